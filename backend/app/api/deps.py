@@ -2,11 +2,13 @@
 API Dependencies
 FastAPI dependencies for database sessions, authentication, permissions
 """
+import secrets
 from typing import Generator, Optional
 from fastapi import Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordBearer
 from sqlalchemy.orm import Session
 
+from app.core.config import settings
 from app.core.database import SessionLocal
 from app.core.security import decode_token
 from app.models import User
@@ -125,6 +127,21 @@ def require_farmer_or_admin(
     return current_user
 
 
+def require_metrics_access(
+    db: Session = Depends(get_db),
+    token: str = Depends(oauth2_scheme)
+) -> None:
+    """
+    Allow /metrics to the Prometheus scraper or an admin
+
+    The scraper authenticates with METRICS_TOKEN as a bearer token;
+    anyone else needs an admin access token.
+    """
+    if settings.METRICS_TOKEN and secrets.compare_digest(token.encode(), settings.METRICS_TOKEN.encode()):
+        return
+    require_admin(get_current_user(db=db, token=token))
+
+
 def get_optional_user(
     db: Session = Depends(get_db),
     token: Optional[str] = Depends(oauth2_scheme)
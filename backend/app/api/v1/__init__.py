@@ -2,7 +2,7 @@
 API v1 routes
 """
 from fastapi import APIRouter
-from . import auth, farms, fields
+from . import auth, changes, farms, fields, operations
 
 # Create API v1 router
 api_router = APIRouter()
@@ -11,5 +11,7 @@ api_router = APIRouter()
 api_router.include_router(auth.router, prefix="/auth", tags=["auth"])
 api_router.include_router(farms.router, prefix="/farms", tags=["farms"])
 api_router.include_router(fields.router, prefix="/fields", tags=["fields"])
+api_router.include_router(operations.router, prefix="/operations", tags=["operations"])
+api_router.include_router(changes.router, prefix="/changes", tags=["changes"])
 
 __all__ = ["api_router"]
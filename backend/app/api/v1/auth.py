@@ -17,8 +17,10 @@ from app.core.security import (
     create_access_token,
     create_refresh_token,
     verify_password,
-    decode_token
+    decode_token,
+    PasswordHasherBusy
 )
+from app.services.login_throttle import login_throttle
 from app.models.user import User
 
 
@@ -79,14 +81,31 @@ def login(
 
     Returns access_token and refresh_token
     """
+    # Reject locked logins before spending CPU on bcrypt
+    retry_after = login_throttle.retry_after(form_data.username)
+    if retry_after is not None:
+        raise HTTPException(
+            status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+            detail="Too many failed login attempts",
+            headers={"Retry-After": str(int(retry_after) + 1)},
+        )
+
     # Authenticate user
-    user = crud_user.authenticate_user(
-        db,
-        username=form_data.username,
-        password=form_data.password
-    )
+    try:
+        user = crud_user.authenticate_user(
+            db,
+            username=form_data.username,
+            password=form_data.password
+        )
+    except PasswordHasherBusy:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Authentication is busy, retry shortly",
+            headers={"Retry-After": "1"},
+        )
 
     if not user:
+        login_throttle.register_failure(form_data.username)
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Incorrect username or password",
@@ -99,6 +118,8 @@ def login(
             detail="Inactive user"
         )
 
+    login_throttle.reset(form_data.username)
+
     # Update last login
     crud_user.update_last_login(db, user.id)
 
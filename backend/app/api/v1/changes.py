@@ -0,0 +1,124 @@
+"""
+Change feed API endpoints (delta sync)
+
+Clients keep the last cursor and poll GET /changes?since=<cursor> to receive
+only farms, fields and operations inserted, updated or deleted since then.
+Bootstrap: read GET /changes/head, load the full collections, then poll from
+that cursor. Responses are gzip-compressed by the middleware in main.py.
+"""
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional, Set, Tuple
+from fastapi import APIRouter, Depends, HTTPException, Query, status
+from sqlalchemy import func
+from sqlalchemy.orm import Session
+
+from app.api.deps import get_db, get_current_user
+from app.core.change_log import TRACKED_TABLES
+from app.core.config import settings
+from app.models import ChangeLog, Farm, Field, Operation
+from app.models.user import User, UserFarm
+from app.schemas.change import ChangeCursor, ChangePage
+
+
+router = APIRouter()
+
+_MODELS = {"farms": Farm, "fields": Field, "operations": Operation}
+
+
+def _accessible_farm_ids(db: Session, user: User) -> Optional[List[int]]:
+    """Farm ids the user may read; None means all (admin)"""
+    if user.role == "admin":
+        return None
+    return [farm_id for (farm_id,) in db.query(UserFarm.farm_id).filter(UserFarm.user_id == user.id)]
+
+
+def _row_data(obj) -> Dict:
+    return {attr.key: getattr(obj, attr.key) for attr in obj.__mapper__.column_attrs}
+
+
+@router.get("/", response_model=ChangePage)
+def get_changes(
+    since: int = Query(0, ge=0, description="Cursor from the previous page (0 = from the beginning)"),
+    limit: int = Query(settings.CHANGES_PAGE_SIZE, ge=1, le=settings.CHANGES_MAX_PAGE),
+    tables: Optional[List[str]] = Query(None, description="Restrict to farms, fields and/or operations"),
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    """
+    Get changes after a cursor
+
+    - **since**: `next_cursor` of the previous page
+    - Several changes of one row within a page are collapsed into the latest
+    - Entries younger than CHANGES_SETTLE_SECONDS are held back so that
+      transactions still committing with lower ids are not skipped
+    """
+    if tables:
+        unknown = set(tables) - set(TRACKED_TABLES)
+        if unknown:
+            raise HTTPException(
+                status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+                detail=f"Unknown tables: {', '.join(sorted(unknown))}"
+            )
+
+    query = db.query(ChangeLog).filter(ChangeLog.id > since)
+    farm_ids = _accessible_farm_ids(db, current_user)
+    if farm_ids is not None:
+        query = query.filter(ChangeLog.farm_id.in_(farm_ids))
+    if tables:
+        query = query.filter(ChangeLog.table_name.in_(tables))
+    if settings.CHANGES_SETTLE_SECONDS > 0:
+        settled = datetime.utcnow() - timedelta(seconds=settings.CHANGES_SETTLE_SECONDS)
+        query = query.filter(ChangeLog.changed_at <= settled)
+
+    entries = query.order_by(ChangeLog.id).limit(limit + 1).all()
+    has_more = len(entries) > limit
+    entries = entries[:limit]
+    if not entries:
+        return {"changes": [], "next_cursor": since, "has_more": False}
+
+    # Latest entry per row
+    latest: Dict[Tuple[str, int], ChangeLog] = {}
+    for entry in entries:
+        latest.pop((entry.table_name, entry.row_id), None)
+        latest[(entry.table_name, entry.row_id)] = entry
+
+    # Current data: one query per table
+    wanted: Dict[str, Set[int]] = {}
+    for (table, row_id), entry in latest.items():
+        if entry.op != "delete":
+            wanted.setdefault(table, set()).add(row_id)
+    rows: Dict[Tuple[str, int], Dict] = {}
+    for table, ids in wanted.items():
+        model = _MODELS[table]
+        for obj in db.query(model).filter(model.id.in_(ids)):
+            rows[(table, obj.id)] = _row_data(obj)
+
+    changes = []
+    for key, entry in latest.items():
+        if entry.op != "delete" and key not in rows:
+            # Deleted later; the delete entry follows on a later page
+            continue
+        changes.append({
+            "cursor": entry.id,
+            "table": entry.table_name,
+            "op": entry.op,
+            "id": entry.row_id,
+            "farm_id": entry.farm_id,
+            "changed_at": entry.changed_at,
+            "data": rows.get(key),
+        })
+
+    return {"changes": changes, "next_cursor": entries[-1].id, "has_more": has_more}
+
+
+@router.get("/head", response_model=ChangeCursor)
+def get_changes_head(
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    """
+    Get the latest cursor
+
+    Use before a full download so that polling can start from this point.
+    """
+    return {"cursor": db.query(func.max(ChangeLog.id)).scalar() or 0}
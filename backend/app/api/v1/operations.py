@@ -0,0 +1,101 @@
+"""
+Operations API endpoints (offline sync)
+"""
+import zlib
+
+from fastapi import APIRouter, Depends, HTTPException, Request, status
+from pydantic import ValidationError
+from sqlalchemy.orm import Session
+
+from app.api.deps import get_db, get_current_user
+from app.api.v1.fields import check_farm_access
+from app.core.config import settings
+from app.crud import operation as crud_operation
+from app.models.equipment import Implement, Machinery
+from app.models.field import Field
+from app.models.user import User
+from app.schemas.operation import OperationSyncBatch, OperationSyncResponse
+
+
+router = APIRouter()
+
+
+async def read_sync_batch(request: Request) -> OperationSyncBatch:
+    """Parse a JSON batch, optionally gzip-compressed (Content-Encoding: gzip)"""
+    max_bytes = settings.SYNC_MAX_BODY_MB * 1024 * 1024
+    body = await request.body()
+    if request.headers.get("content-encoding", "").lower() == "gzip":
+        decompressor = zlib.decompressobj(16 + zlib.MAX_WBITS)
+        try:
+            # One byte over the limit is enough to reject, the rest is never inflated
+            body = decompressor.decompress(body, max_bytes + 1)
+        except zlib.error:
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid gzip body")
+    if len(body) > max_bytes:
+        raise HTTPException(status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE, detail="Batch is too large")
+    try:
+        return OperationSyncBatch.model_validate_json(body)
+    except ValidationError as exc:
+        raise HTTPException(status_code=status.HTTP_422_UNPROCESSABLE_ENTITY, detail=exc.errors())
+
+
+@router.post("/bulk", response_model=OperationSyncResponse)
+def bulk_sync_operations(
+    batch: OperationSyncBatch = Depends(read_sync_batch),
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    """
+    Idempotent bulk upload of operations captured offline
+
+    - Items already accepted (same **client_uuid**) are reported as `duplicate`
+    - An existing operation with the same (field_id, operation_type, operation_date)
+      makes the item a `conflict` unless it is sent with `resolve: keep_both`
+    - Items for farms the user cannot manage, or fields, machinery and implements
+      outside the farm, are `error`
+    """
+    if len(batch.items) > settings.SYNC_MAX_BATCH:
+        raise HTTPException(
+            status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+            detail=f"At most {settings.SYNC_MAX_BATCH} operations per batch"
+        )
+
+    farm_ids = {item.operation.get("farm_id") for item in batch.items}
+    allowed_farms = {
+        farm_id for farm_id in farm_ids
+        if isinstance(farm_id, int) and check_farm_access(db, current_user, farm_id, "manager")
+    }
+    field_ids = {item.operation.get("field_id") for item in batch.items}
+    field_farms = dict(db.query(Field.id, Field.farm_id).filter(Field.id.in_(field_ids)))
+    machine_ids = {item.operation.get("machine_id") for item in batch.items} - {None}
+    machine_farms = dict(db.query(Machinery.id, Machinery.farm_id).filter(Machinery.id.in_(machine_ids)))
+    implement_ids = {item.operation.get("implement_id") for item in batch.items} - {None}
+    implement_farms = dict(db.query(Implement.id, Implement.farm_id).filter(Implement.id.in_(implement_ids)))
+
+    rejected = {}
+    accepted_items = []
+    for item in batch.items:
+        farm_id = item.operation.get("farm_id")
+        machine_id = item.operation.get("machine_id")
+        implement_id = item.operation.get("implement_id")
+        if farm_id not in allowed_farms:
+            rejected[item.client_uuid] = "Not enough permissions to write to this farm"
+        elif field_farms.get(item.operation.get("field_id")) != farm_id:
+            rejected[item.client_uuid] = "Field does not belong to the farm"
+        elif machine_id is not None and machine_farms.get(machine_id) != farm_id:
+            rejected[item.client_uuid] = "Machinery does not belong to the farm"
+        elif implement_id is not None and implement_farms.get(implement_id) != farm_id:
+            rejected[item.client_uuid] = "Implement does not belong to the farm"
+        else:
+            accepted_items.append(item)
+
+    applied = {r["client_uuid"]: r for r in crud_operation.apply_sync_batch(db, accepted_items)} if accepted_items else {}
+    db.commit()
+
+    results = []
+    for item in batch.items:
+        if item.client_uuid in rejected:
+            results.append({"client_uuid": item.client_uuid, "status": "error", "error": rejected[item.client_uuid]})
+        else:
+            results.append(applied[item.client_uuid])
+    return {"results": results}
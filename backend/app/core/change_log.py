@@ -0,0 +1,99 @@
+"""
+Change log capture
+
+An after_flush hook on SessionLocal writes one change_log row per inserted,
+updated or deleted farm, field and operation in the same transaction as the
+change itself (transactional outbox), so the feed never shows a change that
+was rolled back. Changes to operation details (sowing_details, harvest_data,
+...) are recorded as an update of the parent operation.
+
+Not captured: Core-level bulk statements and rows removed by ON DELETE
+CASCADE in the database. Clients recover from those with a full resync.
+"""
+from datetime import datetime
+from typing import Any, Dict, Iterable, Optional, Tuple
+
+from sqlalchemy import event, insert, select
+from sqlalchemy.orm import Session
+from sqlalchemy.orm.util import identity_key
+
+# Tables exposed by GET /api/v1/changes
+TRACKED_TABLES = ("farms", "fields", "operations")
+
+
+def _operation_farm_ids(session: Session, operation_ids: Iterable[int]) -> Dict[int, Optional[int]]:
+    """Farm ids of operations: loaded ones from the identity map, the rest in one query"""
+    from app.models import Operation
+
+    result: Dict[int, Optional[int]] = {}
+    missing = []
+    for operation_id in operation_ids:
+        obj = session.identity_map.get(identity_key(Operation, operation_id))
+        if obj is not None and "farm_id" in obj.__dict__:
+            result[operation_id] = obj.farm_id
+        else:
+            missing.append(operation_id)
+    if missing:
+        result.update(session.connection().execute(
+            select(Operation.id, Operation.farm_id).where(Operation.id.in_(missing))
+        ).all())
+    return result
+
+
+def _entry(obj: Any, op: str) -> Optional[Tuple[str, int, Optional[int], str]]:
+    """(table, row id, farm id, op) for a tracked object, None otherwise"""
+    table = getattr(obj, "__tablename__", None)
+    if table == "farms":
+        return table, obj.id, obj.id, op
+    if table in TRACKED_TABLES:
+        return table, obj.id, obj.farm_id, op
+    operation_id = getattr(obj, "operation_id", None)
+    if operation_id is not None:
+        # farm_id is resolved for the whole flush in _after_flush
+        return "operations", operation_id, None, "update"
+    return None
+
+
+def _after_flush(session: Session, flush_context) -> None:
+    from app.models import ChangeLog
+
+    changes: Dict[Tuple[str, int], Tuple[Optional[int], str]] = {}
+
+    def add(entry):
+        if entry is None or entry[1] is None:
+            return
+        table, row_id, farm_id, op = entry
+        previous = changes.get((table, row_id))
+        # insert followed by a detail update in the same flush stays an insert;
+        # delete is final (details of a deleted operation still report an update)
+        if previous is not None and (previous[1] == "delete" or (previous[1] == "insert" and op == "update")):
+            return
+        changes[(table, row_id)] = (farm_id, op)
+
+    for obj in session.new:
+        add(_entry(obj, "insert"))
+    for obj in session.dirty:
+        if session.is_modified(obj, include_collections=False):
+            add(_entry(obj, "update"))
+    for obj in session.deleted:
+        add(_entry(obj, "delete"))
+
+    if not changes:
+        return
+    unresolved = [key for key, (farm_id, _) in changes.items() if key[0] == "operations" and farm_id is None]
+    if unresolved:
+        farm_ids = _operation_farm_ids(session, [row_id for _, row_id in unresolved])
+        for key in unresolved:
+            changes[key] = (farm_ids.get(key[1]), changes[key][1])
+    now = datetime.utcnow()
+    rows = [
+        {"table_name": table, "row_id": row_id, "farm_id": farm_id, "op": op, "changed_at": now}
+        for (table, row_id), (farm_id, op) in changes.items()
+    ]
+    session.connection().execute(insert(ChangeLog.__table__), rows)
+
+
+def install(session_factory) -> None:
+    """Attach the hook to a sessionmaker (idempotent)"""
+    if not event.contains(session_factory, "after_flush", _after_flush):
+        event.listen(session_factory, "after_flush", _after_flush)
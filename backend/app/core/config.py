@@ -23,6 +23,37 @@ class Settings(BaseSettings):
     ACCESS_TOKEN_EXPIRE_MINUTES: int = 15
     REFRESH_TOKEN_EXPIRE_DAYS: int = 7
 
+    # Password hashing (hashes with a different cost are rehashed on login)
+    BCRYPT_ROUNDS: int = 12
+    PASSWORD_HASH_WORKERS: int = 2
+    PASSWORD_HASH_MAX_PENDING: int = 32
+
+    # Failed login throttling
+    LOGIN_MAX_FAILED_ATTEMPTS: int = 5
+    LOGIN_FAILED_WINDOW_SECONDS: int = 900
+    LOGIN_LOCKOUT_SECONDS: int = 30
+    LOGIN_MAX_LOCKOUT_SECONDS: int = 900
+
+    # SQL instrumentation
+    QUERY_STATS_ENABLED: bool = True
+    SLOW_QUERY_MS: float = 200
+    SLOW_QUERY_LOG_SIZE: int = 200
+    N_PLUS_ONE_THRESHOLD: int = 10
+
+    # Offline sync (POST /operations/bulk)
+    SYNC_MAX_BATCH: int = 500
+    SYNC_MAX_BODY_MB: int = 20
+
+    # Change feed (GET /changes)
+    CHANGES_ENABLED: bool = True
+    CHANGES_PAGE_SIZE: int = 500
+    CHANGES_MAX_PAGE: int = 5000
+    CHANGES_SETTLE_SECONDS: float = 2
+
+    # Prometheus metrics (/metrics, /metrics/sql): admin token or METRICS_TOKEN
+    METRICS_ENABLED: bool = True
+    METRICS_TOKEN: str = ""
+
     # CORS
     BACKEND_CORS_ORIGINS: List[str] = [
         "http://localhost:3000",
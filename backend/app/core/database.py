@@ -5,6 +5,8 @@ from sqlalchemy import create_engine
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
 from .config import settings
+from .query_stats import query_stats
+from . import change_log
 
 
 # Create database engine
@@ -15,9 +17,17 @@ engine = create_engine(
     max_overflow=20
 )
 
+# Per-statement latency, slow-query log and N+1 detection
+if settings.QUERY_STATS_ENABLED:
+    query_stats.install(engine)
+
 # Create session factory
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
+# Record farm/field/operation changes for GET /api/v1/changes
+if settings.CHANGES_ENABLED:
+    change_log.install(SessionLocal)
+
 # Base class for SQLAlchemy models
 Base = declarative_base()
 
@@ -0,0 +1,233 @@
+"""
+Prometheus-style metrics
+
+Hot-path updates never take a lock: every thread writes into its own shard
+(a plain dict owned by that thread), and the scrape merges all shards. The
+registry renders the Prometheus text exposition format (version 0.0.4).
+
+Values sampled at scrape time (DB pool gauges, SQL query statistics) come
+from collectors registered with MetricsRegistry.register_collector().
+"""
+import bisect
+import math
+import threading
+import time
+from typing import Callable, Dict, Iterable, List, Tuple
+
+Labels = Tuple[Tuple[str, str], ...]
+
+# Request latency buckets in seconds
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+# Collector output: (name, type, help, [(labels, value), ...])
+Sample = Tuple[str, str, str, List[Tuple[Labels, float]]]
+
+
+class _Shard:
+    """Metric values written by a single thread"""
+
+    __slots__ = ("values", "histograms")
+
+    def __init__(self):
+        self.values: Dict[Tuple[str, Labels], float] = {}
+        # (name, labels) -> [bucket counts..., +Inf count, sum]
+        self.histograms: Dict[Tuple[str, Labels], List[float]] = {}
+
+
+class MetricsRegistry:
+    """Counters, gauges and histograms with per-thread aggregation"""
+
+    def __init__(self, buckets: Iterable[float] = DEFAULT_BUCKETS):
+        self.buckets = tuple(sorted(buckets))
+        self._meta: Dict[str, Tuple[str, str]] = {}
+        self._shards: List[_Shard] = []
+        self._shards_lock = threading.Lock()
+        self._local = threading.local()
+        self._collectors: List[Callable[[], Iterable[Sample]]] = []
+
+    def describe(self, name: str, kind: str, help_text: str) -> None:
+        """Declare a metric type (counter, gauge or histogram) and help text"""
+        self._meta[name] = (kind, help_text)
+
+    def _shard(self) -> _Shard:
+        shard = getattr(self._local, "shard", None)
+        if shard is None:
+            shard = self._local.shard = _Shard()
+            with self._shards_lock:
+                self._shards.append(shard)
+        return shard
+
+    def inc(self, name: str, labels: Labels = (), value: float = 1.0) -> None:
+        """Increase a counter (or move a gauge by a delta)"""
+        values = self._shard().values
+        key = (name, labels)
+        values[key] = values.get(key, 0.0) + value
+
+    def observe(self, name: str, labels: Labels, value: float) -> None:
+        """Record a histogram observation"""
+        histograms = self._shard().histograms
+        key = (name, labels)
+        row = histograms.get(key)
+        if row is None:
+            row = histograms[key] = [0.0] * (len(self.buckets) + 2)
+        row[bisect.bisect_left(self.buckets, value)] += 1
+        row[-1] += value
+
+    def register_collector(self, collector: Callable[[], Iterable[Sample]]) -> None:
+        """Add a callable sampled on every scrape"""
+        self._collectors.append(collector)
+
+    def _merged(self):
+        values: Dict[Tuple[str, Labels], float] = {}
+        histograms: Dict[Tuple[str, Labels], List[float]] = {}
+        with self._shards_lock:
+            shards = list(self._shards)
+        for shard in shards:
+            for key, value in list(shard.values.items()):
+                values[key] = values.get(key, 0.0) + value
+            for key, row in list(shard.histograms.items()):
+                merged = histograms.setdefault(key, [0.0] * len(row))
+                for i, count in enumerate(list(row)):
+                    merged[i] += count
+        return values, histograms
+
+    def render(self) -> str:
+        """Prometheus text exposition of all metrics"""
+        values, histograms = self._merged()
+        families: Dict[str, List[str]] = {}
+
+        for (name, labels), value in sorted(values.items()):
+            families.setdefault(name, []).append(f"{name}{_format_labels(labels)} {_format_value(value)}")
+
+        for (name, labels), row in sorted(histograms.items()):
+            lines = families.setdefault(name, [])
+            cumulative = 0.0
+            for bound, count in zip(self.buckets + (math.inf,), row[:-1]):
+                cumulative += count
+                le = "+Inf" if bound == math.inf else repr(bound)
+                lines.append(f"{name}_bucket{_format_labels(labels + (('le', le),))} {_format_value(cumulative)}")
+            lines.append(f"{name}_sum{_format_labels(labels)} {_format_value(row[-1])}")
+            lines.append(f"{name}_count{_format_labels(labels)} {_format_value(cumulative)}")
+
+        for collector in self._collectors:
+            for name, kind, help_text, samples in collector():
+                self._meta.setdefault(name, (kind, help_text))
+                families.setdefault(name, []).extend(
+                    f"{name}{_format_labels(labels)} {_format_value(value)}" for labels, value in samples
+                )
+
+        output = []
+        for name in sorted(families):
+            kind, help_text = self._meta.get(name, ("untyped", ""))
+            if help_text:
+                output.append(f"# HELP {name} {help_text}")
+            output.append(f"# TYPE {name} {kind}")
+            output.extend(families[name])
+        return "\n".join(output) + "\n"
+
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(labels: Labels) -> str:
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{key}="{_escape(value)}"' for key, value in labels) + "}"
+
+
+def _format_value(value: float) -> str:
+    if value == math.inf:
+        return "+Inf"
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+class PrometheusMiddleware:
+    """
+    ASGI middleware recording per-route request count, latency and in-flight requests
+
+    The route label is the path template (/api/v1/fields/{field_id}), so
+    the number of series does not grow with ids; unmatched paths share one label.
+    """
+
+    def __init__(self, app, registry: "MetricsRegistry", skip_paths: Iterable[str] = ("/metrics",)):
+        self.app = app
+        self.registry = registry
+        self.skip_paths = frozenset(skip_paths)
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["path"] in self.skip_paths:
+            await self.app(scope, receive, send)
+            return
+
+        status_code = 500
+
+        async def send_wrapper(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+
+        registry = self.registry
+        registry.inc("http_requests_in_flight", (), 1)
+        started = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            elapsed = time.perf_counter() - started
+            registry.inc("http_requests_in_flight", (), -1)
+            route = scope.get("route")
+            path = getattr(route, "path", None) or "<unmatched>"
+            method = scope["method"]
+            registry.inc("http_requests_total", (("method", method), ("route", path), ("status", str(status_code))))
+            registry.observe("http_request_duration_seconds", (("method", method), ("route", path)), elapsed)
+
+
+def instrument_pool(engine, registry: "MetricsRegistry") -> None:
+    """
+    DB pool metrics: checkout wait histogram and pool gauges
+
+    Wraps engine.pool.connect to time how long a request waits for a
+    connection (including opening a new one); pool size, checked-out and
+    overflow connections are sampled on scrape.
+    """
+    pool = engine.pool
+    connect = pool.connect
+
+    def timed_connect():
+        started = time.perf_counter()
+        try:
+            return connect()
+        finally:
+            registry.observe("db_pool_checkout_wait_seconds", (), time.perf_counter() - started)
+
+    pool.connect = timed_connect
+
+    def collect():
+        current = engine.pool
+        samples = []
+        for name, method, help_text in (
+            ("db_pool_size", "size", "Configured pool size"),
+            ("db_pool_checked_out", "checkedout", "Connections currently checked out"),
+            ("db_pool_overflow", "overflow", "Overflow connections in use"),
+        ):
+            if hasattr(current, method):
+                samples.append((name, "gauge", help_text, [((), float(getattr(current, method)()))]))
+        return samples
+
+    registry.register_collector(collect)
+
+
+def _default_registry() -> MetricsRegistry:
+    registry = MetricsRegistry()
+    registry.describe("http_requests_total", "counter", "HTTP requests by route and status")
+    registry.describe("http_request_duration_seconds", "histogram", "HTTP request latency by route")
+    registry.describe("http_requests_in_flight", "gauge", "HTTP requests being processed")
+    registry.describe("db_pool_checkout_wait_seconds", "histogram", "Time spent waiting for a DB connection")
+    return registry
+
+
+# Global registry
+metrics_registry = _default_registry()
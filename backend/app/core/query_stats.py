@@ -0,0 +1,196 @@
+"""
+SQL query instrumentation
+
+before/after_cursor_execute hooks time every statement and aggregate it by
+normalized text (literals and IN lists replaced with ?). Statements slower
+than SLOW_QUERY_MS go to a rolling slow-query log together with the endpoint
+that issued them.
+
+A scope is one HTTP request, opened by the middleware in main.py. When the
+same normalized statement runs N_PLUS_ONE_THRESHOLD times within a scope it
+is reported as a probable N+1 pattern.
+"""
+import contextvars
+import re
+import threading
+import time
+from collections import Counter, deque
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+
+from sqlalchemy import event
+
+from .config import settings
+
+# Aggregate key used once max_statements distinct statements are tracked
+OTHER_STATEMENTS = "<other>"
+
+_STRING_RE = re.compile(r"'(?:[^']|'')*'")
+_NUMBER_RE = re.compile(r"(?<![\w.])-?\d+(?:\.\d+)?\b")
+_IN_LIST_RE = re.compile(r"\bIN\s*\((?:\s*(?:\?|%\(\w+\)s|%s|:\w+)\s*,?)+\)", re.IGNORECASE)
+_SPACE_RE = re.compile(r"\s+")
+
+
+def normalize_statement(statement: str) -> str:
+    """Strip literals and collapse IN lists so statements group together"""
+    text = _STRING_RE.sub("?", statement)
+    text = _NUMBER_RE.sub("?", text)
+    text = _IN_LIST_RE.sub("IN (?...)", text)
+    return _SPACE_RE.sub(" ", text).strip()
+
+
+class _Scope:
+    """Statements issued by one request"""
+
+    __slots__ = ("name", "counts", "flagged", "queries", "ms")
+
+    def __init__(self, name: str):
+        self.name = name
+        self.counts: Counter = Counter()
+        self.flagged: set = set()
+        self.queries = 0
+        self.ms = 0.0
+
+
+_current_scope: contextvars.ContextVar[Optional[_Scope]] = contextvars.ContextVar("query_scope", default=None)
+
+
+class QueryStats:
+    """Process-wide statement statistics, slow-query log and N+1 reports"""
+
+    def __init__(
+        self,
+        slow_ms: float = 200,
+        slow_log_size: int = 200,
+        n_plus_one_threshold: int = 10,
+        max_statements: int = 500,
+    ):
+        self.slow_ms = slow_ms
+        self.n_plus_one_threshold = max(2, n_plus_one_threshold)
+        self.max_statements = max_statements
+        self._stats: Dict[str, Dict[str, Any]] = {}
+        self._slow: deque = deque(maxlen=slow_log_size)
+        self._n_plus_one: deque = deque(maxlen=slow_log_size)
+        self._lock = threading.Lock()
+        self.started_at = datetime.utcnow()
+        self.slow_total = 0
+        self.n_plus_one_total = 0
+
+    def install(self, bind) -> None:
+        """Attach the cursor hooks to an engine (idempotent)"""
+        if not event.contains(bind, "before_cursor_execute", self._before):
+            event.listen(bind, "before_cursor_execute", self._before)
+            event.listen(bind, "after_cursor_execute", self._after)
+
+    def begin_scope(self, name: str) -> contextvars.Token:
+        """Start a new request scope; pass the token to end_scope()"""
+        return _current_scope.set(_Scope(name))
+
+    def end_scope(self, token: contextvars.Token) -> Dict[str, Any]:
+        """Close the request scope and return its totals"""
+        scope = _current_scope.get()
+        _current_scope.reset(token)
+        if scope is None:
+            return {"queries": 0, "ms": 0.0}
+        return {"queries": scope.queries, "ms": scope.ms}
+
+    @staticmethod
+    def _before(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("query_stats_started", []).append(time.perf_counter())
+
+    def _after(self, conn, cursor, statement, parameters, context, executemany):
+        started = conn.info.get("query_stats_started")
+        if not started:
+            return
+        elapsed_ms = (time.perf_counter() - started.pop()) * 1000
+        rows = cursor.rowcount if cursor.rowcount is not None and cursor.rowcount >= 0 else None
+        normalized = normalize_statement(statement)
+
+        scope = _current_scope.get()
+        source = scope.name if scope is not None else threading.current_thread().name
+        repeated = 0
+        if scope is not None:
+            scope.queries += 1
+            scope.ms += elapsed_ms
+            scope.counts[normalized] += 1
+            if scope.counts[normalized] >= self.n_plus_one_threshold and normalized not in scope.flagged:
+                scope.flagged.add(normalized)
+                repeated = scope.counts[normalized]
+
+        now = datetime.utcnow()
+        with self._lock:
+            key = normalized
+            if key not in self._stats and len(self._stats) >= self.max_statements:
+                key = OTHER_STATEMENTS
+            stat = self._stats.get(key)
+            if stat is None:
+                stat = self._stats[key] = {
+                    "statement": key, "count": 0, "total_ms": 0.0, "max_ms": 0.0,
+                    "rows": 0, "sources": set(),
+                }
+            stat["count"] += 1
+            stat["total_ms"] += elapsed_ms
+            stat["max_ms"] = max(stat["max_ms"], elapsed_ms)
+            stat["rows"] += rows or 0
+            if len(stat["sources"]) < 10:
+                stat["sources"].add(source)
+
+            if elapsed_ms >= self.slow_ms:
+                self.slow_total += 1
+                self._slow.append({
+                    "at": now, "ms": round(elapsed_ms, 1), "rows": rows,
+                    "source": source, "statement": normalized,
+                })
+            if repeated:
+                self.n_plus_one_total += 1
+                self._n_plus_one.append({
+                    "at": now, "source": source, "repeats": repeated, "statement": normalized,
+                })
+
+    def top_statements(self, limit: int = 20, order_by: str = "total_ms") -> List[Dict[str, Any]]:
+        """Most expensive statements by total_ms, count or max_ms"""
+        with self._lock:
+            stats = [dict(s, sources=sorted(s["sources"])) for s in self._stats.values()]
+        for s in stats:
+            s["avg_ms"] = round(s["total_ms"] / s["count"], 2) if s["count"] else 0.0
+            s["total_ms"] = round(s["total_ms"], 1)
+            s["max_ms"] = round(s["max_ms"], 1)
+        return sorted(stats, key=lambda s: s[order_by], reverse=True)[:limit]
+
+    def totals(self) -> Dict[str, float]:
+        """Process totals for the Prometheus exposition"""
+        with self._lock:
+            return {
+                "queries": sum(s["count"] for s in self._stats.values()),
+                "seconds": sum(s["total_ms"] for s in self._stats.values()) / 1000,
+                "slow": self.slow_total,
+                "n_plus_one": self.n_plus_one_total,
+            }
+
+    def snapshot(self, limit: int = 20) -> Dict[str, Any]:
+        """JSON-serializable report"""
+        top = self.top_statements(limit)
+        with self._lock:
+            return {
+                "since": self.started_at.isoformat(),
+                "slow_ms": self.slow_ms,
+                "queries": sum(s["count"] for s in self._stats.values()),
+                "top_statements": top,
+                "slow_queries": [dict(e, at=e["at"].isoformat()) for e in reversed(self._slow)],
+                "n_plus_one": [dict(e, at=e["at"].isoformat()) for e in reversed(self._n_plus_one)],
+            }
+
+    def reset(self) -> None:
+        with self._lock:
+            self._stats.clear()
+            self._slow.clear()
+            self._n_plus_one.clear()
+            self.started_at = datetime.utcnow()
+
+
+# Global instance
+query_stats = QueryStats(
+    slow_ms=settings.SLOW_QUERY_MS,
+    slow_log_size=settings.SLOW_QUERY_LOG_SIZE,
+    n_plus_one_threshold=settings.N_PLUS_ONE_THRESHOLD,
+)
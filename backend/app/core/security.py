@@ -1,25 +1,69 @@
 """
 Security utilities: JWT tokens, password hashing
 """
+import threading
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta
-from typing import Any, Optional
+from typing import Any, Optional, Tuple
 from jose import JWTError, jwt
 from passlib.context import CryptContext
 from .config import settings
 
 
-# Password hashing context
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+# Password hashing context. min/max rounds pin the cost, so hashes made
+# with any other cost are reported by needs_update() and rehashed on login.
+pwd_context = CryptContext(
+    schemes=["bcrypt"],
+    deprecated="auto",
+    bcrypt__default_rounds=settings.BCRYPT_ROUNDS,
+    bcrypt__min_rounds=settings.BCRYPT_ROUNDS,
+    bcrypt__max_rounds=settings.BCRYPT_ROUNDS,
+)
+
+# Bounded pool for bcrypt: caps the CPU a burst of logins can take
+_hash_executor = ThreadPoolExecutor(
+    max_workers=max(1, settings.PASSWORD_HASH_WORKERS),
+    thread_name_prefix="bcrypt",
+)
+_hash_slots = threading.BoundedSemaphore(
+    max(1, settings.PASSWORD_HASH_WORKERS) + max(0, settings.PASSWORD_HASH_MAX_PENDING)
+)
+
+
+class PasswordHasherBusy(Exception):
+    """Raised when the password hashing pool queue is full"""
+
+
+def _run_hashing(func, *args):
+    """Run a hashing call in the bounded pool and wait for the result"""
+    if not _hash_slots.acquire(blocking=False):
+        raise PasswordHasherBusy("Password hashing pool is saturated")
+    try:
+        future = _hash_executor.submit(func, *args)
+    except Exception:
+        _hash_slots.release()
+        raise
+    future.add_done_callback(lambda _: _hash_slots.release())
+    return future.result()
 
 
 def verify_password(plain_password: str, hashed_password: str) -> bool:
     """Verify a password against a hash"""
-    return pwd_context.verify(plain_password, hashed_password)
+    return _run_hashing(pwd_context.verify, plain_password, hashed_password)
+
+
+def verify_and_update_password(plain_password: str, hashed_password: str) -> Tuple[bool, Optional[str]]:
+    """
+    Verify a password and rehash it if the stored cost is outdated
+
+    Returns (is_valid, new_hash); new_hash is None when no update is needed.
+    """
+    return _run_hashing(pwd_context.verify_and_update, plain_password, hashed_password)
 
 
 def get_password_hash(password: str) -> str:
     """Hash a password"""
-    return pwd_context.hash(password)
+    return _run_hashing(pwd_context.hash, password)
 
 
 def create_access_token(subject: Any, expires_delta: Optional[timedelta] = None) -> str:
@@ -1,6 +1,6 @@
 """
 CRUD operations
 """
-from . import user, farm, field
+from . import user, farm, field, operation
 
-__all__ = ["user", "farm", "field"]
+__all__ = ["user", "farm", "field", "operation"]
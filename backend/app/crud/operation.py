@@ -0,0 +1,121 @@
+"""
+CRUD operations for Operation model (offline sync)
+"""
+from datetime import date, datetime
+from typing import Any, Dict, List, Optional, Tuple
+
+from sqlalchemy import Date, DateTime
+from sqlalchemy.orm import Session
+
+from app.models.operation import Operation
+from app.schemas.operation import OperationSyncItem
+
+# Details accepted from clients: one-to-one and one-to-many relationships
+DETAIL_RELATIONSHIPS = (
+    "sowing_details",
+    "harvest_data",
+    "agrochemical_analysis",
+    "desiccation_details",
+    "tillage_details",
+    "irrigation_details",
+    "snow_retention_details",
+    "fallow_details",
+)
+COLLECTION_RELATIONSHIPS = ("fertilizer_applications", "pesticide_applications")
+
+# Columns never taken from the client payload; import_key and source_hash
+# belong to the Excel import and would let a client hijack an imported row
+_PROTECTED_COLUMNS = {"id", "operation_id", "client_uuid", "import_key", "source_hash", "created_at", "updated_at"}
+
+
+def _coerce(model, values: Dict[str, Any]) -> Dict[str, Any]:
+    """Convert JSON values to column types and drop unknown keys"""
+    columns = model.__table__.columns
+    result = {}
+    for key, value in values.items():
+        if key not in columns or key in _PROTECTED_COLUMNS:
+            continue
+        column_type = columns[key].type
+        if isinstance(value, str) and isinstance(column_type, DateTime):
+            value = datetime.fromisoformat(value)
+        elif isinstance(value, str) and isinstance(column_type, Date):
+            value = date.fromisoformat(value[:10])
+        result[key] = value
+    return result
+
+
+def build_operation(item: OperationSyncItem) -> Operation:
+    """Operation with its details from a sync item"""
+    op = Operation(**_coerce(Operation, item.operation), client_uuid=item.client_uuid)
+    for name, values in item.details.items():
+        if name not in DETAIL_RELATIONSHIPS and name not in COLLECTION_RELATIONSHIPS:
+            raise ValueError(f"Unknown operation detail: {name}")
+        detail_class = Operation.__mapper__.relationships[name].mapper.class_
+        if name in COLLECTION_RELATIONSHIPS:
+            setattr(op, name, [detail_class(**_coerce(detail_class, v)) for v in values])
+        else:
+            setattr(op, name, detail_class(**_coerce(detail_class, values)))
+    return op
+
+
+def apply_sync_batch(db: Session, items: List[OperationSyncItem]) -> List[Dict[str, Optional[Any]]]:
+    """
+    Idempotent bulk insert of client operations (caller commits)
+
+    Already accepted client_uuids and conflicting operations are looked up
+    with two queries for the whole batch. Each insert runs in its own
+    savepoint so one bad item does not fail the batch.
+    """
+    accepted = dict(
+        db.query(Operation.client_uuid, Operation.id)
+        .filter(Operation.client_uuid.in_([item.client_uuid for item in items]))
+    )
+
+    keys = {}
+    for item in items:
+        try:
+            keys[item.client_uuid] = item.conflict_key()
+        except (TypeError, ValueError):
+            keys[item.client_uuid] = None
+
+    taken: Dict[Tuple, int] = {}
+    valid_keys = [key for key in keys.values() if key is not None]
+    if valid_keys:
+        rows = db.query(Operation.id, Operation.field_id, Operation.operation_type, Operation.operation_date).filter(
+            Operation.field_id.in_({key[0] for key in valid_keys}),
+            Operation.operation_date.in_({key[2] for key in valid_keys}),
+        )
+        for op_id, field_id, operation_type, operation_date in rows:
+            taken.setdefault((field_id, operation_type, operation_date), op_id)
+
+    results = []
+    for item in items:
+        result = {"client_uuid": item.client_uuid, "operation_id": None, "conflict_with": None, "error": None}
+        results.append(result)
+
+        if item.client_uuid in accepted:
+            result.update(status="duplicate", operation_id=accepted[item.client_uuid])
+            continue
+
+        key = keys[item.client_uuid]
+        if key is None:
+            result.update(status="error", error="operation_date is missing or invalid")
+            continue
+        if key in taken and item.resolve != "keep_both":
+            result.update(status="conflict", conflict_with=taken[key])
+            continue
+
+        try:
+            with db.begin_nested():
+                op = build_operation(item)
+                db.add(op)
+                db.flush()
+        except Exception as exc:
+            result.update(status="error", error=f"{type(exc).__name__}: {exc}"[:500])
+            continue
+
+        accepted[item.client_uuid] = op.id
+        taken.setdefault(key, op.id)
+        result.update(status="created", operation_id=op.id)
+
+    return results
@@ -7,7 +7,7 @@ from sqlalchemy.orm import Session
 
 from app.models.user import User, UserFarm
 from app.schemas.user import UserCreate, UserUpdate
-from app.core.security import get_password_hash, verify_password
+from app.core.security import get_password_hash, verify_and_update_password
 
 
 def get_user(db: Session, user_id: int) -> Optional[User]:
@@ -110,9 +110,15 @@ def authenticate_user(db: Session, username: str, password: str) -> Optional[Use
     if not user:
         return None
 
-    if not verify_password(password, user.hashed_password):
+    is_valid, new_hash = verify_and_update_password(password, user.hashed_password)
+    if not is_valid:
         return None
 
+    # Stored hash used an outdated cost - keep the rehashed one
+    if new_hash:
+        user.hashed_password = new_hash
+        db.commit()
+
     return user
 
 
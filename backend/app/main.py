@@ -1,9 +1,17 @@
 """
 Main FastAPI application
 """
-from fastapi import FastAPI
+import re
+
+from fastapi import Depends, FastAPI, Request
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.middleware.gzip import GZipMiddleware
+from fastapi.responses import PlainTextResponse
+from .api.deps import require_metrics_access
 from .core.config import settings
+from .core.database import engine
+from .core.metrics import PrometheusMiddleware, instrument_pool, metrics_registry
+from .core.query_stats import query_stats
 
 
 # Create FastAPI app
@@ -25,6 +33,42 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Compress large responses (change feed pages, collection lists)
+app.add_middleware(GZipMiddleware, minimum_size=1000)
+
+
+# Request count, latency histograms and in-flight requests per route
+if settings.METRICS_ENABLED:
+    app.add_middleware(PrometheusMiddleware, registry=metrics_registry)
+    instrument_pool(engine, metrics_registry)
+
+
+def _collect_query_stats():
+    totals = query_stats.totals()
+    return [
+        ("db_queries_total", "counter", "SQL statements executed", [((), totals["queries"])]),
+        ("db_query_seconds_total", "counter", "Time spent in SQL statements", [((), totals["seconds"])]),
+        ("db_slow_queries_total", "counter", "Statements slower than SLOW_QUERY_MS", [((), totals["slow"])]),
+        ("db_n_plus_one_total", "counter", "Repeated-statement patterns detected", [((), totals["n_plus_one"])]),
+    ]
+
+
+metrics_registry.register_collector(_collect_query_stats)
+
+
+_ID_SEGMENT_RE = re.compile(r"/\d+(?=/|$)")
+
+
+@app.middleware("http")
+async def query_scope(request: Request, call_next):
+    """Group SQL statements by request for N+1 detection"""
+    name = f"{request.method} {_ID_SEGMENT_RE.sub('/{id}', request.url.path)}"
+    token = query_stats.begin_scope(name)
+    try:
+        return await call_next(request)
+    finally:
+        query_stats.end_scope(token)
+
 
 @app.get("/")
 async def root():
@@ -42,6 +86,19 @@ async def health_check():
     return {"status": "healthy", "environment": settings.ENVIRONMENT}
 
 
+# Route templates and normalized SQL are not public: admin or scraper token only
+@app.get("/metrics", response_class=PlainTextResponse, dependencies=[Depends(require_metrics_access)])
+async def metrics():
+    """Prometheus text exposition"""
+    return PlainTextResponse(metrics_registry.render(), media_type="text/plain; version=0.0.4; charset=utf-8")
+
+
+@app.get("/metrics/sql", dependencies=[Depends(require_metrics_access)])
+async def sql_metrics(limit: int = 20):
+    """SQL statistics: top statements, slow-query log and N+1 reports"""
+    return query_stats.snapshot(limit)
+
+
 # Import and include API v1 router
 from app.api.v1 import api_router
 
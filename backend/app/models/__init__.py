@@ -22,6 +22,7 @@ from .operation import (
     SnowRetentionDetails,
     FallowDetails,
 )
+from .change_log import ChangeLog
 
 # Export all models
 __all__ = [
@@ -44,4 +45,5 @@ __all__ = [
     "IrrigationDetails",
     "SnowRetentionDetails",
     "FallowDetails",
+    "ChangeLog",
 ]
@@ -0,0 +1,20 @@
+"""
+Change log model (outbox for the delta sync feed)
+"""
+from sqlalchemy import BigInteger, Column, DateTime, Index, Integer, String
+from app.core.database import Base
+
+
+class ChangeLog(Base):
+    """One insert/update/delete of a farm, field or operation; id is the feed cursor"""
+    __tablename__ = "change_log"
+    __table_args__ = (
+        Index("ix_change_log_farm_id_id", "farm_id", "id"),
+    )
+
+    id = Column(BigInteger().with_variant(Integer, "sqlite"), primary_key=True, autoincrement=True)
+    table_name = Column(String(50), nullable=False)
+    row_id = Column(Integer, nullable=False)
+    farm_id = Column(Integer)
+    op = Column(String(10), nullable=False)  # insert, update, delete
+    changed_at = Column(DateTime, nullable=False)
@@ -27,6 +27,7 @@ class Field(BaseModel):
     slope_degree = Column(Float)
     drainage = Column(String(50))
     last_analysis_year = Column(Integer)
+    source_hash = Column(String(64))  # content hash of the Excel row it was last imported from
 
     # Relationships
     farm = relationship("Farm", back_populates="fields")
@@ -1,7 +1,7 @@
 """
 Operation models
 """
-from sqlalchemy import Column, Integer, String, Float, Date, Text, ForeignKey, Boolean
+from sqlalchemy import Column, Integer, String, Float, Date, Text, ForeignKey, Boolean, Index
 from sqlalchemy.orm import relationship
 from .base import BaseModel
 
@@ -9,6 +9,10 @@ from .base import BaseModel
 class Operation(BaseModel):
     """Operation model - main operations table"""
     __tablename__ = "operations"
+    __table_args__ = (
+        # Conflict lookup for offline sync
+        Index("ix_operations_field_type_date", "field_id", "operation_type", "operation_date"),
+    )
 
     farm_id = Column(Integer, ForeignKey("farms.id"), nullable=False, index=True)
     field_id = Column(Integer, ForeignKey("fields.id", ondelete="CASCADE"), nullable=False, index=True)
@@ -28,6 +32,9 @@ class Operation(BaseModel):
     operator = Column(String(100))
     weather_conditions = Column(Text)
     notes = Column(Text)
+    client_uuid = Column(String(36), unique=True, index=True)  # set by offline clients, makes sync idempotent
+    import_key = Column(String(200), unique=True, index=True)  # natural key of the Excel row it was imported from
+    source_hash = Column(String(64))  # content hash of that row
 
     # Relationships
     farm = relationship("Farm", back_populates="operations")
@@ -30,6 +30,17 @@ from .field import (
     FieldRead,
     FieldWithStats,
 )
+from .operation import (
+    OperationSyncItem,
+    OperationSyncBatch,
+    OperationSyncResult,
+    OperationSyncResponse,
+)
+from .change import (
+    ChangeRead,
+    ChangePage,
+    ChangeCursor,
+)
 
 __all__ = [
     # User schemas
@@ -58,4 +69,13 @@ __all__ = [
     "FieldUpdate",
     "FieldRead",
     "FieldWithStats",
+    # Operation sync schemas
+    "OperationSyncItem",
+    "OperationSyncBatch",
+    "OperationSyncResult",
+    "OperationSyncResponse",
+    # Change feed schemas
+    "ChangeRead",
+    "ChangePage",
+    "ChangeCursor",
 ]
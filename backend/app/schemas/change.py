@@ -0,0 +1,29 @@
+"""
+Change feed Pydantic schemas
+"""
+from typing import Any, Dict, List, Literal, Optional
+from datetime import datetime
+from pydantic import BaseModel, Field
+
+
+class ChangeRead(BaseModel):
+    """One change of a farm, field or operation"""
+    cursor: int = Field(..., description="change_log id; pass the last one as ?since= to continue")
+    table: Literal["farms", "fields", "operations"]
+    op: Literal["insert", "update", "delete"]
+    id: int
+    farm_id: Optional[int] = None
+    changed_at: datetime
+    data: Optional[Dict[str, Any]] = Field(None, description="Current row; null for deletes")
+
+
+class ChangePage(BaseModel):
+    """Page returned by GET /changes"""
+    changes: List[ChangeRead]
+    next_cursor: int
+    has_more: bool
+
+
+class ChangeCursor(BaseModel):
+    """Latest cursor returned by GET /changes/head"""
+    cursor: int
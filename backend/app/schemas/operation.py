@@ -0,0 +1,38 @@
+"""
+Operation Pydantic schemas (offline sync)
+"""
+from typing import Any, Dict, List, Literal, Optional
+from datetime import date
+from pydantic import BaseModel, Field
+
+
+class OperationSyncItem(BaseModel):
+    """Operation queued on an offline client"""
+    client_uuid: str = Field(..., min_length=1, max_length=36)
+    operation: Dict[str, Any] = Field(..., description="Operation columns; farm_id, field_id, operation_type and operation_date are required")
+    details: Dict[str, Any] = Field(default_factory=dict, description="Details by relationship name, e.g. sowing_details")
+    resolve: Optional[Literal["keep_both"]] = Field(None, description="keep_both: store even if an operation with the same key exists")
+
+    def conflict_key(self) -> tuple:
+        """(field_id, operation_type, operation_date) used for conflict detection"""
+        op = self.operation
+        return op.get("field_id"), op.get("operation_type"), date.fromisoformat(str(op.get("operation_date"))[:10])
+
+
+class OperationSyncBatch(BaseModel):
+    """Batch sent by POST /operations/bulk"""
+    items: List[OperationSyncItem]
+
+
+class OperationSyncResult(BaseModel):
+    """Outcome for one queued operation"""
+    client_uuid: str
+    status: Literal["created", "duplicate", "conflict", "error"]
+    operation_id: Optional[int] = None
+    conflict_with: Optional[int] = None
+    error: Optional[str] = None
+
+
+class OperationSyncResponse(BaseModel):
+    """Per-item results in request order"""
+    results: List[OperationSyncResult]
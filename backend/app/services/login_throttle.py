@@ -0,0 +1,77 @@
+"""
+Failed login throttling
+
+After LOGIN_MAX_FAILED_ATTEMPTS failures within LOGIN_FAILED_WINDOW_SECONDS
+a login name is locked; every further failure doubles the lockout up to
+LOGIN_MAX_LOCKOUT_SECONDS. Locked attempts are rejected before any
+password hashing is done, so guessing cannot be used to burn CPU.
+"""
+import threading
+import time
+from collections import OrderedDict
+from typing import Optional
+
+from app.core.config import settings
+
+
+class LoginThrottle:
+    """In-memory per-login failure counter with exponential lockout"""
+
+    def __init__(
+        self,
+        max_failures: int = 5,
+        window: float = 900,
+        base_lockout: float = 30,
+        max_lockout: float = 900,
+        max_keys: int = 10000,
+    ):
+        self.max_failures = max_failures
+        self.window = window
+        self.base_lockout = base_lockout
+        self.max_lockout = max_lockout
+        self.max_keys = max_keys
+        # key -> [failures, first failure time, locked until]
+        self._state: "OrderedDict[str, list]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def key(login: str) -> str:
+        return (login or "").strip().lower()
+
+    def retry_after(self, login: str) -> Optional[float]:
+        """Seconds until the login is unlocked, or None if it is not locked"""
+        now = time.monotonic()
+        with self._lock:
+            state = self._state.get(self.key(login))
+            if state and state[2] > now:
+                return state[2] - now
+        return None
+
+    def register_failure(self, login: str) -> None:
+        """Record a failed attempt"""
+        now = time.monotonic()
+        key = self.key(login)
+        with self._lock:
+            state = self._state.pop(key, None)
+            if state is None or now - state[1] > self.window:
+                state = [0, now, 0.0]
+            state[0] += 1
+            if state[0] >= self.max_failures:
+                excess = state[0] - self.max_failures
+                state[2] = now + min(self.base_lockout * (2 ** excess), self.max_lockout)
+            self._state[key] = state
+            while len(self._state) > self.max_keys:
+                self._state.popitem(last=False)
+
+    def reset(self, login: str) -> None:
+        """Clear failures after a successful login"""
+        with self._lock:
+            self._state.pop(self.key(login), None)
+
+
+login_throttle = LoginThrottle(
+    max_failures=settings.LOGIN_MAX_FAILED_ATTEMPTS,
+    window=settings.LOGIN_FAILED_WINDOW_SECONDS,
+    base_lockout=settings.LOGIN_LOCKOUT_SECONDS,
+    max_lockout=settings.LOGIN_MAX_LOCKOUT_SECONDS,
+)
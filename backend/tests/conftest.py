@@ -0,0 +1,60 @@
+"""
+Shared fixtures for API tests
+
+The app reads DATABASE_URL and SECRET_KEY at import, so a throwaway SQLite
+database is configured before anything from app is imported. API fixtures
+skip when fastapi is not installed.
+"""
+import os
+import tempfile
+
+import pytest
+
+_DB_DIR = tempfile.mkdtemp(prefix="agrodata-tests-")
+os.environ.setdefault("DATABASE_URL", f"sqlite:///{os.path.join(_DB_DIR, 'test.db')}")
+os.environ.setdefault("SECRET_KEY", "test-secret-key-with-at-least-32-characters")
+
+
+@pytest.fixture()
+def db():
+    """Session on a freshly created schema"""
+    pytest.importorskip("fastapi")
+    import app.models  # noqa: F401 - registers the models
+    from app.core.database import Base, SessionLocal, engine
+
+    Base.metadata.drop_all(engine)
+    Base.metadata.create_all(engine)
+    session = SessionLocal()
+    yield session
+    session.close()
+
+
+@pytest.fixture()
+def client(db):
+    from fastapi.testclient import TestClient
+    from app.main import app
+
+    return TestClient(app)
+
+
+@pytest.fixture()
+def auth_headers(db):
+    """auth_headers(role, farm_id=None, farm_roles=None) -> Authorization header of a new user
+
+    farm_roles maps farm ids to the user's role on them (user_farms rows).
+    """
+    from app.core.security import create_access_token
+    from app.models import User, UserFarm
+
+    def make(role: str = "farmer", farm_id=None, farm_roles=None) -> dict:
+        count = db.query(User).count()
+        user = User(username=f"user{count}", email=f"user{count}@example.com", hashed_password="-",
+                    role=role, farm_id=farm_id)
+        db.add(user)
+        db.flush()
+        for member_farm_id, farm_role in (farm_roles or {}).items():
+            db.add(UserFarm(user_id=user.id, farm_id=member_farm_id, role=farm_role))
+        db.commit()
+        return {"Authorization": f"Bearer {create_access_token(user.id)}"}
+
+    return make
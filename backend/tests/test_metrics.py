@@ -0,0 +1,139 @@
+"""
+Tests for the Prometheus metrics exposition
+
+scrape() is a minimal stand-in for a Prometheus server: it parses the text
+format into {(name, labels): value} so tests can read counters and
+histograms the way a real scraper would.
+"""
+import math
+import re
+import threading
+
+import pytest
+
+from app.core.metrics import MetricsRegistry, PrometheusMiddleware
+
+_SAMPLE_RE = re.compile(r'^(?P<name>[a-zA-Z_:][\w:]*)(?:\{(?P<labels>.*)\})? (?P<value>\S+)$')
+_LABEL_RE = re.compile(r'(\w+)="((?:[^"\\]|\\.)*)"')
+
+
+def scrape(text: str) -> dict:
+    """Parse Prometheus text exposition into {(name, frozenset(labels)): value}"""
+    samples = {}
+    for line in text.splitlines():
+        if not line or line.startswith("#"):
+            continue
+        match = _SAMPLE_RE.match(line)
+        assert match, f"Malformed exposition line: {line!r}"
+        labels = frozenset(
+            (key, value.replace('\\"', '"').replace("\\n", "\n").replace("\\\\", "\\"))
+            for key, value in _LABEL_RE.findall(match.group("labels") or "")
+        )
+        value = match.group("value")
+        samples[(match.group("name"), labels)] = math.inf if value == "+Inf" else float(value)
+    return samples
+
+
+def histogram_quantile(samples: dict, name: str, quantile: float, **labels) -> float:
+    """Upper bucket bound containing the quantile (as PromQL would bound it)"""
+    wanted = set(labels.items())
+    buckets = sorted(
+        (float(dict(key)["le"]), value)
+        for (metric, key), value in samples.items()
+        if metric == f"{name}_bucket" and wanted <= set(key)
+    )
+    total = buckets[-1][1]
+    for bound, count in buckets:
+        if count >= quantile * total:
+            return bound
+    return math.inf
+
+
+def test_counters_are_summed_across_threads():
+    registry = MetricsRegistry()
+    registry.describe("jobs_total", "counter", "Jobs")
+
+    def work():
+        for _ in range(1000):
+            registry.inc("jobs_total", (("kind", "a"),))
+
+    threads = [threading.Thread(target=work) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    text = registry.render()
+    assert "# TYPE jobs_total counter" in text
+    assert scrape(text)[("jobs_total", frozenset({("kind", "a")}))] == 8000
+
+
+def test_histogram_is_cumulative_and_gives_percentiles():
+    registry = MetricsRegistry(buckets=(0.1, 0.5, 1.0))
+    registry.describe("latency_seconds", "histogram", "Latency")
+    for value in [0.05] * 90 + [0.3] * 9 + [2.0]:
+        registry.observe("latency_seconds", (("route", "/x"),), value)
+
+    samples = scrape(registry.render())
+    route = ("route", "/x")
+    assert samples[("latency_seconds_bucket", frozenset({route, ("le", "0.1")}))] == 90
+    assert samples[("latency_seconds_bucket", frozenset({route, ("le", "+Inf")}))] == 100
+    assert samples[("latency_seconds_count", frozenset({route}))] == 100
+    assert histogram_quantile(samples, "latency_seconds", 0.5, route="/x") == 0.1
+    assert histogram_quantile(samples, "latency_seconds", 0.99, route="/x") == 0.5
+    assert histogram_quantile(samples, "latency_seconds", 1.0, route="/x") == math.inf
+
+
+def test_collectors_and_label_escaping():
+    registry = MetricsRegistry()
+    registry.register_collector(lambda: [
+        ("cache_hits_total", "counter", "Cache hits", [((("cache", 'a"b'),), 3)]),
+    ])
+    text = registry.render()
+    assert 'cache_hits_total{cache="a\\"b"} 3' in text
+    assert scrape(text)[("cache_hits_total", frozenset({("cache", 'a"b')}))] == 3
+
+
+def test_middleware_records_route_templates():
+    fastapi = pytest.importorskip("fastapi")
+    from fastapi.testclient import TestClient
+
+    registry = MetricsRegistry()
+    app = fastapi.FastAPI()
+    app.add_middleware(PrometheusMiddleware, registry=registry)
+
+    @app.get("/items/{item_id}")
+    def read_item(item_id: int):
+        return {"id": item_id}
+
+    @app.get("/metrics")
+    def metrics():
+        return fastapi.responses.PlainTextResponse(registry.render())
+
+    client = TestClient(app)
+    for item_id in range(5):
+        assert client.get(f"/items/{item_id}").status_code == 200
+    client.get("/missing")
+
+    samples = scrape(client.get("/metrics").text)
+    ok = frozenset({("method", "GET"), ("route", "/items/{item_id}"), ("status", "200")})
+    assert samples[("http_requests_total", ok)] == 5
+    assert samples[("http_request_duration_seconds_count", frozenset({("method", "GET"), ("route", "/items/{item_id}")}))] == 5
+    assert samples[("http_requests_total", frozenset({("method", "GET"), ("route", "<unmatched>"), ("status", "404")}))] == 1
+    assert samples[("http_requests_in_flight", frozenset())] == 0
+
+
+def test_metrics_endpoints_require_admin_or_scrape_token(client, auth_headers, monkeypatch):
+    from app.core.config import settings
+
+    for path in ("/metrics", "/metrics/sql"):
+        assert client.get(path).status_code == 401
+        assert client.get(path, headers=auth_headers("farmer")).status_code == 403
+        assert client.get(path, headers=auth_headers("admin")).status_code == 200
+
+    scraper = {"Authorization": "Bearer scrape-secret"}
+    assert client.get("/metrics", headers=scraper).status_code == 401
+    monkeypatch.setattr(settings, "METRICS_TOKEN", "scrape-secret")
+    response = client.get("/metrics", headers=scraper)
+    assert response.status_code == 200
+    assert "http_requests_total" in response.text
@@ -0,0 +1,164 @@
+"""
+Tests for offline sync: POST /operations/bulk and the GET /changes feed
+
+Each test starts from an empty schema with two farms; the user manages only
+the first one.
+"""
+import gzip
+import json
+
+import pytest
+
+from app.core.config import settings
+
+BULK_URL = f"{settings.API_V1_STR}/operations/bulk"
+CHANGES_URL = f"{settings.API_V1_STR}/changes/"
+
+
+@pytest.fixture()
+def farms(db):
+    """{"own": (farm, field, machinery, implement), "foreign": (...)}"""
+    from app.models import Farm, Field, Implement, Machinery
+
+    result = {}
+    for number, name in enumerate(("own", "foreign"), start=1):
+        farm = Farm(bin=f"00000000000{number}", name=f"Farm {number}")
+        db.add(farm)
+        db.flush()
+        field = Field(farm_id=farm.id, field_code=f"F{number}", area_ha=100)
+        machine = Machinery(farm_id=farm.id, machinery_type="tractor", brand="K", model="744")
+        implement = Implement(farm_id=farm.id, implement_type="seeder")
+        db.add_all([field, machine, implement])
+        db.flush()
+        result[name] = (farm.id, field.id, machine.id, implement.id)
+    db.commit()
+    return result
+
+
+@pytest.fixture()
+def headers(auth_headers, farms):
+    return auth_headers(farm_roles={farms["own"][0]: "manager"})
+
+
+def _item(client_uuid, farm_id, field_id, day=10, resolve=None, **operation):
+    operation.update(farm_id=farm_id, field_id=field_id, operation_type="sowing",
+                     operation_date=f"2025-05-{day:02d}")
+    item = {"client_uuid": client_uuid, "operation": operation,
+            "details": {"sowing_details": {"crop": "Wheat", "seeding_rate_kg_ha": 120.0}}}
+    if resolve:
+        item["resolve"] = resolve
+    return item
+
+
+def _sync(client, headers, *items):
+    response = client.post(BULK_URL, json={"items": list(items)}, headers=headers)
+    assert response.status_code == 200, response.text
+    return [(r["status"], r["error"]) for r in response.json()["results"]]
+
+
+def test_duplicate_conflict_and_keep_both(client, db, headers, farms):
+    from app.models import Operation
+
+    farm_id, field_id, _, _ = farms["own"]
+    first = _item("a", farm_id, field_id)
+    assert _sync(client, headers, first) == [("created", None)]
+
+    # Resent after a lost response, and the same key from another device
+    assert [status for status, _ in _sync(client, headers, first, _item("b", farm_id, field_id))] == [
+        "duplicate", "conflict"
+    ]
+    assert _sync(client, headers, _item("b", farm_id, field_id, resolve="keep_both")) == [("created", None)]
+    assert db.query(Operation).count() == 2
+
+
+def test_foreign_farm_field_and_equipment_are_rejected(client, db, headers, farms):
+    from app.models import Operation
+
+    farm_id, field_id, machine_id, implement_id = farms["own"]
+    foreign_farm, foreign_field, foreign_machine, foreign_implement = farms["foreign"]
+
+    results = _sync(
+        client, headers,
+        _item("farm", foreign_farm, foreign_field),
+        _item("field", farm_id, foreign_field),
+        _item("machine", farm_id, field_id, day=11, machine_id=foreign_machine),
+        _item("implement", farm_id, field_id, day=12, implement_id=foreign_implement),
+        _item("missing", farm_id, field_id, day=13, machine_id=999999),
+        _item("ok", farm_id, field_id, day=14, machine_id=machine_id, implement_id=implement_id),
+    )
+    assert results == [
+        ("error", "Not enough permissions to write to this farm"),
+        ("error", "Field does not belong to the farm"),
+        ("error", "Machinery does not belong to the farm"),
+        ("error", "Implement does not belong to the farm"),
+        ("error", "Machinery does not belong to the farm"),
+        ("created", None),
+    ]
+    assert db.query(Operation.client_uuid).all() == [("ok",)]
+
+
+def test_gzip_body_limits(client, headers, farms, monkeypatch):
+    monkeypatch.setattr(settings, "SYNC_MAX_BODY_MB", 1)
+    farm_id, field_id, _, _ = farms["own"]
+    compressed_headers = dict(headers, **{"Content-Encoding": "gzip", "Content-Type": "application/json"})
+
+    body = gzip.compress(json.dumps({"items": [_item("a", farm_id, field_id)]}).encode())
+    response = client.post(BULK_URL, content=body, headers=compressed_headers)
+    assert response.status_code == 200
+    assert response.json()["results"][0]["status"] == "created"
+
+    # A few kilobytes that inflate past the limit are refused without inflating them whole
+    bomb = gzip.compress(b" " * (8 * 1024 * 1024))
+    assert len(bomb) < 64 * 1024
+    assert client.post(BULK_URL, content=bomb, headers=compressed_headers).status_code == 413
+
+    assert client.post(BULK_URL, content=b"not gzip", headers=compressed_headers).status_code == 400
+
+
+def test_changes_feed_pages_and_filters_farms(client, headers, farms, auth_headers, monkeypatch):
+    monkeypatch.setattr(settings, "CHANGES_SETTLE_SECONDS", 0)
+    farm_id, field_id, _, _ = farms["own"]
+    _sync(client, headers, *(_item(f"op{day}", farm_id, field_id, day=day) for day in (10, 11, 12)))
+
+    seen, since = [], 0
+    while True:
+        page = client.get(CHANGES_URL, params={"since": since, "limit": 2}, headers=headers).json()
+        seen += [(change["table"], change["op"], change["farm_id"]) for change in page["changes"]]
+        assert page["next_cursor"] >= since
+        since = page["next_cursor"]
+        if not page["has_more"]:
+            break
+
+    # Only the managed farm: its farm and field rows, then the three operations
+    assert seen == [("farms", "insert", farm_id), ("fields", "insert", farm_id)] + [
+        ("operations", "insert", farm_id)
+    ] * 3
+    assert client.get(CHANGES_URL, params={"since": since}, headers=headers).json()["changes"] == []
+
+    # Admins see every farm
+    admin = auth_headers(role="admin")
+    everything = client.get(CHANGES_URL, params={"tables": ["fields"]}, headers=admin).json()["changes"]
+    assert {change["farm_id"] for change in everything} == {farms["own"][0], farms["foreign"][0]}
+
+    assert client.get(CHANGES_URL, params={"tables": ["users"]}, headers=headers).status_code == 422
+
+
+def test_changes_feed_reports_cascaded_delete(client, db, headers, farms, monkeypatch):
+    from app.models import Operation
+
+    monkeypatch.setattr(settings, "CHANGES_SETTLE_SECONDS", 0)
+    farm_id, field_id, _, _ = farms["own"]
+    _sync(client, headers, _item("a", farm_id, field_id))
+    since = client.get(f"{CHANGES_URL}head", headers=headers).json()["cursor"]
+
+    # delete-orphan removes sowing_details in the same flush
+    db.expire_all()
+    operation = db.query(Operation).one()
+    assert operation.sowing_details is not None
+    db.delete(operation)
+    db.commit()
+
+    changes = client.get(CHANGES_URL, params={"since": since}, headers=headers).json()["changes"]
+    assert [(c["table"], c["op"], c["id"], c["farm_id"]) for c in changes] == [
+        ("operations", "delete", operation.id, farm_id)
+    ]
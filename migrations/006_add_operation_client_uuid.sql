@@ -0,0 +1,18 @@
+-- Migration: Add client_uuid to operations for offline sync
+-- Date: 2026-10-19
+-- Description: Operations captured offline carry a client-generated UUID so that
+--              re-sending a batch never creates duplicates; conflicts are looked up
+--              by (field_id, operation_type, operation_date)
+
+BEGIN;
+
+ALTER TABLE operations
+ADD COLUMN IF NOT EXISTS client_uuid VARCHAR(36);
+
+CREATE UNIQUE INDEX IF NOT EXISTS ix_operations_client_uuid ON operations(client_uuid);
+CREATE INDEX IF NOT EXISTS ix_operations_field_type_date ON operations(field_id, operation_type, operation_date);
+
+COMMENT ON COLUMN operations.client_uuid
+IS 'UUID операции, созданный на устройстве (офлайн-очередь)';
+
+COMMIT;
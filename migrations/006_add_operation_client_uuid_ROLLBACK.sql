@@ -0,0 +1,14 @@
+-- Rollback Migration: Remove operations.client_uuid
+-- Date: 2026-10-19
+-- Description: Rollback offline sync idempotency key
+
+BEGIN;
+
+-- WARNING: Offline clients with unsynced operations will create duplicates on re-send
+
+DROP INDEX IF EXISTS ix_operations_field_type_date;
+DROP INDEX IF EXISTS ix_operations_client_uuid;
+
+ALTER TABLE operations DROP COLUMN IF EXISTS client_uuid;
+
+COMMIT;
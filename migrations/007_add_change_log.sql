@@ -0,0 +1,23 @@
+-- Migration: Add change_log table for the change feed
+-- Date: 2026-10-19
+-- Description: Outbox of farm/field/operation inserts, updates and deletes written
+--              in the same transaction as the change; id is the cursor of
+--              GET /api/v1/changes?since=
+
+BEGIN;
+
+CREATE TABLE IF NOT EXISTS change_log (
+    id BIGSERIAL PRIMARY KEY,
+    table_name VARCHAR(50) NOT NULL,
+    row_id INTEGER NOT NULL,
+    farm_id INTEGER,
+    op VARCHAR(10) NOT NULL,
+    changed_at TIMESTAMP NOT NULL
+);
+
+CREATE INDEX IF NOT EXISTS ix_change_log_farm_id_id ON change_log(farm_id, id);
+
+COMMENT ON TABLE change_log
+IS 'Журнал изменений хозяйств, полей и операций (лента /api/v1/changes)';
+
+COMMIT;
@@ -0,0 +1,11 @@
+-- Rollback Migration: Remove change_log table
+-- Date: 2026-10-19
+-- Description: Rollback change feed outbox
+
+BEGIN;
+
+-- WARNING: Clients polling /api/v1/changes must do a full resync after this
+
+DROP TABLE IF EXISTS change_log;
+
+COMMIT;
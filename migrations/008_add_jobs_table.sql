@@ -0,0 +1,39 @@
+-- Migration: Add jobs table for background imports and exports
+-- Date: 2026-10-19
+-- Description: Persistent job queue of the Streamlit app (modules/jobs.py);
+--              jobs are claimed with UPDATE ... WHERE status = 'queued' and run
+--              on a local process pool, no external broker
+
+BEGIN;
+
+CREATE TABLE IF NOT EXISTS jobs (
+    id SERIAL PRIMARY KEY,
+    kind VARCHAR(50) NOT NULL,
+    status VARCHAR(20) NOT NULL DEFAULT 'queued',
+    params TEXT,
+    result TEXT,
+    error TEXT,
+    message VARCHAR(500),
+    progress FLOAT DEFAULT 0,
+    artifact_path VARCHAR(500),
+    attempts INTEGER DEFAULT 0,
+    max_attempts INTEGER DEFAULT 1,
+    cancel_requested BOOLEAN DEFAULT FALSE,
+    user_id INTEGER REFERENCES users(id),
+    farm_id INTEGER REFERENCES farms(id),
+    worker VARCHAR(100),
+    created_at TIMESTAMP DEFAULT NOW(),
+    run_after TIMESTAMP,
+    started_at TIMESTAMP,
+    heartbeat_at TIMESTAMP,
+    finished_at TIMESTAMP
+);
+
+CREATE INDEX IF NOT EXISTS ix_jobs_id ON jobs(id);
+CREATE INDEX IF NOT EXISTS ix_jobs_status_run_after ON jobs(status, run_after);
+CREATE INDEX IF NOT EXISTS ix_jobs_farm_created ON jobs(farm_id, created_at);
+
+COMMENT ON TABLE jobs
+IS 'Фоновые задачи: импорт Excel, экспорт журнала';
+
+COMMIT;
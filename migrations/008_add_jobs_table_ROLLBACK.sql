@@ -0,0 +1,11 @@
+-- Rollback Migration: Remove jobs table
+-- Date: 2026-10-19
+-- Description: Rollback background job queue
+
+BEGIN;
+
+-- WARNING: Queued and running jobs are lost; imports in progress must be restarted
+
+DROP TABLE IF EXISTS jobs;
+
+COMMIT;
@@ -0,0 +1,49 @@
+-- Migration: Idempotent Excel re-import
+-- Date: 2026-10-19
+-- Description: Imported rows keep a natural key (import_key) and a content hash
+--              (source_hash) so re-uploading a file upserts instead of duplicating;
+--              import_manifest records row ranges that were already applied
+
+BEGIN;
+
+ALTER TABLE fields
+ADD COLUMN IF NOT EXISTS source_hash VARCHAR(64);
+
+ALTER TABLE operations
+ADD COLUMN IF NOT EXISTS import_key VARCHAR(200),
+ADD COLUMN IF NOT EXISTS source_hash VARCHAR(64);
+
+CREATE UNIQUE INDEX IF NOT EXISTS ix_operations_import_key ON operations(import_key);
+
+ALTER TABLE economic_data
+ADD COLUMN IF NOT EXISTS import_key VARCHAR(200),
+ADD COLUMN IF NOT EXISTS source_hash VARCHAR(64);
+
+CREATE UNIQUE INDEX IF NOT EXISTS ix_economic_data_import_key ON economic_data(import_key);
+
+CREATE TABLE IF NOT EXISTS import_manifest (
+    id SERIAL PRIMARY KEY,
+    farm_id INTEGER NOT NULL REFERENCES farms(id),
+    sheet VARCHAR(10) NOT NULL,
+    file_hash VARCHAR(64) NOT NULL,
+    file_name VARCHAR(255),
+    row_start INTEGER NOT NULL,
+    row_end INTEGER NOT NULL,
+    range_hash VARCHAR(64) NOT NULL,
+    inserted INTEGER DEFAULT 0,
+    updated INTEGER DEFAULT 0,
+    unchanged INTEGER DEFAULT 0,
+    skipped INTEGER DEFAULT 0,
+    job_id INTEGER REFERENCES jobs(id),
+    applied_at TIMESTAMP DEFAULT NOW()
+);
+
+CREATE INDEX IF NOT EXISTS ix_import_manifest_id ON import_manifest(id);
+CREATE INDEX IF NOT EXISTS ix_import_manifest_farm_sheet_range ON import_manifest(farm_id, sheet, range_hash);
+
+COMMENT ON COLUMN operations.import_key
+IS 'Естественный ключ строки импорта Excel: поле, тип, дата, культура';
+COMMENT ON TABLE import_manifest
+IS 'Применённые диапазоны строк импорта Excel';
+
+COMMIT;
@@ -0,0 +1,21 @@
+-- Rollback Migration: Remove Excel import deduplication
+-- Date: 2026-10-19
+-- Description: Rollback import_key/source_hash columns and import_manifest
+
+BEGIN;
+
+-- WARNING: Re-importing a file after rollback creates duplicate operations
+
+DROP TABLE IF EXISTS import_manifest;
+
+DROP INDEX IF EXISTS ix_economic_data_import_key;
+ALTER TABLE economic_data DROP COLUMN IF EXISTS import_key;
+ALTER TABLE economic_data DROP COLUMN IF EXISTS source_hash;
+
+DROP INDEX IF EXISTS ix_operations_import_key;
+ALTER TABLE operations DROP COLUMN IF EXISTS import_key;
+ALTER TABLE operations DROP COLUMN IF EXISTS source_hash;
+
+ALTER TABLE fields DROP COLUMN IF EXISTS source_hash;
+
+COMMIT;
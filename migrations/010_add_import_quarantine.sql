@@ -0,0 +1,33 @@
+-- Migration: Resumable Excel imports with row quarantine
+-- Date: 2026-10-19
+-- Description: Imports commit per chunk; rows rejected by validation or by the
+--              database are kept in import_quarantine for correction and replay
+
+BEGIN;
+
+ALTER TABLE import_manifest
+ADD COLUMN IF NOT EXISTS quarantined INTEGER DEFAULT 0;
+
+CREATE TABLE IF NOT EXISTS import_quarantine (
+    id SERIAL PRIMARY KEY,
+    farm_id INTEGER NOT NULL REFERENCES farms(id),
+    sheet VARCHAR(10) NOT NULL,
+    job_id INTEGER REFERENCES jobs(id),
+    file_name VARCHAR(255),
+    row_number INTEGER,
+    data TEXT,
+    reason VARCHAR(500),
+    status VARCHAR(20) NOT NULL DEFAULT 'pending',
+    created_at TIMESTAMP DEFAULT NOW(),
+    resolved_at TIMESTAMP
+);
+
+CREATE INDEX IF NOT EXISTS ix_import_quarantine_id ON import_quarantine(id);
+CREATE INDEX IF NOT EXISTS ix_import_quarantine_farm_status ON import_quarantine(farm_id, status);
+
+COMMENT ON TABLE import_quarantine
+IS 'Строки импорта Excel с ошибками: исправляются и импортируются повторно';
+COMMENT ON COLUMN import_quarantine.status
+IS 'pending, replayed, discarded';
+
+COMMIT;
@@ -0,0 +1,13 @@
+-- Rollback Migration: Remove import quarantine
+-- Date: 2026-10-19
+-- Description: Rollback import_quarantine table and import_manifest.quarantined
+
+BEGIN;
+
+-- WARNING: Pending quarantined rows are lost
+
+DROP TABLE IF EXISTS import_quarantine;
+
+ALTER TABLE import_manifest DROP COLUMN IF EXISTS quarantined;
+
+COMMIT;
@@ -0,0 +1,82 @@
+-- Migration: Reference tables synchronized from the JSON catalogs
+-- Date: 2026-10-19
+-- Description: ref_crops, ref_fertilizers and ref_pesticides are filled from the
+--              JSON catalogs (modules/reference_sync.py) with a per-row content hash;
+--              operation rows link to reference rows so analytics join them in SQL
+
+BEGIN;
+
+CREATE TABLE IF NOT EXISTS ref_crops (
+    id SERIAL PRIMARY KEY,
+    crop_name VARCHAR(100) NOT NULL UNIQUE,
+    crop_type VARCHAR(50),
+    typical_yield_min FLOAT,
+    typical_yield_max FLOAT,
+    seeding_rate_min FLOAT,
+    seeding_rate_max FLOAT,
+    seeding_depth_cm FLOAT,
+    row_spacing_cm FLOAT
+);
+
+CREATE TABLE IF NOT EXISTS ref_fertilizers (
+    id SERIAL PRIMARY KEY,
+    name VARCHAR(100) NOT NULL UNIQUE,
+    type VARCHAR(50),
+    n_content FLOAT,
+    p2o5_content FLOAT,
+    k2o_content FLOAT,
+    s_content FLOAT
+);
+
+CREATE TABLE IF NOT EXISTS ref_pesticides (
+    id SERIAL PRIMARY KEY,
+    trade_name VARCHAR(100) NOT NULL,
+    active_ingredient VARCHAR(200),
+    pesticide_class VARCHAR(50),
+    typical_dose_min FLOAT,
+    typical_dose_max FLOAT,
+    dose_unit VARCHAR(20)
+);
+
+ALTER TABLE ref_crops
+ADD COLUMN IF NOT EXISTS typical_yield_avg FLOAT,
+ADD COLUMN IF NOT EXISTS n_need_kg_ha FLOAT,
+ADD COLUMN IF NOT EXISTS p2o5_need_kg_ha FLOAT,
+ADD COLUMN IF NOT EXISTS k2o_need_kg_ha FLOAT,
+ADD COLUMN IF NOT EXISTS source_hash VARCHAR(64);
+
+ALTER TABLE ref_fertilizers
+ADD COLUMN IF NOT EXISTS source_hash VARCHAR(64);
+
+ALTER TABLE ref_pesticides
+ADD COLUMN IF NOT EXISTS source_hash VARCHAR(64);
+
+CREATE UNIQUE INDEX IF NOT EXISTS ix_ref_pesticides_trade_name ON ref_pesticides(trade_name);
+CREATE INDEX IF NOT EXISTS ix_ref_pesticides_active_ingredient ON ref_pesticides(active_ingredient);
+
+ALTER TABLE operations
+ADD COLUMN IF NOT EXISTS ref_crop_id INTEGER REFERENCES ref_crops(id) ON DELETE SET NULL;
+CREATE INDEX IF NOT EXISTS ix_operations_ref_crop_id ON operations(ref_crop_id);
+
+ALTER TABLE harvest_data
+ADD COLUMN IF NOT EXISTS ref_crop_id INTEGER REFERENCES ref_crops(id) ON DELETE SET NULL;
+CREATE INDEX IF NOT EXISTS ix_harvest_data_ref_crop_id ON harvest_data(ref_crop_id);
+
+ALTER TABLE sowing_details
+ADD COLUMN IF NOT EXISTS ref_fertilizer_id INTEGER REFERENCES ref_fertilizers(id) ON DELETE SET NULL;
+CREATE INDEX IF NOT EXISTS ix_sowing_details_ref_fertilizer_id ON sowing_details(ref_fertilizer_id);
+
+ALTER TABLE fertilizer_applications
+ADD COLUMN IF NOT EXISTS ref_fertilizer_id INTEGER REFERENCES ref_fertilizers(id) ON DELETE SET NULL;
+CREATE INDEX IF NOT EXISTS ix_fertilizer_applications_ref_fertilizer_id ON fertilizer_applications(ref_fertilizer_id);
+
+ALTER TABLE pesticide_applications
+ADD COLUMN IF NOT EXISTS ref_pesticide_id INTEGER REFERENCES ref_pesticides(id) ON DELETE SET NULL;
+CREATE INDEX IF NOT EXISTS ix_pesticide_applications_ref_pesticide_id ON pesticide_applications(ref_pesticide_id);
+
+COMMENT ON COLUMN ref_crops.source_hash
+IS 'Хеш записи JSON-справочника при последней синхронизации';
+COMMENT ON COLUMN operations.ref_crop_id
+IS 'Культура операции в ref_crops (по названию, с синонимами)';
+
+COMMIT;
@@ -0,0 +1,36 @@
+-- Rollback Migration: Remove reference links
+-- Date: 2026-10-19
+-- Description: Rollback ref_* links on operation tables and sync columns of ref_* tables
+
+BEGIN;
+
+-- WARNING: Nutrient balance and typical yield comparisons lose reference data after rollback
+
+DROP INDEX IF EXISTS ix_pesticide_applications_ref_pesticide_id;
+ALTER TABLE pesticide_applications DROP COLUMN IF EXISTS ref_pesticide_id;
+
+DROP INDEX IF EXISTS ix_fertilizer_applications_ref_fertilizer_id;
+ALTER TABLE fertilizer_applications DROP COLUMN IF EXISTS ref_fertilizer_id;
+
+DROP INDEX IF EXISTS ix_sowing_details_ref_fertilizer_id;
+ALTER TABLE sowing_details DROP COLUMN IF EXISTS ref_fertilizer_id;
+
+DROP INDEX IF EXISTS ix_harvest_data_ref_crop_id;
+ALTER TABLE harvest_data DROP COLUMN IF EXISTS ref_crop_id;
+
+DROP INDEX IF EXISTS ix_operations_ref_crop_id;
+ALTER TABLE operations DROP COLUMN IF EXISTS ref_crop_id;
+
+DROP INDEX IF EXISTS ix_ref_pesticides_active_ingredient;
+DROP INDEX IF EXISTS ix_ref_pesticides_trade_name;
+
+ALTER TABLE ref_pesticides DROP COLUMN IF EXISTS source_hash;
+ALTER TABLE ref_fertilizers DROP COLUMN IF EXISTS source_hash;
+
+ALTER TABLE ref_crops DROP COLUMN IF EXISTS typical_yield_avg;
+ALTER TABLE ref_crops DROP COLUMN IF EXISTS n_need_kg_ha;
+ALTER TABLE ref_crops DROP COLUMN IF EXISTS p2o5_need_kg_ha;
+ALTER TABLE ref_crops DROP COLUMN IF EXISTS k2o_need_kg_ha;
+ALTER TABLE ref_crops DROP COLUMN IF EXISTS source_hash;
+
+COMMIT;
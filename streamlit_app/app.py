@@ -4,9 +4,8 @@
 """
 import streamlit as st
 from modules.config import settings
-from modules.database import init_db
+from modules.startup import bootstrap
 from modules.auth_widget import show_auth_widget
-import os
 
 # Настройка страницы
 st.set_page_config(
@@ -16,11 +15,11 @@ st.set_page_config(
     initial_sidebar_state="expanded"
 )
 
-# Инициализация БД при первом запуске
-if not os.path.exists("farm_data.db"):
-    with st.spinner("Инициализация базы данных..."):
-        init_db()
-        st.success("База данных успешно создана!")
+# Однократная инициализация процесса (схема БД, обслуживание журнала)
+bootstrap_info = bootstrap()
+if bootstrap_info["created_tables"] and not st.session_state.get("bootstrap_notified"):
+    st.session_state["bootstrap_notified"] = True
+    st.success("База данных успешно создана!")
 
 # Стили
 st.markdown("""
@@ -0,0 +1,27 @@
+"""
+Benchmarks - Замеры производительности горячих путей с историей по коммитам
+
+Сценарии: справочники, импорт Excel, запросы журнала/дашборда/агрохимии,
+площадь полигона, графики на длинных рядах, списки API backend.
+
+Запуск из streamlit_app/:
+    python -m benchmarks                    # прогон, сравнение с прошлым коммитом, запись в историю
+    python -m benchmarks --full             # плюс 100k строк / 100k вершин / 1M точек
+    python -m benchmarks --filter import_   # только совпадающие сценарии
+    python -m benchmarks --baseline a1b2c3d # сравнение с конкретным коммитом
+
+Код выхода 1 - есть статистически значимые регрессии.
+"""
+from benchmarks.harness import BenchEnv, BenchmarkRunner, SkipBenchmark, benchmark, measure
+from benchmarks.history import History, compare, mann_whitney_greater
+
+__all__ = [
+    "BenchEnv",
+    "BenchmarkRunner",
+    "SkipBenchmark",
+    "benchmark",
+    "measure",
+    "History",
+    "compare",
+    "mann_whitney_greater",
+]
@@ -0,0 +1,82 @@
+"""
+Benchmarks CLI - python -m benchmarks
+"""
+import argparse
+import json
+import sys
+
+from benchmarks.harness import BenchmarkRunner
+from benchmarks.history import HISTORY_PATH, History, compare, git_revision, machine_id
+
+
+def _format_result(name: str, result: dict) -> str:
+    if "skipped" in result:
+        return f"  {name:<44} skipped: {result['skipped']}"
+    if "error" in result:
+        return f"  {name:<44} ERROR: {result['error']}"
+    samples_ms = sorted(s * 1000 for s in result["samples"])
+    return (f"  {name:<44} {result['median'] * 1000:>10.3f} ms  "
+            f"[{samples_ms[0]:.3f} .. {samples_ms[-1]:.3f}]  x{result['number']}")
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Замеры горячих путей и поиск регрессий")
+    parser.add_argument("--full", action="store_true", help="Тяжёлые параметры (100k строк и т.п.)")
+    parser.add_argument("--filter", default=None, help="Подстрока имени сценария")
+    parser.add_argument("--repeats", type=int, default=10, help="Замеров на сценарий")
+    parser.add_argument("--min-sample-time", type=float, default=0.05, help="Минимальная длительность замера, с")
+    parser.add_argument("--baseline", default=None, help="Коммит для сравнения (по умолчанию - последний прогон)")
+    parser.add_argument("--threshold", type=float, default=0.10, help="Порог роста медианы для регрессии")
+    parser.add_argument("--alpha", type=float, default=0.01, help="Уровень значимости")
+    parser.add_argument("--history", default=str(HISTORY_PATH), help="Файл истории")
+    parser.add_argument("--no-save", action="store_true", help="Не записывать прогон в историю")
+    parser.add_argument("--list", action="store_true", help="Показать сценарии и выйти")
+    parser.add_argument("--json", default=None, help="Сохранить прогон и сравнение в JSON")
+    args = parser.parse_args(argv)
+
+    runner = BenchmarkRunner(full=args.full, pattern=args.filter, repeats=args.repeats,
+                             min_sample_time=args.min_sample_time)
+    if args.list:
+        for name, _, _ in runner.selected():
+            print(name)
+        return 0
+
+    revision = git_revision()
+    machine = machine_id()
+    print(f"Commit {revision['commit'][:10]}{' (dirty)' if revision['dirty'] else ''} on {machine}")
+
+    report = runner.run(progress=lambda name, result: print(_format_result(name, result), flush=True))
+    run = dict(report, machine=machine, **revision)
+
+    history = History(args.history)
+    baseline = history.baseline(machine, revision["commit"], args.baseline)
+    rows = compare(baseline, run, args.threshold, args.alpha) if baseline else []
+    regressions = [row for row in rows if row["status"] == "regression"]
+
+    if baseline is None:
+        print("\nNo baseline run on this machine - nothing to compare")
+    else:
+        print(f"\nCompared with {baseline['commit'][:10]}{' (dirty)' if baseline['dirty'] else ''} "
+              f"({baseline['started_at']}), threshold {args.threshold:.0%}, alpha {args.alpha}")
+        for row in rows:
+            if row["status"] != "unchanged":
+                print(f"  {row['status'].upper():<12} {row['case']:<44} {row['baseline_ms']:.3f} -> "
+                      f"{row['current_ms']:.3f} ms (x{row['ratio']:.2f}, p={row['p_value']:.4f})")
+        if not any(row["status"] != "unchanged" for row in rows):
+            print("  no significant changes")
+
+    if not args.no_save:
+        history.add(run)
+        history.save()
+        print(f"Saved to {history.path}")
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump({"run": run, "comparison": rows}, f, ensure_ascii=False, indent=2)
+
+    errors = [name for name, result in report["cases"].items() if "error" in result]
+    return 1 if regressions or errors else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,89 @@
+"""
+Benchmarks: списки FastAPI backend (/api/v1/farms/, /api/v1/fields/)
+
+Приложение backend поднимается в процессе через TestClient на отдельной
+SQLite-БД; авторизация заменяется администратором через dependency_overrides.
+Без fastapi/pydantic-settings сценарии пропускаются.
+"""
+import importlib.util
+import os
+import sys
+from pathlib import Path
+
+from benchmarks.harness import SkipBenchmark, benchmark
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent.parent / "backend"
+
+
+def _client(env, farms: int = 20, fields_per_farm: int = 50):
+    """TestClient backend с данными (создаётся один раз на прогон)"""
+    if "backend_client" in env.cache:
+        return env.cache["backend_client"]
+
+    for module in ("fastapi", "pydantic_settings", "httpx"):
+        if importlib.util.find_spec(module) is None:
+            raise SkipBenchmark(f"{module} is not installed")
+    if not (BACKEND_DIR / "app" / "main.py").exists():
+        raise SkipBenchmark(f"backend not found in {BACKEND_DIR}")
+
+    # Пакет backend тоже называется app - он должен идти раньше streamlit_app/app.py
+    sys.path.insert(0, str(BACKEND_DIR))
+    database_url = f"sqlite:///{env.workdir / 'backend.db'}"
+    saved = {key: os.environ.get(key) for key in ("DATABASE_URL", "SECRET_KEY")}
+    os.environ["DATABASE_URL"] = database_url
+    os.environ.setdefault("SECRET_KEY", "benchmark-secret")
+    try:
+        from fastapi.testclient import TestClient
+        from sqlalchemy import create_engine
+        from sqlalchemy.orm import sessionmaker
+        from app.main import app
+        from app.api.deps import get_db, get_current_user
+        from app.models import Base, User, Farm, Field
+    finally:
+        for key, value in saved.items():
+            if value is None:
+                os.environ.pop(key, None)
+            else:
+                os.environ[key] = value
+
+    engine = create_engine(database_url)
+    Base.metadata.create_all(bind=engine)
+    factory = sessionmaker(bind=engine, autoflush=False)
+
+    with factory() as db:
+        admin = User(username="bench", email="bench@example.com", hashed_password="-", role="admin")
+        db.add(admin)
+        for f in range(farms):
+            farm = Farm(bin=f"{f:012d}", name=f"Хозяйство {f}", region="Акмолинская")
+            db.add(farm)
+            db.flush()
+            db.add_all(
+                Field(farm_id=farm.id, field_code=f"F{f:03d}-{i:03d}", name=f"Поле {i}", area_ha=100.0 + i)
+                for i in range(fields_per_farm)
+            )
+        db.commit()
+        db.refresh(admin)
+        db.expunge(admin)
+
+    def override_db():
+        db = factory()
+        try:
+            yield db
+        finally:
+            db.close()
+
+    app.dependency_overrides[get_db] = override_db
+    app.dependency_overrides[get_current_user] = lambda: admin
+    client = env.cache["backend_client"] = TestClient(app)
+    return client
+
+
+@benchmark(params=["/api/v1/farms/?limit=100", "/api/v1/fields/?limit=1000"])
+def bench_api_list(env, path):
+    client = _client(env)
+
+    def run():
+        response = client.get(path)
+        assert response.status_code == 200, response.text
+
+    return run
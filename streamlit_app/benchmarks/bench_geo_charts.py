@@ -0,0 +1,62 @@
+"""
+Benchmarks: площадь полигона и графики на длинных рядах
+"""
+import math
+from datetime import datetime, timedelta
+
+from benchmarks.harness import benchmark
+
+
+def _circle(vertices: int, lat: float = 51.2, lon: float = 71.4, radius_deg: float = 0.02):
+    return [
+        (lat + radius_deg * math.sin(2 * math.pi * i / vertices),
+         lon + radius_deg * math.cos(2 * math.pi * i / vertices))
+        for i in range(vertices)
+    ]
+
+
+@benchmark(params=[1000, 10000], full_params=[100000])
+def bench_polygon_area(env, vertices):
+    from utils.maps import calculate_polygon_area
+
+    polygon = _circle(vertices)
+
+    def run():
+        assert calculate_polygon_area(polygon) > 0
+
+    return run
+
+
+def _series(points: int):
+    start = datetime(2024, 1, 1)
+    x = [start + timedelta(minutes=10 * i) for i in range(points)]
+    y = [15 + 10 * math.sin(i / 144 * 2 * math.pi) + (i % 7) * 0.3 for i in range(points)]
+    return x, y
+
+
+@benchmark(params=[10000, 100000], full_params=[1000000])
+def bench_line_chart(env, points):
+    """Построение графика без кеша фигур (прореживание LTTB + Plotly)"""
+    from utils.charts import create_line_chart
+
+    x, y = _series(points)
+    build = getattr(create_line_chart, "uncached", create_line_chart)
+
+    def run():
+        build(x, y, "Температура", "Дата", "°C")
+
+    return run
+
+
+@benchmark(params=[100000])
+def bench_line_chart_cached(env, points):
+    """Повторный вызов с тем же рядом - попадание в кеш фигур"""
+    from utils.charts import create_line_chart
+
+    x, y = _series(points)
+    create_line_chart(x, y, "Температура", "Дата", "°C")
+
+    def run():
+        create_line_chart(x, y, "Температура", "Дата", "°C")
+
+    return run
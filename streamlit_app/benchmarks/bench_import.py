@@ -0,0 +1,157 @@
+"""
+Benchmarks: импорт Excel - чтение листа и построчная валидация
+
+Повторяет шаги страницы 15_📥_Import.py для типов 02-06: чтение листа
+(modules.excel_reader), проверка обязательных колонок и цикл по строкам
+с проверками DataValidator. Файлы генерируются один раз на прогон
+(10k строк, 100k - только с --full).
+"""
+import random
+from datetime import date, timedelta
+
+import pandas as pd
+
+from benchmarks.harness import benchmark
+from modules.excel_reader import read_sheet, read_workbook
+from modules.validators import DataValidator
+
+OPERATION_TYPES = ["sowing", "fertilizing", "spraying", "harvest", "tillage"]
+CROPS = ["Пшеница яровая", "Ячмень", "Рапс", "Лён", "Подсолнечник"]
+
+
+def _fields_row(rng: random.Random, i: int) -> dict:
+    return {"ID поля": f"F{i:06d}", "Название": f"Поле {i}", "Площадь (га)": round(rng.uniform(20, 900), 1),
+            "Тип почвы": "Чернозём обыкновенный"}
+
+
+def _agrochem_row(rng: random.Random, i: int) -> dict:
+    return {"ID поля": f"F{i % 5000:06d}", "Дата анализа": date(2024, 4, 1) + timedelta(days=i % 30),
+            "pH водн": round(rng.uniform(5.5, 8.5), 2), "Гумус (%)": round(rng.uniform(2, 6), 2),
+            "P2O5 (мг/кг)": rng.randint(10, 60), "K2O (мг/кг)": rng.randint(150, 600)}
+
+
+def _operations_row(rng: random.Random, i: int) -> dict:
+    return {"ID поля": f"F{i % 5000:06d}", "Дата": date(2024, 4, 1) + timedelta(days=i % 180),
+            "Тип операции": rng.choice(OPERATION_TYPES), "Культура": rng.choice(CROPS),
+            "Площадь (га)": round(rng.uniform(20, 900), 1)}
+
+
+def _yield_row(rng: random.Random, i: int) -> dict:
+    return {"ID поля": f"F{i % 5000:06d}", "Год": 2023 + i % 3, "Культура": rng.choice(CROPS),
+            "Урожайность (т/га)": round(rng.uniform(0.8, 3.5), 2)}
+
+
+def _economics_row(rng: random.Random, i: int) -> dict:
+    return {"ID поля": f"F{i % 5000:06d}", "Год": 2023 + i % 3, "Культура": rng.choice(CROPS),
+            "Затраты (тг/га)": rng.randint(40000, 120000), "Выручка (тг/га)": rng.randint(50000, 200000)}
+
+
+def _validate_area(row, validator):
+    area = row.get("Площадь (га)")
+    return validator.validate_area(area) if area and area > 0 else (True, "")
+
+
+def _validate_ph(row, validator):
+    ph = row.get("pH водн")
+    return validator.validate_ph(float(ph)) if ph and not pd.isna(ph) else (True, "")
+
+
+def _validate_yield(row, validator):
+    value = row.get("Урожайность (т/га)")
+    return validator.validate_yield(float(value), "wheat") if value else (True, "")
+
+
+# Тип -> (генератор строки, обязательные колонки, колонки строки без пропусков, проверка)
+SHEETS = {
+    "02_fields": (_fields_row, ["ID поля", "Площадь (га)"], ["ID поля", "Площадь (га)"], _validate_area),
+    "03_agrochem": (_agrochem_row, ["ID поля", "Дата анализа"], ["ID поля", "Дата анализа"], _validate_ph),
+    "04_operations": (_operations_row, ["ID поля", "Дата", "Тип операции"],
+                      ["ID поля", "Дата", "Тип операции"], None),
+    "05_yield": (_yield_row, ["ID поля", "Год", "Культура", "Урожайность (т/га)"],
+                 ["ID поля", "Год", "Урожайность (т/га)"], _validate_yield),
+    "06_economics": (_economics_row, ["ID поля", "Год", "Культура"], ["ID поля", "Год"], None),
+}
+
+
+def _sheet_path(env, sheet: str, rows: int):
+    key = ("import_sheet", sheet, rows)
+    if key not in env.cache:
+        make_row = SHEETS[sheet][0]
+        rng = random.Random(f"{sheet}:{rows}")
+        path = env.workdir / f"{sheet}_{rows}.xlsx"
+        pd.DataFrame([make_row(rng, i) for i in range(rows)]).to_excel(path, index=False)
+        env.cache[key] = path
+    return env.cache[key]
+
+
+def _workbook_path(env, rows: int):
+    """Книга со всеми типами 02-06 на отдельных листах"""
+    key = ("import_workbook", rows)
+    if key not in env.cache:
+        path = env.workdir / f"workbook_{rows}.xlsx"
+        with pd.ExcelWriter(path) as writer:
+            for sheet, (make_row, *_) in SHEETS.items():
+                rng = random.Random(f"{sheet}:{rows}")
+                pd.DataFrame([make_row(rng, i) for i in range(rows)]).to_excel(writer, index=False, sheet_name=sheet)
+        env.cache[key] = path
+    return env.cache[key]
+
+
+def validate_sheet(df: pd.DataFrame, sheet: str, validator: DataValidator) -> int:
+    """Валидация листа как на странице импорта; возвращает число валидных строк"""
+    _, required, not_null, check = SHEETS[sheet]
+    missing = [col for col in required if col not in df.columns]
+    if missing:
+        raise ValueError(f"Missing columns: {missing}")
+    valid_rows = 0
+    errors = []
+    for idx, row in df.iterrows():
+        if any(pd.isna(row.get(col)) for col in not_null):
+            continue
+        valid_rows += 1
+        if check is not None:
+            is_valid, msg = check(row, validator)
+            if not is_valid:
+                errors.append(f"Строка {idx + 2}: {msg}")
+    return valid_rows
+
+
+@benchmark(params=[(sheet, 10000) for sheet in SHEETS],
+           full_params=[(sheet, 100000) for sheet in SHEETS], repeats=5)
+def bench_import_sheet(env, param):
+    sheet, rows = param
+    path = _sheet_path(env, sheet, rows)
+    validator = DataValidator()
+
+    def run():
+        df = read_sheet(path)
+        assert validate_sheet(df, sheet, validator) == rows
+
+    return run
+
+
+@benchmark(params=[(sheet, 10000) for sheet in SHEETS],
+           full_params=[(sheet, 100000) for sheet in SHEETS], repeats=5)
+def bench_import_validate(env, param):
+    """Только валидация (лист уже прочитан) - отделяет цикл по строкам от чтения xlsx"""
+    sheet, rows = param
+    df = read_sheet(_sheet_path(env, sheet, rows))
+    validator = DataValidator()
+
+    def run():
+        validate_sheet(df, sheet, validator)
+
+    return run
+
+
+@benchmark(params=[(1, 10000), (0, 10000)], full_params=[(1, 100000), (0, 100000)], repeats=3)
+def bench_read_workbook(env, param):
+    """Все листы книги 02-06: один процесс (workers=1) и пул по числу CPU (workers=0)"""
+    workers, rows = param
+    path = _workbook_path(env, rows)
+
+    def run():
+        frames = read_workbook(path, workers=workers, parallel_min_bytes=0)
+        assert all(len(df) == rows for df in frames.values())
+
+    return run
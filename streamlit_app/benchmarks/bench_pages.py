@@ -0,0 +1,54 @@
+"""
+Benchmarks: запросы страниц на синтетической БД
+
+Журнал (список, детали, полный экспорт), набор метрик дашборда и последние
+агрохимические анализы по полям (карта плодородия). Сценарии журнала и
+дашборда берутся из modules.loadtest, хозяйство и сезон фиксированы.
+"""
+import random
+
+from benchmarks.harness import benchmark
+from modules.database import Field, Operation, AgrochemicalAnalysis
+from modules.loadtest import LoadContext, PAGE_SCENARIOS
+
+
+def _scenario(env, name: str):
+    factory = env.session_factory()
+    scenario = PAGE_SCENARIOS[name]
+    with factory() as db:
+        farm_ids = [row[0] for row in db.query(Field.farm_id).distinct().order_by(Field.farm_id)]
+
+    def run():
+        with factory() as db:
+            scenario(LoadContext(db, random.Random(0), farm_ids[:1], [2024]))
+
+    return run
+
+
+@benchmark(params=["dashboard", "journal_list", "journal_detail", "journal_export_full"])
+def bench_page(env, name):
+    return _scenario(env, name)
+
+
+@benchmark()
+def bench_agrochem_latest_per_field(env):
+    """Последний анализ каждого поля хозяйства, как на вкладке 'Карта плодородия'"""
+    factory = env.session_factory()
+    with factory() as db:
+        farm_id = db.query(Field.farm_id).order_by(Field.farm_id).first()[0]
+
+    def run():
+        with factory() as db:
+            latest = {}
+            for field in db.query(Field).filter(Field.farm_id == farm_id).all():
+                last_analysis = db.query(Operation, AgrochemicalAnalysis).join(
+                    AgrochemicalAnalysis, Operation.id == AgrochemicalAnalysis.operation_id
+                ).filter(
+                    Operation.field_id == field.id,
+                    Operation.operation_type == "soil_analysis"
+                ).order_by(Operation.operation_date.desc()).first()
+                if last_analysis:
+                    latest[field.field_code] = last_analysis[1]
+            assert latest
+
+    return run
@@ -0,0 +1,69 @@
+"""
+Benchmarks: справочники - load_reference для каждого JSON-каталога,
+сопоставление колонки названий (modules.reference_lookup) и поиск
+(modules.reference_search)
+"""
+from pathlib import Path
+
+from benchmarks.harness import benchmark
+
+DATA_DIR = Path(__file__).resolve().parent.parent / "data"
+CATALOGS = sorted(path.name for path in DATA_DIR.glob("*.json"))
+
+
+@benchmark(params=CATALOGS)
+def bench_load_reference(env, filename):
+    from utils.reference_loader import load_reference
+
+    def run():
+        data = load_reference(filename, show_error=False)
+        assert data, f"{filename} is empty"
+
+    return run
+
+
+# Написания из журналов хозяйств: точные, другой регистр, синонимы, опечатки
+NAME_VARIANTS = {
+    "crop": ["Пшеница яровая", "пшеница ЯРОВАЯ", "Яровая пшеница", "Ячмень", "Ячмнь", "Подсолнух", "Лён", "Горох"],
+    "fertilizer": ["Аммофос", "мочевина", "Карбамид", "NPK 16-16-16", "КАС 32", "Сульфат аммония", "Амофос"],
+    "pesticide": ["Фастак", "Гранстар (75% в.д.г.)", "Реглон супер", "Раундап", "Тилт 250"],
+}
+
+
+@benchmark(params=[(catalog, 10000) for catalog in NAME_VARIANTS],
+           full_params=[(catalog, 100000) for catalog in NAME_VARIANTS])
+def bench_reference_resolve(env, param):
+    """Сопоставление колонки названий со справочником одним вызовом resolve()"""
+    import random
+
+    import pandas as pd
+
+    from modules.reference_lookup import lookup
+
+    catalog, rows = param
+    rng = random.Random(f"{catalog}:{rows}")
+    values = pd.Series([rng.choice(NAME_VARIANTS[catalog]) for _ in range(rows)])
+    reference = lookup(catalog)
+
+    def run():
+        resolved = reference.resolve(values)
+        assert len(resolved) == rows
+
+    return run
+
+
+# Запросы из полей поиска: префикс, несколько слов, латынь, опечатка
+SEARCH_QUERIES = ["john deere 8r", "ростсельмаш", "Blumeria", "тебуконазол", "фалкон", "клоп черепашка"]
+
+
+@benchmark(params=SEARCH_QUERIES)
+def bench_reference_search(env, query):
+    """Ранжированный поиск по всем справочникам (индекс modules.reference_search)"""
+    from modules.reference_search import search_index
+
+    index = search_index()
+
+    def run():
+        index.search(query)
+
+    return run
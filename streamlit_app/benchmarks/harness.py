@@ -0,0 +1,239 @@
+"""
+Benchmark harness - Регистрация и замер сценариев производительности
+
+Сценарий - функция-фабрика, помеченная @benchmark. Она получает окружение
+(BenchEnv) и параметр (если заданы params), готовит данные и возвращает
+функцию без аргументов, время которой измеряется. Подготовка в замер не входит.
+
+Один замер (sample) - среднее время number вызовов; number подбирается
+так, чтобы замер длился не меньше min_sample_time (как в timeit/asv).
+"""
+import gc
+import importlib
+import math
+import shutil
+import statistics
+import tempfile
+import time
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+
+# Модули со сценариями (импортируются при первом обращении к реестру)
+BENCH_MODULES = [
+    "benchmarks.bench_references",
+    "benchmarks.bench_import",
+    "benchmarks.bench_pages",
+    "benchmarks.bench_geo_charts",
+    "benchmarks.bench_backend",
+]
+
+_REGISTRY: Dict[str, "Case"] = {}
+
+
+class SkipBenchmark(Exception):
+    """Сценарий невозможен в текущем окружении (нет зависимости и т.п.)"""
+    pass
+
+
+class Case:
+    """
+    Зарегистрированный сценарий
+
+    Args:
+        name: Имя сценария
+        factory: функция(env[, param]) -> функция для замера
+        params: Параметры обычного прогона
+        full_params: Дополнительные параметры для --full
+        repeats: Число замеров (по умолчанию - из BenchmarkRunner)
+    """
+
+    def __init__(self, name: str, factory: Callable, params: Sequence = (None,),
+                 full_params: Sequence = (), repeats: Optional[int] = None):
+        self.name = name
+        self.factory = factory
+        self.params = list(params)
+        self.full_params = list(full_params)
+        self.repeats = repeats
+
+    def instances(self, full: bool = False) -> List[Tuple[str, Any]]:
+        """Пары (полное имя, параметр), например ("polygon_area[10000]", 10000)"""
+        params = self.params + (self.full_params if full else [])
+        return [(case_id(self.name, param), param) for param in params]
+
+
+def case_id(name: str, param: Any) -> str:
+    if param is None:
+        return name
+    if isinstance(param, tuple):
+        param = "-".join(str(p) for p in param)
+    return f"{name}[{param}]"
+
+
+def benchmark(name: Optional[str] = None, params: Sequence = (None,), full_params: Sequence = (),
+              repeats: Optional[int] = None):
+    """
+    Декоратор регистрации сценария
+
+    Args:
+        name: Имя (по умолчанию - имя функции без префикса bench_)
+        params: Параметры обычного прогона
+        full_params: Дополнительные (тяжёлые) параметры для --full
+        repeats: Число замеров для медленных сценариев
+    """
+    def decorator(factory: Callable) -> Callable:
+        case_name = name or factory.__name__.removeprefix("bench_")
+        if case_name in _REGISTRY:
+            raise ValueError(f"Duplicate benchmark: {case_name}")
+        _REGISTRY[case_name] = Case(case_name, factory, params, full_params, repeats)
+        return factory
+    return decorator
+
+
+def registered() -> Dict[str, Case]:
+    """Все сценарии из BENCH_MODULES"""
+    for module in BENCH_MODULES:
+        importlib.import_module(module)
+    return dict(_REGISTRY)
+
+
+class BenchEnv:
+    """
+    Общие данные сценариев
+
+    Временный каталог для файлов и синтетическая SQLite-БД (modules.synthetic),
+    которая создаётся при первом обращении и живёт весь прогон.
+    """
+
+    def __init__(self, workdir: Optional[str] = None):
+        self._own_workdir = workdir is None
+        self.workdir = Path(workdir or tempfile.mkdtemp(prefix="bench_"))
+        self.workdir.mkdir(parents=True, exist_ok=True)
+        self.cache: Dict[Any, Any] = {}
+        self._engine = None
+        self._session_factory = None
+
+    def session_factory(self):
+        """Фабрика сессий синтетической БД: 3 хозяйства × ~40 полей × 2 сезона"""
+        if self._session_factory is None:
+            from sqlalchemy import create_engine
+            from sqlalchemy.orm import sessionmaker
+            from modules.synthetic import SyntheticConfig, SyntheticGenerator
+
+            self._engine = create_engine(f"sqlite:///{self.workdir / 'bench.db'}")
+            config = SyntheticConfig(farms=3, fields_per_farm=40, seasons=2, last_season=2024,
+                                     seed=7, weather="daily", gps_points=0)
+            SyntheticGenerator(config, self._engine).run()
+            self._session_factory = sessionmaker(bind=self._engine)
+        return self._session_factory
+
+    def close(self) -> None:
+        if self._engine is not None:
+            self._engine.dispose()
+        if self._own_workdir:
+            shutil.rmtree(self.workdir, ignore_errors=True)
+
+
+def _timed(func: Callable[[], Any], number: int) -> float:
+    gc_enabled = gc.isenabled()
+    gc.disable()
+    try:
+        started = time.perf_counter()
+        for _ in range(number):
+            func()
+        return time.perf_counter() - started
+    finally:
+        if gc_enabled:
+            gc.enable()
+
+
+def measure(func: Callable[[], Any], repeats: int = 10, min_sample_time: float = 0.05,
+            max_number: int = 10000) -> Dict[str, Any]:
+    """
+    Замеры функции
+
+    Первые вызовы калибруют number и служат прогревом.
+
+    Args:
+        func: Функция без аргументов
+        repeats: Число замеров
+        min_sample_time: Минимальная длительность одного замера, с
+        max_number: Верхняя граница вызовов в замере
+
+    Returns:
+        {"samples": [с на вызов, ...], "number": вызовов в замере, "median": ...}
+    """
+    number = 1
+    while True:
+        elapsed = _timed(func, number)
+        if elapsed >= min_sample_time or number >= max_number:
+            break
+        grow = min_sample_time / elapsed if elapsed > 0 else 10
+        number = min(max_number, max(number * 2, math.ceil(number * grow * 1.2)))
+
+    samples = [_timed(func, number) / number for _ in range(repeats)]
+    return {"samples": samples, "number": number, "median": statistics.median(samples)}
+
+
+class BenchmarkRunner:
+    """
+    Прогон сценариев
+
+    Args:
+        full: Включить тяжёлые параметры (100k строк, 100k вершин)
+        pattern: Подстрока имени - прогнать только совпадающие сценарии
+        repeats: Замеров на сценарий
+        min_sample_time: Минимальная длительность замера, с
+        env: Окружение (по умолчанию - новое во временном каталоге)
+    """
+
+    def __init__(self, full: bool = False, pattern: Optional[str] = None, repeats: int = 10,
+                 min_sample_time: float = 0.05, env: Optional[BenchEnv] = None):
+        self.full = full
+        self.pattern = pattern
+        self.repeats = repeats
+        self.min_sample_time = min_sample_time
+        self.env = env
+
+    def selected(self) -> List[Tuple[str, Case, Any]]:
+        items = []
+        for case in registered().values():
+            for full_name, param in case.instances(self.full):
+                if not self.pattern or self.pattern in full_name:
+                    items.append((full_name, case, param))
+        return items
+
+    def run(self, progress: Optional[Callable[[str, Dict[str, Any]], None]] = None) -> Dict[str, Any]:
+        """
+        Прогон выбранных сценариев
+
+        Args:
+            progress: callback(имя, результат) после каждого сценария
+
+        Returns:
+            {"cases": {имя: {"samples", "number", "median"} | {"skipped"} | {"error"}}, ...}
+        """
+        env = self.env or BenchEnv()
+        results: Dict[str, Dict[str, Any]] = {}
+        started = time.perf_counter()
+        try:
+            for full_name, case, param in self.selected():
+                try:
+                    func = case.factory(env) if param is None else case.factory(env, param)
+                    result = measure(func, case.repeats or self.repeats, self.min_sample_time)
+                except SkipBenchmark as exc:
+                    result = {"skipped": str(exc)}
+                except Exception as exc:
+                    result = {"error": f"{type(exc).__name__}: {exc}"[:300]}
+                results[full_name] = result
+                if progress:
+                    progress(full_name, result)
+        finally:
+            if self.env is None:
+                env.close()
+
+        return {
+            "started_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "seconds": round(time.perf_counter() - started, 2),
+            "full": self.full,
+            "cases": results,
+        }
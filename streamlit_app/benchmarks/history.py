@@ -0,0 +1,183 @@
+"""
+Benchmark history - История замеров по коммитам и поиск регрессий
+
+Каждый прогон сохраняется в локальный JSON с коммитом, признаком
+незакоммиченных изменений и идентификатором машины. Сравнение идёт только
+с прогонами той же машины: время на разном железе несопоставимо.
+
+Регрессия - замеры статистически значимо медленнее базовых (односторонний
+U-критерий Манна-Уитни, p < alpha) И медиана выросла больше чем на
+threshold. Первое условие отсекает шум, второе - значимые, но мелкие сдвиги.
+"""
+import json
+import math
+import os
+import platform
+import statistics
+import subprocess
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+HISTORY_PATH = Path(__file__).resolve().parent / ".results" / "history.json"
+
+# Хранить прогонов не больше (старые удаляются)
+MAX_RUNS = 500
+
+
+def git_revision(cwd: Optional[Path] = None) -> Dict[str, Any]:
+    """Текущий коммит, ветка и наличие незакоммиченных изменений"""
+    cwd = cwd or Path(__file__).resolve().parent
+
+    def git(*args: str) -> Optional[str]:
+        try:
+            return subprocess.run(
+                ["git", *args], cwd=cwd, capture_output=True, text=True, check=True, timeout=30
+            ).stdout.strip()
+        except (OSError, subprocess.SubprocessError):
+            return None
+
+    commit = git("rev-parse", "HEAD")
+    status = git("status", "--porcelain", "--untracked-files=no")
+    return {
+        "commit": commit or "unknown",
+        "branch": git("rev-parse", "--abbrev-ref", "HEAD"),
+        "dirty": bool(status),
+    }
+
+
+def machine_id() -> str:
+    """Идентификатор машины и интерпретатора"""
+    return f"{platform.node()}|{platform.machine()}|{os.cpu_count()}cpu|py{platform.python_version()}"
+
+
+class History:
+    """
+    JSON-история прогонов
+
+    Один прогон на (коммит, машина, dirty): повторный прогон того же
+    коммита заменяет предыдущий.
+    """
+
+    def __init__(self, path: Path = HISTORY_PATH):
+        self.path = Path(path)
+        self.runs: List[Dict[str, Any]] = []
+        if self.path.exists():
+            with open(self.path, "r", encoding="utf-8") as f:
+                self.runs = json.load(f).get("runs", [])
+
+    def add(self, run: Dict[str, Any]) -> None:
+        key = (run["commit"], run["machine"], run["dirty"])
+        self.runs = [r for r in self.runs if (r["commit"], r["machine"], r["dirty"]) != key]
+        self.runs.append(run)
+        self.runs = self.runs[-MAX_RUNS:]
+
+    def baseline(self, machine: str, current_commit: str, revision: Optional[str] = None) -> Optional[Dict[str, Any]]:
+        """
+        Базовый прогон для сравнения
+
+        Args:
+            machine: Идентификатор машины
+            current_commit: Текущий коммит (его чистый прогон - база для dirty-прогона)
+            revision: Префикс коммита; по умолчанию - последний прогон другого коммита
+
+        Returns:
+            Прогон или None
+        """
+        for run in reversed(self.runs):
+            if run["machine"] != machine:
+                continue
+            if revision:
+                if run["commit"].startswith(revision) and not run["dirty"]:
+                    return run
+            elif run["commit"] != current_commit or not run["dirty"]:
+                return run
+        return None
+
+    def save(self) -> None:
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = self.path.with_suffix(".tmp")
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump({"runs": self.runs}, f, ensure_ascii=False, indent=1)
+        os.replace(tmp, self.path)
+
+
+def _ranks(values: Sequence[float]) -> Tuple[List[float], float]:
+    """Ранги со средним для связок и поправка на связки sum(t^3 - t)"""
+    order = sorted(range(len(values)), key=lambda i: values[i])
+    ranks = [0.0] * len(values)
+    ties = 0.0
+    i = 0
+    while i < len(order):
+        j = i
+        while j + 1 < len(order) and values[order[j + 1]] == values[order[i]]:
+            j += 1
+        rank = (i + j) / 2 + 1
+        for k in range(i, j + 1):
+            ranks[order[k]] = rank
+        t = j - i + 1
+        ties += t ** 3 - t
+        i = j + 1
+    return ranks, ties
+
+
+def mann_whitney_greater(baseline: Sequence[float], current: Sequence[float]) -> float:
+    """
+    Односторонний U-критерий Манна-Уитни: current стохастически больше baseline
+
+    Нормальное приближение с поправкой на связки и непрерывность.
+
+    Returns:
+        p-value (1.0, если выборки пустые или все значения совпадают)
+    """
+    n1, n2 = len(baseline), len(current)
+    if not n1 or not n2:
+        return 1.0
+    ranks, ties = _ranks(list(baseline) + list(current))
+    u_current = sum(ranks[n1:]) - n2 * (n2 + 1) / 2
+    n = n1 + n2
+    variance = n1 * n2 / 12 * ((n + 1) - ties / (n * (n - 1)))
+    if variance <= 0:
+        return 1.0
+    z = (u_current - n1 * n2 / 2 - 0.5) / math.sqrt(variance)
+    return 0.5 * math.erfc(z / math.sqrt(2))
+
+
+def compare(baseline: Dict[str, Any], current: Dict[str, Any], threshold: float = 0.10,
+            alpha: float = 0.01) -> List[Dict[str, Any]]:
+    """
+    Сравнение двух прогонов по сценариям, которые есть в обоих
+
+    Args:
+        baseline: Базовый прогон
+        current: Текущий прогон
+        threshold: Минимальный относительный рост медианы (0.10 = 10%)
+        alpha: Уровень значимости
+
+    Returns:
+        [{"case", "baseline_ms", "current_ms", "ratio", "p_value", "status"}, ...],
+        status - "regression", "improvement" или "unchanged"
+    """
+    rows = []
+    for name, result in current["cases"].items():
+        base = baseline["cases"].get(name)
+        if not base or "samples" not in base or "samples" not in result:
+            continue
+        before, after = base["samples"], result["samples"]
+        ratio = statistics.median(after) / statistics.median(before) if statistics.median(before) else math.inf
+        p_slower = mann_whitney_greater(before, after)
+        p_faster = mann_whitney_greater(after, before)
+        if p_slower < alpha and ratio > 1 + threshold:
+            status, p_value = "regression", p_slower
+        elif p_faster < alpha and ratio < 1 / (1 + threshold):
+            status, p_value = "improvement", p_faster
+        else:
+            status, p_value = "unchanged", min(p_slower, p_faster)
+        rows.append({
+            "case": name,
+            "baseline_ms": statistics.median(before) * 1000,
+            "current_ms": statistics.median(after) * 1000,
+            "ratio": ratio,
+            "p_value": p_value,
+            "status": status,
+        })
+    return rows
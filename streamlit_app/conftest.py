@@ -0,0 +1,43 @@
+"""
+Общие фикстуры тестов: временная SQLite-база со схемой и тестовое хозяйство
+"""
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from modules.database import Base, Farm, Field
+
+
+@pytest.fixture()
+def engine(tmp_path):
+    """Движок временной базы с созданной схемой"""
+    engine = create_engine(f"sqlite:///{tmp_path / 'test.db'}")
+    Base.metadata.create_all(engine)
+    yield engine
+    engine.dispose()
+
+
+@pytest.fixture()
+def session_factory(engine):
+    """Фабрика сессий временной базы"""
+    return sessionmaker(bind=engine)
+
+
+@pytest.fixture()
+def farm_id(session_factory) -> int:
+    """ID тестового хозяйства"""
+    with session_factory() as db:
+        farm = Farm(bin="123456789012", name="Тест")
+        db.add(farm)
+        db.commit()
+        return farm.id
+
+
+@pytest.fixture()
+def field_id(session_factory, farm_id) -> int:
+    """ID поля F1 (100 га) тестового хозяйства"""
+    with session_factory() as db:
+        field = Field(farm_id=farm_id, field_code="F1", name="Поле 1", area_ha=100)
+        db.add(field)
+        db.commit()
+        return field.id
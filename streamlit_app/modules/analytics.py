@@ -0,0 +1,331 @@
+"""
+Analytics - Колоночная аналитика по операциям (уборка, удобрения, СЗР)
+
+Вместо выборки ORM-кортежей (Operation, Detail, Field) и агрегации в циклах
+данные читаются одним запросом только нужных колонок в DataFrame,
+а все итоги по полям, годам и культурам считаются векторно в pandas.
+Свойства из справочника (типичная урожайность культуры) присоединяются
+в том же запросе из справочных таблиц (modules.reference_sync).
+"""
+from typing import Dict, List, Optional, Tuple
+
+import pandas as pd
+from sqlalchemy import extract, select
+from sqlalchemy.orm import Session
+
+from modules.database import (
+    Operation,
+    Field,
+    HarvestData,
+    FertilizerApplication,
+    PesticideApplication,
+    RefCrop,
+)
+
+
+# Общие колонки операции и поля для всех срезов
+_BASE_COLUMNS = [
+    Operation.id.label("operation_id"),
+    Operation.operation_date.label("operation_date"),
+    Operation.area_processed_ha.label("area_ha"),
+    Operation.crop.label("operation_crop"),
+    Field.id.label("field_id"),
+    Field.field_code.label("field_code"),
+    Field.name.label("field_name"),
+]
+
+
+def _build_frame(
+    db: Session,
+    detail_model,
+    detail_columns: List,
+    operation_type: str,
+    farm_id: Optional[int],
+    year: Optional[int] = None,
+    field_code: Optional[str] = None,
+    extra_filters: Optional[List] = None,
+    outer_joins: Optional[List[Tuple]] = None,
+) -> pd.DataFrame:
+    """
+    Выборка колонок операции, деталей и поля в DataFrame
+
+    Args:
+        db: Сессия БД
+        detail_model: Модель деталей операции
+        detail_columns: Колонки деталей (с label)
+        operation_type: Тип операции
+        farm_id: ID хозяйства (None - все хозяйства)
+        year: Год операции
+        field_code: Код поля
+        extra_filters: Дополнительные условия WHERE
+        outer_joins: (модель, условие) - LEFT JOIN справочных таблиц
+
+    Returns:
+        DataFrame, отсортированный по дате операции (новые сверху)
+    """
+    columns = _BASE_COLUMNS + detail_columns
+    stmt = (
+        select(*columns)
+        .select_from(Operation)
+        .join(detail_model, Operation.id == detail_model.operation_id)
+        .join(Field, Operation.field_id == Field.id)
+        .where(Operation.operation_type == operation_type)
+    )
+    for model, onclause in outer_joins or []:
+        stmt = stmt.outerjoin(model, onclause)
+
+    if farm_id is not None:
+        stmt = stmt.where(Field.farm_id == farm_id)
+    if year is not None:
+        stmt = stmt.where(extract('year', Operation.operation_date) == year)
+    if field_code is not None:
+        stmt = stmt.where(Field.field_code == field_code)
+    for condition in extra_filters or []:
+        stmt = stmt.where(condition)
+
+    stmt = stmt.order_by(Operation.operation_date.desc())
+
+    result = db.execute(stmt)
+    df = pd.DataFrame(result.all(), columns=list(result.keys()))
+
+    df["operation_date"] = pd.to_datetime(df["operation_date"])
+    df["year"] = df["operation_date"].dt.year.astype("Int64")
+    df["field"] = df["field_code"].astype(str) + " - " + df["field_name"].fillna("").astype(str)
+    return df
+
+
+def _group(df: pd.DataFrame, by: str, agg: Dict) -> pd.DataFrame:
+    """Группировка с сохранением пустых ключей (культура/класс не указаны)"""
+    if df.empty:
+        return pd.DataFrame(columns=[by] + list(agg.keys()))
+    return df.groupby(by, dropna=False, sort=True).agg(**agg).reset_index()
+
+
+# ============================================================================
+# УБОРКА
+# ============================================================================
+
+def harvest_frame(
+    db: Session,
+    farm_id: Optional[int],
+    year: Optional[int] = None,
+    crop: Optional[str] = None,
+    field_code: Optional[str] = None,
+) -> pd.DataFrame:
+    """Данные уборки для среза (хозяйство, год, культура, поле) с типичной урожайностью культуры"""
+    return _build_frame(
+        db,
+        HarvestData,
+        [
+            HarvestData.crop.label("crop"),
+            HarvestData.variety.label("variety"),
+            HarvestData.yield_t_ha.label("yield_t_ha"),
+            HarvestData.total_yield_t.label("total_yield_t"),
+            HarvestData.moisture_percent.label("moisture_percent"),
+            HarvestData.protein_percent.label("protein_percent"),
+            RefCrop.typical_yield_min.label("typical_yield_min"),
+            RefCrop.typical_yield_avg.label("typical_yield_avg"),
+            RefCrop.typical_yield_max.label("typical_yield_max"),
+        ],
+        "harvest",
+        farm_id,
+        year=year,
+        field_code=field_code,
+        extra_filters=[HarvestData.crop == crop] if crop is not None else None,
+        outer_joins=[(RefCrop, RefCrop.id == HarvestData.ref_crop_id)],
+    )
+
+
+def crop_targets(db: Session) -> pd.DataFrame:
+    """
+    Типичная урожайность культур из справочника
+
+    Returns:
+        DataFrame: crop, yield_min, yield_avg, yield_max (т/га)
+    """
+    result = db.execute(select(
+        RefCrop.crop_name.label("crop"),
+        RefCrop.typical_yield_min.label("yield_min"),
+        RefCrop.typical_yield_avg.label("yield_avg"),
+        RefCrop.typical_yield_max.label("yield_max"),
+    ).order_by(RefCrop.id))
+    return pd.DataFrame(result.all(), columns=list(result.keys()))
+
+
+def harvest_summary(df: pd.DataFrame) -> Dict:
+    """
+    Итоги по уборке
+
+    Returns:
+        {"totals": {...}, "by_crop", "by_field", "by_year": DataFrame}
+        Средняя урожайность по полям и годам - взвешенная по площади
+        (валовой сбор / площадь), по культурам - средняя по записям,
+        с типичной урожайностью (typical_yield_avg) и отклонением от неё
+        (vs_typical_pct).
+    """
+    total_area = float(df["area_ha"].sum()) if not df.empty else 0.0
+    total_yield = float(df["total_yield_t"].sum()) if not df.empty else 0.0
+
+    totals = {
+        "count": len(df),
+        "total_area": total_area,
+        "total_yield": total_yield,
+        "avg_yield": total_yield / total_area if total_area > 0 else 0.0,
+        "max_yield": float(df["yield_t_ha"].max()) if df["yield_t_ha"].notna().any() else 0.0,
+    }
+
+    sums = dict(total_yield=("total_yield_t", "sum"), total_area=("area_ha", "sum"))
+
+    by_field = _group(df, "field_code", sums)
+    by_year = _group(df, "year", sums)
+    for frame in (by_field, by_year):
+        frame["avg_yield"] = (frame["total_yield"] / frame["total_area"]).where(frame["total_area"] > 0, 0.0)
+
+    by_crop = _group(df, "crop", dict(
+        avg_yield=("yield_t_ha", "mean"),
+        total_yield=("total_yield_t", "sum"),
+        total_area=("area_ha", "sum"),
+        typical_yield_avg=("typical_yield_avg", "first"),
+    ))
+    typical = pd.to_numeric(by_crop["typical_yield_avg"], errors="coerce")
+    average = pd.to_numeric(by_crop["avg_yield"], errors="coerce")
+    by_crop["vs_typical_pct"] = (average / typical.where(typical > 0) - 1) * 100
+
+    return {"totals": totals, "by_crop": by_crop, "by_field": by_field, "by_year": by_year}
+
+
+# ============================================================================
+# УДОБРЕНИЯ
+# ============================================================================
+
+def fertilizer_frame(
+    db: Session,
+    farm_id: Optional[int],
+    year: Optional[int] = None,
+    field_code: Optional[str] = None,
+    fertilizer_type: Optional[str] = None,
+    crop: Optional[str] = None,
+) -> pd.DataFrame:
+    """Данные внесения удобрений для среза"""
+    filters = []
+    if fertilizer_type is not None:
+        filters.append(FertilizerApplication.fertilizer_type == fertilizer_type)
+    if crop is not None:
+        filters.append(Operation.crop == crop)
+
+    return _build_frame(
+        db,
+        FertilizerApplication,
+        [
+            FertilizerApplication.fertilizer_name.label("fertilizer_name"),
+            FertilizerApplication.fertilizer_type.label("fertilizer_type"),
+            FertilizerApplication.rate_kg_ha.label("rate_kg_ha"),
+            FertilizerApplication.total_fertilizer_kg.label("total_fertilizer_kg"),
+            FertilizerApplication.n_applied_kg.label("n_applied_kg"),
+            FertilizerApplication.p_applied_kg.label("p_applied_kg"),
+            FertilizerApplication.k_applied_kg.label("k_applied_kg"),
+            FertilizerApplication.application_method.label("application_method"),
+        ],
+        "fertilizing",
+        farm_id,
+        year=year,
+        field_code=field_code,
+        extra_filters=filters,
+    )
+
+
+def fertilizer_summary(df: pd.DataFrame) -> Dict:
+    """
+    Итоги по внесению удобрений
+
+    Returns:
+        {"totals": {...}, "by_category", "by_field", "by_year": DataFrame}
+    """
+    totals = {
+        "count": len(df),
+        "total_fertilizer": float(df["total_fertilizer_kg"].sum()) if not df.empty else 0.0,
+        "total_n": float(df["n_applied_kg"].sum()) if not df.empty else 0.0,
+        "total_p": float(df["p_applied_kg"].sum()) if not df.empty else 0.0,
+        "total_k": float(df["k_applied_kg"].sum()) if not df.empty else 0.0,
+    }
+
+    npk = dict(
+        n=("n_applied_kg", "sum"),
+        p=("p_applied_kg", "sum"),
+        k=("k_applied_kg", "sum"),
+        total_fertilizer=("total_fertilizer_kg", "sum"),
+    )
+
+    return {
+        "totals": totals,
+        "by_category": _group(df, "fertilizer_type", dict(total_fertilizer=("total_fertilizer_kg", "sum"))),
+        "by_field": _group(df, "field", npk),
+        "by_year": _group(df, "year", npk),
+    }
+
+
+# ============================================================================
+# СЗР
+# ============================================================================
+
+def pesticide_frame(
+    db: Session,
+    farm_id: Optional[int],
+    year: Optional[int] = None,
+    field_code: Optional[str] = None,
+    pesticide_class: Optional[str] = None,
+    crop: Optional[str] = None,
+) -> pd.DataFrame:
+    """Данные обработок СЗР для среза"""
+    filters = []
+    if pesticide_class is not None:
+        filters.append(PesticideApplication.pesticide_class == pesticide_class)
+    if crop is not None:
+        filters.append(Operation.crop == crop)
+
+    return _build_frame(
+        db,
+        PesticideApplication,
+        [
+            PesticideApplication.pesticide_name.label("pesticide_name"),
+            PesticideApplication.pesticide_class.label("pesticide_class"),
+            PesticideApplication.rate_per_ha.label("rate_per_ha"),
+            PesticideApplication.total_product_used.label("total_product_used"),
+            PesticideApplication.treatment_target.label("treatment_target"),
+            PesticideApplication.application_method.label("application_method"),
+        ],
+        "spraying",
+        farm_id,
+        year=year,
+        field_code=field_code,
+        extra_filters=filters,
+    )
+
+
+def pesticide_summary(df: pd.DataFrame) -> Dict:
+    """
+    Итоги по обработкам СЗР
+
+    Returns:
+        {"totals": {...}, "by_class", "by_target", "by_field", "by_year": DataFrame}
+    """
+    total_product = float(df["total_product_used"].sum()) if not df.empty else 0.0
+    total_area = float(df["area_ha"].sum()) if not df.empty else 0.0
+
+    totals = {
+        "count": len(df),
+        "total_product": total_product,
+        "total_area": total_area,
+        "avg_rate": total_product / total_area if total_area > 0 else 0.0,
+    }
+
+    counts = dict(count=("operation_id", "size"))
+    usage = dict(total_product=("total_product_used", "sum"), total_area=("area_ha", "sum"))
+
+    return {
+        "totals": totals,
+        "by_class": _group(df, "pesticide_class", counts),
+        "by_target": _group(df, "treatment_target", counts),
+        "by_field": _group(df, "field_code", usage),
+        "by_year": _group(df, "year", usage),
+    }
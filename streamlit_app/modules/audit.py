@@ -0,0 +1,246 @@
+"""
+Audit - Асинхронная пакетная запись журнала действий
+
+События складываются в ограниченную очередь процесса, фоновый поток
+записывает их пачками (multi-row INSERT) через отдельное соединение
+каждые AUDIT_BATCH_SIZE событий или AUDIT_FLUSH_INTERVAL_MS миллисекунд.
+Запрос пользователя не ждёт коммита журнала.
+
+Политика переполнения очереди (AUDIT_OVERFLOW_POLICY):
+    block - ждать место в очереди не дольше AUDIT_BLOCK_TIMEOUT_MS, затем отбросить
+    drop  - сразу отбросить событие
+    sync  - записать событие синхронно в вызывающем потоке
+"""
+import atexit
+import logging
+import queue
+import threading
+import time
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+
+from sqlalchemy import insert
+
+from modules.config import settings
+from modules.database import AuditLog, engine
+
+logger = logging.getLogger(__name__)
+
+OVERFLOW_POLICIES = ("block", "drop", "sync")
+
+
+class _FlushRequest:
+    """Маркер принудительного сброса очереди"""
+
+    def __init__(self):
+        self.done = threading.Event()
+
+
+class AuditWriter:
+    """
+    Фоновый писатель журнала действий
+
+    Поток запускается при первом событии. Порядок событий сохраняется,
+    время события фиксируется в момент вызова, а не в момент записи.
+    """
+
+    def __init__(
+        self,
+        bind=None,
+        max_queue: int = 10000,
+        batch_size: int = 100,
+        flush_interval_ms: int = 500,
+        overflow_policy: str = "block",
+        block_timeout_ms: int = 50,
+    ):
+        if overflow_policy not in OVERFLOW_POLICIES:
+            raise ValueError(f"Unknown audit overflow policy: {overflow_policy}")
+
+        self.bind = bind if bind is not None else engine
+        self.batch_size = max(1, batch_size)
+        self.flush_interval = max(1, flush_interval_ms) / 1000
+        self.overflow_policy = overflow_policy
+        self.block_timeout = max(0, block_timeout_ms) / 1000
+
+        self._queue: "queue.Queue" = queue.Queue(maxsize=max_queue)
+        self._thread: Optional[threading.Thread] = None
+        self._start_lock = threading.Lock()
+        self._stats_lock = threading.Lock()
+        self._stopped = False
+
+        self.enqueued = 0
+        self.written = 0
+        self.dropped = 0
+        self.failed = 0
+        self.batches = 0
+
+    # ------------------------------------------------------------------
+    # Приём событий
+    # ------------------------------------------------------------------
+
+    def submit(self, event: Dict[str, Any]) -> bool:
+        """
+        Постановка события в очередь
+
+        Args:
+            event: Поля AuditLog (user_id, action, entity_type, entity_id, details, ip_address)
+
+        Returns:
+            True, если событие принято (в очередь или записано синхронно)
+        """
+        event.setdefault("created_at", datetime.now())
+        self._ensure_started()
+
+        try:
+            if self.overflow_policy == "block":
+                self._queue.put(event, timeout=self.block_timeout)
+            else:
+                self._queue.put_nowait(event)
+        except queue.Full:
+            if self.overflow_policy == "sync":
+                return self._write([event])
+            self._count("dropped")
+            logger.warning("Audit queue is full, event dropped: %s", event.get("action"))
+            return False
+
+        self._count("enqueued")
+        return True
+
+    def flush(self, timeout: float = 5.0) -> bool:
+        """
+        Принудительная запись всех событий, поставленных до вызова
+
+        Returns:
+            True, если очередь успела сброситься за timeout секунд
+        """
+        if self._thread is None or not self._thread.is_alive():
+            return True
+        request = _FlushRequest()
+        try:
+            self._queue.put(request, timeout=timeout)
+        except queue.Full:
+            return False
+        return request.done.wait(timeout)
+
+    def stop(self, timeout: float = 5.0) -> None:
+        """Сброс очереди и остановка потока"""
+        self.flush(timeout)
+        self._stopped = True
+
+    def stats(self) -> Dict[str, Any]:
+        """Статистика писателя"""
+        with self._stats_lock:
+            return {
+                "queued": self._queue.qsize(),
+                "enqueued": self.enqueued,
+                "written": self.written,
+                "dropped": self.dropped,
+                "failed": self.failed,
+                "batches": self.batches,
+                "overflow_policy": self.overflow_policy,
+            }
+
+    # ------------------------------------------------------------------
+    # Фоновый поток
+    # ------------------------------------------------------------------
+
+    def _count(self, name: str, value: int = 1) -> None:
+        with self._stats_lock:
+            setattr(self, name, getattr(self, name) + value)
+
+    def _ensure_started(self) -> None:
+        if self._thread is not None and self._thread.is_alive():
+            return
+        with self._start_lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._stopped = False
+                self._thread = threading.Thread(target=self._run, name="audit-writer", daemon=True)
+                self._thread.start()
+
+    def _run(self) -> None:
+        batch: List[Dict[str, Any]] = []
+        deadline = None
+
+        while not (self._stopped and self._queue.empty()):
+            timeout = self.flush_interval if deadline is None else max(0.0, deadline - time.monotonic())
+            try:
+                item = self._queue.get(timeout=timeout)
+            except queue.Empty:
+                item = None
+
+            if isinstance(item, _FlushRequest):
+                if batch:
+                    self._write(batch)
+                    batch, deadline = [], None
+                item.done.set()
+                continue
+
+            if item is not None:
+                batch.append(item)
+                if deadline is None:
+                    deadline = time.monotonic() + self.flush_interval
+
+            if batch and (len(batch) >= self.batch_size or time.monotonic() >= deadline):
+                self._write(batch)
+                batch, deadline = [], None
+
+        if batch:
+            self._write(batch)
+
+    def _write(self, rows: List[Dict[str, Any]]) -> bool:
+        """Запись пачки одним INSERT в отдельной транзакции"""
+        try:
+            with self.bind.begin() as conn:
+                conn.execute(insert(AuditLog.__table__), rows)
+        except Exception:
+            self._count("failed", len(rows))
+            logger.exception("Failed to write %d audit events", len(rows))
+            return False
+
+        self._count("written", len(rows))
+        self._count("batches")
+        return True
+
+
+# Общий писатель процесса
+audit_writer = AuditWriter(
+    max_queue=settings.AUDIT_QUEUE_SIZE,
+    batch_size=settings.AUDIT_BATCH_SIZE,
+    flush_interval_ms=settings.AUDIT_FLUSH_INTERVAL_MS,
+    overflow_policy=settings.AUDIT_OVERFLOW_POLICY,
+    block_timeout_ms=settings.AUDIT_BLOCK_TIMEOUT_MS,
+)
+
+atexit.register(audit_writer.stop)
+
+
+def record(
+    user_id: int,
+    action: str,
+    entity_type: Optional[str] = None,
+    entity_id: Optional[int] = None,
+    details: Optional[str] = None,
+    ip_address: Optional[str] = None,
+) -> bool:
+    """
+    Асинхронная запись действия в журнал
+
+    Args:
+        user_id: ID пользователя
+        action: Действие (login, logout, create, update, delete)
+        entity_type: Тип сущности
+        entity_id: ID сущности
+        details: Детали
+        ip_address: IP-адрес
+
+    Returns:
+        True, если событие принято писателем
+    """
+    return audit_writer.submit({
+        "user_id": user_id,
+        "action": action,
+        "entity_type": entity_type,
+        "entity_id": entity_id,
+        "details": details,
+        "ip_address": ip_address,
+    })
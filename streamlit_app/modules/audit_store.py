@@ -0,0 +1,431 @@
+"""
+Audit store - Помесячное хранение журнала действий и быстрые выборки
+
+PostgreSQL: audit_logs преобразуется в секционированную таблицу
+(PARTITION BY RANGE (created_at)) с помесячными секциями audit_logs_YYYYMM,
+создаваемыми заранее на AUDIT_PARTITIONS_AHEAD месяцев вперёд.
+
+SQLite: audit_logs хранит только текущий месяц, прошлые месяцы
+переносятся в таблицы audit_logs_YYYYMM (ротация).
+
+В обоих случаях хранение ограничивается удалением целых месячных
+таблиц (DROP TABLE) без построчного DELETE.
+
+Запуск обслуживания: python -m modules.audit_store
+"""
+import re
+import threading
+import time
+from datetime import date, datetime
+from typing import Dict, List, Optional, Tuple
+
+from sqlalchemy import (
+    Column, DateTime, Index, Integer, MetaData, String, Table, Text,
+    and_, inspect, or_, select, text,
+)
+from sqlalchemy.engine import Connection, Engine
+from sqlalchemy.orm import Session
+
+from modules.config import settings
+from modules.database import AuditLog, User, engine as default_engine
+
+BASE_TABLE = AuditLog.__tablename__
+_PARTITION_RE = re.compile(rf"^{BASE_TABLE}_(\d{{4}})(\d{{2}})$")
+
+# Курсор keyset-пагинации: (created_at, id) последней строки страницы
+Cursor = Tuple[datetime, int]
+
+
+# ============================================================================
+# МЕСЯЦЫ И ИМЕНА ТАБЛИЦ
+# ============================================================================
+
+def month_start(value) -> date:
+    """Первое число месяца"""
+    return date(value.year, value.month, 1)
+
+
+def add_months(value: date, months: int) -> date:
+    """Сдвиг первого числа месяца на months месяцев"""
+    index = value.year * 12 + value.month - 1 + months
+    return date(index // 12, index % 12 + 1, 1)
+
+
+def partition_name(month: date) -> str:
+    """Имя месячной таблицы: audit_logs_YYYYMM"""
+    return f"{BASE_TABLE}_{month.year:04d}{month.month:02d}"
+
+
+def _partition_month(name: str) -> Optional[date]:
+    match = _PARTITION_RE.match(name)
+    if not match:
+        return None
+    return date(int(match.group(1)), int(match.group(2)), 1)
+
+
+def _archive_table(name: str) -> Table:
+    """Описание месячной таблицы с теми же колонками, что у audit_logs"""
+    return Table(
+        name,
+        MetaData(),
+        Column("id", Integer, primary_key=True),
+        Column("user_id", Integer, nullable=False),
+        Column("action", String(100), nullable=False),
+        Column("entity_type", String(50)),
+        Column("entity_id", Integer),
+        Column("details", Text),
+        Column("ip_address", String(50)),
+        Column("created_at", DateTime),
+        Index(f"ix_{name}_created_id", "created_at", "id"),
+        Index(f"ix_{name}_user_created", "user_id", "created_at"),
+        Index(f"ix_{name}_entity", "entity_type", "entity_id"),
+    )
+
+
+def _is_postgres(bind) -> bool:
+    return bind.dialect.name == "postgresql"
+
+
+# ============================================================================
+# ОБСЛУЖИВАНИЕ
+# ============================================================================
+
+def ensure_indexes(conn: Connection) -> None:
+    """Создание индексов audit_logs в уже существующих БД"""
+    for index in AuditLog.__table__.indexes:
+        index.create(conn, checkfirst=True)
+
+
+def _pg_is_partitioned(conn: Connection) -> bool:
+    return conn.execute(text(
+        "SELECT EXISTS (SELECT 1 FROM pg_partitioned_table p "
+        "JOIN pg_class c ON c.oid = p.partrelid WHERE c.relname = :name "
+        "AND pg_table_is_visible(c.oid))"
+    ), {"name": BASE_TABLE}).scalar()
+
+
+def _pg_convert_to_partitioned(conn: Connection, today: date) -> None:
+    """
+    Преобразование обычной audit_logs в секционированную
+
+    Существующая таблица становится секцией audit_logs_legacy с диапазоном
+    до начала следующего месяца, последовательность id переходит
+    к новой родительской таблице.
+    """
+    legacy = f"{BASE_TABLE}_legacy"
+    next_month = add_months(month_start(today), 1)
+
+    sequence = conn.execute(text("SELECT pg_get_serial_sequence(:t, 'id')"), {"t": BASE_TABLE}).scalar()
+
+    conn.execute(text(f"ALTER TABLE {BASE_TABLE} RENAME TO {legacy}"))
+    conn.execute(text(f"ALTER TABLE {legacy} RENAME CONSTRAINT {BASE_TABLE}_pkey TO {legacy}_pkey"))
+    for (index_name,) in conn.execute(text(
+        "SELECT indexname FROM pg_indexes WHERE tablename = :t AND indexname LIKE 'ix\\_%'"
+    ), {"t": legacy}).all():
+        conn.execute(text(f"ALTER INDEX {index_name} RENAME TO {index_name.replace(BASE_TABLE, legacy, 1)}"))
+    if sequence:
+        # Иначе последовательность удалится вместе с legacy по сроку хранения
+        conn.execute(text(f"ALTER SEQUENCE {sequence} OWNED BY NONE"))
+
+    conn.execute(text(f"UPDATE {legacy} SET created_at = now() WHERE created_at IS NULL"))
+    conn.execute(text(f"ALTER TABLE {legacy} ALTER COLUMN created_at SET NOT NULL"))
+
+    conn.execute(text(
+        f"CREATE TABLE {BASE_TABLE} (LIKE {legacy} INCLUDING DEFAULTS INCLUDING CONSTRAINTS) "
+        f"PARTITION BY RANGE (created_at)"
+    ))
+    conn.execute(text(f"ALTER TABLE {BASE_TABLE} ADD PRIMARY KEY (id, created_at)"))
+    conn.execute(text(f"ALTER TABLE {BASE_TABLE} ADD FOREIGN KEY (user_id) REFERENCES users (id)"))
+    ensure_indexes(conn)
+
+    conn.execute(text(
+        f"ALTER TABLE {BASE_TABLE} ATTACH PARTITION {legacy} "
+        f"FOR VALUES FROM (MINVALUE) TO ('{next_month.isoformat()}')"
+    ))
+    conn.execute(text(f"CREATE TABLE {BASE_TABLE}_default PARTITION OF {BASE_TABLE} DEFAULT"))
+
+
+def _pg_ensure_partitions(conn: Connection, today: date, months_ahead: int) -> List[str]:
+    """
+    Создание месячных секций на months_ahead месяцев вперёд
+
+    Если в audit_logs_default уже есть строки месяца (секция не была
+    создана вовремя), PostgreSQL не даст создать секцию поверх них.
+    Тогда секция создаётся отдельной таблицей, строки месяца переносятся
+    в неё из default и она подключается (ATTACH PARTITION) - всё в
+    транзакции обслуживания.
+    """
+    existing = set(inspect(conn).get_table_names())
+    covered_until = max(_pg_partition_bounds(conn).values(), default=None)
+    default = f"{BASE_TABLE}_default"
+
+    created = []
+    current = month_start(today)
+    for offset in range(0, months_ahead + 1):
+        month = add_months(current, offset)
+        name = partition_name(month)
+        if name in existing or (covered_until is not None and month < covered_until):
+            continue
+        lower, upper = month.isoformat(), add_months(month, 1).isoformat()
+        bounds = f"FROM ('{lower}') TO ('{upper}')"
+        in_month = f"created_at >= '{lower}' AND created_at < '{upper}'"
+        if default in existing and conn.execute(text(f"SELECT 1 FROM {default} WHERE {in_month} LIMIT 1")).first():
+            # Блокировка: до ATTACH в default не добавятся новые строки месяца
+            conn.execute(text(f"LOCK TABLE {default} IN SHARE ROW EXCLUSIVE MODE"))
+            conn.execute(text(
+                f"CREATE TABLE {name} (LIKE {BASE_TABLE} INCLUDING DEFAULTS INCLUDING CONSTRAINTS)"
+            ))
+            conn.execute(text(f"INSERT INTO {name} SELECT * FROM {default} WHERE {in_month}"))
+            conn.execute(text(f"DELETE FROM {default} WHERE {in_month}"))
+            conn.execute(text(f"ALTER TABLE {BASE_TABLE} ATTACH PARTITION {name} FOR VALUES {bounds}"))
+        else:
+            conn.execute(text(f"CREATE TABLE {name} PARTITION OF {BASE_TABLE} FOR VALUES {bounds}"))
+        created.append(name)
+    return created
+
+
+def _pg_partition_bounds(conn: Connection) -> Dict[str, date]:
+    """Верхние границы диапазонов секций {имя: дата}"""
+    rows = conn.execute(text(
+        "SELECT c.relname, pg_get_expr(c.relpartbound, c.oid) FROM pg_inherits i "
+        "JOIN pg_class c ON c.oid = i.inhrelid JOIN pg_class p ON p.oid = i.inhparent "
+        "WHERE p.relname = :name"
+    ), {"name": BASE_TABLE}).all()
+
+    bounds = {}
+    for name, expr in rows:
+        match = re.search(r"TO \('(\d{4}-\d{2}-\d{2})", expr or "")
+        if match:
+            bounds[name] = date.fromisoformat(match.group(1))
+    return bounds
+
+
+def _sqlite_rotate(conn: Connection, today: date) -> List[str]:
+    """Перенос записей прошлых месяцев из audit_logs в месячные таблицы"""
+    current = month_start(today)
+    source = AuditLog.__table__
+
+    oldest = conn.execute(select(source.c.created_at).where(
+        source.c.created_at < datetime.combine(current, datetime.min.time())
+    ).order_by(source.c.created_at).limit(1)).scalar()
+    if oldest is None:
+        return []
+
+    rotated = []
+    month = month_start(oldest)
+    while month < current:
+        lower = datetime.combine(month, datetime.min.time())
+        upper = datetime.combine(add_months(month, 1), datetime.min.time())
+        in_month = and_(source.c.created_at >= lower, source.c.created_at < upper)
+
+        if conn.execute(select(source.c.id).where(in_month).limit(1)).first() is not None:
+            archive = _archive_table(partition_name(month))
+            archive.create(conn, checkfirst=True)
+            columns = [c.name for c in archive.columns]
+            conn.execute(archive.insert().from_select(
+                columns, select(*[source.c[name] for name in columns]).where(in_month)
+            ))
+            conn.execute(source.delete().where(in_month))
+            rotated.append(archive.name)
+        month = add_months(month, 1)
+    return rotated
+
+
+def apply_retention(conn: Connection, today: date, retention_months: int) -> List[str]:
+    """
+    Удаление месячных таблиц старше срока хранения
+
+    Returns:
+        Имена удалённых таблиц
+    """
+    if retention_months <= 0:
+        return []
+
+    cutoff = add_months(month_start(today), -retention_months)
+    dropped = []
+
+    if _is_postgres(conn):
+        for name, upper in _pg_partition_bounds(conn).items():
+            if upper <= cutoff:
+                conn.execute(text(f"ALTER TABLE {BASE_TABLE} DETACH PARTITION {name}"))
+                conn.execute(text(f"DROP TABLE {name}"))
+                dropped.append(name)
+        return dropped
+
+    for name in inspect(conn).get_table_names():
+        month = _partition_month(name)
+        if month is not None and add_months(month, 1) <= cutoff:
+            conn.execute(text(f"DROP TABLE {name}"))
+            dropped.append(name)
+    return dropped
+
+
+def maintain(bind: Optional[Engine] = None, today: Optional[date] = None) -> Dict[str, List[str]]:
+    """
+    Обслуживание журнала: индексы, секции/ротация, срок хранения
+
+    Args:
+        bind: Engine (по умолчанию engine приложения)
+        today: Текущая дата (для тестов)
+
+    Returns:
+        {"created": [...], "rotated": [...], "dropped": [...]}
+    """
+    bind = bind if bind is not None else default_engine
+    today = today or date.today()
+    report = {"created": [], "rotated": [], "dropped": []}
+
+    with bind.begin() as conn:
+        if _is_postgres(conn):
+            if not _pg_is_partitioned(conn):
+                _pg_convert_to_partitioned(conn, today)
+            report["created"] = _pg_ensure_partitions(conn, today, settings.AUDIT_PARTITIONS_AHEAD)
+        else:
+            ensure_indexes(conn)
+            report["rotated"] = _sqlite_rotate(conn, today)
+        report["dropped"] = apply_retention(conn, today, settings.AUDIT_RETENTION_MONTHS)
+
+    return report
+
+
+_last_maintenance = 0.0
+_maintenance_lock = threading.Lock()
+
+
+def maintain_if_due(bind: Optional[Engine] = None) -> Optional[Dict[str, List[str]]]:
+    """
+    Обслуживание не чаще раза в AUDIT_MAINTENANCE_INTERVAL_MIN минут на процесс
+
+    Returns:
+        Отчёт maintain() или None, если обслуживание не требовалось
+    """
+    global _last_maintenance
+    interval = settings.AUDIT_MAINTENANCE_INTERVAL_MIN * 60
+    if time.monotonic() - _last_maintenance < interval and _last_maintenance:
+        return None
+    with _maintenance_lock:
+        if _last_maintenance and time.monotonic() - _last_maintenance < interval:
+            return None
+        report = maintain(bind)
+        _last_maintenance = time.monotonic()
+        return report
+
+
+# ============================================================================
+# ВЫБОРКИ
+# ============================================================================
+
+def _tables_newest_first(bind) -> List[Tuple[Table, Optional[date]]]:
+    """
+    Таблицы журнала от новых к старым
+
+    PostgreSQL: только родительская таблица (секции выбирает планировщик).
+    SQLite: audit_logs (текущий месяц), затем месячные таблицы.
+    """
+    if _is_postgres(bind):
+        return [(AuditLog.__table__, None)]
+
+    months = sorted(
+        (m for m in (_partition_month(n) for n in inspect(bind).get_table_names()) if m is not None),
+        reverse=True,
+    )
+    return [(AuditLog.__table__, None)] + [(_archive_table(partition_name(m)), m) for m in months]
+
+
+def query_audit_page(
+    db: Session,
+    limit: int = 100,
+    cursor: Optional[Cursor] = None,
+    user_id: Optional[int] = None,
+    action: Optional[str] = None,
+    entity_type: Optional[str] = None,
+    entity_id: Optional[int] = None,
+    date_from: Optional[date] = None,
+    date_to: Optional[date] = None,
+) -> Tuple[List[Dict], Optional[Cursor]]:
+    """
+    Страница журнала с keyset-пагинацией (новые сверху)
+
+    Вместо OFFSET следующая страница начинается строго после
+    (created_at, id) последней строки предыдущей, поэтому глубина
+    листания не влияет на стоимость запроса.
+
+    Args:
+        db: Сессия БД
+        limit: Размер страницы
+        cursor: Курсор предыдущей страницы (None - первая страница)
+        user_id, action, entity_type, entity_id: Фильтры
+        date_from, date_to: Период (включительно)
+
+    Returns:
+        (строки, курсор следующей страницы или None)
+    """
+    lower = datetime.combine(date_from, datetime.min.time()) if date_from else None
+    upper = datetime.combine(date_to, datetime.max.time()) if date_to else None
+
+    rows: List[Dict] = []
+    for table, month in _tables_newest_first(db.get_bind()):
+        if month is not None:
+            # Месячные таблицы вне периода и новее курсора не читаем
+            month_begin = datetime.combine(month, datetime.min.time())
+            month_end = datetime.combine(add_months(month, 1), datetime.min.time())
+            if (lower and month_end <= lower) or (upper and month_begin > upper):
+                continue
+            if cursor and month_begin > cursor[0]:
+                continue
+
+        c = table.c
+        stmt = select(
+            c.id, c.created_at, c.user_id, c.action, c.entity_type, c.entity_id, c.details,
+            User.username.label("username"),
+        ).select_from(table).outerjoin(User, User.id == c.user_id)
+
+        if cursor:
+            stmt = stmt.where(or_(
+                c.created_at < cursor[0],
+                and_(c.created_at == cursor[0], c.id < cursor[1]),
+            ))
+        if lower:
+            stmt = stmt.where(c.created_at >= lower)
+        if upper:
+            stmt = stmt.where(c.created_at <= upper)
+        if user_id is not None:
+            stmt = stmt.where(c.user_id == user_id)
+        if action:
+            stmt = stmt.where(c.action == action)
+        if entity_type:
+            stmt = stmt.where(c.entity_type == entity_type)
+        if entity_id is not None:
+            stmt = stmt.where(c.entity_id == entity_id)
+
+        stmt = stmt.order_by(c.created_at.desc(), c.id.desc()).limit(limit + 1 - len(rows))
+        rows.extend(dict(r._mapping) for r in db.execute(stmt))
+        if len(rows) > limit:
+            break
+
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+    next_cursor = (rows[-1]["created_at"], rows[-1]["id"]) if has_more and rows else None
+    return rows, next_cursor
+
+
+def list_partitions(bind: Optional[Engine] = None) -> List[Dict]:
+    """Месячные таблицы журнала и число строк в них"""
+    bind = bind if bind is not None else default_engine
+    with bind.connect() as conn:
+        if _is_postgres(conn):
+            names = sorted(_pg_partition_bounds(conn))
+        else:
+            names = [BASE_TABLE] + sorted(
+                (n for n in inspect(conn).get_table_names() if _partition_month(n)), reverse=True
+            )
+        return [
+            {"table": name, "rows": conn.execute(text(f"SELECT COUNT(*) FROM {name}")).scalar()}
+            for name in names
+        ]
+
+
+if __name__ == "__main__":
+    result = maintain()
+    for key, names in result.items():
+        print(f"{key}: {', '.join(names) if names else '-'}")
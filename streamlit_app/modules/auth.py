@@ -1,24 +1,24 @@
 """
 Authentication and authorization utilities
 """
-import bcrypt
 import streamlit as st
 from datetime import datetime
 from typing import Optional
 from sqlalchemy.orm import Session
-from modules.database import User, Farm, AuditLog, UserFarm, SessionLocal
+from modules.database import User, Farm, UserFarm, SessionLocal
+from modules import audit, query_log
+from modules.credentials import credential_service, login_throttle
+from modules.startup import bootstrap
 
 
 def hash_password(password: str) -> str:
-    """Хеширование пароля"""
-    salt = bcrypt.gensalt()
-    hashed = bcrypt.hashpw(password.encode('utf-8'), salt)
-    return hashed.decode('utf-8')
+    """Хеширование пароля (в пуле потоков сервиса паролей)"""
+    return credential_service.hash(password)
 
 
 def verify_password(password: str, hashed_password: str) -> bool:
-    """Проверка пароля"""
-    return bcrypt.checkpw(password.encode('utf-8'), hashed_password.encode('utf-8'))
+    """Проверка пароля (в пуле потоков сервиса паролей)"""
+    return credential_service.verify(password, hashed_password)
 
 
 def create_user(
@@ -48,17 +48,31 @@ def create_user(
 
 
 def authenticate_user(db: Session, username: str, password: str) -> Optional[User]:
-    """Аутентификация пользователя"""
+    """
+    Аутентификация пользователя
+
+    Raises:
+        LoginThrottled: Превышен лимит неудачных попыток для имени
+        CredentialServiceBusy: Пул проверки паролей перегружен
+    """
+    login_throttle.check(username)
+
     user = db.query(User).filter(User.username == username).first()
 
-    if not user:
+    if not user or not user.is_active:
+        login_throttle.register_failure(username)
         return None
 
-    if not user.is_active:
+    valid, new_hash = credential_service.verify_and_update(password, user.hashed_password)
+    if not valid:
+        login_throttle.register_failure(username)
         return None
 
-    if not verify_password(password, user.hashed_password):
-        return None
+    login_throttle.reset(username)
+
+    # Стоимость хеша изменилась - сохраняем пересчитанный
+    if new_hash:
+        user.hashed_password = new_hash
 
     # Обновляем время последнего входа
     user.last_login = datetime.now()
@@ -114,6 +128,11 @@ def has_farm_access(farm_id: int) -> bool:
 
 def require_auth(redirect_to_login: bool = True):
     """Декоратор/проверка авторизации"""
+    # Страница может открыться первой после перезапуска, минуя app.py:
+    # схема БД (ADDED_COLUMNS) нужна до запросов страницы. Один раз на процесс
+    bootstrap()
+    # Новая область журнала SQL: счётчики N+1 - на один перезапуск страницы
+    query_log.begin_scope()
     if not is_authenticated():
         st.error("❌ Требуется авторизация")
         if redirect_to_login:
@@ -165,16 +184,20 @@ def log_action(
     entity_id: Optional[int] = None,
     details: Optional[str] = None
 ):
-    """Логирование действий пользователя"""
-    log = AuditLog(
+    """
+    Логирование действий пользователя
+
+    Событие ставится в очередь фонового писателя (modules.audit) и
+    записывается отдельным соединением, поэтому сессия db не используется
+    и не коммитится. Параметр оставлен для совместимости вызовов.
+    """
+    audit.record(
         user_id=user_id,
         action=action,
         entity_type=entity_type,
         entity_id=entity_id,
         details=details
     )
-    db.add(log)
-    db.commit()
 
 
 def get_user_display_name() -> str:
@@ -0,0 +1,119 @@
+"""
+Change log - Журнал изменений хозяйств, полей и операций
+
+Каждый flush сессии, затронувший хозяйство, поле, операцию или её детали,
+добавляет строки в change_log в той же транзакции (outbox): изменение
+и запись о нём фиксируются или откатываются вместе. id записи - курсор
+ленты GET /api/v1/changes?since= в backend.
+
+Изменение деталей (sowing_details, harvest_data, ...) записывается как
+update операции. Пакетные записи через Core в журнал сами не попадают:
+modules.excel_import передаёт их через record(); генератор modules.synthetic
+и каскадные удаления на стороне БД не журналируются.
+"""
+from datetime import datetime
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from sqlalchemy import event, insert, select
+from sqlalchemy.orm import Session
+from sqlalchemy.orm.util import identity_key
+
+from modules.database import ChangeLog, Operation, SessionLocal
+
+# Отслеживаемые таблицы
+TRACKED_TABLES = ("farms", "fields", "operations")
+
+
+def _operation_farm_ids(session: Session, operation_ids: Iterable[int]) -> Dict[int, Optional[int]]:
+    """farm_id операций: загруженные берутся из identity map, остальные - одним запросом"""
+    result: Dict[int, Optional[int]] = {}
+    missing = []
+    for operation_id in operation_ids:
+        obj = session.identity_map.get(identity_key(Operation, operation_id))
+        if obj is not None and "farm_id" in obj.__dict__:
+            result[operation_id] = obj.farm_id
+        else:
+            missing.append(operation_id)
+    if missing:
+        result.update(session.connection().execute(
+            select(Operation.id, Operation.farm_id).where(Operation.id.in_(missing))
+        ).all())
+    return result
+
+
+def _entry(obj: Any, op: str) -> Optional[Tuple[str, int, Optional[int], str]]:
+    """(таблица, id, farm_id, op) для объекта или None, если он не отслеживается"""
+    table = getattr(obj, "__tablename__", None)
+    if table == "farms":
+        return table, obj.id, obj.id, op
+    if table in TRACKED_TABLES:
+        return table, obj.id, obj.farm_id, op
+    operation_id = getattr(obj, "operation_id", None)
+    if operation_id is not None:
+        # Детали операции: изменение самой операции, farm_id определяется после
+        return "operations", operation_id, None, "update"
+    return None
+
+
+def _after_flush(session: Session, flush_context) -> None:
+    changes: Dict[Tuple[str, int], Tuple[Optional[int], str]] = {}
+
+    def add(entry):
+        if entry is None or entry[1] is None:
+            return
+        table, row_id, farm_id, op = entry
+        previous = changes.get((table, row_id))
+        # insert + update в одном flush - это insert; delete перекрывает всё
+        # (детали удалённой операции дают update, который не должен его затереть)
+        if previous is not None and (previous[1] == "delete" or (previous[1] == "insert" and op == "update")):
+            return
+        changes[(table, row_id)] = (farm_id, op)
+
+    for obj in session.new:
+        add(_entry(obj, "insert"))
+    for obj in session.dirty:
+        if session.is_modified(obj, include_collections=False):
+            add(_entry(obj, "update"))
+    for obj in session.deleted:
+        add(_entry(obj, "delete"))
+
+    if not changes:
+        return
+    unresolved = [key for key, (farm_id, _) in changes.items() if key[0] == "operations" and farm_id is None]
+    if unresolved:
+        farm_ids = _operation_farm_ids(session, [row_id for _, row_id in unresolved])
+        for key in unresolved:
+            changes[key] = (farm_ids.get(key[1]), changes[key][1])
+    now = datetime.utcnow()
+    rows: List[Dict[str, Any]] = [
+        {"table_name": table, "row_id": row_id, "farm_id": farm_id, "op": op, "changed_at": now}
+        for (table, row_id), (farm_id, op) in changes.items()
+    ]
+    session.connection().execute(insert(ChangeLog.__table__), rows)
+
+
+def record(session: Session, table: str, entries: Iterable[Tuple[int, Optional[int], str]]) -> None:
+    """
+    Журналирование записей, сделанных в обход ORM (INSERT ... ON CONFLICT)
+
+    Args:
+        session: Сессия, в транзакции которой выполнена запись
+        table: Таблица из TRACKED_TABLES
+        entries: (id, farm_id, op)
+    """
+    now = datetime.utcnow()
+    rows = [
+        {"table_name": table, "row_id": row_id, "farm_id": farm_id, "op": op, "changed_at": now}
+        for row_id, farm_id, op in entries
+    ]
+    if rows:
+        session.execute(insert(ChangeLog.__table__), rows)
+
+
+def install(target=SessionLocal) -> None:
+    """Подключение журнала к фабрике сессий (повторный вызов ничего не делает)"""
+    if not event.contains(target, "after_flush", _after_flush):
+        event.listen(target, "after_flush", _after_flush)
+
+
+install()
@@ -17,6 +17,7 @@ class Settings:
     APP_NAME = os.getenv("APP_NAME", "АгроДанные КЗ")
     VERSION = os.getenv("VERSION", "1.0.0")
     DEBUG = os.getenv("DEBUG", "True") == "True"
+    STARTUP_PROFILE = os.getenv("STARTUP_PROFILE", "False") == "True"  # Печать профиля запуска в лог
 
     # Limits and validation
     MAX_FIELD_AREA = 30000  # га
@@ -32,6 +33,68 @@ class Settings:
     EXPORT_CHUNK_SIZE = 1000
     MAX_EXPORT_ROWS = 100000
 
+    # Chart cache settings
+    CHART_CACHE_MAX_ENTRIES = int(os.getenv("CHART_CACHE_MAX_ENTRIES", "256"))
+    CHART_CACHE_MAX_MB = int(os.getenv("CHART_CACHE_MAX_MB", "64"))
+    CHART_MAX_POINTS = int(os.getenv("CHART_MAX_POINTS", "2000"))  # Порог прореживания LTTB
+    CHART_WEBGL_THRESHOLD = int(os.getenv("CHART_WEBGL_THRESHOLD", "5000"))  # Scattergl для больших рядов
+
+    # SQL instrumentation
+    QUERY_LOG_ENABLED = os.getenv("QUERY_LOG_ENABLED", "True") == "True"
+    SLOW_QUERY_MS = float(os.getenv("SLOW_QUERY_MS", "200"))  # Порог журнала медленных запросов
+    SLOW_QUERY_LOG_SIZE = int(os.getenv("SLOW_QUERY_LOG_SIZE", "200"))
+    N_PLUS_ONE_THRESHOLD = int(os.getenv("N_PLUS_ONE_THRESHOLD", "10"))  # Повторов одного запроса за перезапуск страницы
+
+    # ORM loading profiles
+    STRICT_LOADING = os.getenv("STRICT_LOADING", "False") == "True"  # Ошибка при обращении к связи вне профиля
+
+    # Farm read-model cache
+    FARM_CACHE_TTL_SEC = int(os.getenv("FARM_CACHE_TTL_SEC", "300"))  # Страховка от записей других процессов
+
+    # Offline mode: локальная очередь операций и синхронизация
+    OFFLINE_QUEUE_ENABLED = os.getenv("OFFLINE_QUEUE_ENABLED", "False") == "True"
+    OFFLINE_QUEUE_PATH = os.getenv("OFFLINE_QUEUE_PATH", "./offline_queue.db")
+    OFFLINE_SYNC_URL = os.getenv("OFFLINE_SYNC_URL", "")  # Адрес FastAPI backend; пусто - запись напрямую в DATABASE_URL
+    OFFLINE_SYNC_USERNAME = os.getenv("OFFLINE_SYNC_USERNAME")  # Учётная запись устройства: токены обновляются сами
+    OFFLINE_SYNC_PASSWORD = os.getenv("OFFLINE_SYNC_PASSWORD")
+    OFFLINE_SYNC_TOKEN = os.getenv("OFFLINE_SYNC_TOKEN")  # Постоянный токен, если учётная запись не задана
+    OFFLINE_SYNC_BATCH = int(os.getenv("OFFLINE_SYNC_BATCH", "200"))
+    OFFLINE_SYNC_INTERVAL_SEC = float(os.getenv("OFFLINE_SYNC_INTERVAL_SEC", "30"))
+    OFFLINE_SYNC_MAX_BACKOFF_SEC = float(os.getenv("OFFLINE_SYNC_MAX_BACKOFF_SEC", "600"))
+
+    # Background jobs: таблица jobs + пул процессов
+    JOBS_WORKERS = int(os.getenv("JOBS_WORKERS", "2"))  # Процессов-исполнителей; 0 - выполнять сразу в потоке страницы
+    JOBS_DIR = os.getenv("JOBS_DIR", "./jobs")  # Загруженные файлы и результаты задач
+    JOBS_POLL_SEC = float(os.getenv("JOBS_POLL_SEC", "2"))  # Опрос очереди и обновление статуса на странице
+    JOBS_PROGRESS_INTERVAL_SEC = float(os.getenv("JOBS_PROGRESS_INTERVAL_SEC", "1"))
+    JOBS_STALE_SEC = float(os.getenv("JOBS_STALE_SEC", "300"))  # Без heartbeat дольше - исполнитель считается остановленным
+    JOBS_MAX_ATTEMPTS = int(os.getenv("JOBS_MAX_ATTEMPTS", "2"))
+    JOBS_RETRY_DELAY_SEC = float(os.getenv("JOBS_RETRY_DELAY_SEC", "30"))
+    JOBS_KEEP_DAYS = int(os.getenv("JOBS_KEEP_DAYS", "30"))
+
+    # Excel import (modules.excel_reader, modules.excel_import)
+    EXCEL_ENGINE = os.getenv("EXCEL_ENGINE", "auto")  # auto | calamine | openpyxl; auto - calamine, если установлен
+    EXCEL_PARSE_WORKERS = int(os.getenv("EXCEL_PARSE_WORKERS", "0"))  # Процессов разбора листов; 0 - по числу CPU, 1 - без пула
+    EXCEL_PARALLEL_MIN_MB = float(os.getenv("EXCEL_PARALLEL_MIN_MB", "5"))  # Меньшие файлы разбираются в одном процессе
+    IMPORT_CHUNK_ROWS = int(os.getenv("IMPORT_CHUNK_ROWS", "500"))  # Строк в пакете upsert и в диапазоне манифеста импорта
+    REFERENCE_FUZZY_MIN = float(os.getenv("REFERENCE_FUZZY_MIN", "0.5"))  # Минимальное сходство триграмм для подсказки из справочника
+    REFERENCE_HISTORY_KEEP = int(os.getenv("REFERENCE_HISTORY_KEEP", "50"))  # Хранимых версий каждого справочника (data/.history)
+    REFERENCE_RELOAD_SEC = float(os.getenv("REFERENCE_RELOAD_SEC", "2"))  # Не чаще раза в N секунд проверять, изменились ли файлы справочников
+
+    # ML dataset settings
+    ML_DATASET_DIR = os.getenv("ML_DATASET_DIR", "./ml_dataset")
+    ML_MAX_CLOUD_COVER_PCT = float(os.getenv("ML_MAX_CLOUD_COVER_PCT", "40"))  # Снимки NDVI с облачностью выше отбрасываются
+
+    # Audit log settings
+    AUDIT_QUEUE_SIZE = int(os.getenv("AUDIT_QUEUE_SIZE", "10000"))
+    AUDIT_BATCH_SIZE = int(os.getenv("AUDIT_BATCH_SIZE", "100"))
+    AUDIT_FLUSH_INTERVAL_MS = int(os.getenv("AUDIT_FLUSH_INTERVAL_MS", "500"))
+    AUDIT_OVERFLOW_POLICY = os.getenv("AUDIT_OVERFLOW_POLICY", "block")  # block, drop, sync
+    AUDIT_BLOCK_TIMEOUT_MS = int(os.getenv("AUDIT_BLOCK_TIMEOUT_MS", "50"))
+    AUDIT_RETENTION_MONTHS = int(os.getenv("AUDIT_RETENTION_MONTHS", "24"))  # 0 - хранить всё
+    AUDIT_PARTITIONS_AHEAD = int(os.getenv("AUDIT_PARTITIONS_AHEAD", "2"))  # PostgreSQL
+    AUDIT_MAINTENANCE_INTERVAL_MIN = int(os.getenv("AUDIT_MAINTENANCE_INTERVAL_MIN", "60"))
+
     # Upload settings
     MAX_UPLOAD_SIZE_MB = int(os.getenv("MAX_UPLOAD_SIZE_MB", "50"))
     ALLOWED_PHOTO_EXTENSIONS = os.getenv("ALLOWED_PHOTO_EXTENSIONS", "jpg,jpeg,png").split(",")
@@ -47,6 +110,15 @@ class Settings:
     SENTINEL_HUB_CLIENT_ID = os.getenv("SENTINEL_HUB_CLIENT_ID")
     SENTINEL_HUB_CLIENT_SECRET = os.getenv("SENTINEL_HUB_CLIENT_SECRET")
 
+    # Password hashing
+    AUTH_BCRYPT_ROUNDS = int(os.getenv("AUTH_BCRYPT_ROUNDS", "12"))  # Хеши с другой стоимостью пересчитываются при входе
+    AUTH_HASH_WORKERS = int(os.getenv("AUTH_HASH_WORKERS", "2"))
+    AUTH_HASH_MAX_PENDING = int(os.getenv("AUTH_HASH_MAX_PENDING", "32"))
+    AUTH_MAX_FAILED_ATTEMPTS = int(os.getenv("AUTH_MAX_FAILED_ATTEMPTS", "5"))
+    AUTH_FAILED_WINDOW_SEC = int(os.getenv("AUTH_FAILED_WINDOW_SEC", "900"))
+    AUTH_LOCKOUT_SEC = int(os.getenv("AUTH_LOCKOUT_SEC", "30"))
+    AUTH_MAX_LOCKOUT_SEC = int(os.getenv("AUTH_MAX_LOCKOUT_SEC", "900"))
+
     # Session
     SESSION_TIMEOUT_HOURS = int(os.getenv("SESSION_TIMEOUT_HOURS", "24"))
 
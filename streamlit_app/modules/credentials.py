@@ -0,0 +1,177 @@
+"""
+Credentials - Хеширование и проверка паролей вне потока страницы
+
+bcrypt выполняется в ограниченном пуле потоков (AUTH_HASH_WORKERS),
+поэтому волна входов не занимает все ядра и не тормозит перезапуски
+страниц других пользователей. Стоимость (AUTH_BCRYPT_ROUNDS) настраивается:
+хеши с другой стоимостью прозрачно пересчитываются при успешном входе.
+Ограничитель неудачных попыток не даёт тратить CPU на перебор пароля.
+"""
+import re
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeout
+from typing import Optional, Tuple
+
+import bcrypt
+
+from modules.config import settings
+
+_BCRYPT_COST_RE = re.compile(r"^\$2[abxy]?\$(\d{2})\$")
+
+
+class CredentialServiceBusy(Exception):
+    """Пул проверки паролей перегружен (очередь заполнена или ожидание дольше timeout)"""
+
+
+class LoginThrottled(Exception):
+    """Слишком много неудачных попыток входа"""
+
+    def __init__(self, retry_after: float):
+        self.retry_after = retry_after
+        super().__init__(f"Too many failed login attempts, retry in {retry_after:.0f} s")
+
+
+class LoginThrottle:
+    """
+    Ограничитель неудачных попыток входа
+
+    После max_failures неудач в окне window секунд ключ блокируется;
+    каждая следующая неудача удваивает блокировку (до max_lockout).
+    Успешный вход сбрасывает счётчик. Хранится не более max_keys ключей.
+    """
+
+    def __init__(
+        self,
+        max_failures: int = 5,
+        window: float = 900,
+        base_lockout: float = 30,
+        max_lockout: float = 900,
+        max_keys: int = 10000,
+    ):
+        self.max_failures = max_failures
+        self.window = window
+        self.base_lockout = base_lockout
+        self.max_lockout = max_lockout
+        self.max_keys = max_keys
+        # ключ -> [число неудач, время первой неудачи, заблокирован до]
+        self._state: "OrderedDict[str, list]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def key(username: str) -> str:
+        return (username or "").strip().lower()
+
+    def check(self, username: str) -> None:
+        """Проверка блокировки (LoginThrottled, если ключ заблокирован)"""
+        now = time.monotonic()
+        with self._lock:
+            state = self._state.get(self.key(username))
+            if state and state[2] > now:
+                raise LoginThrottled(state[2] - now)
+
+    def register_failure(self, username: str) -> None:
+        """Учёт неудачной попытки"""
+        now = time.monotonic()
+        key = self.key(username)
+        with self._lock:
+            state = self._state.pop(key, None)
+            if state is None or now - state[1] > self.window:
+                state = [0, now, 0.0]
+            state[0] += 1
+            if state[0] >= self.max_failures:
+                excess = state[0] - self.max_failures
+                state[2] = now + min(self.base_lockout * (2 ** excess), self.max_lockout)
+            self._state[key] = state
+            while len(self._state) > self.max_keys:
+                self._state.popitem(last=False)
+
+    def reset(self, username: str) -> None:
+        """Сброс счётчика после успешного входа"""
+        with self._lock:
+            self._state.pop(self.key(username), None)
+
+
+class CredentialService:
+    """
+    Сервис паролей: bcrypt в ограниченном пуле потоков
+
+    Одновременно выполняется не больше workers операций, в очереди
+    ожидают не больше max_pending; сверх этого - CredentialServiceBusy.
+    """
+
+    def __init__(self, rounds: int = 12, workers: int = 2, max_pending: int = 32, timeout: float = 10.0):
+        self.rounds = rounds
+        self.timeout = timeout
+        self._executor = ThreadPoolExecutor(max_workers=max(1, workers), thread_name_prefix="bcrypt")
+        self._slots = threading.BoundedSemaphore(max(1, workers) + max(0, max_pending))
+
+    def _run(self, func, *args):
+        if not self._slots.acquire(blocking=False):
+            raise CredentialServiceBusy("Password hashing pool is saturated")
+        try:
+            future = self._executor.submit(func, *args)
+        except Exception:
+            self._slots.release()
+            raise
+        future.add_done_callback(lambda _: self._slots.release())
+        try:
+            return future.result(timeout=self.timeout)
+        except FutureTimeout:
+            # Ещё в очереди - снимаем; уже выполняется - досчитает и освободит слот
+            future.cancel()
+            raise CredentialServiceBusy(f"Password hashing did not finish within {self.timeout} s") from None
+
+    def hash(self, password: str) -> str:
+        """Хеширование пароля с текущей стоимостью"""
+        return self._run(self._hash_sync, password, self.rounds)
+
+    def verify(self, password: str, hashed_password: str) -> bool:
+        """Проверка пароля"""
+        return self._run(self._verify_sync, password, hashed_password)
+
+    def verify_and_update(self, password: str, hashed_password: str) -> Tuple[bool, Optional[str]]:
+        """
+        Проверка пароля с пересчётом устаревшего хеша
+
+        Returns:
+            (пароль верный, новый хеш или None, если пересчёт не нужен)
+        """
+        if not self.verify(password, hashed_password):
+            return False, None
+        if self.needs_rehash(hashed_password):
+            return True, self.hash(password)
+        return True, None
+
+    def needs_rehash(self, hashed_password: str) -> bool:
+        """Стоимость хеша отличается от настроенной"""
+        match = _BCRYPT_COST_RE.match(hashed_password or "")
+        return match is None or int(match.group(1)) != self.rounds
+
+    @staticmethod
+    def _hash_sync(password: str, rounds: int) -> str:
+        return bcrypt.hashpw(password.encode('utf-8'), bcrypt.gensalt(rounds=rounds)).decode('utf-8')
+
+    @staticmethod
+    def _verify_sync(password: str, hashed_password: str) -> bool:
+        try:
+            return bcrypt.checkpw(password.encode('utf-8'), hashed_password.encode('utf-8'))
+        except ValueError:
+            # Повреждённый или не-bcrypt хеш
+            return False
+
+
+# Общие экземпляры процесса
+credential_service = CredentialService(
+    rounds=settings.AUTH_BCRYPT_ROUNDS,
+    workers=settings.AUTH_HASH_WORKERS,
+    max_pending=settings.AUTH_HASH_MAX_PENDING,
+)
+
+login_throttle = LoginThrottle(
+    max_failures=settings.AUTH_MAX_FAILED_ATTEMPTS,
+    window=settings.AUTH_FAILED_WINDOW_SEC,
+    base_lockout=settings.AUTH_LOCKOUT_SEC,
+    max_lockout=settings.AUTH_MAX_LOCKOUT_SEC,
+)
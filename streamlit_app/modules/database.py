@@ -3,7 +3,7 @@ Database models and connection management
 Updated: 2025-10-22 - Added Machinery, Implements and new operation details models
 """
 from datetime import datetime
-from sqlalchemy import create_engine, Column, Integer, String, Float, Date, DateTime, Boolean, Text, ForeignKey, func, UniqueConstraint
+from sqlalchemy import create_engine, BigInteger, Column, Integer, String, Float, Date, DateTime, Boolean, Text, ForeignKey, func, UniqueConstraint, Index
 from sqlalchemy.orm import declarative_base, sessionmaker, relationship
 import os
 from dotenv import load_dotenv
@@ -76,6 +76,106 @@ class AuditLog(Base):
     ip_address = Column(String(50))
     created_at = Column(DateTime, server_default=func.now())
 
+    # Индексы под фильтры и keyset-пагинацию журнала (см. modules/audit_store.py)
+    __table_args__ = (
+        Index('ix_audit_logs_created_id', 'created_at', 'id'),
+        Index('ix_audit_logs_user_created', 'user_id', 'created_at'),
+        Index('ix_audit_logs_entity', 'entity_type', 'entity_id'),
+    )
+
+
+class ChangeLog(Base):
+    """Журнал изменений хозяйств, полей и операций (для GET /api/v1/changes)"""
+    __tablename__ = "change_log"
+
+    id = Column(BigInteger().with_variant(Integer, "sqlite"), primary_key=True, autoincrement=True)  # Курсор ленты
+    table_name = Column(String(50), nullable=False)  # farms, fields, operations
+    row_id = Column(Integer, nullable=False)
+    farm_id = Column(Integer)
+    op = Column(String(10), nullable=False)  # insert, update, delete
+    changed_at = Column(DateTime, nullable=False)
+
+    __table_args__ = (
+        Index('ix_change_log_farm_id_id', 'farm_id', 'id'),
+    )
+
+
+class Job(Base):
+    """Фоновая задача: импорт, экспорт, пересчёт (см. modules/jobs.py)"""
+    __tablename__ = "jobs"
+
+    id = Column(Integer, primary_key=True, index=True)
+    kind = Column(String(50), nullable=False)  # import_excel, export_journal, ...
+    status = Column(String(20), nullable=False, default="queued")  # queued, running, succeeded, failed, cancelled
+    params = Column(Text)  # JSON аргументов обработчика
+    result = Column(Text)  # JSON результата
+    error = Column(Text)  # Traceback последней ошибки
+    message = Column(String(500))  # Текущий шаг / краткий итог
+    progress = Column(Float, default=0.0)  # 0..1
+    artifact_path = Column(String(500))  # Файл результата (выгрузка)
+    attempts = Column(Integer, default=0)
+    max_attempts = Column(Integer, default=1)
+    cancel_requested = Column(Boolean, default=False)
+    user_id = Column(Integer, ForeignKey("users.id"))
+    farm_id = Column(Integer, ForeignKey("farms.id"))
+    worker = Column(String(100))  # host:pid диспетчера
+    created_at = Column(DateTime, server_default=func.now())
+    run_after = Column(DateTime)  # Не раньше (повтор после ошибки)
+    started_at = Column(DateTime)
+    heartbeat_at = Column(DateTime)
+    finished_at = Column(DateTime)
+
+    __table_args__ = (
+        Index('ix_jobs_status_run_after', 'status', 'run_after'),
+        Index('ix_jobs_farm_created', 'farm_id', 'created_at'),
+    )
+
+
+class ImportManifest(Base):
+    """Применённый диапазон строк импорта Excel (см. modules/excel_import.py)"""
+    __tablename__ = "import_manifest"
+
+    id = Column(Integer, primary_key=True, index=True)
+    farm_id = Column(Integer, ForeignKey("farms.id"), nullable=False)
+    sheet = Column(String(10), nullable=False)  # Тип файла: 02..06
+    file_hash = Column(String(64), nullable=False)  # SHA-256 загруженного файла
+    file_name = Column(String(255))
+    row_start = Column(Integer, nullable=False)  # Номера строк Excel (с заголовком - строка 1)
+    row_end = Column(Integer, nullable=False)
+    range_hash = Column(String(64), nullable=False)  # Хеш содержимого строк диапазона
+    inserted = Column(Integer, default=0)
+    updated = Column(Integer, default=0)
+    unchanged = Column(Integer, default=0)
+    skipped = Column(Integer, default=0)  # Пустые строки
+    quarantined = Column(Integer, default=0)  # Строки, отправленные в import_quarantine
+    job_id = Column(Integer, ForeignKey("jobs.id"))
+    applied_at = Column(DateTime, server_default=func.now())
+
+    __table_args__ = (
+        Index('ix_import_manifest_farm_sheet_range', 'farm_id', 'sheet', 'range_hash'),
+    )
+
+
+class ImportQuarantine(Base):
+    """Строка импорта Excel, не прошедшая проверку или запись; исправляется и повторяется со страницы импорта"""
+    __tablename__ = "import_quarantine"
+
+    id = Column(Integer, primary_key=True, index=True)
+    farm_id = Column(Integer, ForeignKey("farms.id"), nullable=False)
+    sheet = Column(String(10), nullable=False)  # Тип файла: 02..06
+    job_id = Column(Integer, ForeignKey("jobs.id"))
+    file_name = Column(String(255))
+    row_number = Column(Integer)  # Номер строки Excel
+    data = Column(Text)  # JSON ячеек строки (после исправления - исправленные значения)
+    reason = Column(String(500))  # Причина последней ошибки
+    status = Column(String(20), nullable=False, default="pending")  # pending, replayed, discarded
+    created_at = Column(DateTime, server_default=func.now())
+    resolved_at = Column(DateTime)
+
+    __table_args__ = (
+        Index('ix_import_quarantine_farm_status', 'farm_id', 'status'),
+    )
+
 
 # ============================================================================
 # ОСНОВНЫЕ ТАБЛИЦЫ
@@ -135,6 +235,7 @@ class Field(Base):
     slope_degree = Column(Float)
     drainage = Column(String(50))
     last_analysis_year = Column(Integer)
+    source_hash = Column(String(64))  # Хеш строки Excel последнего импорта (ключ - field_code)
     created_at = Column(DateTime, server_default=func.now())
 
     # Relationships
@@ -145,6 +246,9 @@ class Field(Base):
 class Operation(Base):
     """Операция (посев, обработка, уборка)"""
     __tablename__ = "operations"
+    __table_args__ = (
+        Index('ix_operations_field_type_date', 'field_id', 'operation_type', 'operation_date'),  # Поиск конфликтов синхронизации
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     farm_id = Column(Integer, ForeignKey("farms.id"), nullable=False)  # Добавлено farm_id
@@ -163,6 +267,10 @@ class Operation(Base):
     operator = Column(String(100))
     weather_conditions = Column(Text)
     notes = Column(Text)
+    client_uuid = Column(String(36), unique=True, index=True)  # UUID клиента (офлайн-очередь), для идемпотентной синхронизации
+    import_key = Column(String(200), unique=True, index=True)  # Естественный ключ строки импорта Excel (upsert при повторной загрузке)
+    source_hash = Column(String(64))  # Хеш строки Excel последнего импорта
+    ref_crop_id = Column(Integer, ForeignKey("ref_crops.id", ondelete="SET NULL"), index=True)  # Культура в справочнике (modules.reference_sync)
     created_at = Column(DateTime, server_default=func.now())
 
     # Relationships
@@ -201,6 +309,7 @@ class SowingDetail(Base):
     combined_with_fertilizer = Column(Boolean, default=False)  # Совмещенный посев с удобрениями
     combined_fertilizer_name = Column(String(200))  # Название удобрения при совмещенном посеве
     combined_fertilizer_rate_kg_ha = Column(Float)  # Норма удобрения при совмещенном посеве
+    ref_fertilizer_id = Column(Integer, ForeignKey("ref_fertilizers.id", ondelete="SET NULL"), index=True)  # Удобрение при совмещенном посеве в справочнике
 
     # Relationships
     operation = relationship("Operation", back_populates="sowing_details")
@@ -224,6 +333,7 @@ class FertilizerApplication(Base):
     k_applied_kg = Column(Float)  # Внесено K д.в.
     application_method = Column(String(50))  # Способ внесения
     application_purpose = Column(String(50))  # Цель внесения
+    ref_fertilizer_id = Column(Integer, ForeignKey("ref_fertilizers.id", ondelete="SET NULL"), index=True)  # Удобрение в справочнике
 
     # Relationships
     operation = relationship("Operation", back_populates="fertilizer_applications")
@@ -248,6 +358,7 @@ class PesticideApplication(Base):
     wind_speed_ms = Column(Float)  # Скорость ветра
     humidity_percent = Column(Float)  # Влажность
     waiting_period_days = Column(Integer)  # Срок ожидания
+    ref_pesticide_id = Column(Integer, ForeignKey("ref_pesticides.id", ondelete="SET NULL"), index=True)  # Препарат в справочнике
 
     # Relationships
     operation = relationship("Operation", back_populates="pesticide_applications")
@@ -271,6 +382,7 @@ class HarvestData(Base):
     weed_content_percent = Column(Float)  # Засоренность
     oil_content_percent = Column(Float)  # Масличность
     quality_class = Column(Integer)  # Класс качества
+    ref_crop_id = Column(Integer, ForeignKey("ref_crops.id", ondelete="SET NULL"), index=True)  # Культура в справочнике
 
     # Relationships
     operation = relationship("Operation", back_populates="harvest_data")
@@ -341,6 +453,8 @@ class EconomicData(Base):
     machinery_rental_type = Column(String(50))  # Тип аренды техники (за час, за день, за га)
     rented_machinery_description = Column(Text)  # Описание арендованной техники
     notes = Column(Text)
+    import_key = Column(String(200), unique=True, index=True)  # Естественный ключ строки импорта Excel: поле, год, культура
+    source_hash = Column(String(64))  # Хеш строки Excel последнего импорта
 
 
 class WeatherData(Base):
@@ -593,6 +707,9 @@ class FallowDetails(Base):
 # СПРАВОЧНЫЕ ТАБЛИЦЫ
 # ============================================================================
 
+# Заполняются из JSON-справочников modules.reference_sync; source_hash -
+# хеш записи справочника при последней синхронизации
+
 class RefCrop(Base):
     """Справочник культур"""
     __tablename__ = "ref_crops"
@@ -602,10 +719,15 @@ class RefCrop(Base):
     crop_type = Column(String(50))
     typical_yield_min = Column(Float)
     typical_yield_max = Column(Float)
+    typical_yield_avg = Column(Float)  # Средняя урожайность т/га
     seeding_rate_min = Column(Float)
     seeding_rate_max = Column(Float)
     seeding_depth_cm = Column(Float)
     row_spacing_cm = Column(Float)
+    n_need_kg_ha = Column(Float)  # Потребность в N на среднюю урожайность
+    p2o5_need_kg_ha = Column(Float)  # Потребность в P2O5
+    k2o_need_kg_ha = Column(Float)  # Потребность в K2O
+    source_hash = Column(String(64))
 
 
 class RefFertilizer(Base):
@@ -619,11 +741,16 @@ class RefFertilizer(Base):
     p2o5_content = Column(Float)
     k2o_content = Column(Float)
     s_content = Column(Float)
+    source_hash = Column(String(64))
 
 
 class RefPesticide(Base):
     """Справочник СЗР"""
     __tablename__ = "ref_pesticides"
+    __table_args__ = (
+        Index('ix_ref_pesticides_trade_name', 'trade_name', unique=True),
+        Index('ix_ref_pesticides_active_ingredient', 'active_ingredient'),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     trade_name = Column(String(100), nullable=False)
@@ -632,6 +759,7 @@ class RefPesticide(Base):
     typical_dose_min = Column(Float)
     typical_dose_max = Column(Float)
     dose_unit = Column(String(20))
+    source_hash = Column(String(64))
 
 
 # ============================================================================
@@ -652,6 +780,10 @@ def get_db():
         db.close()
 
 
+# Хуки журнала изменений на SessionLocal (модуль использует модели выше)
+from modules import change_log  # noqa: E402,F401
+
+
 if __name__ == "__main__":
     print("Creating database tables...")
     init_db()
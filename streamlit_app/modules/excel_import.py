@@ -0,0 +1,590 @@
+"""
+Excel import - Запись листов Excel (типы 02-06) в БД
+
+Логика импорта страницы 15_📥_Import.py, вынесенная из скрипта страницы,
+чтобы выполняться фоновой задачей (modules.jobs, вид import_excel).
+Страница проверяет файл и ставит задачу; здесь - только запись.
+
+Повторный импорт идемпотентен. Каждая строка получает естественный ключ
+и хеш содержимого (source_hash), которые сохраняются в записи:
+поле - field_code; анализ, операция, урожай - import_key из поля, типа,
+даты и культуры (глубины отбора); экономика - import_key из поля, года и
+культуры. Записи пишутся пакетами INSERT ... ON CONFLICT DO UPDATE: новая
+строка добавляется, исправленная обновляется, совпадающая по хешу не
+трогается. Операции, созданные вручную, import_key не имеют и при
+импорте не изменяются.
+
+Манифест import_manifest хранит хеши уже применённых диапазонов строк
+(IMPORT_CHUNK_ROWS): при повторной загрузке исправленного файла диапазоны
+без изменений пропускаются целиком, разбираются только изменённые.
+
+Каждый пакет фиксируется отдельной транзакцией вместе со строкой
+манифеста, поэтому прерванный импорт (сбой, отмена, остановка
+исполнителя) при повторе задачи продолжается с первого незафиксированного
+пакета. Ошибочные строки не откатывают импорт: они сохраняются в
+import_quarantine с причиной, исправляются на странице импорта и
+повторяются через replay_quarantine().
+
+Названия культур приводятся к справочнику (modules.reference_lookup)
+одним вызовом на колонку до разбора строк; после импорта записи получают
+ссылки на справочные таблицы (modules.reference_sync.link_references).
+"""
+import hashlib
+import json
+from datetime import date, datetime
+from typing import Any, Callable, Dict, List, NamedTuple, Optional, Tuple
+
+import pandas as pd
+from sqlalchemy import delete, select, update
+from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.orm import Session
+
+from modules import change_log, reference_sync
+from modules.config import settings
+from modules.database import (
+    AgrochemicalAnalysis, EconomicData, Field, HarvestData, ImportManifest, ImportQuarantine, Operation,
+)
+from modules.excel_reader import read_sheet
+from modules.nutrient_balance import invalidate_balance_cache
+from modules.reference_lookup import canonicalize
+from modules.upsert import upsert
+
+# Тип файла -> обязательные колонки (строки без них уходят в карантин)
+REQUIRED_COLUMNS = {
+    "02": ("ID поля", "Площадь (га)"),
+    "03": ("ID поля", "Дата анализа"),
+    "04": ("ID поля", "Дата", "Тип операции"),
+    "05": ("ID поля", "Год", "Урожайность (т/га)"),
+    "06": ("ID поля", "Год"),
+}
+
+# Колонки со справочными названиями -> справочник modules.reference_lookup
+REFERENCE_COLUMNS = {
+    "Культура": "crop",
+}
+
+OPERATION_TYPE_MAP = {
+    "Посев": "sowing",
+    "Внесение удобрений": "fertilizing",
+    "Опрыскивание": "spraying",
+    "Уборка": "harvest",
+}
+
+# Статусы строк карантина
+QUARANTINE_PENDING = "pending"
+QUARANTINE_REPLAYED = "replayed"
+QUARANTINE_DISCARDED = "discarded"
+
+Progress = Optional[Callable[..., None]]
+Record = Dict[str, Any]
+
+
+class _FieldRef(NamedTuple):
+    """Поле хозяйства для сопоставления строк по ID поля"""
+    id: int
+    area_ha: Optional[float]
+
+
+def sheet_type(selected_type: str) -> str:
+    """Код типа ("02") из подписи выбора на странице ("02 - Паспорт полей")"""
+    return selected_type.split(" ", 1)[0]
+
+
+def _value(row: Dict[str, Any], column: str) -> Any:
+    """Значение ячейки: NaN -> None, скаляры numpy -> Python"""
+    value = row.get(column)
+    if value is None:
+        return None
+    try:
+        if pd.isna(value):
+            return None
+    except (TypeError, ValueError):
+        return value
+    return value.item() if hasattr(value, "item") else value
+
+
+def _text(row: Dict[str, Any], column: str) -> Optional[str]:
+    value = _value(row, column)
+    return str(value) if value is not None else None
+
+
+def canonical_names(df: pd.DataFrame) -> pd.DataFrame:
+    """Названия из справочников в колонках REFERENCE_COLUMNS (найденные точно или по синониму)"""
+    columns = {
+        column: canonicalize(df[column], catalog)
+        for column, catalog in REFERENCE_COLUMNS.items() if column in df.columns
+    }
+    return df.assign(**columns) if columns else df
+
+
+def row_hash(sheet: str, row: Dict[str, Any]) -> str:
+    """Хеш содержимого строки: не зависит от порядка колонок и типов numpy"""
+    payload = {str(column): _value(row, column) for column in row}
+    data = json.dumps([sheet, payload], sort_keys=True, default=str, ensure_ascii=False)
+    return hashlib.sha256(data.encode("utf-8")).hexdigest()
+
+
+def file_hash(path: str) -> str:
+    """SHA-256 файла"""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1024 * 1024), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def _import_key(*parts: Any) -> str:
+    return "|".join("" if part is None else str(part) for part in parts)
+
+
+def _logged(inserted: Dict[str, int], updated: Dict[str, int], farm_id: int) -> List[Tuple[int, int, str]]:
+    return ([(row_id, farm_id, "insert") for row_id in inserted.values()]
+            + [(row_id, farm_id, "update") for row_id in updated.values()])
+
+
+def _field_record(row: Dict[str, Any], source_hash: str, field: Optional[_FieldRef], farm_id: int) -> Record:
+    return {"values": {
+        "farm_id": farm_id,
+        "field_code": str(_value(row, "ID поля")),
+        "name": _text(row, "Название поля"),
+        "area_ha": float(_value(row, "Площадь (га)")),
+        "cadastral_number": _text(row, "Кадастровый номер"),
+        "center_lat": _value(row, "Центроид широта"),
+        "center_lon": _value(row, "Центроид долгота"),
+        "soil_type": _text(row, "Тип почвы"),
+        "ph_water": _value(row, "pH водн"),
+        "humus_pct": _value(row, "Гумус (%)"),
+        "p2o5_mg_kg": _value(row, "P2O5 (мг/кг)"),
+        "k2o_mg_kg": _value(row, "K2O (мг/кг)"),
+        "source_hash": source_hash,
+    }}
+
+
+def _operation_values(field: _FieldRef, farm_id: int, key: str, source_hash: str, operation_type: str,
+                      operation_date: date, area: Optional[float], crop: Optional[str] = None,
+                      notes: Optional[str] = None) -> Dict[str, Any]:
+    return {
+        "farm_id": farm_id,
+        "field_id": field.id,
+        "operation_type": operation_type,
+        "operation_date": operation_date,
+        "crop": crop,
+        "area_processed_ha": area if area is not None else field.area_ha,
+        "notes": notes,
+        "import_key": key,
+        "source_hash": source_hash,
+    }
+
+
+def _analysis_record(row: Dict[str, Any], source_hash: str, field: _FieldRef, farm_id: int) -> Record:
+    analysis_date = pd.to_datetime(_value(row, "Дата анализа")).date()
+    depth = _value(row, "Глубина отбора (см)")
+    key = _import_key(field.id, "soil_analysis", analysis_date, depth)
+    return {
+        "values": _operation_values(field, farm_id, key, source_hash, "soil_analysis", analysis_date, None),
+        "detail": {
+            "sample_depth_cm": depth,
+            "ph_water": _value(row, "pH водн"),
+            "ph_salt": _value(row, "pH сол"),
+            "humus_percent": _value(row, "Гумус (%)"),
+            "nitrogen_total_percent": _value(row, "N общий (%)"),
+            "p2o5_mg_kg": _value(row, "P2O5 (мг/кг)"),
+            "k2o_mg_kg": _value(row, "K2O (мг/кг)"),
+            "mobile_s_mg_kg": _value(row, "S подв. (мг/кг)"),
+        },
+    }
+
+
+def _operation_record(row: Dict[str, Any], source_hash: str, field: _FieldRef, farm_id: int) -> Record:
+    type_label = str(_value(row, "Тип операции"))
+    operation_date = pd.to_datetime(_value(row, "Дата")).date()
+    crop = _text(row, "Культура")
+    # В ключе - исходная подпись типа: разные работы типа "other" не сливаются
+    key = _import_key(field.id, type_label, operation_date, crop)
+    return {"values": _operation_values(
+        field, farm_id, key, source_hash, OPERATION_TYPE_MAP.get(type_label, "other"), operation_date,
+        _value(row, "Площадь (га)"), crop=crop, notes=_text(row, "Примечание"),
+    )}
+
+
+def _yield_record(row: Dict[str, Any], source_hash: str, field: _FieldRef, farm_id: int) -> Record:
+    """Урожайность: операция harvest, дата - 15 августа года"""
+    yield_t_ha = float(_value(row, "Урожайность (т/га)"))
+    area = _value(row, "Площадь (га)")
+    area = area if area is not None else field.area_ha
+    harvest_date = date(int(_value(row, "Год")), 8, 15)
+    crop = _text(row, "Культура") or "Не указано"
+    key = _import_key(field.id, "harvest", harvest_date, crop)
+    return {
+        "values": _operation_values(field, farm_id, key, source_hash, "harvest", harvest_date, area, crop=crop),
+        "detail": {
+            "crop": crop,
+            "variety": _text(row, "Сорт"),
+            "yield_t_ha": yield_t_ha,
+            "total_yield_t": yield_t_ha * area if area else None,
+            "moisture_percent": _value(row, "Влажность (%)"),
+            "protein_percent": _value(row, "Белок (%)"),
+            "gluten_percent": _value(row, "Клейковина (%)"),
+        },
+    }
+
+
+def _economics_record(row: Dict[str, Any], source_hash: str, field: _FieldRef, farm_id: int) -> Record:
+    year = int(_value(row, "Год"))
+    crop = _text(row, "Культура")
+    subsidy = _value(row, "Субсидии (тг/га)")
+    return {"values": {
+        "field_id": field.id,
+        "year": year,
+        "crop": crop,
+        "revenue_kzt_ha": _value(row, "Выручка (тг/га)"),
+        "total_costs_kzt_ha": _value(row, "Затраты (тг/га)"),
+        "profit_kzt_ha": _value(row, "Прибыль (тг/га)"),
+        "profitability_pct": _value(row, "Рентабельность (%)"),
+        "field_rental_cost": _value(row, "Аренда поля (тг/га)"),
+        "field_rental_period": _text(row, "Период аренды поля"),
+        "machinery_rental_cost": _value(row, "Аренда техники (тг)"),
+        "machinery_rental_type": _text(row, "Тип аренды техники"),
+        "rented_machinery_description": _text(row, "Описание арендованной техники"),
+        "notes": f"Субсидии: {subsidy} тг/га" if subsidy is not None else None,
+        "import_key": _import_key(field.id, year, crop),
+        "source_hash": source_hash,
+    }}
+
+
+def _write_fields(db: Session, farm_id: int, records: List[Record]) -> Dict[str, Any]:
+    # field_code уникален во всей БД: коды другого хозяйства не перезаписываются
+    codes = [record["values"]["field_code"] for record in records]
+    foreign = set(db.scalars(select(Field.field_code).where(Field.field_code.in_(codes), Field.farm_id != farm_id)))
+    values = [record["values"] for record in records if record["values"]["field_code"] not in foreign]
+    inserted, updated, unchanged = {}, {}, 0
+    if values:
+        inserted, updated, unchanged = upsert(
+            db, Field, "field_code", values, guard=lambda excluded: Field.__table__.c.farm_id == excluded.farm_id,
+        )
+    change_log.record(db, "fields", _logged(inserted, updated, farm_id))
+    return {"inserted": len(inserted), "updated": len(updated), "unchanged": unchanged, "conflicts": sorted(foreign)}
+
+
+def _write_operations(db: Session, farm_id: int, records: List[Record], detail_model=None) -> Dict[str, Any]:
+    inserted, updated, unchanged = upsert(db, Operation, "import_key", [record["values"] for record in records])
+    written = {**inserted, **updated}
+    if detail_model is not None and written:
+        # Детали изменённой операции заменяются целиком
+        details = {record["values"]["import_key"]: record["detail"] for record in records}
+        detail_table = detail_model.__table__
+        if updated:
+            db.execute(delete(detail_table).where(detail_table.c.operation_id.in_(list(updated.values()))))
+        db.execute(detail_table.insert(), [dict(details[key], operation_id=row_id) for key, row_id in written.items()])
+    change_log.record(db, "operations", _logged(inserted, updated, farm_id))
+    return {"inserted": len(inserted), "updated": len(updated), "unchanged": unchanged}
+
+
+def _write_analyses(db: Session, farm_id: int, records: List[Record]) -> Dict[str, Any]:
+    return _write_operations(db, farm_id, records, AgrochemicalAnalysis)
+
+
+def _write_yields(db: Session, farm_id: int, records: List[Record]) -> Dict[str, Any]:
+    return _write_operations(db, farm_id, records, HarvestData)
+
+
+def _write_economics(db: Session, farm_id: int, records: List[Record]) -> Dict[str, Any]:
+    inserted, updated, unchanged = upsert(db, EconomicData, "import_key", [record["values"] for record in records])
+    return {"inserted": len(inserted), "updated": len(updated), "unchanged": unchanged}
+
+
+# Тип файла -> (запись по строке, запись пакета в БД, подпись прогресса, нужно ли поле хозяйства)
+SHEETS = {
+    "02": (_field_record, _write_fields, "Поля", False),
+    "03": (_analysis_record, _write_analyses, "Анализы", True),
+    "04": (_operation_record, _write_operations, "Операции", True),
+    "05": (_yield_record, _write_yields, "Урожайность", True),
+    "06": (_economics_record, _write_economics, "Экономика", True),
+}
+
+
+def _summary(result: Dict[str, Any]) -> str:
+    parts = [f"добавлено {result['inserted']}", f"обновлено {result['updated']}",
+             f"без изменений {result['unchanged']}"]
+    if result["already_applied"]:
+        parts.append(f"уже применено ранее {result['already_applied']}")
+    if result["quarantined"]:
+        parts.append(f"в карантине {result['quarantined']}")
+    if result["skipped"]:
+        parts.append(f"пустых {result['skipped']}")
+    return "Строки: " + ", ".join(parts)
+
+
+def _farm_fields(db: Session, farm_id: int) -> Dict[str, _FieldRef]:
+    # Кортежи, а не объекты Field: коммит каждого пакета не сбрасывает их состояние
+    return {
+        code: _FieldRef(field_id, area_ha)
+        for code, field_id, area_ha in db.execute(
+            select(Field.field_code, Field.id, Field.area_ha).where(Field.farm_id == farm_id)
+        )
+    }
+
+
+def _prepare(sheet: str, row: Dict[str, Any], source_hash: str, fields: Dict[str, _FieldRef],
+             farm_id: int) -> Record:
+    """Запись для БД по строке; ValueError с причиной - строка уходит в карантин"""
+    make_record, _, _, needs_field = SHEETS[sheet]
+    empty = [column for column in REQUIRED_COLUMNS[sheet] if _value(row, column) is None]
+    if empty:
+        raise ValueError(f"Не заполнено: {', '.join(empty)}")
+    field = None
+    if needs_field:
+        field = fields.get(str(_value(row, "ID поля")))
+        if field is None:
+            raise ValueError(f"Поле {_value(row, 'ID поля')} не найдено в хозяйстве")
+    try:
+        return make_record(row, source_hash, field, farm_id)
+    except (TypeError, ValueError, OverflowError) as exc:
+        raise ValueError(f"Некорректное значение: {exc}") from exc
+
+
+def _db_error(exc: SQLAlchemyError) -> str:
+    message = str(getattr(exc, "orig", None) or exc).strip()
+    return (message.splitlines() or ["Ошибка записи"])[0][:500]
+
+
+def _write_chunk(db: Session, sheet: str, farm_id: int,
+                 items: List[Tuple[int, Dict[str, Any], Record]]) -> Tuple[Dict[str, int], List[Tuple[int, Dict, str]]]:
+    """
+    Запись пакета одним upsert; при ошибке БД - построчно, чтобы отделить ошибочные строки
+
+    Args:
+        items: [(номер строки Excel, строка, запись)]
+
+    Returns:
+        (счётчики inserted/updated/unchanged, [(номер строки, строка, причина)] для карантина)
+    """
+    write = SHEETS[sheet][1]
+    counts = {"inserted": 0, "updated": 0, "unchanged": 0}
+    failures = []
+    if not items:
+        return counts, failures
+    try:
+        with db.begin_nested():
+            written = write(db, farm_id, [record for _, _, record in items])
+        batches = [(items, written)]
+    except SQLAlchemyError:
+        batches = []
+        for item in items:
+            try:
+                with db.begin_nested():
+                    batches.append(([item], write(db, farm_id, [item[2]])))
+            except SQLAlchemyError as exc:
+                failures.append((item[0], item[1], _db_error(exc)))
+
+    for batch, written in batches:
+        for name in counts:
+            counts[name] += written[name]
+        conflicts = set(written.get("conflicts", ()))
+        failures.extend(
+            (row_number, row, f"Код поля {record['values']['field_code']} принадлежит другому хозяйству")
+            for row_number, row, record in batch if record["values"].get("field_code") in conflicts
+        )
+    return counts, failures
+
+
+def _quarantine(farm_id: int, sheet: str, row_number: int, row: Dict[str, Any], reason: str,
+                file_name: Optional[str], job_id: Optional[int]) -> ImportQuarantine:
+    data = json.dumps({str(column): _value(row, column) for column in row}, default=str, ensure_ascii=False)
+    return ImportQuarantine(farm_id=farm_id, sheet=sheet, job_id=job_id, file_name=file_name,
+                            row_number=row_number, data=data, reason=reason[:500])
+
+
+def import_sheet(db: Session, df: pd.DataFrame, sheet: str, farm_id: int, progress: Progress = None,
+                 file_sha256: str = "", file_name: Optional[str] = None, force: bool = False,
+                 job_id: Optional[int] = None) -> Dict[str, Any]:
+    """
+    Импорт листа пакетами upsert с фиксацией каждого пакета
+
+    Пакет из IMPORT_CHUNK_ROWS строк, его строки карантина и строка
+    манифеста фиксируются одной транзакцией - это контрольная точка:
+    после сбоя или отмены повторный запуск пропускает зафиксированные
+    пакеты. Строки с ошибками (пустые обязательные колонки, неизвестное
+    поле, неверные значения, отказ БД) уходят в import_quarantine
+    с причиной и не прерывают импорт.
+
+    Args:
+        db: Сессия (коммитится после каждого пакета)
+        df: Лист Excel
+        sheet: Тип файла ("02".."06")
+        farm_id: Хозяйство
+        progress: callback(доля, сообщение)
+        file_sha256: Хеш файла (для манифеста)
+        file_name: Имя загруженного файла
+        force: Разобрать и диапазоны, применённые ранее (кроме пакетов этой же задачи)
+        job_id: Задача modules.jobs
+
+    Returns:
+        {"imported", "inserted", "updated", "unchanged", "already_applied", "quarantined",
+         "skipped", "summary"}
+    """
+    label = SHEETS[sheet][2]
+    fields = _farm_fields(db, farm_id) if SHEETS[sheet][3] else {}
+    manifest = select(ImportManifest.range_hash).where(ImportManifest.farm_id == farm_id, ImportManifest.sheet == sheet)
+    if force:
+        # Повтор задачи после сбоя продолжает с места остановки и при force
+        manifest = manifest.where(ImportManifest.job_id == job_id) if job_id is not None else None
+    applied = set(db.scalars(manifest)) if manifest is not None else set()
+
+    result = {"inserted": 0, "updated": 0, "unchanged": 0, "already_applied": 0, "quarantined": 0, "skipped": 0}
+    rows = canonical_names(df).to_dict("records")
+    chunk_rows = max(1, settings.IMPORT_CHUNK_ROWS)
+    for start in range(0, len(rows), chunk_rows):
+        if progress:
+            progress(0.95 * start / len(rows), f"{label}: {start} из {len(rows)}")
+        chunk = rows[start:start + chunk_rows]
+        hashes = [row_hash(sheet, row) for row in chunk]
+        range_hash = hashlib.sha256("".join(hashes).encode("ascii")).hexdigest()
+        if range_hash in applied:
+            result["already_applied"] += len(chunk)
+            continue
+
+        items, failures, skipped = [], [], 0
+        for offset, (row, source_hash) in enumerate(zip(chunk, hashes)):
+            # Номера строк Excel: строка 1 - заголовок
+            row_number = start + offset + 2
+            if all(_value(row, column) is None for column in row):
+                skipped += 1
+                continue
+            try:
+                items.append((row_number, row, _prepare(sheet, row, source_hash, fields, farm_id)))
+            except ValueError as exc:
+                failures.append((row_number, row, str(exc)))
+
+        counts, write_failures = _write_chunk(db, sheet, farm_id, items)
+        failures.extend(write_failures)
+        db.add_all(_quarantine(farm_id, sheet, *failure, file_name, job_id) for failure in failures)
+        db.add(ImportManifest(
+            farm_id=farm_id, sheet=sheet, file_hash=file_sha256, file_name=file_name,
+            row_start=start + 2, row_end=start + len(chunk) + 1, range_hash=range_hash,
+            inserted=counts["inserted"], updated=counts["updated"], unchanged=counts["unchanged"],
+            skipped=skipped, quarantined=len(failures), job_id=job_id,
+        ))
+        db.commit()
+        applied.add(range_hash)
+
+        for name in counts:
+            result[name] += counts[name]
+        result["quarantined"] += len(failures)
+        result["skipped"] += skipped
+
+    result["imported"] = result["inserted"] + result["updated"]
+    if result["imported"]:
+        # Пакетная запись минует события ORM: ссылки на справочник - одним проходом
+        reference_sync.link_references(db)
+        db.commit()
+        invalidate_balance_cache(farm_id)
+    result["summary"] = _summary(result)
+    return result
+
+
+def quarantine_rows(db: Session, farm_id: int, sheet: Optional[str] = None, limit: int = 500) -> List[Dict[str, Any]]:
+    """
+    Строки карантина, ожидающие исправления
+
+    Args:
+        db: Сессия
+        farm_id: Хозяйство
+        sheet: Тип файла (по умолчанию - все)
+        limit: Не более строк
+
+    Returns:
+        [{"id", "sheet", "row_number", "file_name", "reason", "data", "created_at"}]
+    """
+    query = select(ImportQuarantine).where(
+        ImportQuarantine.farm_id == farm_id, ImportQuarantine.status == QUARANTINE_PENDING,
+    )
+    if sheet:
+        query = query.where(ImportQuarantine.sheet == sheet)
+    return [
+        {"id": item.id, "sheet": item.sheet, "row_number": item.row_number, "file_name": item.file_name,
+         "reason": item.reason, "data": json.loads(item.data or "{}"), "created_at": item.created_at}
+        for item in db.scalars(query.order_by(ImportQuarantine.sheet, ImportQuarantine.id).limit(limit))
+    ]
+
+
+def replay_quarantine(db: Session, rows: Dict[int, Optional[Dict[str, Any]]]) -> Dict[str, int]:
+    """
+    Повторный импорт строк карантина после исправления
+
+    Args:
+        db: Сессия
+        rows: {id строки карантина: исправленные данные строки или None - сохранённые}
+
+    Returns:
+        {"replayed", "failed"}
+    """
+    items = db.scalars(select(ImportQuarantine).where(
+        ImportQuarantine.id.in_(list(rows)), ImportQuarantine.status == QUARANTINE_PENDING,
+    )).all()
+    fields: Dict[int, Dict[str, _FieldRef]] = {}
+    replayed = failed = 0
+    for item in items:
+        row = rows.get(item.id) or json.loads(item.data or "{}")
+        row = canonical_names(pd.DataFrame([row])).to_dict("records")[0] if row else row
+        item.data = json.dumps({str(column): _value(row, column) for column in row}, default=str, ensure_ascii=False)
+        if item.farm_id not in fields:
+            fields[item.farm_id] = _farm_fields(db, item.farm_id)
+        try:
+            record = _prepare(item.sheet, row, row_hash(item.sheet, row), fields[item.farm_id], item.farm_id)
+            _, failures = _write_chunk(db, item.sheet, item.farm_id, [(item.row_number, row, record)])
+            if failures:
+                raise ValueError(failures[0][2])
+        except ValueError as exc:
+            item.reason = str(exc)[:500]
+            failed += 1
+            continue
+        item.status = QUARANTINE_REPLAYED
+        item.resolved_at = datetime.utcnow()
+        replayed += 1
+    if replayed:
+        reference_sync.link_references(db)
+    db.commit()
+    for farm_id in fields:
+        invalidate_balance_cache(farm_id)
+    return {"replayed": replayed, "failed": failed}
+
+
+def discard_quarantine(db: Session, ids: List[int]) -> int:
+    """Отказ от строк карантина (остаются в таблице со статусом discarded)"""
+    count = db.execute(
+        update(ImportQuarantine)
+        .where(ImportQuarantine.id.in_(ids), ImportQuarantine.status == QUARANTINE_PENDING)
+        .values(status=QUARANTINE_DISCARDED, resolved_at=datetime.utcnow())
+    ).rowcount
+    db.commit()
+    return count
+
+
+def run_import_job(ctx, path: str, sheet: str, farm_id: int, file_name: Optional[str] = None,
+                   force: bool = False) -> Dict[str, Any]:
+    """
+    Обработчик задачи import_excel
+
+    Args:
+        ctx: JobContext
+        path: Загруженный файл (modules.jobs.save_upload)
+        sheet: Тип файла ("02".."06")
+        farm_id: Хозяйство
+        file_name: Исходное имя файла
+        force: Применить заново и уже импортированные диапазоны строк
+
+    Returns:
+        Итог импорта
+    """
+    if sheet not in SHEETS:
+        raise ValueError(f"Import of type {sheet} is not supported")
+
+    ctx.progress(0.0, "Чтение файла...", force=True)
+    df = read_sheet(path)
+    missing_columns = [column for column in REQUIRED_COLUMNS[sheet] if column not in df.columns]
+    if missing_columns:
+        raise ValueError(f"Отсутствуют обязательные колонки: {', '.join(missing_columns)}")
+
+    return import_sheet(ctx.db, df, sheet, farm_id, progress=ctx.progress, file_sha256=file_hash(path),
+                        file_name=file_name, force=force, job_id=ctx.job_id)
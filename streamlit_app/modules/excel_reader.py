@@ -0,0 +1,260 @@
+"""
+Excel reader - Чтение книг Excel для импорта
+
+Книга открывается один раз, строки листа читаются потоково (openpyxl в
+режиме read_only, без построения объектов ячеек) или движком calamine,
+если установлен пакет python-calamine. Независимые листы большой книги
+разбираются параллельно в процессах-исполнителях.
+
+Результат совпадает с pd.read_excel (заголовок - первая строка, пустые
+строки в конце листа отбрасываются), кроме текстовых ячеек: они остаются
+текстом, тогда как pandas превращает похожий на число текст
+("+77011234567", "007") в число.
+
+Пул процессов запускается только там, где spawn безопасен: в процессе
+python -m ... (исполнитель modules.jobs, бенчмарки, pytest). Streamlit
+подставляет скрипт страницы как __main__, и дочерний процесс выполнил бы
+страницу заново, поэтому в потоке страницы листы читаются по очереди
+из одной открытой книги.
+"""
+import importlib.util
+import io
+import multiprocessing
+import os
+import sys
+import tempfile
+import zipfile
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Dict, Iterable, List, Optional, Sequence
+from xml.etree import ElementTree
+
+import pandas as pd
+
+from modules.config import settings
+
+_SHEET_TAG = "{http://schemas.openxmlformats.org/spreadsheetml/2006/main}sheet"
+
+
+def engine() -> str:
+    """Движок чтения по EXCEL_ENGINE: calamine (если установлен) или openpyxl"""
+    if settings.EXCEL_ENGINE == "openpyxl":
+        return "openpyxl"
+    if importlib.util.find_spec("python_calamine") is not None:
+        return "calamine"
+    if settings.EXCEL_ENGINE == "calamine":
+        raise ImportError("EXCEL_ENGINE=calamine requires the python-calamine package")
+    return "openpyxl"
+
+
+def _source(source: Any) -> Any:
+    """Путь или BytesIO: файл из st.file_uploader, bytes и пути принимаются одинаково"""
+    if isinstance(source, (str, os.PathLike)):
+        return os.fspath(source)
+    if isinstance(source, (bytes, bytearray, memoryview)):
+        return io.BytesIO(source)
+    if hasattr(source, "getvalue"):
+        return io.BytesIO(source.getvalue())
+    if hasattr(source, "read"):
+        source.seek(0)
+        return io.BytesIO(source.read())
+    raise TypeError(f"Unsupported Excel source: {type(source).__name__}")
+
+
+def _rewind(source: Any) -> Any:
+    if hasattr(source, "seek"):
+        source.seek(0)
+    return source
+
+
+def sheet_names(source: Any) -> List[str]:
+    """
+    Имена листов без разбора содержимого
+
+    Для xlsx читается только xl/workbook.xml; sharedStrings и листы не
+    открываются, поэтому вызов дешёвый и для книги в десятки мегабайт.
+
+    Args:
+        source: Путь, bytes или загруженный файл
+
+    Returns:
+        Имена листов в порядке книги
+    """
+    source = _source(source)
+    try:
+        with zipfile.ZipFile(_rewind(source)) as archive:
+            root = ElementTree.fromstring(archive.read("xl/workbook.xml"))
+        return [sheet.get("name") for sheet in root.iter(_SHEET_TAG)]
+    except (zipfile.BadZipFile, KeyError):
+        # .xls и нестандартные файлы - через pandas
+        return pd.ExcelFile(_rewind(source)).sheet_names
+
+
+def _columns(header: Sequence[Any]) -> List[str]:
+    """Заголовки как у pd.read_excel: пустые - "Unnamed: i", повторы - "имя.1" """
+    columns, seen = [], {}
+    for i, name in enumerate(header):
+        name = f"Unnamed: {i}" if name is None else name
+        if isinstance(name, float) and name.is_integer():
+            name = int(name)
+        count = seen.get(name, 0)
+        seen[name] = count + 1
+        columns.append(f"{name}.{count}" if count else name)
+    return columns
+
+
+def _frame(rows: Iterable[Sequence[Any]], nrows: Optional[int]) -> pd.DataFrame:
+    """DataFrame из потока строк: первая непустая - заголовок"""
+    rows = iter(rows)
+    header = None
+    for row in rows:
+        if any(value is not None for value in row):
+            header = list(row)
+            break
+    if header is None:
+        return pd.DataFrame()
+
+    data = []
+    width = len(header)
+    for row in rows:
+        if nrows is not None and len(data) >= nrows:
+            break
+        width = max(width, len(row))
+        data.append(row)
+    # Пустые строки посреди данных сохраняются (номера строк для сообщений), хвостовые - нет
+    while data and all(value is None for value in data[-1]):
+        data.pop()
+
+    header = header + [None] * (width - len(header))
+    data = [tuple(row) + (None,) * (width - len(row)) for row in data]
+    # Колонки без заголовка и без значений (форматирование за таблицей) отбрасываются
+    while width and header[width - 1] is None and all(row[width - 1] is None for row in data):
+        width -= 1
+    header = header[:width]
+    data = [row[:width] for row in data]
+    return pd.DataFrame.from_records(data, columns=_columns(header))
+
+
+def _read_openpyxl(workbook, sheet: str, nrows: Optional[int]) -> pd.DataFrame:
+    worksheet = workbook[sheet]
+    # Размер из <dimension> часто неверен у файлов не из Excel
+    worksheet.reset_dimensions()
+    return _frame(worksheet.iter_rows(values_only=True), nrows)
+
+
+def _typed(df: pd.DataFrame, dtype_backend: Optional[str]) -> pd.DataFrame:
+    return df.convert_dtypes(dtype_backend=dtype_backend) if dtype_backend else df
+
+
+def _read_sheets(source: Any, sheets: Sequence[str], nrows: Optional[int],
+                 dtype_backend: Optional[str], engine_name: str) -> Dict[str, pd.DataFrame]:
+    """Листы из одной открытой книги (последовательно)"""
+    source = _source(source)
+    if engine_name == "calamine":
+        frames = pd.read_excel(_rewind(source), sheet_name=list(sheets), nrows=nrows, engine="calamine")
+        return {sheet: _typed(frames[sheet], dtype_backend) for sheet in sheets}
+
+    from openpyxl import load_workbook
+
+    workbook = load_workbook(_rewind(source), read_only=True, data_only=True)
+    try:
+        return {sheet: _typed(_read_openpyxl(workbook, sheet, nrows), dtype_backend) for sheet in sheets}
+    finally:
+        workbook.close()
+
+
+def _read_sheet_task(path: str, sheet: str, nrows: Optional[int], dtype_backend: Optional[str],
+                     engine_name: str) -> pd.DataFrame:
+    """Задача процесса-исполнителя: один лист"""
+    return _read_sheets(path, [sheet], nrows, dtype_backend, engine_name)[sheet]
+
+
+def parallel_safe() -> bool:
+    """Можно ли запускать процессы spawn: __main__ импортируется как модуль, а не выполняется как скрипт"""
+    main = sys.modules.get("__main__")
+    return getattr(main, "__spec__", None) is not None or not getattr(main, "__file__", None)
+
+
+def _size(source: Any) -> int:
+    if isinstance(source, str):
+        return os.path.getsize(source)
+    return len(source.getbuffer())
+
+
+def _workers(requested: Optional[int], sheets: int) -> int:
+    workers = settings.EXCEL_PARSE_WORKERS if requested is None else requested
+    if workers <= 0:
+        workers = os.cpu_count() or 1
+    return max(1, min(workers, sheets))
+
+
+def read_workbook(source: Any, sheets: Optional[Sequence[str]] = None, nrows: Optional[int] = None,
+                  dtype_backend: Optional[str] = None, workers: Optional[int] = None,
+                  parallel_min_bytes: Optional[int] = None) -> Dict[str, pd.DataFrame]:
+    """
+    Чтение листов книги Excel
+
+    Args:
+        source: Путь, bytes или файл из st.file_uploader
+        sheets: Листы (по умолчанию - все); отсутствующие в книге - KeyError
+        nrows: Не более строк данных на лист (превью)
+        dtype_backend: None - типы numpy, "numpy_nullable" или "pyarrow" - типизированные колонки
+        workers: Процессов разбора (по умолчанию EXCEL_PARSE_WORKERS)
+        parallel_min_bytes: Минимальный размер файла для пула (по умолчанию EXCEL_PARALLEL_MIN_MB)
+
+    Returns:
+        {лист: DataFrame} в порядке sheets
+    """
+    source = _source(source)
+    names = sheet_names(source)
+    sheets = list(names if sheets is None else sheets)
+    unknown = [sheet for sheet in sheets if sheet not in names]
+    if unknown:
+        raise KeyError(f"Worksheet(s) not found: {', '.join(unknown)}")
+
+    engine_name = engine()
+    if parallel_min_bytes is None:
+        parallel_min_bytes = int(settings.EXCEL_PARALLEL_MIN_MB * 1024 * 1024)
+    workers = _workers(workers, len(sheets))
+    if workers < 2 or _size(source) < parallel_min_bytes or not parallel_safe():
+        return _read_sheets(source, sheets, nrows, dtype_backend, engine_name)
+
+    spill = None
+    if not isinstance(source, str):
+        # Исполнителям передаётся путь, а не содержимое файла
+        spill = tempfile.NamedTemporaryFile(suffix=".xlsx", delete=False)
+        spill.write(source.getbuffer())
+        spill.close()
+    path = spill.name if spill else source
+    try:
+        with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn")) as pool:
+            futures = {
+                sheet: pool.submit(_read_sheet_task, path, sheet, nrows, dtype_backend, engine_name)
+                for sheet in sheets
+            }
+            return {sheet: future.result() for sheet, future in futures.items()}
+    finally:
+        if spill:
+            os.unlink(spill.name)
+
+
+def read_sheet(source: Any, sheet: Optional[str] = None, nrows: Optional[int] = None,
+               dtype_backend: Optional[str] = None) -> pd.DataFrame:
+    """
+    Один лист (по умолчанию - первый, как pd.read_excel)
+
+    Args:
+        source: Путь, bytes или файл из st.file_uploader
+        sheet: Имя листа
+        nrows: Не более строк данных
+        dtype_backend: См. read_workbook
+
+    Returns:
+        DataFrame листа
+    """
+    source = _source(source)
+    if sheet is None:
+        names = sheet_names(source)
+        if not names:
+            raise ValueError("Workbook has no worksheets")
+        sheet = names[0]
+    return read_workbook(source, [sheet], nrows=nrows, dtype_backend=dtype_backend, workers=1)[sheet]
@@ -0,0 +1,61 @@
+"""
+Exports - Фоновые выгрузки
+
+Полный экспорт журнала с деталями (профиль export_full) для больших
+хозяйств строится дольше одного перезапуска скрипта, поэтому выполняется
+задачей modules.jobs (вид export_journal) и отдаётся файлом-результатом.
+"""
+from datetime import date, datetime
+from typing import Any, Dict, Optional, Union
+
+import pandas as pd
+
+from modules.database import Field, Operation
+from modules.loading import export_operations_frame, operations_query
+
+
+def journal_filters(farm_id: int, operation_type: Optional[str] = None, field_id: Optional[int] = None,
+                    date_from: Union[date, str, None] = None, date_to: Union[date, str, None] = None) -> list:
+    """
+    Фильтры журнала операций
+
+    Args:
+        farm_id: Хозяйство
+        operation_type: Тип операции
+        field_id: Поле
+        date_from: Начало периода (date или ISO-строка из параметров задачи)
+        date_to: Конец периода
+
+    Returns:
+        Условия для query.filter(*filters)
+    """
+    filters = [Field.farm_id == farm_id]
+    if operation_type:
+        filters.append(Operation.operation_type == operation_type)
+    if field_id:
+        filters.append(Operation.field_id == field_id)
+    if date_from:
+        filters.append(Operation.operation_date >= date.fromisoformat(str(date_from)[:10]))
+    if date_to:
+        filters.append(Operation.operation_date <= date.fromisoformat(str(date_to)[:10]))
+    return filters
+
+
+def run_journal_export_job(ctx, farm_id: int, operation_type: Optional[str] = None, field_id: Optional[int] = None,
+                           date_from: Optional[str] = None, date_to: Optional[str] = None) -> Dict[str, Any]:
+    """Обработчик задачи export_journal: Excel с операциями и деталями"""
+    ctx.progress(0.0, "Загрузка операций...", force=True)
+    operations = (
+        operations_query(ctx.db, "export_full")
+        .join(Operation.field)
+        .filter(*journal_filters(farm_id, operation_type, field_id, date_from, date_to))
+        .order_by(Operation.operation_date.desc())
+        .all()
+    )
+
+    ctx.progress(0.5, f"Формирование файла: {len(operations)} операций", force=True)
+    path = ctx.artifact(f"journal_full_{datetime.now():%Y%m%d_%H%M%S}.xlsx")
+    with pd.ExcelWriter(path, engine="openpyxl") as writer:
+        export_operations_frame(operations).to_excel(writer, index=False, sheet_name="Операции")
+
+    return {"rows": len(operations), "summary": f"Выгружено операций: {len(operations)}"}
@@ -0,0 +1,324 @@
+"""
+Farm cache - Общий для всех сессий кеш справочных данных хозяйства
+
+Списки полей, активной техники и агрегатов и запись хозяйства читаются
+на каждой странице при каждом действии пользователя. Кеш хранит их
+один раз на хозяйство для всех сессий Streamlit процесса.
+
+Свежесть обеспечивают версии: каждая запись кеша помнит версию
+(сущность, хозяйство), с которой была загружена. События сессии
+SQLAlchemy увеличивают версию при коммите изменений Field, Machinery,
+Implements и Farm, поэтому устаревшие данные не отдаются. Для записей
+из других процессов действует страховочный TTL (FARM_CACHE_TTL_SEC).
+
+Значения - неизменяемые снимки (ReadModel) с колонками модели:
+для изменения загрузите объект ORM в своей сессии (db.get(Field, id)).
+"""
+import threading
+import time
+from typing import Any, Callable, Dict, Hashable, List, Optional, Tuple
+
+from sqlalchemy import event, inspect as sa_inspect
+from sqlalchemy.orm import Session
+
+from modules.config import settings
+from modules.database import SessionLocal, Farm, Field, Machinery, Implements
+
+# Область "все хозяйства" (администратор)
+ALL_FARMS = "*"
+
+# Отслеживаемые модели: имя сущности -> функция получения farm_id объекта
+_TRACKED: Dict[type, Tuple[str, Callable[[Any], Optional[int]]]] = {
+    Farm: ("farm", lambda obj: obj.id),
+    Field: ("field", lambda obj: obj.farm_id),
+    Machinery: ("machinery", lambda obj: obj.farm_id),
+    Implements: ("implements", lambda obj: obj.farm_id),
+}
+
+
+class ReadModel:
+    """Неизменяемый снимок строки модели (только колонки)"""
+
+    __slots__ = ("_model", "_data")
+
+    def __init__(self, model: str, data: Dict[str, Any]):
+        object.__setattr__(self, "_model", model)
+        object.__setattr__(self, "_data", data)
+
+    @classmethod
+    def from_orm(cls, obj) -> "ReadModel":
+        mapper = sa_inspect(obj).mapper
+        return cls(mapper.class_.__name__, {attr.key: getattr(obj, attr.key) for attr in mapper.column_attrs})
+
+    def __getattr__(self, name: str):
+        # Служебные имена (копирование, pickle) не ищем в данных
+        if name.startswith("__") or name in ReadModel.__slots__:
+            raise AttributeError(name)
+        try:
+            return self._data[name]
+        except KeyError:
+            raise AttributeError(f"{self._model} snapshot has no attribute '{name}'") from None
+
+    def __setattr__(self, name: str, value):
+        raise AttributeError(
+            f"{self._model} snapshot is read-only; load the ORM object in your session to modify it"
+        )
+
+    def __eq__(self, other):
+        return isinstance(other, ReadModel) and (self._model, self._data.get("id")) == (other._model, other._data.get("id"))
+
+    def __hash__(self):
+        return hash((self._model, self._data.get("id")))
+
+    def __copy__(self):
+        return self
+
+    def __deepcopy__(self, memo):
+        return self
+
+    def __reduce__(self):
+        return (ReadModel, (self._model, self._data))
+
+    def __repr__(self):
+        return f"<{self._model} snapshot id={self._data.get('id')}>"
+
+    def to_dict(self) -> Dict[str, Any]:
+        return dict(self._data)
+
+
+class FarmReadCache:
+    """
+    Кеш снимков с версиями по (сущность, хозяйство)
+
+    Версия области ALL_FARMS увеличивается при любом изменении сущности,
+    поэтому кеш администратора (все хозяйства) тоже остаётся свежим.
+    """
+
+    def __init__(self, ttl: float = 300):
+        self.ttl = ttl
+        self._versions: Dict[Tuple[str, Hashable], int] = {}
+        self._entries: Dict[Tuple, Tuple[Tuple[int, ...], float, Any]] = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def _stamp(self, entities: Tuple[str, ...], scope: Hashable) -> Tuple[int, ...]:
+        return tuple(self._versions.get((entity, scope), 0) for entity in entities)
+
+    def bump(self, entity: str, farm_id: Optional[Hashable]) -> None:
+        """Новая версия сущности хозяйства (и области всех хозяйств)"""
+        with self._lock:
+            scopes = {ALL_FARMS} if farm_id is None else {farm_id, ALL_FARMS}
+            if farm_id is None:
+                # Хозяйство неизвестно (массовое изменение) - устаревают все области
+                scopes.update(scope for (name, scope) in self._versions if name == entity)
+                scopes.update(key[2] for key in self._entries if entity in key[0])
+            for scope in scopes:
+                self._versions[(entity, scope)] = self._versions.get((entity, scope), 0) + 1
+
+    def get_or_load(self, name: Tuple[str, ...], scope: Hashable, loader: Callable[[], Any], *args) -> Any:
+        """
+        Значение из кеша или загрузка
+
+        Args:
+            name: Сущности, от которых зависит значение
+            scope: farm_id или ALL_FARMS
+            loader: Функция загрузки (вызывается без блокировки)
+            args: Дополнительные части ключа
+
+        Returns:
+            Закешированное значение
+        """
+        key = (name, args, scope)
+        with self._lock:
+            stamp = self._stamp(name, scope)
+            entry = self._entries.get(key)
+            if entry and entry[0] == stamp and time.monotonic() - entry[1] < self.ttl:
+                self.hits += 1
+                return entry[2]
+            self.misses += 1
+
+        value = loader()
+
+        with self._lock:
+            # Версия, прочитанная до загрузки: если запись успела измениться,
+            # следующий запрос увидит новую версию и перезагрузит значение
+            self._entries[key] = (stamp, time.monotonic(), value)
+        return value
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / total if total else 0.0,
+            }
+
+
+farm_cache = FarmReadCache(ttl=settings.FARM_CACHE_TTL_SEC)
+
+
+# ============================================================================
+# ИНВАЛИДАЦИЯ ПО КОММИТУ
+# ============================================================================
+
+def _pending(session: Session) -> set:
+    return session.info.setdefault("farm_cache_pending", set())
+
+
+def _collect_changes(session: Session, flush_context) -> None:
+    """Сбор изменённых (сущность, хозяйство) до коммита"""
+    pending = _pending(session)
+    for obj in list(session.new) + list(session.dirty) + list(session.deleted):
+        tracked = _TRACKED.get(type(obj))
+        if tracked is None:
+            continue
+        entity, farm_of = tracked
+        pending.add((entity, farm_of(obj)))
+
+        # Перенос в другое хозяйство - устаревает и старое
+        if entity != "farm":
+            history = sa_inspect(obj).attrs.farm_id.history
+            for old_farm in history.deleted or ():
+                pending.add((entity, old_farm))
+
+
+def _collect_bulk_changes(orm_execute_state) -> None:
+    """Массовые UPDATE/DELETE через query.update()/delete()"""
+    if not (orm_execute_state.is_update or orm_execute_state.is_delete):
+        return
+    mapper = orm_execute_state.bind_mapper
+    tracked = _TRACKED.get(mapper.class_) if mapper is not None else None
+    if tracked is not None:
+        _pending(orm_execute_state.session).add((tracked[0], None))
+
+
+def _apply_changes(session: Session) -> None:
+    pending = session.info.pop("farm_cache_pending", None)
+    for entity, farm_id in pending or ():
+        farm_cache.bump(entity, farm_id)
+
+
+def _discard_changes(session: Session) -> None:
+    session.info.pop("farm_cache_pending", None)
+
+
+_LISTENERS = (
+    ("after_flush", _collect_changes),
+    ("do_orm_execute", _collect_bulk_changes),
+    ("after_commit", _apply_changes),
+    ("after_rollback", _discard_changes),
+)
+
+
+def install(target=SessionLocal) -> None:
+    """Подключение инвалидации к фабрике сессий (повторный вызов ничего не делает)"""
+    for name, listener in _LISTENERS:
+        if not event.contains(target, name, listener):
+            event.listen(target, name, listener)
+
+
+install()
+
+
+# ============================================================================
+# ЧИТАЮЩИЕ МОДЕЛИ
+# ============================================================================
+
+# Фабрика сессий чтения снимков
+_session_factory = SessionLocal
+
+
+def _load(query_builder: Callable[[Session], Any]) -> List[ReadModel]:
+    """Загрузка снимков в отдельной короткой сессии"""
+    session = _session_factory()
+    try:
+        return [ReadModel.from_orm(obj) for obj in query_builder(session)]
+    finally:
+        session.close()
+
+
+def _scoped(query, model, scope):
+    return query if scope == ALL_FARMS else query.filter(model.farm_id == scope)
+
+
+def user_scope() -> Optional[Hashable]:
+    """
+    Область данных текущего пользователя (как в filter_query_by_farm)
+
+    Returns:
+        ALL_FARMS для администратора, farm_id для привязанного пользователя,
+        None - нет доступа ни к одному хозяйству
+    """
+    from modules.auth import get_current_user
+
+    user = get_current_user()
+    if not user:
+        return None
+    if user.get("role") == "admin":
+        return ALL_FARMS
+    return user.get("farm_id") or None
+
+
+def get_fields(scope: Optional[Hashable] = ALL_FARMS) -> List[ReadModel]:
+    """Поля хозяйства (или всех хозяйств); список - копия, снимки общие"""
+    if scope is None:
+        return []
+    return list(farm_cache.get_or_load(("field",), scope, lambda: _load(
+        lambda s: _scoped(s.query(Field), Field, scope).order_by(Field.id).all()
+    )))
+
+
+def get_machinery(scope: Optional[Hashable] = ALL_FARMS, active_only: bool = True) -> List[ReadModel]:
+    """Техника хозяйства (по умолчанию только активная)"""
+    if scope is None:
+        return []
+
+    def query(s):
+        q = _scoped(s.query(Machinery), Machinery, scope)
+        if active_only:
+            q = q.filter(Machinery.status == 'active')
+        return q.order_by(Machinery.id).all()
+
+    return list(farm_cache.get_or_load(("machinery",), scope, lambda: _load(query), active_only))
+
+
+def get_implements(scope: Optional[Hashable] = ALL_FARMS, active_only: bool = True) -> List[ReadModel]:
+    """Агрегаты хозяйства (по умолчанию только активные)"""
+    if scope is None:
+        return []
+
+    def query(s):
+        q = _scoped(s.query(Implements), Implements, scope)
+        if active_only:
+            q = q.filter(Implements.status == 'active')
+        return q.order_by(Implements.id).all()
+
+    return list(farm_cache.get_or_load(("implements",), scope, lambda: _load(query), active_only))
+
+
+def get_farm(scope: Optional[Hashable]) -> Optional[ReadModel]:
+    """
+    Запись хозяйства
+
+    Для ALL_FARMS (администратор) - первое хозяйство, как и раньше
+    на страницах (db.query(Farm).first()).
+    """
+    if scope is None:
+        return None
+
+    def query(s):
+        if scope == ALL_FARMS:
+            farm = s.query(Farm).order_by(Farm.id).first()
+        else:
+            farm = s.query(Farm).filter(Farm.id == scope).first()
+        return [farm] if farm else []
+
+    farms = farm_cache.get_or_load(("farm",), scope, lambda: _load(query))
+    return farms[0] if farms else None
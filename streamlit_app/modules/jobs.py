@@ -0,0 +1,689 @@
+"""
+Jobs - Фоновые задачи: импорт, экспорт, пересчёты
+
+Долгие импорты и выгрузки выполнялись внутри перезапуска скрипта под
+st.spinner: обновление страницы обрывало их на середине, а поток скрипта
+был занят до конца. Теперь страница только ставит задачу и опрашивает статус.
+
+Задачи хранятся в таблице jobs - она же очередь, внешний брокер не нужен.
+Выполняют их процессы-исполнители (python -m modules.jobs): процесс
+Streamlit держит пул из JOBS_WORKERS таких процессов, каждый забирает
+задачу атомарным UPDATE ... WHERE status='queued'. Несколько импортов
+идут на разных ядрах, а задача переживает перезапуски скрипта и закрытие
+вкладки. Исполнитель можно запустить и вручную, в том числе на другой машине.
+
+Обработчик - функция handler(ctx, **params) -> dict, зарегистрированная
+в HANDLERS как "модуль:функция":
+    ctx.db          - сессия для работы обработчика
+    ctx.progress()  - прогресс и сообщение; при отмене прерывает задачу
+    ctx.artifact()  - путь для файла результата
+
+Ошибка обработчика повторяется до max_attempts раз с задержкой
+JOBS_RETRY_DELAY_SEC * 2^n. Задача, у которой heartbeat не обновлялся
+дольше JOBS_STALE_SEC (исполнитель остановлен), возвращается в очередь.
+
+JOBS_WORKERS=0 - выполнение сразу в потоке страницы (отладка).
+"""
+import argparse
+import atexit
+import importlib
+import json
+import logging
+import os
+import shutil
+import socket
+import subprocess
+import sys
+import threading
+import time
+import traceback
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterable, List, Optional
+
+from sqlalchemy import delete, or_, select, update
+from sqlalchemy.exc import OperationalError
+
+from modules.config import settings
+from modules.database import Job, SessionLocal
+
+logger = logging.getLogger(__name__)
+
+# Каталог streamlit_app (PYTHONPATH процессов-исполнителей)
+APP_DIR = Path(__file__).resolve().parents[1]
+
+# Статусы задачи
+QUEUED = "queued"
+RUNNING = "running"
+SUCCEEDED = "succeeded"
+FAILED = "failed"
+CANCELLED = "cancelled"
+
+ACTIVE = (QUEUED, RUNNING)
+FINISHED = (SUCCEEDED, FAILED, CANCELLED)
+
+# Обработчики: вид задачи -> "модуль:функция"
+HANDLERS = {
+    "import_excel": "modules.excel_import:run_import_job",
+    "export_journal": "modules.exports:run_journal_export_job",
+}
+
+# Сущности кеша хозяйства (modules.farm_cache), которые меняет задача
+INVALIDATES = {
+    "import_excel": ("farm", "field"),
+}
+
+KIND_LABELS = {
+    "import_excel": "Импорт Excel",
+    "export_journal": "Экспорт журнала",
+}
+
+STATUS_LABELS = {
+    QUEUED: "⏳ В очереди",
+    RUNNING: "⚙️ Выполняется",
+    SUCCEEDED: "✅ Готово",
+    FAILED: "❌ Ошибка",
+    CANCELLED: "⏹️ Отменена",
+}
+
+
+class JobCancelled(Exception):
+    """Задача отменена пользователем"""
+    pass
+
+
+def _handler(kind: str) -> Callable:
+    path = HANDLERS.get(kind)
+    if path is None:
+        raise ValueError(f"Unknown job kind: {kind}")
+    module, func = path.split(":")
+    return getattr(importlib.import_module(module), func)
+
+
+def job_dir(job_id: int) -> Path:
+    """Каталог файлов задачи"""
+    return Path(settings.JOBS_DIR) / str(job_id)
+
+
+def uploads_dir() -> Path:
+    """Каталог загруженных файлов, которые ждут обработки"""
+    path = Path(settings.JOBS_DIR) / "uploads"
+    path.mkdir(parents=True, exist_ok=True)
+    return path
+
+
+def _snapshot(job: Job) -> Dict[str, Any]:
+    data = {column.key: getattr(job, column.key) for column in Job.__table__.columns}
+    data["params"] = json.loads(job.params) if job.params else {}
+    data["result"] = json.loads(job.result) if job.result else None
+    return data
+
+
+class JobContext:
+    """
+    Окружение обработчика
+
+    Args:
+        job_id: ID задачи
+        session_factory: Фабрика сессий БД задачи
+        params: Аргументы задачи
+    """
+
+    def __init__(self, job_id: int, session_factory: Callable, params: Dict[str, Any]):
+        self.job_id = job_id
+        self.params = params
+        self._factory = session_factory
+        self._last_write = 0.0
+        self.artifact_path: Optional[Path] = None
+        self.db = session_factory()
+
+    def progress(self, fraction: float, message: Optional[str] = None, force: bool = False) -> None:
+        """
+        Сохранение прогресса и проверка отмены
+
+        Записывает не чаще раза в JOBS_PROGRESS_INTERVAL_SEC (force - сразу).
+
+        Args:
+            fraction: Доля выполненного, 0..1
+            message: Текущий шаг
+            force: Записать независимо от интервала
+
+        Raises:
+            JobCancelled: пользователь отменил задачу
+        """
+        now = time.monotonic()
+        if not force and now - self._last_write < settings.JOBS_PROGRESS_INTERVAL_SEC:
+            return
+        self._last_write = now
+
+        values: Dict[str, Any] = {"progress": max(0.0, min(1.0, fraction)), "heartbeat_at": datetime.utcnow()}
+        if message is not None:
+            values["message"] = message[:500]
+        with self._factory() as s:
+            cancel = s.execute(select(Job.cancel_requested).where(Job.id == self.job_id)).scalar()
+            try:
+                s.execute(update(Job).where(Job.id == self.job_id).values(**values))
+                s.commit()
+            except OperationalError as exc:
+                # SQLite: запись занята транзакцией обработчика - прогресс не критичен
+                s.rollback()
+                logger.debug("Job %s progress not saved: %s", self.job_id, exc)
+        if cancel:
+            raise JobCancelled()
+
+    def artifact(self, filename: str) -> Path:
+        """Путь для файла результата (показывается на странице для скачивания)"""
+        directory = job_dir(self.job_id)
+        directory.mkdir(parents=True, exist_ok=True)
+        self.artifact_path = directory / filename
+        return self.artifact_path
+
+    def close(self) -> None:
+        self.db.close()
+
+
+# ============================================================================
+# ВЫПОЛНЕНИЕ
+# ============================================================================
+
+def _finish(session_factory: Callable, job_id: int, status: str, values: Dict[str, Any]) -> str:
+    """Итог выполнения; ошибка при оставшихся попытках возвращает задачу в очередь"""
+    now = datetime.utcnow()
+    with session_factory() as s:
+        job = s.get(Job, job_id)
+        if job is None:
+            return status
+        if status == FAILED and (job.attempts or 0) < (job.max_attempts or 1) and not job.cancel_requested:
+            delay = settings.JOBS_RETRY_DELAY_SEC * 2 ** max(0, (job.attempts or 1) - 1)
+            status = QUEUED
+            values = dict(values, run_after=now + timedelta(seconds=delay), worker=None,
+                          message=f"Повтор через {delay:.0f} с: {values.get('message', '')}"[:500])
+        else:
+            values = dict(values, finished_at=now)
+        for key, value in dict(values, status=status, heartbeat_at=now).items():
+            setattr(job, key, value)
+        s.commit()
+    return status
+
+
+def run_job(job_id: int, session_factory: Callable = SessionLocal) -> str:
+    """
+    Выполнение забранной задачи (в процессе-исполнителе или inline)
+
+    Args:
+        job_id: ID задачи в статусе running
+        session_factory: Фабрика сессий БД
+
+    Returns:
+        Итоговый статус (queued - будет повтор)
+    """
+    with session_factory() as s:
+        job = s.get(Job, job_id)
+        if job is None:
+            return FAILED
+        kind = job.kind
+        params = json.loads(job.params) if job.params else {}
+
+    ctx = JobContext(job_id, session_factory, params)
+    try:
+        result = _handler(kind)(ctx, **params) or {}
+        status = SUCCEEDED
+        values = {
+            "progress": 1.0,
+            "result": json.dumps(result, ensure_ascii=False, default=str),
+            "message": str(result.get("summary", ""))[:500] or None,
+            "error": None,
+        }
+    except JobCancelled:
+        ctx.db.rollback()
+        status, values = CANCELLED, {"message": "Отменена пользователем"}
+    except Exception as exc:
+        ctx.db.rollback()
+        logger.exception("Job %s (%s) failed", job_id, kind)
+        status = FAILED
+        values = {"message": f"{type(exc).__name__}: {exc}"[:500], "error": traceback.format_exc()[-4000:]}
+    finally:
+        ctx.close()
+
+    if ctx.artifact_path is not None and status == SUCCEEDED:
+        values["artifact_path"] = str(ctx.artifact_path)
+    return _finish(session_factory, job_id, status, values)
+
+
+def _claim(session_factory: Callable, worker: str, limit: int, job_id: Optional[int] = None) -> List[int]:
+    """Атомарный перевод задач из очереди в running; другой исполнитель их уже не заберёт"""
+    now = datetime.utcnow()
+    claimed = []
+    with session_factory() as s:
+        query = select(Job.id).where(Job.status == QUEUED, or_(Job.run_after.is_(None), Job.run_after <= now))
+        if job_id is not None:
+            query = query.where(Job.id == job_id)
+        candidates = s.execute(query.order_by(Job.id).limit(limit)).scalars().all()
+        for candidate in candidates:
+            taken = s.execute(
+                update(Job)
+                .where(Job.id == candidate, Job.status == QUEUED)
+                .values(status=RUNNING, worker=worker, attempts=Job.attempts + 1,
+                        started_at=now, heartbeat_at=now, progress=0.0, run_after=None)
+            ).rowcount
+            s.commit()
+            if taken:
+                claimed.append(candidate)
+    return claimed
+
+
+def recover_stale(session_factory: Callable = SessionLocal, stale_after: float = settings.JOBS_STALE_SEC) -> int:
+    """
+    Задачи running без heartbeat дольше stale_after (исполнитель остановлен)
+
+    Возвращаются в очередь, если остались попытки, иначе завершаются ошибкой.
+
+    Returns:
+        Число обработанных задач
+    """
+    now = datetime.utcnow()
+    threshold = now - timedelta(seconds=stale_after)
+    with session_factory() as s:
+        stale = s.execute(select(Job).where(Job.status == RUNNING, Job.heartbeat_at < threshold)).scalars().all()
+        for job in stale:
+            if job.cancel_requested:
+                job.status, job.finished_at = CANCELLED, now
+            elif (job.attempts or 0) < (job.max_attempts or 1):
+                job.status, job.worker = QUEUED, None
+                job.message = "Исполнитель остановлен, задача возвращена в очередь"
+            else:
+                job.status, job.finished_at = FAILED, now
+                job.message = "Исполнитель остановлен"
+        s.commit()
+        return len(stale)
+
+
+class _Heartbeat:
+    """Поток, обновляющий heartbeat_at выполняемой задачи"""
+
+    def __init__(self, session_factory: Callable, job_id: int, interval: float):
+        self._factory = session_factory
+        self._job_id = job_id
+        self._interval = interval
+        self._stopped = threading.Event()
+        self._thread = threading.Thread(target=self._run, name=f"job-{job_id}-heartbeat", daemon=True)
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stopped.set()
+        self._thread.join()
+
+    def _run(self) -> None:
+        while not self._stopped.wait(self._interval):
+            with self._factory() as s:
+                try:
+                    s.execute(update(Job).where(Job.id == self._job_id, Job.status == RUNNING)
+                              .values(heartbeat_at=datetime.utcnow()))
+                    s.commit()
+                except OperationalError as exc:
+                    s.rollback()
+                    logger.debug("Job %s heartbeat not saved: %s", self._job_id, exc)
+
+
+def work(session_factory: Callable, poll_interval: float = settings.JOBS_POLL_SEC, once: bool = False,
+         parent_pid: Optional[int] = None) -> int:
+    """
+    Цикл процесса-исполнителя: забрать задачу, выполнить, повторить
+
+    Args:
+        session_factory: Фабрика сессий БД
+        poll_interval: Пауза при пустой очереди, с
+        once: Выйти, когда очередь пуста
+        parent_pid: Завершиться, когда процесс Streamlit, запустивший исполнителя, остановлен
+
+    Returns:
+        Число выполненных задач
+    """
+    name = f"{socket.gethostname()}:{os.getpid()}"
+    heartbeat_every = max(1.0, min(settings.JOBS_STALE_SEC / 4, 30.0))
+    done = 0
+    while True:
+        try:
+            recover_stale(session_factory)
+            claimed = _claim(session_factory, name, 1)
+        except OperationalError as exc:
+            logger.warning("Jobs queue unavailable: %s", exc)
+            claimed = []
+        if claimed:
+            with _Heartbeat(session_factory, claimed[0], heartbeat_every):
+                run_job(claimed[0], session_factory)
+            done += 1
+            continue
+        if once or (parent_pid is not None and os.getppid() != parent_pid):
+            return done
+        time.sleep(poll_interval)
+
+
+# ============================================================================
+# ПУЛ ИСПОЛНИТЕЛЕЙ
+# ============================================================================
+
+class JobRunner:
+    """
+    Пул процессов-исполнителей (python -m modules.jobs) процесса Streamlit
+
+    Исполнители - отдельные интерпретаторы, а не multiprocessing: Streamlit
+    подменяет __main__ скриптом страницы, и spawn выполнил бы его заново
+    в каждом дочернем процессе. Исполнители сами забирают задачи из таблицы
+    jobs; упавший исполнитель перезапускается при следующем notify().
+
+    Args:
+        database_url: URL БД для исполнителей
+        workers: Число процессов
+        poll_interval: Опрос очереди исполнителем, с
+    """
+
+    def __init__(self, database_url: str = settings.DATABASE_URL, workers: int = settings.JOBS_WORKERS,
+                 poll_interval: float = settings.JOBS_POLL_SEC):
+        self.database_url = database_url
+        self.workers = max(1, workers)
+        self.poll_interval = max(0.1, poll_interval)
+        self._processes: List[subprocess.Popen] = []
+        self._lock = threading.Lock()
+
+    def notify(self) -> int:
+        """
+        Запуск недостающих исполнителей
+
+        Returns:
+            Число работающих процессов
+        """
+        with self._lock:
+            self._processes = [p for p in self._processes if p.poll() is None]
+            while len(self._processes) < self.workers:
+                self._processes.append(self._spawn())
+            return len(self._processes)
+
+    def stop(self, timeout: float = 5.0) -> None:
+        """Остановка исполнителей; прерванная задача вернётся в очередь по heartbeat"""
+        with self._lock:
+            for process in self._processes:
+                if process.poll() is None:
+                    process.terminate()
+            for process in self._processes:
+                try:
+                    process.wait(timeout)
+                except subprocess.TimeoutExpired:
+                    process.kill()
+            self._processes = []
+
+    def _spawn(self) -> subprocess.Popen:
+        env = dict(os.environ)
+        env.update({
+            "DATABASE_URL": self.database_url,
+            "JOBS_DIR": str(Path(settings.JOBS_DIR).resolve()),
+            "PYTHONPATH": os.pathsep.join(filter(None, [str(APP_DIR), env.get("PYTHONPATH")])),
+        })
+        command = [sys.executable, "-m", "modules.jobs", "--poll", str(self.poll_interval),
+                   "--parent-pid", str(os.getpid())]
+        return subprocess.Popen(command, env=env, stdin=subprocess.DEVNULL)
+
+
+_runner: Optional[JobRunner] = None
+_runner_lock = threading.Lock()
+
+
+def get_runner() -> JobRunner:
+    """Пул исполнителей процесса (создаётся при первом обращении)"""
+    global _runner
+    if _runner is None:
+        with _runner_lock:
+            if _runner is None:
+                _runner = JobRunner()
+                atexit.register(_runner.stop)
+    return _runner
+
+
+
+# ============================================================================
+# API ДЛЯ СТРАНИЦ
+# ============================================================================
+
+def submit(kind: str, params: Optional[Dict[str, Any]] = None, user_id: Optional[int] = None,
+           farm_id: Optional[int] = None, max_attempts: Optional[int] = None,
+           session_factory: Callable = SessionLocal, runner: Optional[JobRunner] = None) -> int:
+    """
+    Постановка задачи в очередь
+
+    При JOBS_WORKERS=0 задача выполняется сразу в вызывающем потоке.
+
+    Args:
+        kind: Вид задачи (ключ HANDLERS)
+        params: Аргументы обработчика (JSON-совместимые)
+        user_id: Автор
+        farm_id: Хозяйство (фильтр списка задач, инвалидация кеша)
+        max_attempts: Попыток при ошибке (по умолчанию JOBS_MAX_ATTEMPTS)
+        session_factory: Фабрика сессий БД
+        runner: Диспетчер (по умолчанию - диспетчер процесса)
+
+    Returns:
+        ID задачи
+    """
+    if kind not in HANDLERS:
+        raise ValueError(f"Unknown job kind: {kind}")
+    job = Job(
+        kind=kind,
+        status=QUEUED,
+        params=json.dumps(params or {}, ensure_ascii=False, default=str),
+        user_id=user_id,
+        farm_id=farm_id,
+        attempts=0,
+        max_attempts=max_attempts or settings.JOBS_MAX_ATTEMPTS,
+        progress=0.0,
+        cancel_requested=False,
+    )
+    with session_factory() as s:
+        s.add(job)
+        s.commit()
+        job_id = job.id
+
+    if runner is not None:
+        runner.notify()
+    elif settings.JOBS_WORKERS <= 0:
+        while _claim(session_factory, f"inline:{os.getpid()}", 1, job_id):
+            if run_job(job_id, session_factory) != QUEUED:
+                break
+    else:
+        get_runner().notify()
+    return job_id
+
+
+def get_job(job_id: int, session_factory: Callable = SessionLocal) -> Optional[Dict[str, Any]]:
+    """Снимок задачи (dict) или None"""
+    with session_factory() as s:
+        job = s.get(Job, job_id)
+        return _snapshot(job) if job is not None else None
+
+
+def list_jobs(farm_id: Optional[int] = None, kinds: Optional[Iterable[str]] = None, limit: int = 20,
+              session_factory: Callable = SessionLocal) -> List[Dict[str, Any]]:
+    """Последние задачи хозяйства (новые первыми)"""
+    query = select(Job)
+    if farm_id is not None:
+        query = query.where(Job.farm_id == farm_id)
+    if kinds:
+        query = query.where(Job.kind.in_(list(kinds)))
+    with session_factory() as s:
+        return [_snapshot(job) for job in s.execute(query.order_by(Job.id.desc()).limit(limit)).scalars()]
+
+
+def cancel(job_id: int, session_factory: Callable = SessionLocal) -> None:
+    """Отмена: задача из очереди снимается сразу, выполняемая - на следующем ctx.progress()"""
+    now = datetime.utcnow()
+    with session_factory() as s:
+        s.execute(update(Job).where(Job.id == job_id, Job.status == QUEUED)
+                  .values(status=CANCELLED, cancel_requested=True, finished_at=now, message="Отменена пользователем"))
+        s.execute(update(Job).where(Job.id == job_id, Job.status == RUNNING).values(cancel_requested=True))
+        s.commit()
+
+
+def retry(job_id: int, session_factory: Callable = SessionLocal) -> None:
+    """Повторный запуск завершившейся с ошибкой или отменённой задачи"""
+    with session_factory() as s:
+        s.execute(
+            update(Job)
+            .where(Job.id == job_id, Job.status.in_([FAILED, CANCELLED]))
+            .values(status=QUEUED, attempts=0, cancel_requested=False, progress=0.0, error=None,
+                    message=None, run_after=None, started_at=None, finished_at=None, worker=None)
+        )
+        s.commit()
+    if settings.JOBS_WORKERS > 0:
+        get_runner().notify()
+
+
+def purge(days: int = settings.JOBS_KEEP_DAYS, session_factory: Callable = SessionLocal) -> int:
+    """Удаление завершённых задач старше days дней, их файлов и старых загрузок"""
+    threshold = datetime.utcnow() - timedelta(days=days)
+    with session_factory() as s:
+        old = s.execute(
+            select(Job.id).where(Job.status.in_(FINISHED), Job.finished_at < threshold)
+        ).scalars().all()
+        if old:
+            s.execute(delete(Job).where(Job.id.in_(old)))
+            s.commit()
+    for job_id in old:
+        shutil.rmtree(job_dir(job_id), ignore_errors=True)
+
+    uploads = Path(settings.JOBS_DIR) / "uploads"
+    if uploads.exists():
+        for path in uploads.iterdir():
+            if path.stat().st_mtime < threshold.timestamp():
+                path.unlink(missing_ok=True)
+    return len(old)
+
+
+def save_upload(uploaded_file) -> str:
+    """Сохранение загруженного файла для задачи; возвращает путь"""
+    safe_name = Path(uploaded_file.name).name.replace(" ", "_")
+    path = uploads_dir() / f"{datetime.now():%Y%m%d%H%M%S}_{os.getpid()}_{safe_name}"
+    path.write_bytes(uploaded_file.getvalue())
+    return str(path)
+
+
+def _invalidate(job: Dict[str, Any]) -> None:
+    """Сброс кеша хозяйства после задачи, записавшей данные в другом процессе"""
+    entities = INVALIDATES.get(job["kind"], ())
+    if job["status"] == SUCCEEDED and entities:
+        from modules.farm_cache import farm_cache
+
+        for entity in entities:
+            farm_cache.bump(entity, job["farm_id"])
+
+
+def _render_body(job: Dict[str, Any], key_prefix: str) -> None:
+    import streamlit as st
+
+    title = f"{KIND_LABELS.get(job['kind'], job['kind'])} #{job['id']} · {STATUS_LABELS.get(job['status'], job['status'])}"
+    if job["created_at"]:
+        title += f" · {job['created_at']:%d.%m.%Y %H:%M}"
+    st.markdown(f"**{title}**")
+
+    if job["status"] in ACTIVE:
+        st.progress(job["progress"] or 0.0, text=job["message"] or "")
+        if st.button("⏹️ Отменить", key=f"{key_prefix}_cancel_{job['id']}", disabled=bool(job["cancel_requested"])):
+            cancel(job["id"])
+            st.rerun()
+        return
+
+    if job["status"] == SUCCEEDED:
+        if job["message"]:
+            st.success(job["message"])
+        artifact = job["artifact_path"]
+        if artifact and Path(artifact).exists():
+            st.download_button(
+                "📥 Скачать результат",
+                data=Path(artifact).read_bytes(),
+                file_name=Path(artifact).name,
+                key=f"{key_prefix}_download_{job['id']}",
+            )
+        return
+
+    if job["status"] == FAILED:
+        st.error(job["message"] or "Ошибка выполнения")
+        if job["error"]:
+            with st.expander("Подробности"):
+                st.code(job["error"])
+    else:
+        st.info(job["message"] or "Задача отменена")
+    if st.button("🔁 Повторить", key=f"{key_prefix}_retry_{job['id']}"):
+        retry(job["id"])
+        st.rerun()
+
+
+def render_job(job_id: int, key_prefix: str = "job", job: Optional[Dict[str, Any]] = None) -> Optional[Dict[str, Any]]:
+    """
+    Статус задачи с автообновлением, пока она в очереди или выполняется
+
+    Args:
+        job_id: ID задачи
+        key_prefix: Префикс ключей виджетов (одна задача может быть на странице дважды)
+        job: Уже загруженный снимок задачи
+
+    Returns:
+        Снимок задачи или None, если её нет
+    """
+    import streamlit as st
+
+    job = job or get_job(job_id)
+    if job is None:
+        return None
+    active = job["status"] in ACTIVE
+    if active and settings.JOBS_WORKERS > 0:
+        # После перезапуска Streamlit исполнителей ещё нет
+        get_runner().notify()
+
+    @st.fragment(run_every=settings.JOBS_POLL_SEC if active else None)
+    def _panel():
+        current = get_job(job_id)
+        if current is None:
+            return
+        if active and current["status"] not in ACTIVE:
+            # Завершилась - перерисовать страницу без автообновления
+            _invalidate(current)
+            st.rerun()
+        _render_body(current, key_prefix)
+
+    _panel()
+    return job
+
+
+def render_jobs(farm_id: Optional[int] = None, kinds: Optional[Iterable[str]] = None, limit: int = 10) -> None:
+    """Список последних задач хозяйства (переживает обновление страницы)"""
+    import streamlit as st
+
+    jobs = list_jobs(farm_id, kinds, limit)
+    active = sum(1 for job in jobs if job["status"] in ACTIVE)
+    label = f"🗂️ Фоновые задачи: {len(jobs)}" + (f", выполняется {active}" if active else "")
+    with st.expander(label, expanded=bool(active)):
+        if not jobs:
+            st.caption("Задач пока нет")
+        for job in jobs:
+            render_job(job["id"], key_prefix="jobs_list", job=job)
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Исполнитель фоновых задач (таблица jobs)")
+    parser.add_argument("--poll", type=float, default=settings.JOBS_POLL_SEC, help="Пауза при пустой очереди, с")
+    parser.add_argument("--once", action="store_true", help="Выполнить очередь и выйти")
+    parser.add_argument("--parent-pid", type=int, default=None, help="Выйти вместе с процессом Streamlit")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(name)s %(levelname)s %(message)s")
+    done = work(SessionLocal, args.poll, args.once, args.parent_pid)
+    logger.info("Jobs worker %s stopped after %d jobs", os.getpid(), done)
+    return 0
+
+
+if __name__ == "__main__":
+    # Функции из модуля modules.jobs, а не из __main__: один класс JobCancelled для обработчиков
+    from modules.jobs import main as _main
+
+    sys.exit(_main())
@@ -0,0 +1,204 @@
+"""
+Loading - Именованные профили загрузки операций с деталями
+
+У Operation десять связей с деталями (sowing_details, harvest_data,
+tillage_details и т.д.), и все они ленивые: просмотр и экспорт журнала
+делали отдельный запрос на каждую связь каждой строки. Профиль задаёт
+стратегии загрузки заранее:
+
+    journal          - детальный просмотр: поле, техника и все детали
+    export_full      - полный экспорт: всё за 3 запроса при любом числе строк
+    harvest_summary  - итоги уборки: поле и данные уборки
+
+Связи вне профиля при STRICT_LOADING=True вызывают ошибку (raiseload),
+а forbid_lazy_loads() в тестах ловит любую ленивую загрузку в сессии.
+"""
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, List, Optional
+
+import pandas as pd
+from sqlalchemy import event, inspect as sa_inspect
+from sqlalchemy.orm import Session, joinedload, raiseload, selectinload, subqueryload
+
+from modules.config import settings
+from modules.database import Operation
+
+# Детали один-к-одному (uselist=False)
+OPERATION_DETAILS = (
+    "sowing_details",
+    "harvest_data",
+    "agrochemical_analysis",
+    "desiccation_details",
+    "tillage_details",
+    "irrigation_details",
+    "snow_retention_details",
+    "fallow_details",
+)
+
+# Детали один-ко-многим
+OPERATION_COLLECTIONS = (
+    "fertilizer_applications",
+    "pesticide_applications",
+)
+
+
+class LazyLoadError(Exception):
+    """Ленивая загрузка связи там, где она запрещена"""
+
+
+def _journal_options() -> List:
+    # Одна операция: JOIN для всех деталей, коллекции - по запросу на связь
+    return (
+        [joinedload(Operation.field), joinedload(Operation.machinery), joinedload(Operation.implement)]
+        + [joinedload(getattr(Operation, name)) for name in OPERATION_DETAILS]
+        + [selectinload(getattr(Operation, name)) for name in OPERATION_COLLECTIONS]
+    )
+
+
+def _export_full_options() -> List:
+    # Тысячи операций: selectinload дробит IN на пачки по 500 id,
+    # поэтому коллекции грузятся subqueryload - один запрос на связь
+    return (
+        [joinedload(Operation.field), joinedload(Operation.machinery), joinedload(Operation.implement)]
+        + [joinedload(getattr(Operation, name)) for name in OPERATION_DETAILS]
+        + [subqueryload(getattr(Operation, name)) for name in OPERATION_COLLECTIONS]
+    )
+
+
+def _harvest_summary_options() -> List:
+    return [joinedload(Operation.field), joinedload(Operation.harvest_data)]
+
+
+LOAD_PROFILES: Dict[str, Callable[[], List]] = {
+    "journal": _journal_options,
+    "export_full": _export_full_options,
+    "harvest_summary": _harvest_summary_options,
+}
+
+
+def profile_options(name: str, strict: Optional[bool] = None) -> List:
+    """
+    Опции загрузки профиля
+
+    Args:
+        name: Имя профиля из LOAD_PROFILES
+        strict: Запретить связи вне профиля (по умолчанию settings.STRICT_LOADING)
+
+    Returns:
+        Список опций для query.options(...) / select(...).options(...)
+    """
+    if name not in LOAD_PROFILES:
+        raise ValueError(f"Unknown loading profile: {name}")
+    options = LOAD_PROFILES[name]()
+    if settings.STRICT_LOADING if strict is None else strict:
+        options.append(raiseload("*"))
+    return options
+
+
+def operations_query(db: Session, profile: str, strict: Optional[bool] = None):
+    """
+    Запрос операций с опциями профиля
+
+    Args:
+        db: Сессия БД
+        profile: Имя профиля
+        strict: См. profile_options
+
+    Returns:
+        Query[Operation] для дальнейшей фильтрации
+    """
+    return db.query(Operation).options(*profile_options(profile, strict))
+
+
+@contextmanager
+def forbid_lazy_loads(session: Session):
+    """
+    Запрет ленивых загрузок в сессии (режим проверки для тестов)
+
+    Любой запрос, выполняемый ради ленивой связи, прерывается LazyLoadError
+    с именем модели и связи. Many-to-one, найденные в identity map,
+    SQL не выполняют и не считаются.
+    """
+    def _check(orm_execute_state):
+        state = orm_execute_state.lazy_loaded_from
+        if state is not None:
+            path = orm_execute_state.loader_strategy_path
+            relation = path[-1].key if path is not None and len(path) else "?"
+            raise LazyLoadError(f"Lazy load of {state.class_.__name__}.{relation} (id={state.identity})")
+
+    event.listen(session, "do_orm_execute", _check)
+    try:
+        yield session
+    finally:
+        event.remove(session, "do_orm_execute", _check)
+
+
+def _columns(obj) -> Dict[str, Any]:
+    """Значения колонок объекта без служебных ключей"""
+    if obj is None:
+        return {}
+    return {
+        attr.key: getattr(obj, attr.key)
+        for attr in sa_inspect(obj).mapper.column_attrs
+        if attr.key not in ("id", "operation_id")
+    }
+
+
+def operation_details(operation: Operation) -> Dict[str, Any]:
+    """
+    Детали операции по связям
+
+    Returns:
+        {имя связи: dict колонок} для деталей один-к-одному
+        и {имя связи: [dict, ...]} для коллекций; пустые связи пропускаются
+    """
+    details: Dict[str, Any] = {}
+    for name in OPERATION_DETAILS:
+        values = _columns(getattr(operation, name))
+        if values:
+            details[name] = values
+    for name in OPERATION_COLLECTIONS:
+        items = [_columns(item) for item in getattr(operation, name)]
+        if items:
+            details[name] = items
+    return details
+
+
+def export_operations_frame(operations: List[Operation]) -> pd.DataFrame:
+    """
+    Плоская таблица операций с деталями для экспорта
+
+    Ожидает операции, загруженные профилем export_full. Колонки деталей
+    получают префикс связи (harvest_data.yield_t_ha), коллекции
+    сворачиваются в число записей и список наименований.
+
+    Args:
+        operations: Операции с загруженными связями
+
+    Returns:
+        DataFrame, одна строка на операцию
+    """
+    rows = []
+    for op in operations:
+        row = _columns(op)
+        row["id"] = op.id
+        row["field_code"] = op.field.field_code if op.field else None
+        row["field_name"] = op.field.name if op.field else None
+        row["machine"] = f"{op.machinery.brand or ''} {op.machinery.model}".strip() if op.machinery else None
+        row["implement"] = f"{op.implement.brand or ''} {op.implement.model}".strip() if op.implement else None
+
+        for name in OPERATION_DETAILS:
+            for key, value in _columns(getattr(op, name)).items():
+                row[f"{name}.{key}"] = value
+
+        row["fertilizer_applications.count"] = len(op.fertilizer_applications)
+        row["fertilizer_applications.names"] = "; ".join(a.fertilizer_name for a in op.fertilizer_applications)
+        row["pesticide_applications.count"] = len(op.pesticide_applications)
+        row["pesticide_applications.names"] = "; ".join(a.pesticide_name for a in op.pesticide_applications)
+        rows.append(row)
+
+    frame = pd.DataFrame(rows)
+    if not frame.empty:
+        leading = ["id", "operation_date", "operation_type", "field_code", "field_name"]
+        frame = frame[leading + [c for c in frame.columns if c not in leading]]
+    return frame
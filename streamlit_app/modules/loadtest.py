@@ -0,0 +1,363 @@
+"""
+Load test - Воспроизведение типовых запросов страниц и API с перцентилями
+
+Сценарии повторяют запросы страниц (дашборд, поля, журнал, детали
+и полный экспорт операций, аналитика уборки/удобрений/СЗР, погода, NDVI,
+признаки ML) для случайных хозяйств из БД. Необязательно - вызовы
+FastAPI (--api-url). Для каждого сценария считаются p50/p95/p99.
+
+Данные для прогона создаёт modules.synthetic.
+
+Запуск:
+    python -m modules.loadtest --iterations 50 --workers 4
+    python -m modules.loadtest --scenarios journal_list,harvest_analytics --json report.json
+"""
+import json
+import math
+import random
+import time
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date
+from typing import Any, Callable, Dict, Iterable, List, Optional
+
+from sqlalchemy import create_engine, extract, func
+from sqlalchemy.orm import Session, sessionmaker
+
+from modules import analytics
+from modules.database import (
+    SessionLocal,
+    Farm,
+    Field,
+    Operation,
+    WeatherData,
+    SatelliteData,
+)
+from modules.loading import operations_query, operation_details, export_operations_frame
+from modules.ml_dataset import build_field_season_frame
+
+
+def percentile(values: List[float], q: float) -> float:
+    """
+    Перцентиль с линейной интерполяцией
+
+    Args:
+        values: Значения
+        q: Перцентиль 0-100
+
+    Returns:
+        Значение перцентиля (nan для пустого списка)
+    """
+    if not values:
+        return math.nan
+    ordered = sorted(values)
+    rank = (len(ordered) - 1) * q / 100
+    low, high = math.floor(rank), math.ceil(rank)
+    return ordered[low] + (ordered[high] - ordered[low]) * (rank - low)
+
+
+class LoadContext:
+    """Случайный выбор хозяйства, поля, сезона и операции для итерации"""
+
+    def __init__(self, db: Session, rng: random.Random, farm_ids: List[int], seasons: List[int]):
+        self.db = db
+        self.rng = rng
+        self.farm_id = rng.choice(farm_ids)
+        self.season = rng.choice(seasons)
+
+    def field_id(self) -> Optional[int]:
+        ids = [row[0] for row in self.db.query(Field.id).filter(Field.farm_id == self.farm_id).limit(200)]
+        return self.rng.choice(ids) if ids else None
+
+    def operation_id(self) -> Optional[int]:
+        ids = [row[0] for row in self.db.query(Operation.id).filter(Operation.farm_id == self.farm_id).limit(500)]
+        return self.rng.choice(ids) if ids else None
+
+
+# ============================================================================
+# СЦЕНАРИИ СТРАНИЦ
+# ============================================================================
+
+def _dashboard(ctx: LoadContext) -> None:
+    db = ctx.db
+    db.query(Farm).filter(Farm.id == ctx.farm_id).first()
+    db.query(Field).filter(Field.farm_id == ctx.farm_id).count()
+    db.query(Operation).filter(Operation.farm_id == ctx.farm_id).count()
+    db.query(func.sum(Field.area_ha)).filter(Field.farm_id == ctx.farm_id).scalar()
+
+
+def _fields_list(ctx: LoadContext) -> None:
+    ctx.db.query(Field).filter(Field.farm_id == ctx.farm_id).order_by(Field.id).all()
+
+
+def _journal_list(ctx: LoadContext) -> None:
+    ctx.db.query(
+        Operation.id, Operation.operation_date, Operation.operation_type,
+        Field.name, Field.field_code, Operation.crop, Operation.variety,
+        Operation.area_processed_ha, Operation.operator, Operation.notes,
+    ).join(Field).filter(
+        Field.farm_id == ctx.farm_id,
+        Operation.operation_date >= date(ctx.season, 1, 1),
+        Operation.operation_date <= date(ctx.season, 12, 31),
+    ).order_by(Operation.operation_date.desc()).all()
+
+
+def _journal_detail(ctx: LoadContext) -> None:
+    op_id = ctx.operation_id()
+    if op_id is not None:
+        op = operations_query(ctx.db, "journal").filter(Operation.id == op_id).first()
+        operation_details(op)
+
+
+def _journal_export_full(ctx: LoadContext) -> None:
+    operations = (
+        operations_query(ctx.db, "export_full")
+        .filter(Operation.farm_id == ctx.farm_id, extract("year", Operation.operation_date) == ctx.season)
+        .all()
+    )
+    export_operations_frame(operations)
+
+
+def _harvest_analytics(ctx: LoadContext) -> None:
+    analytics.harvest_summary(analytics.harvest_frame(ctx.db, ctx.farm_id))
+
+
+def _fertilizer_analytics(ctx: LoadContext) -> None:
+    analytics.fertilizer_summary(analytics.fertilizer_frame(ctx.db, ctx.farm_id))
+
+
+def _pesticide_analytics(ctx: LoadContext) -> None:
+    analytics.pesticide_summary(analytics.pesticide_frame(ctx.db, ctx.farm_id))
+
+
+def _weather_season(ctx: LoadContext) -> None:
+    ctx.db.query(WeatherData).filter(
+        WeatherData.farm_id == ctx.farm_id,
+        extract("year", WeatherData.datetime) == ctx.season,
+    ).order_by(WeatherData.datetime).all()
+
+
+def _ndvi_field(ctx: LoadContext) -> None:
+    field_id = ctx.field_id()
+    if field_id is not None:
+        ctx.db.query(SatelliteData).filter(SatelliteData.field_id == field_id).order_by(SatelliteData.acquisition_date).all()
+
+
+def _ml_features(ctx: LoadContext) -> None:
+    build_field_season_frame(ctx.db, ctx.farm_id, [ctx.season])
+
+
+PAGE_SCENARIOS: Dict[str, Callable[[LoadContext], None]] = {
+    "dashboard": _dashboard,
+    "fields_list": _fields_list,
+    "journal_list": _journal_list,
+    "journal_detail": _journal_detail,
+    "journal_export_full": _journal_export_full,
+    "harvest_analytics": _harvest_analytics,
+    "fertilizer_analytics": _fertilizer_analytics,
+    "pesticide_analytics": _pesticide_analytics,
+    "weather_season": _weather_season,
+    "ndvi_field": _ndvi_field,
+    "ml_features": _ml_features,
+}
+
+
+# ============================================================================
+# СЦЕНАРИИ API
+# ============================================================================
+
+def api_scenarios(base_url: str, token: Optional[str] = None, timeout: float = 30) -> Dict[str, Callable[[LoadContext], None]]:
+    """
+    Вызовы FastAPI backend
+
+    Args:
+        base_url: Адрес backend (http://localhost:8000)
+        token: Bearer-токен для /api/v1
+        timeout: Таймаут запроса, с
+    """
+    base_url = base_url.rstrip("/")
+    headers = {"Authorization": f"Bearer {token}"} if token else {}
+
+    def get(path: str) -> None:
+        request = urllib.request.Request(base_url + path, headers=headers)
+        with urllib.request.urlopen(request, timeout=timeout) as response:
+            response.read()
+
+    scenarios = {"api_health": lambda ctx: get("/health")}
+    if token:
+        scenarios["api_farm"] = lambda ctx: get(f"/api/v1/farms/{ctx.farm_id}")
+        scenarios["api_fields"] = lambda ctx: get(f"/api/v1/fields/?farm_id={ctx.farm_id}")
+    return scenarios
+
+
+# ============================================================================
+# ПРОГОН
+# ============================================================================
+
+class LoadRunner:
+    """
+    Прогон сценариев
+
+    Args:
+        scenarios: {имя: функция(LoadContext)}
+        iterations: Замеров на сценарий
+        workers: Параллельных потоков (у каждого своя сессия)
+        warmup: Прогревочных вызовов на сценарий (не учитываются)
+        seed: Зерно выбора хозяйств
+        session_factory: Фабрика сессий (по умолчанию SessionLocal приложения)
+    """
+
+    def __init__(
+        self,
+        scenarios: Dict[str, Callable[[LoadContext], None]],
+        iterations: int = 30,
+        workers: int = 1,
+        warmup: int = 2,
+        seed: int = 42,
+        session_factory=None,
+    ):
+        self.scenarios = scenarios
+        self.iterations = iterations
+        self.workers = max(1, workers)
+        self.warmup = warmup
+        self.seed = seed
+        self.session_factory = session_factory or SessionLocal
+
+    def _population(self):
+        db = self.session_factory()
+        try:
+            farm_ids = [row[0] for row in db.query(Farm.id).order_by(Farm.id)]
+            seasons = sorted({
+                int(row[0]) for row in db.query(extract("year", Operation.operation_date)).distinct() if row[0]
+            }) or [date.today().year]
+        finally:
+            db.close()
+        if not farm_ids:
+            raise RuntimeError("No farms in the database: generate data with python -m modules.synthetic")
+        return farm_ids, seasons
+
+    def _run_one(self, name: str, worker: int, count: int, farm_ids, seasons) -> Dict[str, Any]:
+        func_ = self.scenarios[name]
+        rng = random.Random(f"{self.seed}:{name}:{worker}")
+        timings: List[float] = []
+        errors: List[str] = []
+        db = self.session_factory()
+        try:
+            for i in range(count + (self.warmup if worker == 0 else 0)):
+                ctx = LoadContext(db, rng, farm_ids, seasons)
+                started = time.perf_counter()
+                try:
+                    func_(ctx)
+                except Exception as exc:
+                    db.rollback()
+                    errors.append(f"{type(exc).__name__}: {exc}"[:200])
+                    continue
+                finally:
+                    db.expunge_all()
+                if worker == 0 and i < self.warmup:
+                    continue
+                timings.append((time.perf_counter() - started) * 1000)
+        finally:
+            db.close()
+        return {"timings": timings, "errors": errors}
+
+    def run(self) -> Dict[str, Any]:
+        """
+        Прогон всех сценариев по очереди
+
+        Returns:
+            {"scenarios": {имя: {n, errors, mean_ms, p50_ms, p95_ms, p99_ms, max_ms}}, ...}
+        """
+        farm_ids, seasons = self._population()
+        results = {}
+        started = time.perf_counter()
+
+        for name in self.scenarios:
+            shares = [self.iterations // self.workers + (1 if w < self.iterations % self.workers else 0) for w in range(self.workers)]
+            with ThreadPoolExecutor(max_workers=self.workers) as pool:
+                parts = list(pool.map(lambda w: self._run_one(name, w, shares[w], farm_ids, seasons), range(self.workers)))
+            timings = [t for part in parts for t in part["timings"]]
+            errors = [e for part in parts for e in part["errors"]]
+            results[name] = {
+                "n": len(timings),
+                "errors": len(errors),
+                "first_error": errors[0] if errors else None,
+                "mean_ms": round(sum(timings) / len(timings), 2) if timings else math.nan,
+                "p50_ms": round(percentile(timings, 50), 2),
+                "p95_ms": round(percentile(timings, 95), 2),
+                "p99_ms": round(percentile(timings, 99), 2),
+                "max_ms": round(max(timings), 2) if timings else math.nan,
+            }
+
+        return {
+            "started_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "seconds": round(time.perf_counter() - started, 2),
+            "farms": len(farm_ids),
+            "seasons": seasons,
+            "iterations": self.iterations,
+            "workers": self.workers,
+            "scenarios": results,
+        }
+
+
+def format_report(report: Dict[str, Any]) -> str:
+    """Таблица результатов для консоли"""
+    lines = [
+        f"Farms: {report['farms']}, seasons: {report['seasons']}, workers: {report['workers']}, "
+        f"total {report['seconds']} s",
+        f"{'scenario':<24} {'n':>5} {'err':>4} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'max ms':>9}",
+    ]
+    for name, r in report["scenarios"].items():
+        lines.append(
+            f"{name:<24} {r['n']:>5} {r['errors']:>4} {r['p50_ms']:>9.1f} {r['p95_ms']:>9.1f} "
+            f"{r['p99_ms']:>9.1f} {r['max_ms']:>9.1f}"
+        )
+        if r["first_error"]:
+            lines.append(f"    first error: {r['first_error']}")
+    return "\n".join(lines)
+
+
+def select_scenarios(names: Optional[Iterable[str]] = None, api_url: Optional[str] = None,
+                     api_token: Optional[str] = None) -> Dict[str, Callable[[LoadContext], None]]:
+    """Сценарии страниц (и API, если указан адрес), при необходимости - только выбранные"""
+    scenarios = dict(PAGE_SCENARIOS)
+    if api_url:
+        scenarios.update(api_scenarios(api_url, api_token))
+    if names:
+        unknown = set(names) - set(scenarios)
+        if unknown:
+            raise ValueError(f"Unknown scenarios: {', '.join(sorted(unknown))}")
+        scenarios = {name: scenarios[name] for name in names}
+    return scenarios
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Нагрузочный прогон запросов страниц и API")
+    parser.add_argument("--iterations", type=int, default=30, help="Замеров на сценарий")
+    parser.add_argument("--workers", type=int, default=1)
+    parser.add_argument("--warmup", type=int, default=2)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--scenarios", default=None, help="Сценарии через запятую (по умолчанию все)")
+    parser.add_argument("--database-url", default=None, help="БД (по умолчанию DATABASE_URL приложения)")
+    parser.add_argument("--api-url", default=None, help="Адрес FastAPI backend")
+    parser.add_argument("--api-token", default=None, help="Bearer-токен для /api/v1")
+    parser.add_argument("--json", default=None, help="Сохранить отчёт в JSON")
+    args = parser.parse_args()
+
+    factory = sessionmaker(bind=create_engine(args.database_url)) if args.database_url else None
+    runner = LoadRunner(
+        select_scenarios(args.scenarios.split(",") if args.scenarios else None, args.api_url, args.api_token),
+        iterations=args.iterations,
+        workers=args.workers,
+        warmup=args.warmup,
+        seed=args.seed,
+        session_factory=factory,
+    )
+    report = runner.run()
+    print(format_report(report))
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
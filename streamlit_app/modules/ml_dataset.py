@@ -0,0 +1,572 @@
+"""
+ML dataset - Сборка обучающей выборки "поле-сезон" в партиционированный Parquet
+
+Одна строка на поле и сезон: посев, удобрения (баланс NPK), обработки СЗР,
+урожай, последний агрохимический анализ, агрометеопоказатели (СЭТ, осадки
+по окнам) и признаки NDVI.
+
+Сборка инкрементальная. High-water marks источников: курсор журнала
+изменений (modules.change_log - любая запись поля, операции или её
+деталей, в том числе правка на месте), количество и максимальный id
+таблиц и хеш справочных таблиц. Если отметки не изменились - сборка
+пропускается целиком. Иначе пересчитываются партиции (хозяйство, сезон):
+    - с записями журнала после курсора прошлой сборки (изменение поля
+      или хозяйства - все сезоны хозяйства, анализа почвы - и все
+      последующие сезоны);
+    - с изменившимся отпечатком (количество и максимальный id строк -
+      ловит удаления и записи, не попадающие в журнал);
+    - все, если изменились справочные таблицы (нормы NPK).
+
+Погода и снимки в журнал не попадают: они только добавляются импортом,
+правку существующих строк подхватывает лишь полная сборка (--full).
+
+Запуск: python -m modules.ml_dataset [--full] [--output ./ml_dataset]
+"""
+import hashlib
+import json
+import os
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional, Set, Tuple
+
+import pandas as pd
+from sqlalchemy import extract, func, select
+from sqlalchemy.orm import Session
+
+from modules.config import settings
+from modules.database import (
+    Operation,
+    Field,
+    SowingDetail,
+    FertilizerApplication,
+    PesticideApplication,
+    HarvestData,
+    AgrochemicalAnalysis,
+    WeatherData,
+    SatelliteData,
+    ChangeLog,
+    RefCrop,
+    RefFertilizer,
+    SessionLocal,
+)
+from modules.nutrient_balance import compute_balance
+
+
+MANIFEST_NAME = "_manifest.json"
+
+# Окна осадков внутри сезона: (название, первый месяц, последний месяц)
+PRECIPITATION_WINDOWS = [
+    ("precip_apr_may_mm", 4, 5),
+    ("precip_jun_jul_mm", 6, 7),
+    ("precip_aug_sep_mm", 8, 9),
+]
+
+# Вегетационный период для СЭТ
+VEGETATION_MONTHS = (4, 9)
+
+PESTICIDE_CLASS_COLUMNS = {
+    "Гербицид": "herbicide_treatments",
+    "Инсектицид": "insecticide_treatments",
+    "Фунгицид": "fungicide_treatments",
+}
+
+
+def _frame(db: Session, stmt) -> pd.DataFrame:
+    """Выполнение запроса в DataFrame"""
+    result = db.execute(stmt)
+    return pd.DataFrame(result.all(), columns=list(result.keys()))
+
+
+# ============================================================================
+# ОТПЕЧАТКИ ИСТОЧНИКОВ
+# ============================================================================
+
+def _operation_detail_signature(db: Session, model, name: str) -> pd.DataFrame:
+    """Отпечаток (count, max id) детальной таблицы по (хозяйство, сезон)"""
+    season_col = extract('year', Operation.operation_date)
+    return _frame(db, select(
+        Operation.farm_id.label("farm_id"),
+        season_col.label("season"),
+        func.count(model.id).label(f"{name}_count"),
+        func.max(model.id).label(f"{name}_max_id"),
+    ).join(model, model.operation_id == Operation.id).group_by(Operation.farm_id, season_col))
+
+
+def _reference_digest(db: Session) -> str:
+    """Хеш справочных таблиц, от которых зависит баланс NPK (строки переписываются на месте)"""
+    h = hashlib.sha256()
+    for model in (RefCrop, RefFertilizer):
+        for row_id, source_hash in db.execute(select(model.id, model.source_hash).order_by(model.id)):
+            h.update(f"{model.__tablename__}:{row_id}:{source_hash};".encode("utf-8"))
+    return h.hexdigest()
+
+
+def high_water_marks(db: Session) -> Dict[str, Any]:
+    """
+    Текущие high-water marks таблиц-источников
+
+    Returns:
+        {имя_таблицы: [количество строк, максимальный id], "references": хеш справочников}
+        (change_log: максимальный id - курсор журнала изменений)
+    """
+    marks: Dict[str, Any] = {}
+    for model in (Operation, Field, SowingDetail, FertilizerApplication, PesticideApplication,
+                  HarvestData, AgrochemicalAnalysis, WeatherData, SatelliteData, ChangeLog):
+        count, max_id = db.execute(select(func.count(model.id), func.max(model.id))).one()
+        marks[model.__tablename__] = [int(count or 0), int(max_id or 0)]
+    marks["references"] = _reference_digest(db)
+    return marks
+
+
+def changed_partitions(db: Session, since: int) -> Tuple[Dict[int, int], Set[Tuple[int, int]]]:
+    """
+    Партиции, затронутые записями журнала изменений после курсора
+
+    Args:
+        db: Сессия БД
+        since: id последней учтённой записи change_log
+
+    Returns:
+        ({farm_id: первый устаревший сезон - устарели и все последующие}, {(farm_id, season)})
+    """
+    from_season: Dict[int, int] = {}
+    operation_ids: Set[int] = set()
+    for table, row_id, farm_id in db.execute(
+        select(ChangeLog.table_name, ChangeLog.row_id, ChangeLog.farm_id).where(ChangeLog.id > since)
+    ):
+        if table == "operations":
+            operation_ids.add(row_id)
+        elif farm_id is not None:
+            # Поле (площадь, название) и хозяйство входят в строки всех сезонов
+            from_season[farm_id] = 0
+
+    partitions: Set[Tuple[int, int]] = set()
+    ids = list(operation_ids)
+    season_col = extract('year', Operation.operation_date)
+    for start in range(0, len(ids), 500):
+        # Удалённые операции здесь не найдутся - их ловят отпечатки партиций
+        rows = db.execute(
+            select(Operation.farm_id, season_col, AgrochemicalAnalysis.id)
+            .outerjoin(AgrochemicalAnalysis, AgrochemicalAnalysis.operation_id == Operation.id)
+            .where(Operation.id.in_(ids[start:start + 500]))
+        )
+        for farm_id, season, analysis_id in rows:
+            if season is None:
+                continue
+            partitions.add((int(farm_id), int(season)))
+            if analysis_id is not None:
+                # Анализ почвы - "последний анализ" и последующих сезонов
+                from_season[farm_id] = min(from_season.get(farm_id, int(season)), int(season))
+    return from_season, partitions
+
+
+def partition_signatures(db: Session) -> Dict[Tuple[int, int], Dict[str, int]]:
+    """
+    Отпечатки всех партиций (хозяйство, сезон)
+
+    Анализы почвы учитываются накопительно: анализ прошлого года
+    влияет на "последний анализ" всех последующих сезонов.
+
+    Returns:
+        {(farm_id, season): {колонка_отпечатка: значение}}
+    """
+    season_col = extract('year', Operation.operation_date)
+
+    frames = [_frame(db, select(
+        Operation.farm_id.label("farm_id"),
+        season_col.label("season"),
+        func.count(Operation.id).label("operations_count"),
+        func.max(Operation.id).label("operations_max_id"),
+    ).group_by(Operation.farm_id, season_col))]
+
+    for model, name in ((SowingDetail, "sowing"), (FertilizerApplication, "fertilizer"),
+                        (PesticideApplication, "pesticide"), (HarvestData, "harvest")):
+        frames.append(_operation_detail_signature(db, model, name))
+
+    weather_season = extract('year', WeatherData.datetime)
+    frames.append(_frame(db, select(
+        WeatherData.farm_id.label("farm_id"),
+        weather_season.label("season"),
+        func.count(WeatherData.id).label("weather_count"),
+        func.max(WeatherData.id).label("weather_max_id"),
+    ).where(WeatherData.farm_id.isnot(None)).group_by(WeatherData.farm_id, weather_season)))
+
+    satellite_season = extract('year', SatelliteData.acquisition_date)
+    frames.append(_frame(db, select(
+        Field.farm_id.label("farm_id"),
+        satellite_season.label("season"),
+        func.count(SatelliteData.id).label("satellite_count"),
+        func.max(SatelliteData.id).label("satellite_max_id"),
+    ).join(Field, Field.id == SatelliteData.field_id).group_by(Field.farm_id, satellite_season)))
+
+    signatures = None
+    for frame in frames:
+        frame = frame.astype({"farm_id": "int64", "season": "int64"})
+        signatures = frame if signatures is None else signatures.merge(frame, on=["farm_id", "season"], how="outer")
+    signatures = signatures.sort_values(["farm_id", "season"]).fillna(0)
+
+    # Накопительный отпечаток анализов почвы
+    soil = _operation_detail_signature(db, AgrochemicalAnalysis, "soil")
+    if not soil.empty:
+        soil = soil.astype({"farm_id": "int64", "season": "int64"})
+        signatures = pd.merge_asof(
+            signatures.sort_values("season"),
+            soil.sort_values("season").assign(
+                soil_count=lambda d: d.groupby("farm_id")["soil_count"].cumsum(),
+                soil_max_id=lambda d: d.groupby("farm_id")["soil_max_id"].cummax(),
+            ),
+            on="season",
+            by="farm_id",
+            direction="backward",
+        ).fillna(0)
+
+    result = {}
+    for row in signatures.to_dict("records"):
+        key = (int(row.pop("farm_id")), int(row.pop("season")))
+        result[key] = {k: int(v) for k, v in row.items()}
+    return result
+
+
+# ============================================================================
+# ПРИЗНАКИ
+# ============================================================================
+
+def _sowing_features(db: Session, farm_id: int) -> pd.DataFrame:
+    """Признаки посева (первый посев поля в сезоне)"""
+    season_col = extract('year', Operation.operation_date)
+    df = _frame(db, select(
+        Operation.field_id.label("field_id"),
+        season_col.label("season"),
+        Operation.operation_date.label("sowing_date"),
+        SowingDetail.variety.label("variety"),
+        SowingDetail.seeding_rate_kg_ha.label("seeding_rate_kg_ha"),
+        SowingDetail.seeding_depth_cm.label("seeding_depth_cm"),
+        SowingDetail.seed_reproduction.label("seed_reproduction"),
+        SowingDetail.combined_with_fertilizer.label("combined_with_fertilizer"),
+    ).join(SowingDetail, SowingDetail.operation_id == Operation.id).where(
+        Operation.farm_id == farm_id, Operation.operation_type == "sowing"
+    ))
+    if df.empty:
+        return df
+
+    df = df.sort_values("sowing_date").drop_duplicates(["field_id", "season"], keep="first")
+    df["sowing_doy"] = pd.to_datetime(df["sowing_date"]).dt.dayofyear
+    return df.drop(columns=["sowing_date"])
+
+
+def _pesticide_features(db: Session, farm_id: int) -> pd.DataFrame:
+    """Количество обработок СЗР по классам"""
+    season_col = extract('year', Operation.operation_date)
+    df = _frame(db, select(
+        Operation.field_id.label("field_id"),
+        season_col.label("season"),
+        PesticideApplication.pesticide_class.label("pesticide_class"),
+        func.count(PesticideApplication.id).label("treatments"),
+    ).join(PesticideApplication, PesticideApplication.operation_id == Operation.id).where(
+        Operation.farm_id == farm_id
+    ).group_by(Operation.field_id, season_col, PesticideApplication.pesticide_class))
+    if df.empty:
+        return df
+
+    totals = df.groupby(["field_id", "season"], as_index=False)["treatments"].sum()
+    totals = totals.rename(columns={"treatments": "pesticide_treatments"})
+
+    by_class = df[df["pesticide_class"].isin(PESTICIDE_CLASS_COLUMNS)].pivot_table(
+        index=["field_id", "season"], columns="pesticide_class", values="treatments", aggfunc="sum"
+    ).rename(columns=PESTICIDE_CLASS_COLUMNS).reset_index()
+    by_class.columns.name = None
+
+    return totals.merge(by_class, on=["field_id", "season"], how="left")
+
+
+def _harvest_quality_features(db: Session, farm_id: int) -> pd.DataFrame:
+    """Показатели качества урожая"""
+    season_col = extract('year', Operation.operation_date)
+    return _frame(db, select(
+        Operation.field_id.label("field_id"),
+        season_col.label("season"),
+        func.avg(HarvestData.protein_percent).label("protein_percent"),
+        func.avg(HarvestData.moisture_percent).label("grain_moisture_percent"),
+        func.max(Operation.operation_date).label("harvest_date"),
+    ).join(HarvestData, HarvestData.operation_id == Operation.id).where(
+        Operation.farm_id == farm_id
+    ).group_by(Operation.field_id, season_col))
+
+
+def _weather_features(db: Session, farm_id: int) -> pd.DataFrame:
+    """
+    Агрометеопоказатели хозяйства по сезонам
+
+    Данные (в т.ч. почасовые) сначала сводятся к суточным: средняя
+    температура - среднее temp_air_c или (min + max) / 2, осадки - сумма.
+    """
+    df = _frame(db, select(
+        WeatherData.datetime.label("datetime"),
+        WeatherData.temp_air_c.label("temp_air_c"),
+        WeatherData.temp_min_c.label("temp_min_c"),
+        WeatherData.temp_max_c.label("temp_max_c"),
+        WeatherData.precipitation_mm.label("precipitation_mm"),
+    ).where(WeatherData.farm_id == farm_id))
+    if df.empty:
+        return pd.DataFrame(columns=["season"])
+
+    df["date"] = pd.to_datetime(df["datetime"]).dt.normalize()
+    df["temp_mean"] = df["temp_air_c"].fillna((df["temp_min_c"] + df["temp_max_c"]) / 2)
+
+    daily = df.groupby("date").agg(
+        temp_mean=("temp_mean", "mean"),
+        precipitation_mm=("precipitation_mm", "sum"),
+    ).reset_index()
+    daily["season"] = daily["date"].dt.year
+    daily["month"] = daily["date"].dt.month
+
+    vegetation = daily[daily["month"].between(*VEGETATION_MONTHS)].copy()
+    vegetation["gdd5"] = (vegetation["temp_mean"] - 5).clip(lower=0)
+    vegetation["gdd10"] = (vegetation["temp_mean"] - 10).clip(lower=0)
+
+    features = vegetation.groupby("season").agg(
+        gdd5=("gdd5", "sum"),
+        gdd10=("gdd10", "sum"),
+        temp_mean_vegetation=("temp_mean", "mean"),
+        precip_vegetation_mm=("precipitation_mm", "sum"),
+        weather_days=("date", "nunique"),
+    )
+
+    for name, first, last in PRECIPITATION_WINDOWS:
+        window = daily[daily["month"].between(first, last)]
+        features[name] = window.groupby("season")["precipitation_mm"].sum()
+
+    return features.reset_index()
+
+
+def _ndvi_features(db: Session, farm_id: int) -> pd.DataFrame:
+    """Признаки NDVI поля за сезон (без сильно облачных снимков)"""
+    df = _frame(db, select(
+        SatelliteData.field_id.label("field_id"),
+        SatelliteData.acquisition_date.label("acquisition_date"),
+        SatelliteData.ndvi_mean.label("ndvi_mean"),
+        SatelliteData.cloud_cover_pct.label("cloud_cover_pct"),
+    ).join(Field, Field.id == SatelliteData.field_id).where(
+        Field.farm_id == farm_id, SatelliteData.ndvi_mean.isnot(None)
+    ))
+    if df.empty:
+        return df
+
+    df = df[df["cloud_cover_pct"].fillna(0) <= settings.ML_MAX_CLOUD_COVER_PCT].copy()
+    df["acquisition_date"] = pd.to_datetime(df["acquisition_date"])
+    df["season"] = df["acquisition_date"].dt.year
+
+    peak = df.loc[df.groupby(["field_id", "season"])["ndvi_mean"].idxmax()]
+    peak = peak.assign(ndvi_peak_doy=peak["acquisition_date"].dt.dayofyear)[["field_id", "season", "ndvi_peak_doy"]]
+
+    features = df.groupby(["field_id", "season"], as_index=False).agg(
+        ndvi_max=("ndvi_mean", "max"),
+        ndvi_avg=("ndvi_mean", "mean"),
+        ndvi_observations=("ndvi_mean", "size"),
+    )
+    return features.merge(peak, on=["field_id", "season"], how="left")
+
+
+def build_field_season_frame(db: Session, farm_id: int, seasons: Optional[Iterable[int]] = None) -> pd.DataFrame:
+    """
+    Обучающая выборка хозяйства: строка на поле-сезон
+
+    Args:
+        db: Сессия БД
+        farm_id: ID хозяйства
+        seasons: Сезоны для сборки (None - все)
+
+    Returns:
+        DataFrame признаков
+    """
+    df = compute_balance(db, farm_id)
+    if df.empty:
+        return df
+
+    df.insert(0, "farm_id", farm_id)
+    df["season"] = df["season"].astype("int64")
+
+    for features in (_sowing_features(db, farm_id), _pesticide_features(db, farm_id),
+                     _harvest_quality_features(db, farm_id), _ndvi_features(db, farm_id)):
+        if not features.empty:
+            features = features.astype({"field_id": "int64", "season": "int64"})
+            df = df.merge(features, on=["field_id", "season"], how="left")
+
+    weather = _weather_features(db, farm_id)
+    if not weather.empty:
+        df = df.merge(weather.astype({"season": "int64"}), on="season", how="left")
+
+    # Одинаковый набор колонок во всех партициях
+    for col in ["pesticide_treatments"] + list(PESTICIDE_CLASS_COLUMNS.values()):
+        df[col] = df[col].fillna(0).astype("int64") if col in df.columns else 0
+
+    if seasons is not None:
+        df = df[df["season"].isin(list(seasons))]
+
+    return df.reset_index(drop=True)
+
+
+# ============================================================================
+# ИНКРЕМЕНТАЛЬНАЯ МАТЕРИАЛИЗАЦИЯ
+# ============================================================================
+
+class DatasetBuilder:
+    """
+    Инкрементальная сборка датасета в каталог партиций
+
+    Структура: <output>/farm_id=<id>/season=<год>/data.parquet
+    и <output>/_manifest.json с отметками источников и отпечатками партиций.
+    """
+
+    def __init__(self, db: Session, output_dir: Optional[str] = None):
+        self.db = db
+        self.output_dir = Path(output_dir or settings.ML_DATASET_DIR)
+
+    @property
+    def manifest_path(self) -> Path:
+        return self.output_dir / MANIFEST_NAME
+
+    def partition_path(self, farm_id: int, season: int) -> Path:
+        return self.output_dir / f"farm_id={farm_id}" / f"season={season}" / "data.parquet"
+
+    def load_manifest(self) -> Dict:
+        """Чтение манифеста предыдущей сборки"""
+        if not self.manifest_path.exists():
+            return {"high_water_marks": {}, "partitions": {}}
+        with open(self.manifest_path, "r", encoding="utf-8") as f:
+            return json.load(f)
+
+    def _save_manifest(self, manifest: Dict) -> None:
+        self.output_dir.mkdir(parents=True, exist_ok=True)
+        tmp_path = self.manifest_path.with_suffix(".tmp")
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(manifest, f, ensure_ascii=False, indent=2)
+        os.replace(tmp_path, self.manifest_path)
+
+    def _write_partition(self, df: pd.DataFrame, farm_id: int, season: int) -> None:
+        path = self.partition_path(farm_id, season)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = path.with_suffix(".tmp")
+        df.to_parquet(tmp_path, engine="pyarrow", index=False)
+        os.replace(tmp_path, path)
+
+    def _remove_partition(self, farm_id: int, season: int) -> None:
+        path = self.partition_path(farm_id, season)
+        if path.exists():
+            path.unlink()
+
+    def build(self, full: bool = False) -> Dict:
+        """
+        Сборка датасета
+
+        Args:
+            full: Пересобрать все партиции независимо от отпечатков
+
+        Returns:
+            Отчёт: {"rebuilt": [...], "removed": [...], "unchanged": int, "skipped": bool}
+        """
+        manifest = self.load_manifest()
+        marks = high_water_marks(self.db)
+
+        report = {"rebuilt": [], "removed": [], "unchanged": 0, "skipped": False}
+
+        if not full and manifest.get("high_water_marks") == marks:
+            report["skipped"] = True
+            report["unchanged"] = len(manifest.get("partitions", {}))
+            return report
+
+        previous_marks = manifest.get("high_water_marks") or {}
+        cursor = manifest.get("change_cursor")
+        if full or cursor is None or cursor > marks["change_log"][1] or \
+                previous_marks.get("references") != marks["references"]:
+            # Первая сборка, журнал пересоздан или изменились нормы справочников
+            previous, previous_empty, from_season, touched = {}, set(), {}, set()
+        else:
+            previous = manifest.get("partitions", {})
+            # Партиции без строк поле-сезон: файла нет, но они собраны
+            previous_empty = set(manifest.get("empty_partitions", []))
+            from_season, touched = changed_partitions(self.db, cursor)
+
+        signatures = partition_signatures(self.db)
+
+        dirty: Dict[int, List[int]] = {}
+        current = {}
+        empty = set()
+        for (farm_id, season), signature in signatures.items():
+            key = f"{farm_id}/{season}"
+            current[key] = signature
+            stale = (farm_id, season) in touched or season >= from_season.get(farm_id, season + 1)
+            built = key in previous_empty or self.partition_path(farm_id, season).exists()
+            if previous.get(key) == signature and built and not stale:
+                report["unchanged"] += 1
+                if key in previous_empty:
+                    empty.add(key)
+            else:
+                dirty.setdefault(farm_id, []).append(season)
+
+        for farm_id, seasons in dirty.items():
+            df = build_field_season_frame(self.db, farm_id, seasons)
+            for season in seasons:
+                part = df[df["season"] == season] if not df.empty else df
+                if part.empty:
+                    # Операции есть, но строк поле-сезон нет (например, только обработка почвы)
+                    self._remove_partition(farm_id, season)
+                    empty.add(f"{farm_id}/{season}")
+                    continue
+                self._write_partition(part, farm_id, season)
+                report["rebuilt"].append((farm_id, season))
+
+        for key in set(manifest.get("partitions", {})) - set(current):
+            farm_id, season = (int(v) for v in key.split("/"))
+            self._remove_partition(farm_id, season)
+            report["removed"].append((farm_id, season))
+
+        self._save_manifest({
+            "built_at": datetime.now().isoformat(timespec="seconds"),
+            "high_water_marks": marks,
+            # Курсор прочитан до сборки: запись во время сборки попадёт в следующую
+            "change_cursor": marks["change_log"][1],
+            "partitions": current,
+            "empty_partitions": sorted(empty),
+        })
+        return report
+
+
+def load_dataset(output_dir: Optional[str] = None, farm_id: Optional[int] = None) -> pd.DataFrame:
+    """
+    Чтение собранного датасета
+
+    Args:
+        output_dir: Каталог датасета
+        farm_id: Только одно хозяйство
+
+    Returns:
+        DataFrame всех партиций (farm_id и season - из путей партиций)
+    """
+    root = Path(output_dir or settings.ML_DATASET_DIR)
+    if farm_id is not None:
+        root = root / f"farm_id={farm_id}"
+    files = sorted(root.glob("**/data.parquet"))
+    if not files:
+        return pd.DataFrame()
+    return pd.concat([pd.read_parquet(f, engine="pyarrow") for f in files], ignore_index=True)
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Сборка ML-датасета поле-сезон")
+    parser.add_argument("--full", action="store_true", help="Полная пересборка")
+    parser.add_argument("--output", default=None, help="Каталог датасета")
+    args = parser.parse_args()
+
+    db = SessionLocal()
+    try:
+        result = DatasetBuilder(db, args.output).build(full=args.full)
+    finally:
+        db.close()
+
+    if result["skipped"]:
+        print("Source tables unchanged, nothing to rebuild.")
+    else:
+        print(f"Rebuilt: {len(result['rebuilt'])}, removed: {len(result['removed'])}, unchanged: {result['unchanged']}")
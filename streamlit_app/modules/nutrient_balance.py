@@ -0,0 +1,306 @@
+"""
+Nutrient balance - Баланс N/P/K по полям и сезонам
+
+Приход: внесённые удобрения (FertilizerApplication) и удобрения при
+совмещённом посеве (SowingDetail). Вынос: урожайность (HarvestData)
+x удельный вынос культуры. Контекст: последний агрохимический анализ
+поля на конец сезона.
+
+Содержание NPK удобрения и потребность культуры берутся соединением
+в SQL со справочными таблицами ref_fertilizers и ref_crops по ссылкам
+записей (modules.reference_sync).
+
+Фосфор и калий считаются в оксидной форме (P2O5, K2O), как в справочниках.
+Все расчёты выполняются одним векторным проходом по всем полям сезона.
+"""
+import threading
+from typing import Dict, Optional, Tuple
+
+import pandas as pd
+from sqlalchemy import event, extract, func, select
+from sqlalchemy.orm import Session
+
+from modules.database import (
+    Operation,
+    Field,
+    FertilizerApplication,
+    SowingDetail,
+    HarvestData,
+    AgrochemicalAnalysis,
+    ChangeLog,
+    RefCrop,
+    RefFertilizer,
+)
+
+
+BALANCE_COLUMNS = [
+    "field_id", "field_code", "field_name", "area_ha", "season", "crop",
+    "yield_t_ha",
+    "n_applied_kg_ha", "p_applied_kg_ha", "k_applied_kg_ha",
+    "n_removed_kg_ha", "p_removed_kg_ha", "k_removed_kg_ha",
+    "n_balance_kg_ha", "p_balance_kg_ha", "k_balance_kg_ha",
+    "soil_p2o5_mg_kg", "soil_k2o_mg_kg", "soil_no3_mg_kg", "soil_analysis_date",
+]
+
+
+def _frame(db: Session, stmt, numeric: Tuple[str, ...] = ()) -> pd.DataFrame:
+    """
+    Выполнение запроса в DataFrame
+
+    Колонки numeric приводятся к float: колонка, где все значения NULL,
+    иначе остаётся object и арифметика с ней падает.
+    """
+    result = db.execute(stmt)
+    df = pd.DataFrame(result.all(), columns=list(result.keys()))
+    return df.astype({column: float for column in numeric})
+
+
+def compute_balance(db: Session, farm_id: int, season: Optional[int] = None) -> pd.DataFrame:
+    """
+    Расчёт баланса N/P/K для всех полей хозяйства
+
+    Args:
+        db: Сессия БД
+        farm_id: ID хозяйства
+        season: Сезон (год); None - все сезоны
+
+    Returns:
+        DataFrame со строкой на поле-сезон (колонки BALANCE_COLUMNS), кг д.в./га
+    """
+    season_col = extract('year', Operation.operation_date)
+
+    def scoped(stmt):
+        stmt = stmt.where(Operation.farm_id == farm_id)
+        if season is not None:
+            stmt = stmt.where(season_col == season)
+        return stmt
+
+    # Внесение удобрений: группировка в SQL
+    applied = _frame(db, scoped(
+        select(
+            Operation.field_id.label("field_id"),
+            season_col.label("season"),
+            func.sum(FertilizerApplication.n_applied_kg).label("n_applied"),
+            func.sum(FertilizerApplication.p_applied_kg).label("p_applied"),
+            func.sum(FertilizerApplication.k_applied_kg).label("k_applied"),
+        )
+        .join(FertilizerApplication, FertilizerApplication.operation_id == Operation.id)
+        .where(Operation.operation_type == "fertilizing")
+    ).group_by(Operation.field_id, season_col), numeric=("n_applied", "p_applied", "k_applied"))
+
+    # Совмещённый посев с удобрениями: содержание NPK - из ref_fertilizers
+    sowing = _frame(db, scoped(
+        select(
+            Operation.field_id.label("field_id"),
+            season_col.label("season"),
+            SowingDetail.crop.label("sowing_crop"),
+            SowingDetail.combined_fertilizer_rate_kg_ha.label("fert_rate"),
+            Operation.area_processed_ha.label("sown_area"),
+            RefFertilizer.n_content.label("n_pct"),
+            RefFertilizer.p2o5_content.label("p_pct"),
+            RefFertilizer.k2o_content.label("k_pct"),
+        )
+        .join(SowingDetail, SowingDetail.operation_id == Operation.id)
+        .outerjoin(RefFertilizer, RefFertilizer.id == SowingDetail.ref_fertilizer_id)
+        .where(Operation.operation_type == "sowing")
+    ), numeric=("fert_rate", "sown_area", "n_pct", "p_pct", "k_pct"))
+
+    # Урожай: взвешенная по площади урожайность; вынос на 1 т - из ref_crops
+    # (потребность культуры задана на среднюю урожайность)
+    typical_yield = func.nullif(RefCrop.typical_yield_avg, 0)
+    harvest = _frame(db, scoped(
+        select(
+            Operation.field_id.label("field_id"),
+            season_col.label("season"),
+            HarvestData.crop.label("harvest_crop"),
+            HarvestData.yield_t_ha.label("yield_t_ha"),
+            HarvestData.total_yield_t.label("total_yield_t"),
+            Operation.area_processed_ha.label("harvested_area"),
+            (RefCrop.n_need_kg_ha / typical_yield).label("n_per_t"),
+            (RefCrop.p2o5_need_kg_ha / typical_yield).label("p_per_t"),
+            (RefCrop.k2o_need_kg_ha / typical_yield).label("k_per_t"),
+        )
+        .join(HarvestData, HarvestData.operation_id == Operation.id)
+        .outerjoin(RefCrop, RefCrop.id == HarvestData.ref_crop_id)
+        .where(Operation.operation_type == "harvest")
+    ), numeric=("yield_t_ha", "total_yield_t", "harvested_area", "n_per_t", "p_per_t", "k_per_t"))
+
+    fields = _frame(db, select(
+        Field.id.label("field_id"),
+        Field.field_code.label("field_code"),
+        Field.name.label("field_name"),
+        Field.area_ha.label("area_ha"),
+    ).where(Field.farm_id == farm_id))
+
+    # ---- Приход с совмещённым посевом
+    if not sowing.empty:
+        sowing = sowing.merge(fields[["field_id", "area_ha"]], on="field_id", how="left")
+        area = sowing["sown_area"].fillna(sowing["area_ha"]).fillna(0)
+        total_fert = sowing["fert_rate"].fillna(0) * area
+        for nutrient in ("n", "p", "k"):
+            sowing[f"{nutrient}_combined"] = total_fert * sowing[f"{nutrient}_pct"].fillna(0) / 100
+        sowing_agg = sowing.groupby(["field_id", "season"], as_index=False).agg(
+            sowing_crop=("sowing_crop", "first"),
+            n_combined=("n_combined", "sum"),
+            p_combined=("p_combined", "sum"),
+            k_combined=("k_combined", "sum"),
+        )
+    else:
+        sowing_agg = pd.DataFrame(columns=["field_id", "season", "sowing_crop", "n_combined", "p_combined", "k_combined"])
+
+    # ---- Урожайность на поле-сезон
+    if not harvest.empty:
+        harvest["weighted_area"] = harvest["harvested_area"].where(harvest["total_yield_t"].notna())
+        harvest_agg = harvest.groupby(["field_id", "season"], as_index=False).agg(
+            harvest_crop=("harvest_crop", "first"),
+            n_per_t=("n_per_t", "first"),
+            p_per_t=("p_per_t", "first"),
+            k_per_t=("k_per_t", "first"),
+            total_yield_t=("total_yield_t", "sum"),
+            weighted_area=("weighted_area", "sum"),
+            mean_yield=("yield_t_ha", "mean"),
+        )
+        weighted = harvest_agg["total_yield_t"] / harvest_agg["weighted_area"]
+        harvest_agg["yield_t_ha"] = weighted.where(harvest_agg["weighted_area"] > 0, harvest_agg["mean_yield"])
+        harvest_agg = harvest_agg[["field_id", "season", "harvest_crop", "yield_t_ha", "n_per_t", "p_per_t", "k_per_t"]]
+    else:
+        harvest_agg = pd.DataFrame(columns=["field_id", "season", "harvest_crop", "yield_t_ha",
+                                            "n_per_t", "p_per_t", "k_per_t"])
+
+    # ---- Сведение поле-сезон
+    keys = pd.concat([
+        applied[["field_id", "season"]],
+        sowing_agg[["field_id", "season"]],
+        harvest_agg[["field_id", "season"]],
+    ]).drop_duplicates()
+
+    if keys.empty:
+        return pd.DataFrame(columns=BALANCE_COLUMNS)
+
+    df = (
+        keys.astype({"field_id": "int64", "season": "int64"})
+        .merge(fields, on="field_id", how="inner")
+        .merge(applied.astype({"season": "int64"}), on=["field_id", "season"], how="left")
+        .merge(sowing_agg.astype({"season": "int64"}), on=["field_id", "season"], how="left")
+        .merge(harvest_agg.astype({"season": "int64"}), on=["field_id", "season"], how="left")
+    )
+
+    df["crop"] = df["harvest_crop"].fillna(df["sowing_crop"])
+
+    area = df["area_ha"].where(df["area_ha"] > 0)
+    for nutrient in ("n", "p", "k"):
+        applied_total = df[f"{nutrient}_applied"].fillna(0) + df[f"{nutrient}_combined"].fillna(0)
+        df[f"{nutrient}_applied_kg_ha"] = (applied_total / area).fillna(0)
+        df[f"{nutrient}_removed_kg_ha"] = (df["yield_t_ha"] * df[f"{nutrient}_per_t"]).fillna(0)
+        df[f"{nutrient}_balance_kg_ha"] = df[f"{nutrient}_applied_kg_ha"] - df[f"{nutrient}_removed_kg_ha"]
+
+    df = _attach_latest_soil(db, farm_id, df)
+
+    return df[BALANCE_COLUMNS].sort_values(["season", "field_code"]).reset_index(drop=True)
+
+
+def _attach_latest_soil(db: Session, farm_id: int, df: pd.DataFrame) -> pd.DataFrame:
+    """Последний агрохимический анализ поля на конец сезона (merge_asof)"""
+    soil = _frame(db, select(
+        Operation.field_id.label("field_id"),
+        Operation.operation_date.label("soil_analysis_date"),
+        AgrochemicalAnalysis.p2o5_mg_kg.label("soil_p2o5_mg_kg"),
+        AgrochemicalAnalysis.k2o_mg_kg.label("soil_k2o_mg_kg"),
+        AgrochemicalAnalysis.no3_mg_kg.label("soil_no3_mg_kg"),
+    ).join(
+        AgrochemicalAnalysis, AgrochemicalAnalysis.operation_id == Operation.id
+    ).where(Operation.farm_id == farm_id))
+
+    df["season_end"] = pd.to_datetime(df["season"].astype(str) + "-12-31").astype("datetime64[ns]")
+
+    if soil.empty:
+        for col in ("soil_p2o5_mg_kg", "soil_k2o_mg_kg", "soil_no3_mg_kg", "soil_analysis_date"):
+            df[col] = None
+        return df
+
+    soil["soil_analysis_date"] = pd.to_datetime(soil["soil_analysis_date"]).astype("datetime64[ns]")
+    soil["field_id"] = soil["field_id"].astype("int64")
+
+    merged = pd.merge_asof(
+        df.sort_values("season_end"),
+        soil.sort_values("soil_analysis_date"),
+        left_on="season_end",
+        right_on="soil_analysis_date",
+        by="field_id",
+        direction="backward",
+    )
+    return merged
+
+
+# ============================================================================
+# КЕШ ПО СЕЗОНАМ
+# ============================================================================
+
+_cache: Dict[Tuple[int, int], Tuple[tuple, pd.DataFrame]] = {}
+_cache_lock = threading.Lock()
+
+
+def _season_stamp(db: Session, farm_id: int, season: int) -> tuple:
+    """
+    Отпечаток данных, влияющих на баланс сезона
+
+    Последняя запись журнала изменений хозяйства (modules.change_log):
+    любая запись поля, операции или её деталей - в том числе правка на
+    месте и upsert импорта Excel, в том числе из другого процесса -
+    даёт новый отпечаток. Число операций до конца сезона ловит удаления
+    в обход журнала (каскады БД). Изменения справочных таблиц в журнал
+    не попадают: их синхронизация сбрасывает кеш сама
+    (invalidate_balance_cache).
+    """
+    season_col = extract('year', Operation.operation_date)
+    last_change = db.scalar(select(func.max(ChangeLog.id)).where(ChangeLog.farm_id == farm_id))
+    operations = db.scalar(
+        select(func.count(Operation.id)).where(Operation.farm_id == farm_id, season_col <= season)
+    )
+    return last_change, operations
+
+
+def get_season_balance(db: Session, farm_id: int, season: int) -> pd.DataFrame:
+    """
+    Баланс N/P/K сезона с кешированием
+
+    Args:
+        db: Сессия БД
+        farm_id: ID хозяйства
+        season: Сезон (год)
+
+    Returns:
+        DataFrame баланса (копия, безопасная для изменения)
+    """
+    stamp = _season_stamp(db, farm_id, season)
+    key = (farm_id, season)
+
+    with _cache_lock:
+        cached = _cache.get(key)
+    if cached is not None and cached[0] == stamp:
+        return cached[1].copy()
+
+    df = compute_balance(db, farm_id, season)
+    with _cache_lock:
+        _cache[key] = (stamp, df)
+    return df.copy()
+
+
+def invalidate_balance_cache(farm_id: Optional[int] = None) -> None:
+    """
+    Сброс кеша баланса (для хозяйства или целиком)
+
+    Вызывается путями записи в обход ORM: импорт Excel, синхронизация
+    офлайн-очереди, синхронизация справочных таблиц.
+    """
+    with _cache_lock:
+        if farm_id is None:
+            _cache.clear()
+        else:
+            for key in [k for k in _cache if k[0] == farm_id]:
+                del _cache[key]
+
+
+def invalidate_after_commit(db: Session, farm_id: Optional[int] = None) -> None:
+    """Сброс кеша баланса после коммита сессии (до него расчёт видел бы старые данные)"""
+    event.listen(db, "after_commit", lambda session: invalidate_balance_cache(farm_id), once=True)
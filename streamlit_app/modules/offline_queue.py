@@ -0,0 +1,690 @@
+"""
+Offline queue - Локальная очередь операций с пакетной синхронизацией
+
+Формы посева, обработки почвы и уборки в офлайн-режиме
+(OFFLINE_QUEUE_ENABLED) не ждут коммита в центральной БД: операция
+с UUID, созданным на клиенте, записывается в локальную SQLite (WAL) на
+устройстве, и отправка формы завершается сразу.
+
+Фоновый поток отправляет очередь пачками по OFFLINE_SYNC_BATCH:
+    - OFFLINE_SYNC_URL задан - POST /api/v1/operations/bulk (JSON, gzip)
+      от учётной записи устройства OFFLINE_SYNC_USERNAME (токены
+      обновляются сами) или с постоянным OFFLINE_SYNC_TOKEN;
+    - иначе - напрямую в БД приложения той же логикой apply_batch().
+
+Приём идемпотентен: повторная отправка операции с тем же client_uuid
+не создаёт дубликат. Если у поля уже есть операция того же типа на ту же
+дату (другой client_uuid), операция помечается конфликтом и ждёт
+решения пользователя: сохранить как отдельную или отменить.
+"""
+import atexit
+import gzip
+import json
+import logging
+import sqlite3
+import threading
+import urllib.error
+import urllib.parse
+import urllib.request
+import uuid
+from datetime import date, datetime
+from pathlib import Path
+from typing import Any, Dict, Hashable, Iterable, List, Optional, Tuple
+
+from sqlalchemy import Date, DateTime
+from sqlalchemy.orm import Session
+
+from modules.config import settings
+from modules.database import Operation, SessionLocal
+from modules.farm_cache import ALL_FARMS
+from modules.loading import OPERATION_DETAILS, OPERATION_COLLECTIONS
+from modules.nutrient_balance import invalidate_balance_cache
+
+logger = logging.getLogger(__name__)
+
+# Статусы локальной очереди
+PENDING = "pending"
+SYNCED = "synced"
+CONFLICT = "conflict"
+FAILED = "failed"
+DISCARDED = "discarded"
+
+# Решение конфликта: сохранить рядом с существующей операцией
+KEEP_BOTH = "keep_both"
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS queued_operations (
+    client_uuid TEXT PRIMARY KEY,
+    farm_id INTEGER NOT NULL,
+    field_id INTEGER NOT NULL,
+    operation_type TEXT NOT NULL,
+    operation_date TEXT NOT NULL,
+    payload TEXT NOT NULL,
+    status TEXT NOT NULL DEFAULT 'pending',
+    resolve TEXT,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    last_error TEXT,
+    server_id INTEGER,
+    conflict_with INTEGER,
+    created_at TEXT NOT NULL,
+    synced_at TEXT
+);
+CREATE INDEX IF NOT EXISTS ix_queued_operations_status ON queued_operations (status, created_at);
+"""
+
+
+def _json_default(value):
+    if isinstance(value, (date, datetime)):
+        return value.isoformat()
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+# Колонки, которые никогда не берутся из присланных данных: import_key и
+# source_hash принадлежат импорту Excel и позволили бы перехватить его строку
+_PROTECTED_COLUMNS = {"id", "operation_id", "client_uuid", "import_key", "source_hash", "created_at", "updated_at"}
+
+
+def _coerce(model, values: Dict[str, Any]) -> Dict[str, Any]:
+    """Значения из JSON в типы колонок модели; неизвестные ключи отбрасываются"""
+    columns = model.__table__.columns
+    result = {}
+    for key, value in values.items():
+        if key not in columns or key in _PROTECTED_COLUMNS:
+            continue
+        column_type = columns[key].type
+        if isinstance(value, str) and isinstance(column_type, DateTime):
+            value = datetime.fromisoformat(value)
+        elif isinstance(value, str) and isinstance(column_type, Date):
+            value = date.fromisoformat(value[:10])
+        result[key] = value
+    return result
+
+
+def _detail_class(name: str):
+    if name not in OPERATION_DETAILS and name not in OPERATION_COLLECTIONS:
+        raise ValueError(f"Unknown operation detail: {name}")
+    return Operation.__mapper__.relationships[name].mapper.class_
+
+
+def build_operation(operation: Dict[str, Any], details: Optional[Dict[str, Any]] = None,
+                    client_uuid: Optional[str] = None) -> Operation:
+    """
+    Операция с деталями из словарей
+
+    Args:
+        operation: Поля Operation
+        details: {"sowing_details": {...}} или {"fertilizer_applications": [{...}, ...]}
+        client_uuid: UUID операции
+
+    Returns:
+        Несохранённый объект Operation
+    """
+    op = Operation(**_coerce(Operation, operation), client_uuid=client_uuid)
+    for name, values in (details or {}).items():
+        detail_class = _detail_class(name)
+        if name in OPERATION_COLLECTIONS:
+            setattr(op, name, [detail_class(**_coerce(detail_class, v)) for v in values])
+        else:
+            setattr(op, name, detail_class(**_coerce(detail_class, values)))
+    return op
+
+
+def apply_batch(db: Session, items: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """
+    Идемпотентный приём пачки операций (без commit)
+
+    Уже принятые client_uuid и конфликтующие операции ищутся двумя
+    запросами на всю пачку. Каждая операция пишется в своей точке
+    сохранения: ошибка одной не отменяет остальные.
+
+    Args:
+        db: Сессия БД
+        items: [{"client_uuid", "operation": {...}, "details": {...}, "resolve": None|"keep_both"}]
+
+    Returns:
+        [{"client_uuid", "status": created|duplicate|conflict|error, "operation_id", "conflict_with", "error"}]
+    """
+    uuids = [item["client_uuid"] for item in items]
+    accepted = dict(db.query(Operation.client_uuid, Operation.id).filter(Operation.client_uuid.in_(uuids)))
+
+    values = {item["client_uuid"]: _coerce(Operation, item["operation"]) for item in items}
+    taken: Dict[Tuple, int] = {}
+    field_ids = {v.get("field_id") for v in values.values()}
+    dates = {v.get("operation_date") for v in values.values()}
+    if field_ids and dates:
+        rows = db.query(Operation.id, Operation.field_id, Operation.operation_type, Operation.operation_date).filter(
+            Operation.field_id.in_(field_ids), Operation.operation_date.in_(dates)
+        )
+        for op_id, field_id, operation_type, operation_date in rows:
+            taken.setdefault((field_id, operation_type, operation_date), op_id)
+
+    results = []
+    for item in items:
+        client_uuid = item["client_uuid"]
+        result = {"client_uuid": client_uuid, "operation_id": None, "conflict_with": None, "error": None}
+        results.append(result)
+
+        if client_uuid in accepted:
+            result.update(status="duplicate", operation_id=accepted[client_uuid])
+            continue
+
+        op_values = values[client_uuid]
+        key = (op_values.get("field_id"), op_values.get("operation_type"), op_values.get("operation_date"))
+        if key in taken and item.get("resolve") != KEEP_BOTH:
+            result.update(status="conflict", conflict_with=taken[key])
+            continue
+
+        try:
+            with db.begin_nested():
+                op = build_operation(item["operation"], item.get("details"), client_uuid)
+                db.add(op)
+                db.flush()
+        except Exception as exc:
+            result.update(status="error", error=f"{type(exc).__name__}: {exc}"[:500])
+            continue
+
+        accepted[client_uuid] = op.id
+        taken.setdefault(key, op.id)
+        result.update(status="created", operation_id=op.id)
+
+    return results
+
+
+class OfflineQueue:
+    """
+    Локальная очередь операций в SQLite
+
+    Одно соединение на процесс под блокировкой; журнал WAL и
+    synchronous=NORMAL - запись в очередь занимает доли миллисекунды
+    и переживает перезапуск процесса.
+    """
+
+    def __init__(self, path: str):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._conn = sqlite3.connect(str(self.path), check_same_thread=False, isolation_level=None)
+        self._conn.row_factory = sqlite3.Row
+        self._lock = threading.Lock()
+        with self._lock:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("PRAGMA synchronous=NORMAL")
+            self._conn.executescript(_SCHEMA)
+
+    def enqueue(self, operation: Dict[str, Any], details: Optional[Dict[str, Any]] = None,
+                client_uuid: Optional[str] = None) -> str:
+        """
+        Постановка операции в очередь
+
+        Args:
+            operation: Поля Operation (farm_id, field_id, operation_type, operation_date обязательны)
+            details: Детали операции по имени связи
+            client_uuid: UUID (по умолчанию - новый)
+
+        Returns:
+            client_uuid
+        """
+        client_uuid = client_uuid or str(uuid.uuid4())
+        payload = json.dumps({"operation": operation, "details": details or {}},
+                             ensure_ascii=False, default=_json_default)
+        operation_date = operation["operation_date"]
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR IGNORE INTO queued_operations "
+                "(client_uuid, farm_id, field_id, operation_type, operation_date, payload, created_at) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (client_uuid, operation["farm_id"], operation["field_id"], operation["operation_type"],
+                 operation_date.isoformat() if hasattr(operation_date, "isoformat") else str(operation_date),
+                 payload, datetime.now().isoformat()),
+            )
+        return client_uuid
+
+    def pending(self, limit: int = 200) -> List[Dict[str, Any]]:
+        """Следующая пачка к отправке (в порядке постановки)"""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT client_uuid, payload, resolve FROM queued_operations "
+                "WHERE status = ? ORDER BY created_at LIMIT ?", (PENDING, limit)
+            ).fetchall()
+        items = []
+        for row in rows:
+            payload = json.loads(row["payload"])
+            items.append({"client_uuid": row["client_uuid"], "operation": payload["operation"],
+                          "details": payload["details"], "resolve": row["resolve"]})
+        return items
+
+    def apply_results(self, results: Iterable[Dict[str, Any]]) -> Dict[str, int]:
+        """
+        Перенос ответа сервера в очередь
+
+        Returns:
+            {статус ответа: количество}
+        """
+        now = datetime.now().isoformat()
+        summary: Dict[str, int] = {}
+        with self._lock:
+            self._conn.execute("BEGIN")
+            for r in results:
+                summary[r["status"]] = summary.get(r["status"], 0) + 1
+                if r["status"] in ("created", "duplicate"):
+                    self._conn.execute(
+                        "UPDATE queued_operations SET status = ?, server_id = ?, synced_at = ?, last_error = NULL "
+                        "WHERE client_uuid = ?", (SYNCED, r["operation_id"], now, r["client_uuid"]))
+                elif r["status"] == "conflict":
+                    self._conn.execute(
+                        "UPDATE queued_operations SET status = ?, conflict_with = ? WHERE client_uuid = ?",
+                        (CONFLICT, r["conflict_with"], r["client_uuid"]))
+                else:
+                    self._conn.execute(
+                        "UPDATE queued_operations SET status = ?, attempts = attempts + 1, last_error = ? "
+                        "WHERE client_uuid = ?", (FAILED, r.get("error"), r["client_uuid"]))
+            self._conn.execute("COMMIT")
+        return summary
+
+    def record_failure(self, client_uuids: Iterable[str], error: str) -> None:
+        """Пачка не доставлена (нет связи) - операции остаются в очереди"""
+        with self._lock:
+            self._conn.executemany(
+                "UPDATE queued_operations SET attempts = attempts + 1, last_error = ? WHERE client_uuid = ?",
+                [(error[:500], u) for u in client_uuids])
+
+    def resolve(self, client_uuid: str, action: str, farm_id: Optional[int] = None) -> None:
+        """
+        Решение по конфликту или ошибке
+
+        Args:
+            client_uuid: UUID операции
+            action: "keep_both" - отправить снова как отдельную, "retry" - повторить, "discard" - отменить
+            farm_id: Хозяйство пользователя; операции других хозяйств не меняются (None - любые)
+        """
+        if action == "discard":
+            sql, args = "UPDATE queued_operations SET status = ? WHERE client_uuid = ?", (DISCARDED, client_uuid)
+        elif action in (KEEP_BOTH, "retry"):
+            sql = "UPDATE queued_operations SET status = ?, resolve = COALESCE(?, resolve) WHERE client_uuid = ?"
+            args = (PENDING, KEEP_BOTH if action == KEEP_BOTH else None, client_uuid)
+        else:
+            raise ValueError(f"Unknown resolve action: {action}")
+        if farm_id is not None:
+            sql, args = sql + " AND farm_id = ?", (*args, farm_id)
+        with self._lock:
+            self._conn.execute(sql, args)
+
+    def counts(self, farm_id: Optional[int] = None) -> Dict[str, int]:
+        """Число операций по статусам (farm_id - только этого хозяйства)"""
+        where, args = ("WHERE farm_id = ? ", (farm_id,)) if farm_id is not None else ("", ())
+        with self._lock:
+            rows = self._conn.execute(
+                f"SELECT status, COUNT(*) FROM queued_operations {where}GROUP BY status", args
+            ).fetchall()
+        return {status: count for status, count in rows}
+
+    def items(self, statuses: Iterable[str], limit: int = 100, farm_id: Optional[int] = None) -> List[Dict[str, Any]]:
+        """Операции с указанными статусами (для экрана синхронизации; farm_id - только этого хозяйства)"""
+        statuses = list(statuses)
+        where, args = f"status IN ({','.join('?' * len(statuses))})", list(statuses)
+        if farm_id is not None:
+            where, args = where + " AND farm_id = ?", args + [farm_id]
+        with self._lock:
+            rows = self._conn.execute(
+                f"SELECT client_uuid, farm_id, field_id, operation_type, operation_date, status, attempts, "
+                f"last_error, conflict_with, created_at FROM queued_operations "
+                f"WHERE {where} ORDER BY created_at LIMIT ?",
+                (*args, limit),
+            ).fetchall()
+        return [dict(row) for row in rows]
+
+    def purge(self, before: datetime) -> int:
+        """Удаление синхронизированных и отменённых операций старше before"""
+        with self._lock:
+            cursor = self._conn.execute(
+                "DELETE FROM queued_operations WHERE status IN (?, ?) AND created_at < ?",
+                (SYNCED, DISCARDED, before.isoformat()))
+        return cursor.rowcount
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+
+class DirectTransport:
+    """Синхронизация напрямую в БД приложения"""
+
+    def __init__(self, session_factory=None):
+        self.session_factory = session_factory or SessionLocal
+
+    def send(self, items: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        db = self.session_factory()
+        try:
+            results = apply_batch(db, items)
+            db.commit()
+            return results
+        except Exception:
+            db.rollback()
+            raise
+        finally:
+            db.close()
+
+
+class SyncAuthError(Exception):
+    """Сервер отклонил учётные данные синхронизации (401/403)"""
+
+    def __init__(self, status: int, detail: str):
+        super().__init__(detail)
+        self.status = status
+
+
+def _http_detail(exc: urllib.error.HTTPError) -> str:
+    """Текст ошибки из ответа FastAPI ({"detail": ...}) или код ответа"""
+    try:
+        detail = json.loads(exc.read() or b"{}").get("detail")
+    except (ValueError, AttributeError, OSError):
+        detail = None
+    if isinstance(detail, list):
+        # Ошибки валидации pydantic
+        detail = "; ".join(f"{'.'.join(map(str, e.get('loc', ())))}: {e.get('msg')}" for e in detail)
+    return f"HTTP {exc.code}: {detail or exc.reason}"[:500]
+
+
+class HttpTransport:
+    """
+    Синхронизация через POST /api/v1/operations/bulk (тело - JSON в gzip)
+
+    С username/password (учётная запись устройства) токены получаются
+    через /api/v1/auth/login и обновляются через /api/v1/auth/refresh,
+    когда сервер отвечает 401. Без них используется постоянный token.
+    Отказ в доступе - SyncAuthError, прочие ответы с ошибкой - HTTPError.
+    """
+
+    def __init__(self, base_url: str, token: Optional[str] = None, timeout: float = 30,
+                 username: Optional[str] = None, password: Optional[str] = None):
+        self.base_url = base_url.rstrip("/")
+        self.url = self.base_url + "/api/v1/operations/bulk"
+        self.token = token
+        self.username = username
+        self.password = password
+        self.timeout = timeout
+        self._refresh_token: Optional[str] = None
+        self._auth_lock = threading.Lock()
+
+    def _post(self, path: str, data: bytes, headers: Dict[str, str]) -> Dict[str, Any]:
+        request = urllib.request.Request(self.base_url + path, data=data, method="POST")
+        for name, value in headers.items():
+            request.add_header(name, value)
+        with urllib.request.urlopen(request, timeout=self.timeout) as response:
+            body = response.read()
+            if response.headers.get("Content-Encoding") == "gzip":
+                body = gzip.decompress(body)
+        return json.loads(body)
+
+    def _new_tokens(self) -> Dict[str, Any]:
+        """Новая пара токенов: по refresh token, пока он действует, иначе вход"""
+        if self._refresh_token:
+            query = urllib.parse.urlencode({"refresh_token": self._refresh_token})
+            try:
+                return self._post(f"/api/v1/auth/refresh?{query}", b"", {})
+            except urllib.error.HTTPError as exc:
+                if exc.code != 401:
+                    raise
+        form = urllib.parse.urlencode({"username": self.username, "password": self.password or ""})
+        return self._post("/api/v1/auth/login", form.encode("utf-8"),
+                          {"Content-Type": "application/x-www-form-urlencoded"})
+
+    def _authenticate(self, rejected: Optional[str] = None) -> Optional[str]:
+        """Действующий access token; rejected - токен, который сервер отклонил"""
+        if not self.username:
+            return self.token
+        with self._auth_lock:
+            if self.token and self.token != rejected:
+                # Уже получен (или обновлён другим потоком)
+                return self.token
+            try:
+                tokens = self._new_tokens()
+            except urllib.error.HTTPError as exc:
+                if exc.code in (401, 403, 429):
+                    raise SyncAuthError(exc.code, _http_detail(exc)) from exc
+                raise
+            self.token, self._refresh_token = tokens["access_token"], tokens.get("refresh_token")
+            return self.token
+
+    def _send_batch(self, body: bytes, token: Optional[str]) -> List[Dict[str, Any]]:
+        headers = {"Content-Type": "application/json", "Content-Encoding": "gzip", "Accept-Encoding": "gzip"}
+        if token:
+            headers["Authorization"] = f"Bearer {token}"
+        try:
+            return self._post("/api/v1/operations/bulk", body, headers)["results"]
+        except urllib.error.HTTPError as exc:
+            if exc.code in (401, 403):
+                raise SyncAuthError(exc.code, _http_detail(exc)) from exc
+            raise
+
+    def send(self, items: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        body = gzip.compress(json.dumps({"items": items}, ensure_ascii=False, default=_json_default).encode("utf-8"))
+        token = self._authenticate()
+        try:
+            return self._send_batch(body, token)
+        except SyncAuthError as exc:
+            if not self.username or exc.status != 401:
+                raise
+        # Токен истёк - обновление и один повтор
+        return self._send_batch(body, self._authenticate(rejected=token))
+
+
+class SyncWorker:
+    """
+    Фоновая отправка очереди
+
+    Поток просыпается каждые interval секунд или сразу после постановки
+    операции (notify). Пока связи нет (или сервер отвечает 5xx), пауза
+    между попытками растёт вдвое до max_backoff. Пачку, отклонённую
+    целиком (4xx), делят пополам, пока ошибка не останется за одной
+    операцией - она помечается failed с ответом сервера. Отказ в доступе
+    (auth_error) ждёт max_backoff или notify.
+    """
+
+    def __init__(self, queue: OfflineQueue, transport, batch_size: int = 200,
+                 interval: float = 30, max_backoff: float = 600):
+        self.queue = queue
+        self.transport = transport
+        self.batch_size = max(1, batch_size)
+        self.interval = max(0.1, interval)
+        self.max_backoff = max(self.interval, max_backoff)
+        self._wake = threading.Event()
+        self._stopped = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._start_lock = threading.Lock()
+        self._sync_lock = threading.Lock()
+        self.last_sync: Optional[datetime] = None
+        self.last_error: Optional[str] = None
+        self.auth_error: Optional[str] = None
+
+    def notify(self) -> None:
+        """Разбудить поток (новая операция в очереди)"""
+        self._ensure_started()
+        self._wake.set()
+
+    def _send(self, items: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """Отправка пачки; отклонённая целиком пачка делится пополам"""
+        try:
+            return self.transport.send(items)
+        except urllib.error.HTTPError as exc:
+            if exc.code >= 500 or exc.code == 429:
+                raise
+            if len(items) == 1:
+                return [{"client_uuid": items[0]["client_uuid"], "status": "error", "error": _http_detail(exc)}]
+            middle = len(items) // 2
+            return self._send(items[:middle]) + self._send(items[middle:])
+
+    def sync_once(self) -> Dict[str, int]:
+        """
+        Отправка очереди пачками до опустошения или первой ошибки связи
+
+        Raises:
+            SyncAuthError: Сервер отклонил учётные данные (операции остаются в очереди)
+            urllib.error.URLError, OSError: Нет связи или ошибка сервера 5xx
+
+        Returns:
+            {статус ответа: количество} по всем отправленным пачкам
+        """
+        summary: Dict[str, int] = {}
+        with self._sync_lock:
+            while True:
+                items = self.queue.pending(self.batch_size)
+                if not items:
+                    break
+                try:
+                    results = self._send(items)
+                except SyncAuthError as exc:
+                    self.auth_error = str(exc)
+                    raise
+                except (urllib.error.URLError, OSError, TimeoutError) as exc:
+                    self.last_error = f"{type(exc).__name__}: {exc}"
+                    self.queue.record_failure([i["client_uuid"] for i in items], self.last_error)
+                    raise
+                for status, count in self.queue.apply_results(results).items():
+                    summary[status] = summary.get(status, 0) + count
+                created = {r["client_uuid"] for r in results if r["status"] == "created"}
+                for farm_id in {i["operation"]["farm_id"] for i in items if i["client_uuid"] in created}:
+                    invalidate_balance_cache(farm_id)
+                self.last_sync = datetime.now()
+                self.last_error = self.auth_error = None
+                if len(items) < self.batch_size:
+                    break
+        return summary
+
+    def stop(self, timeout: float = 5.0) -> None:
+        self._stopped.set()
+        self._wake.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+
+    def _ensure_started(self) -> None:
+        if self._thread is not None and self._thread.is_alive():
+            return
+        with self._start_lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._stopped.clear()
+                self._thread = threading.Thread(target=self._run, name="offline-sync", daemon=True)
+                self._thread.start()
+
+    def _run(self) -> None:
+        delay = self.interval
+        while not self._stopped.is_set():
+            try:
+                self.sync_once()
+                delay = self.interval
+            except SyncAuthError as exc:
+                # Учётные данные сами не исправятся - до notify или max_backoff
+                logger.error("Offline sync rejected by server: %s", exc)
+                delay = self.max_backoff
+            except Exception as exc:
+                self.last_error = self.last_error or f"{type(exc).__name__}: {exc}"
+                logger.warning("Offline sync failed, retry in %.0f s: %s", delay, self.last_error)
+                delay = min(self.max_backoff, delay * 2)
+            self._wake.wait(delay)
+            self._wake.clear()
+
+
+_worker: Optional[SyncWorker] = None
+_worker_lock = threading.Lock()
+
+
+def get_worker() -> SyncWorker:
+    """Очередь и поток синхронизации процесса (создаются при первом обращении)"""
+    global _worker
+    if _worker is None:
+        with _worker_lock:
+            if _worker is None:
+                transport = (HttpTransport(settings.OFFLINE_SYNC_URL, settings.OFFLINE_SYNC_TOKEN,
+                                           username=settings.OFFLINE_SYNC_USERNAME,
+                                           password=settings.OFFLINE_SYNC_PASSWORD)
+                             if settings.OFFLINE_SYNC_URL else DirectTransport())
+                _worker = SyncWorker(
+                    OfflineQueue(settings.OFFLINE_QUEUE_PATH),
+                    transport,
+                    batch_size=settings.OFFLINE_SYNC_BATCH,
+                    interval=settings.OFFLINE_SYNC_INTERVAL_SEC,
+                    max_backoff=settings.OFFLINE_SYNC_MAX_BACKOFF_SEC,
+                )
+                atexit.register(_worker.stop)
+    return _worker
+
+
+def save_operation(db: Session, operation: Dict[str, Any], details: Optional[Dict[str, Any]] = None) -> Tuple[str, Optional[int]]:
+    """
+    Сохранение операции из формы
+
+    В офлайн-режиме операция ставится в локальную очередь и сразу
+    возвращается; иначе записывается в БД в сессии страницы.
+
+    Args:
+        db: Сессия страницы
+        operation: Поля Operation
+        details: Детали по имени связи ({"sowing_details": {...}})
+
+    Returns:
+        (client_uuid, id операции или None, если она ещё в очереди)
+    """
+    client_uuid = str(uuid.uuid4())
+    if settings.OFFLINE_QUEUE_ENABLED:
+        worker = get_worker()
+        worker.queue.enqueue(operation, details, client_uuid)
+        worker.notify()
+        return client_uuid, None
+
+    op = build_operation(operation, details, client_uuid)
+    db.add(op)
+    db.commit()
+    return client_uuid, op.id
+
+
+def render_sync_status(scope: Optional[Hashable]) -> None:
+    """
+    Блок состояния очереди: ожидающие, конфликты, ошибки, ручная синхронизация
+
+    Args:
+        scope: Область пользователя (modules.farm_cache.user_scope()): операции
+            чужих хозяйств не показываются и не меняются
+    """
+    import streamlit as st
+
+    if not settings.OFFLINE_QUEUE_ENABLED or scope is None:
+        return
+
+    farm_id = None if scope == ALL_FARMS else scope
+    worker = get_worker()
+    counts = worker.queue.counts(farm_id)
+    waiting = counts.get(PENDING, 0)
+    problems = worker.queue.items([CONFLICT, FAILED], limit=50, farm_id=farm_id)
+    label = f"📶 Синхронизация: {waiting} в очереди" + (f", {len(problems)} требуют решения" if problems else "")
+
+    with st.expander(label, expanded=bool(problems)):
+        col1, col2, col3 = st.columns(3)
+        col1.metric("В очереди", waiting)
+        col2.metric("Синхронизировано", counts.get(SYNCED, 0))
+        col3.metric("Конфликты / ошибки", len(problems))
+        if worker.last_sync:
+            st.caption(f"Последняя синхронизация: {worker.last_sync:%d.%m.%Y %H:%M:%S}")
+        if worker.auth_error:
+            st.error(f"🔒 Сервер отклонил учётную запись синхронизации: {worker.auth_error}")
+        elif worker.last_error:
+            st.warning(f"Нет связи с сервером: {worker.last_error}")
+
+        if st.button("🔄 Синхронизировать сейчас", key="offline_sync_now", disabled=not waiting):
+            try:
+                summary = worker.sync_once()
+                st.success(f"Отправлено: {sum(summary.values())}")
+            except Exception as e:
+                st.error(f"❌ Синхронизация не удалась: {e}")
+
+        for item in problems:
+            title = f"{item['operation_type']} · поле {item['field_id']} · {item['operation_date']}"
+            if item["status"] == CONFLICT:
+                st.warning(f"⚠️ {title}: на эту дату уже есть операция #{item['conflict_with']}")
+                actions = [("Сохранить отдельно", KEEP_BOTH), ("Отменить", "discard")]
+            else:
+                st.error(f"❌ {title}: {item['last_error']}")
+                actions = [("Повторить", "retry"), ("Отменить", "discard")]
+            for col, (caption, action) in zip(st.columns(len(actions)), actions):
+                if col.button(caption, key=f"offline_{action}_{item['client_uuid']}"):
+                    worker.queue.resolve(item["client_uuid"], action, farm_id)
+                    worker.notify()
+                    st.rerun()
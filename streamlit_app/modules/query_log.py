@@ -0,0 +1,241 @@
+"""
+Query log - Инструментирование SQL: задержки, журнал медленных запросов, N+1
+
+Хуки before/after_cursor_execute на движке замеряют каждый запрос
+и агрегируют его по нормализованному тексту (литералы и списки IN
+заменены на ?). Запросы дольше SLOW_QUERY_MS попадают в скользящий
+журнал медленных запросов с указанием страницы.
+
+Область (scope) - один перезапуск страницы: begin_scope() вызывается
+в начале страницы (require_auth). Если один и тот же нормализованный
+запрос выполнен в области N_PLUS_ONE_THRESHOLD раз, это фиксируется
+как вероятный N+1.
+"""
+import contextvars
+import os
+import re
+import sys
+import threading
+import time
+from collections import Counter, deque
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+
+from sqlalchemy import event
+
+from modules.config import settings
+from modules.database import engine
+
+# Ключ агрегата, когда уникальных запросов больше max_statements
+OTHER_STATEMENTS = "<other>"
+
+_STRING_RE = re.compile(r"'(?:[^']|'')*'")
+_NUMBER_RE = re.compile(r"(?<![\w.])-?\d+(?:\.\d+)?\b")
+_IN_LIST_RE = re.compile(r"\bIN\s*\((?:\s*(?:\?|%\(\w+\)s|%s|:\w+)\s*,?)+\)", re.IGNORECASE)
+_SPACE_RE = re.compile(r"\s+")
+
+
+def normalize_statement(statement: str) -> str:
+    """
+    Нормализация SQL для группировки
+
+    Args:
+        statement: Текст запроса
+
+    Returns:
+        Запрос без литералов, с одним плейсхолдером в списках IN
+    """
+    text = _STRING_RE.sub("?", statement)
+    text = _NUMBER_RE.sub("?", text)
+    text = _IN_LIST_RE.sub("IN (?...)", text)
+    return _SPACE_RE.sub(" ", text).strip()
+
+
+class _Scope:
+    """Один перезапуск страницы (или один HTTP-запрос)"""
+
+    __slots__ = ("name", "counts", "flagged", "queries", "ms")
+
+    def __init__(self, name: str):
+        self.name = name
+        self.counts: Counter = Counter()
+        self.flagged: set = set()
+        self.queries = 0
+        self.ms = 0.0
+
+
+_current_scope: contextvars.ContextVar[Optional[_Scope]] = contextvars.ContextVar("query_scope", default=None)
+
+
+def _caller_page() -> str:
+    """Страница приложения в стеке вызова (без области)"""
+    frame = sys._getframe(2)
+    depth = 0
+    while frame is not None and depth < 60:
+        filename = frame.f_code.co_filename
+        if f"{os.sep}pages{os.sep}" in filename or filename.endswith(f"{os.sep}app.py"):
+            return os.path.basename(filename)
+        frame = frame.f_back
+        depth += 1
+    return threading.current_thread().name
+
+
+class QueryLog:
+    """
+    Статистика запросов процесса
+
+    Агрегаты по нормализованному запросу: число, суммарное и максимальное
+    время, строки и страницы-источники. Журналы медленных запросов и N+1 -
+    ограниченные deque.
+    """
+
+    def __init__(
+        self,
+        slow_ms: float = 200,
+        slow_log_size: int = 200,
+        n_plus_one_threshold: int = 10,
+        max_statements: int = 500,
+    ):
+        self.slow_ms = slow_ms
+        self.n_plus_one_threshold = max(2, n_plus_one_threshold)
+        self.max_statements = max_statements
+        self._stats: Dict[str, Dict[str, Any]] = {}
+        self._slow: deque = deque(maxlen=slow_log_size)
+        self._n_plus_one: deque = deque(maxlen=slow_log_size)
+        self._lock = threading.Lock()
+        self.started_at = datetime.now()
+
+    # ------------------------------------------------------------------
+    # Подключение к движку и области
+    # ------------------------------------------------------------------
+
+    def install(self, bind) -> None:
+        """Регистрация хуков на движке (повторный вызов безопасен)"""
+        if not event.contains(bind, "before_cursor_execute", self._before):
+            event.listen(bind, "before_cursor_execute", self._before)
+            event.listen(bind, "after_cursor_execute", self._after)
+
+    def begin_scope(self, name: Optional[str] = None) -> None:
+        """
+        Начало новой области (перезапуска страницы)
+
+        Args:
+            name: Имя страницы; по умолчанию - файл страницы из стека вызова
+        """
+        _current_scope.set(_Scope(name or _caller_page()))
+
+    # ------------------------------------------------------------------
+    # Хуки
+    # ------------------------------------------------------------------
+
+    @staticmethod
+    def _before(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("query_log_started", []).append(time.perf_counter())
+
+    def _after(self, conn, cursor, statement, parameters, context, executemany):
+        started = conn.info.get("query_log_started")
+        if not started:
+            return
+        elapsed_ms = (time.perf_counter() - started.pop()) * 1000
+        rows = cursor.rowcount if cursor.rowcount is not None and cursor.rowcount >= 0 else None
+        normalized = normalize_statement(statement)
+
+        scope = _current_scope.get()
+        source = scope.name if scope is not None else _caller_page()
+        repeated = 0
+        if scope is not None:
+            scope.queries += 1
+            scope.ms += elapsed_ms
+            scope.counts[normalized] += 1
+            if scope.counts[normalized] >= self.n_plus_one_threshold and normalized not in scope.flagged:
+                scope.flagged.add(normalized)
+                repeated = scope.counts[normalized]
+
+        now = datetime.now()
+        with self._lock:
+            key = normalized
+            if key not in self._stats and len(self._stats) >= self.max_statements:
+                key = OTHER_STATEMENTS
+            stat = self._stats.get(key)
+            if stat is None:
+                stat = self._stats[key] = {
+                    "statement": key, "count": 0, "total_ms": 0.0, "max_ms": 0.0,
+                    "rows": 0, "sources": set(),
+                }
+            stat["count"] += 1
+            stat["total_ms"] += elapsed_ms
+            stat["max_ms"] = max(stat["max_ms"], elapsed_ms)
+            stat["rows"] += rows or 0
+            if len(stat["sources"]) < 10:
+                stat["sources"].add(source)
+
+            if elapsed_ms >= self.slow_ms:
+                self._slow.append({
+                    "at": now, "ms": round(elapsed_ms, 1), "rows": rows,
+                    "source": source, "statement": normalized,
+                })
+            if repeated:
+                self._n_plus_one.append({
+                    "at": now, "source": source, "repeats": repeated, "statement": normalized,
+                })
+
+    # ------------------------------------------------------------------
+    # Отчёты
+    # ------------------------------------------------------------------
+
+    def top_statements(self, limit: int = 20, order_by: str = "total_ms") -> List[Dict[str, Any]]:
+        """Самые затратные запросы (по total_ms, count или max_ms)"""
+        with self._lock:
+            stats = [dict(s, sources=sorted(s["sources"])) for s in self._stats.values()]
+        for s in stats:
+            s["avg_ms"] = round(s["total_ms"] / s["count"], 2) if s["count"] else 0.0
+            s["total_ms"] = round(s["total_ms"], 1)
+            s["max_ms"] = round(s["max_ms"], 1)
+        return sorted(stats, key=lambda s: s[order_by], reverse=True)[:limit]
+
+    def slow_queries(self) -> List[Dict[str, Any]]:
+        """Журнал медленных запросов (новые сверху)"""
+        with self._lock:
+            return list(reversed(self._slow))
+
+    def n_plus_one(self) -> List[Dict[str, Any]]:
+        """Обнаруженные повторы запроса в одной области (новые сверху)"""
+        with self._lock:
+            return list(reversed(self._n_plus_one))
+
+    def summary(self) -> Dict[str, Any]:
+        """Сводка для страницы администратора и экспорта"""
+        with self._lock:
+            count = sum(s["count"] for s in self._stats.values())
+            total_ms = sum(s["total_ms"] for s in self._stats.values())
+            return {
+                "since": self.started_at,
+                "statements": len(self._stats),
+                "queries": count,
+                "total_ms": round(total_ms, 1),
+                "slow": len(self._slow),
+                "n_plus_one": len(self._n_plus_one),
+                "slow_ms": self.slow_ms,
+            }
+
+    def reset(self) -> None:
+        with self._lock:
+            self._stats.clear()
+            self._slow.clear()
+            self._n_plus_one.clear()
+            self.started_at = datetime.now()
+
+
+query_log = QueryLog(
+    slow_ms=settings.SLOW_QUERY_MS,
+    slow_log_size=settings.SLOW_QUERY_LOG_SIZE,
+    n_plus_one_threshold=settings.N_PLUS_ONE_THRESHOLD,
+)
+
+if settings.QUERY_LOG_ENABLED:
+    query_log.install(engine)
+
+
+def begin_scope(name: Optional[str] = None) -> None:
+    """Начало области страницы в общем журнале (см. QueryLog.begin_scope)"""
+    query_log.begin_scope(name)
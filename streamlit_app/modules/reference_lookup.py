@@ -0,0 +1,341 @@
+"""
+Reference lookup - Сопоставление введённых названий со справочниками
+
+Культуры, удобрения, СЗР и действующие вещества вводятся свободным текстом
+(SowingDetail.crop, FertilizerApplication.fertilizer_name,
+PesticideApplication.pesticide_name, колонки Excel). Справочник один раз
+компилируется в таблицы поиска:
+
+- хеш-таблица нормализованных названий (регистр, ё/е, пунктуация и
+  пробелы не различаются): точное совпадение;
+- таблица синонимов: явные (ALIASES) и выведенные из названия - часть до
+  скобок и в скобках ("Карбамид (Мочевина)"), название без концентрации
+  ("Фастак (100 г/л)" -> "Фастак"). Синоним, ведущий к двум названиям,
+  отбрасывается;
+- индекс триграмм: подсказки для опечаток по коэффициенту Дайса.
+
+resolve() разбирает колонку целиком: нормализуются и сопоставляются
+словарём только уникальные значения (pd.factorize), нечёткий поиск -
+только для уникальных несопоставленных, результат раскладывается
+по строкам через коды. Колонка в 100 тыс. строк
+с сотней разных названий обходится в сотню поисков, а не в 100 тыс.
+"""
+import re
+import time
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from modules.config import settings
+from utils.reference_loader import load_reference, reference_version
+
+# Справочник -> файлы: (имя файла, вложенный по категориям)
+CATALOGS = {
+    "crop": (("crops.json", False),),
+    "fertilizer": (("fertilizers.json", True),),
+    "pesticide": (("pesticides.json", True), ("desiccation_products.json", False)),
+    "active_ingredient": (("active_ingredients.json", False),),
+}
+
+# Явные синонимы: написание -> название в справочнике
+ALIASES = {
+    "crop": {
+        "Яровая пшеница": "Пшеница яровая",
+        "Озимая пшеница": "Пшеница озимая",
+        "Лен": "Лен масличный",
+        "Масличный лен": "Лен масличный",
+        "Подсолнух": "Подсолнечник",
+        "Травы": "Многолетние травы",
+    },
+    "fertilizer": {
+        "Селитра аммиачная": "Аммиачная селитра",
+        "NPK 16:16:16": "Нитроаммофоска NPK 16:16:16",
+        "Нитроаммофоска": "Нитроаммофоска NPK 16:16:16",
+        "КАС": "КАС-32",
+        "Суперфосфат": "Простой суперфосфат",
+        "Хлорид калия": "Хлористый калий",
+    },
+    "pesticide": {},
+    "active_ingredient": {
+        "2,4-Дихлорфеноксиуксусная кислота": "2,4-Д",
+        "Дикват дибромид": "Дикват",
+    },
+}
+
+MATCH_EXACT = "exact"
+MATCH_ALIAS = "alias"
+MATCH_FUZZY = "fuzzy"
+
+RESOLVE_COLUMNS = ["value", "canonical", "match", "score"]
+
+_PUNCTUATION = re.compile(r"[\W_]+")
+# Концентрация препарата: "150 г/л", "75% в.д.г.", "(34% + 17%)"
+_CONCENTRATION = re.compile(r"\s+\d[\d.,]*\s*(г/л|г/кг|%).*$")
+_PARENTHESES = re.compile(r"^(.*?)\s*\((.*)\)\s*$")
+
+
+def normalize(name) -> str:
+    """Ключ сопоставления: нижний регистр, ё -> е, пунктуация и пробелы схлопнуты"""
+    if not isinstance(name, str):
+        return ""
+    return _PUNCTUATION.sub(" ", name.lower().replace("ё", "е")).strip()
+
+
+def _trigrams(key: str) -> List[str]:
+    padded = f"  {key} "
+    return sorted({padded[i:i + 3] for i in range(len(padded) - 2)})
+
+
+def _derived_aliases(name: str) -> List[str]:
+    """Синонимы из названия: до скобок, в скобках, без концентрации"""
+    aliases = []
+    match = _PARENTHESES.match(name)
+    if match:
+        aliases.append(match.group(1))
+        inner = match.group(2)
+        if not any(char.isdigit() for char in inner):
+            aliases.append(inner)
+    stripped = _CONCENTRATION.sub("", name)
+    if stripped != name:
+        aliases.append(stripped)
+    return aliases
+
+
+def _by_row(per_unique, codes: np.ndarray, missing) -> np.ndarray:
+    """Значения уникальных -> значения строк (код за последним - пустое значение)"""
+    return np.append(np.asarray(per_unique, dtype=object), missing)[codes]
+
+
+class ReferenceLookup:
+    """
+    Скомпилированный справочник
+
+    Args:
+        catalog: Имя справочника (ключ CATALOGS)
+        names: Названия справочника
+        aliases: Синонимы {написание: название}
+    """
+
+    def __init__(self, catalog: str, names: Iterable[str], aliases: Optional[Dict[str, str]] = None):
+        self.catalog = catalog
+        self.names: Tuple[str, ...] = tuple(dict.fromkeys(names))
+        index = {name: i for i, name in enumerate(self.names)}
+
+        # Точные ключи имеют приоритет над синонимами
+        self._exact: Dict[str, int] = {}
+        for i, name in enumerate(self.names):
+            self._exact.setdefault(normalize(name), i)
+
+        candidates: Dict[str, set] = {}
+        for i, name in enumerate(self.names):
+            for alias in _derived_aliases(name):
+                candidates.setdefault(normalize(alias), set()).add(i)
+        for alias, name in (aliases or {}).items():
+            if name in index:
+                # Явный синоним перекрывает выведенные
+                candidates[normalize(alias)] = {index[name]}
+        self._aliases: Dict[str, int] = {
+            key: next(iter(targets)) for key, targets in candidates.items()
+            if key and len(targets) == 1 and key not in self._exact
+        }
+
+        # Индекс триграмм по всем ключам (названия и синонимы)
+        keys = list(self._exact) + list(self._aliases)
+        self._key_target = np.array(
+            [self._exact[key] for key in self._exact] + [self._aliases[key] for key in self._aliases],
+            dtype=np.int64,
+        )
+        postings: Dict[str, List[int]] = {}
+        sizes = []
+        for k, key in enumerate(keys):
+            grams = _trigrams(key)
+            sizes.append(len(grams))
+            for gram in grams:
+                postings.setdefault(gram, []).append(k)
+        self._key_sizes = np.array(sizes, dtype=np.float64)
+        self._postings = {gram: np.array(ids, dtype=np.int64) for gram, ids in postings.items()}
+
+    def __len__(self) -> int:
+        return len(self.names)
+
+    def _scores(self, key: str) -> np.ndarray:
+        """Коэффициент Дайса по триграммам для каждого названия (лучший из его ключей)"""
+        scores = np.zeros(len(self.names))
+        grams = _trigrams(key)
+        hits = [self._postings[gram] for gram in grams if gram in self._postings]
+        if not hits:
+            return scores
+        common = np.bincount(np.concatenate(hits), minlength=len(self._key_sizes))
+        dice = 2.0 * common / (self._key_sizes + len(grams))
+        np.maximum.at(scores, self._key_target, dice)
+        return scores
+
+    def suggest(self, name: str, limit: int = 3, min_score: Optional[float] = None) -> List[Tuple[str, float]]:
+        """
+        Ближайшие названия справочника
+
+        Args:
+            name: Введённое название
+            limit: Не более подсказок
+            min_score: Минимальное сходство 0..1 (по умолчанию REFERENCE_FUZZY_MIN)
+
+        Returns:
+            [(название, сходство)] по убыванию сходства
+        """
+        min_score = settings.REFERENCE_FUZZY_MIN if min_score is None else min_score
+        scores = self._scores(normalize(name))
+        order = np.argsort(-scores, kind="stable")[:limit]
+        return [(self.names[i], round(float(scores[i]), 3)) for i in order if scores[i] >= min_score and scores[i] > 0]
+
+    def resolve(self, values: Iterable, fuzzy: bool = True) -> pd.DataFrame:
+        """
+        Сопоставление колонки названий со справочником
+
+        Args:
+            values: Названия (Series, список); пустые значения не сопоставляются
+            fuzzy: Искать ближайшее название для несопоставленных
+
+        Returns:
+            DataFrame с индексом values и колонками RESOLVE_COLUMNS:
+            canonical - название справочника (None, если не найдено),
+            match - "exact", "alias", "fuzzy" или None, score - сходство
+        """
+        values = values if isinstance(values, pd.Series) else pd.Series(list(values), dtype=object)
+        codes, uniques = pd.factorize(values, use_na_sentinel=True)
+        keys = pd.Series(np.asarray(uniques, dtype=object), dtype=object).map(normalize)
+
+        exact = keys.map(self._exact)
+        alias = keys.map(self._aliases)
+        target = exact.fillna(alias)
+        match = pd.Series(np.where(exact.notna(), MATCH_EXACT, np.where(alias.notna(), MATCH_ALIAS, None)),
+                          dtype=object)
+        score = pd.Series(np.where(target.notna(), 1.0, 0.0))
+
+        if fuzzy and len(self.names):
+            min_score = settings.REFERENCE_FUZZY_MIN
+            for i in np.flatnonzero(target.isna().to_numpy() & (keys != "").to_numpy()):
+                scores = self._scores(keys.iat[i])
+                order = np.argsort(-scores, kind="stable")
+                best = order[0]
+                # Равно близкие названия ("Пшеница" - яровая или озимая) не выбираются
+                ambiguous = len(order) > 1 and scores[order[1]] == scores[best]
+                if scores[best] >= min_score and not ambiguous:
+                    target.iat[i], match.iat[i], score.iat[i] = best, MATCH_FUZZY, round(float(scores[best]), 3)
+
+        names = np.array(self.names + (None,), dtype=object)
+        canonical = names[target.fillna(len(self.names)).astype(np.int64).to_numpy()]
+        # Пустые значения (код -1) -> последняя позиция: не сопоставлено
+        codes = np.where(codes < 0, len(uniques), codes)
+        # Колонки object: не найдено - None, а не NaN строкового типа
+        return pd.DataFrame({
+            "value": pd.Series(values.to_numpy(dtype=object), index=values.index, dtype=object),
+            "canonical": pd.Series(_by_row(canonical, codes, None), index=values.index, dtype=object),
+            "match": pd.Series(_by_row(match, codes, None), index=values.index, dtype=object),
+            "score": pd.Series(_by_row(score, codes, 0.0).astype(float), index=values.index),
+        })
+
+    def canonicalize(self, values: pd.Series) -> pd.Series:
+        """
+        Названия справочника вместо найденных точно или по синониму
+
+        Нечёткие совпадения не подставляются: значение остаётся как введено.
+
+        Args:
+            values: Колонка названий
+
+        Returns:
+            Series того же индекса
+        """
+        resolved = self.resolve(values, fuzzy=False)
+        return resolved["canonical"].where(resolved["match"].notna(), values)
+
+
+def _catalog_names(catalog: str) -> List[str]:
+    """Названия справочника из JSON-файлов"""
+    names = []
+    for filename, nested in CATALOGS[catalog]:
+        data = load_reference(filename, show_error=False)
+        if nested:
+            names.extend(name for group in data.values() if isinstance(group, dict) for name in group)
+        else:
+            names.extend(data)
+
+    if catalog == "active_ingredient":
+        # Компоненты действующих веществ препаратов: "Дикват дибромид 150 г/л", "А + Б"
+        for filename, nested in CATALOGS["pesticide"]:
+            data = load_reference(filename, show_error=False)
+            products = [p for group in data.values() for p in group.values()] if nested else list(data.values())
+            for product in products:
+                substance = product.get("действующее_вещество") if isinstance(product, dict) else None
+                for part in (substance or "").split("+"):
+                    part = _CONCENTRATION.sub("", part.strip())
+                    if part and normalize(part) not in {normalize(alias) for alias in ALIASES[catalog]}:
+                        names.append(part)
+    return names
+
+
+_compiled: Dict[str, Tuple[Tuple, ReferenceLookup]] = {}
+_checked_at: Dict[str, float] = {}
+
+
+def _catalog_files(catalog: str) -> List[str]:
+    files = [filename for filename, _ in CATALOGS[catalog]]
+    if catalog == "active_ingredient":
+        files += [filename for filename, _ in CATALOGS["pesticide"]]
+    return files
+
+
+def lookup(catalog: str) -> ReferenceLookup:
+    """
+    Скомпилированный справочник
+
+    Компилируется один раз и перекомпилируется, только когда меняется файл
+    справочника (отпечатки сверяются не чаще раза в REFERENCE_RELOAD_SEC).
+
+    Args:
+        catalog: "crop", "fertilizer", "pesticide" или "active_ingredient"
+
+    Returns:
+        ReferenceLookup
+    """
+    if catalog not in CATALOGS:
+        raise KeyError(f"Unknown reference catalog: {catalog}")
+    cached = _compiled.get(catalog)
+    now = time.monotonic()
+    if cached is not None and now - _checked_at.get(catalog, 0.0) < settings.REFERENCE_RELOAD_SEC:
+        return cached[1]
+    versions = tuple(reference_version(filename) for filename in _catalog_files(catalog))
+    if cached is None or cached[0] != versions:
+        reference = ReferenceLookup(catalog, _catalog_names(catalog), ALIASES.get(catalog))
+        cached = _compiled[catalog] = (versions, reference)
+    _checked_at[catalog] = now
+    return cached[1]
+
+
+def canonicalize(values: pd.Series, catalog: str) -> pd.Series:
+    """Сокращение для lookup(catalog).canonicalize(values)"""
+    return lookup(catalog).canonicalize(values)
+
+
+def unknown_names(values: pd.Series, catalog: str, limit: int = 3) -> pd.DataFrame:
+    """
+    Названия, которых нет в справочнике, с подсказками
+
+    Args:
+        values: Колонка названий
+        catalog: Справочник
+        limit: Подсказок на название
+
+    Returns:
+        DataFrame: name, rows (число строк), suggestions (список названий)
+    """
+    reference = lookup(catalog)
+    resolved = reference.resolve(values, fuzzy=False)
+    missing = resolved.loc[resolved["match"].isna() & values.notna(), "value"]
+    counts = missing.astype(str).value_counts()
+    return pd.DataFrame({
+        "name": counts.index,
+        "rows": counts.to_numpy(),
+        "suggestions": [[name for name, _ in reference.suggest(value, limit)] for value in counts.index],
+    }, columns=["name", "rows", "suggestions"])
@@ -0,0 +1,362 @@
+"""
+Reference search - Поиск по всем справочникам
+
+Индекс строится один раз на процесс (search_index(), прогревается в
+bootstrap) по всем JSON-каталогам CATALOG_FILES. Запись справочника -
+ключ верхнего уровня, а у каталогов с группами (пестициды по классам,
+болезни по культурам) - ключ внутри группы. Индексируются название,
+группа и поля SEARCH_FIELDS (производитель, модель, латынь,
+действующее вещество).
+
+- Инвертированный индекс: слово -> записи с весом поля.
+- Отсортированный словарь слов: префиксный поиск через bisect.
+- Индекс триграмм словаря: слова с опечатками (коэффициент Дайса).
+- Фасеты FACET_FIELDS: записи по значению поля (производитель, тип
+  оборудования) для выбора марки и модели без перебора справочника.
+
+Запрос ранжируется по сумме лучших совпадений его слов (точное > префикс >
+нечёткое) с весом поля; каждое слово запроса должно совпасть. При
+изменении справочника update_catalog() переиндексирует только
+добавленные, изменённые и удалённые записи; изменения файлов из других
+сессий и процессов подхватываются по их отпечатку (см. search_index()).
+"""
+import bisect
+import threading
+import time
+from collections import Counter
+from typing import Any, Dict, Iterable, List, NamedTuple, Optional, Set, Tuple
+
+from modules.config import settings
+from modules.reference_lookup import normalize
+from utils.reference_loader import load_reference, reference_version
+
+# Справочники, входящие в индекс
+CATALOG_FILES = (
+    "crops.json", "tractors.json", "combines.json", "implements.json", "pesticides.json",
+    "fertilizers.json", "diseases.json", "pests.json", "weeds.json", "soil_types.json",
+    "countries.json", "seed_reproductions.json", "active_ingredients.json",
+    "pesticide_classes.json", "fertilizer_categories.json", "desiccation_products.json",
+)
+
+# Поля записи, по которым ищется текст -> вес совпадения
+SEARCH_FIELDS = {
+    "производитель": 0.8,
+    "модель": 0.9,
+    "латынь": 0.8,
+    "действующее_вещество": 0.7,
+}
+TITLE_WEIGHT = 1.0
+GROUP_WEIGHT = 0.5
+
+# Поля для фасетного выбора (марка -> модели)
+FACET_FIELDS = ("производитель", "тип_оборудования")
+
+# Оценка совпадения слова запроса со словом записи
+EXACT_SCORE = 1.0
+PREFIX_SCORE = 0.7
+FUZZY_SCORE = 0.6
+
+
+class SearchHit(NamedTuple):
+    """Найденная запись справочника"""
+    catalog: str
+    key: str
+    group: Optional[str]
+    score: float
+    data: Any
+
+
+class _Entry(NamedTuple):
+    catalog: str
+    group: Optional[str]
+    key: str
+    data: Any
+
+
+def _words(text: Any) -> List[str]:
+    return normalize(text).split() if isinstance(text, str) else []
+
+
+def _trigrams(word: str) -> Set[str]:
+    padded = f"  {word} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+def _is_grouped(data: Dict[str, Any]) -> bool:
+    """Справочник с группами: {группа: {запись: {поля}}}"""
+    return bool(data) and all(
+        isinstance(group, dict) and group and all(isinstance(item, dict) for item in group.values())
+        for group in data.values()
+    )
+
+
+def _entries(data: Dict[str, Any]) -> Dict[Tuple[Optional[str], str], Any]:
+    if _is_grouped(data):
+        return {(group, key): item for group, items in data.items() for key, item in items.items()}
+    return {(None, key): item for key, item in data.items()}
+
+
+class ReferenceSearch:
+    """Индекс поиска по справочникам (обновляется по каталогу, см. update_catalog)"""
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._next_id = 0
+        self._entries: Dict[int, _Entry] = {}
+        self._ids: Dict[Tuple[str, Optional[str], str], int] = {}
+        self._entry_words: Dict[int, Dict[str, float]] = {}
+        self._postings: Dict[str, Dict[int, float]] = {}
+        self._vocabulary: List[str] = []
+        self._word_trigrams: Dict[str, Set[str]] = {}
+        self._trigram_words: Dict[str, Set[str]] = {}
+        self._facets: Dict[Tuple[str, str], Dict[str, Set[int]]] = {}
+
+    # ------------------------------------------------------------------
+    # Обновление индекса
+    # ------------------------------------------------------------------
+
+    def update_catalog(self, catalog: str, data: Dict[str, Any]) -> Dict[str, int]:
+        """
+        Синхронизация индекса со справочником
+
+        Переиндексируются только добавленные, изменённые и удалённые записи.
+
+        Args:
+            catalog: Имя файла справочника ("tractors.json")
+            data: Содержимое справочника
+
+        Returns:
+            {"added", "updated", "removed"}
+        """
+        entries = _entries(data or {})
+        counts = {"added": 0, "updated": 0, "removed": 0}
+        with self._lock:
+            current = {(group, key): entry_id for (name, group, key), entry_id in self._ids.items() if name == catalog}
+            for path, entry_id in current.items():
+                if path not in entries:
+                    self._remove(entry_id)
+                    counts["removed"] += 1
+            for (group, key), item in entries.items():
+                entry_id = current.get((group, key))
+                if entry_id is None:
+                    entry_id = self._next_id
+                    self._next_id += 1
+                    counts["added"] += 1
+                elif self._entries[entry_id].data != item:
+                    # Изменённая запись сохраняет номер - и место в порядке справочника
+                    self._remove(entry_id)
+                    counts["updated"] += 1
+                else:
+                    continue
+                self._add(entry_id, _Entry(catalog, group, key, item))
+        return counts
+
+    def _add(self, entry_id: int, entry: _Entry) -> None:
+        self._entries[entry_id] = entry
+        self._ids[(entry.catalog, entry.group, entry.key)] = entry_id
+
+        weights: Dict[str, float] = {}
+        fields = [(entry.key, TITLE_WEIGHT), (entry.group, GROUP_WEIGHT)]
+        if isinstance(entry.data, dict):
+            fields += [(entry.data.get(name), weight) for name, weight in SEARCH_FIELDS.items()]
+        for text, weight in fields:
+            for word in _words(text):
+                weights[word] = max(weights.get(word, 0.0), weight)
+        self._entry_words[entry_id] = weights
+        for word, weight in weights.items():
+            posting = self._postings.get(word)
+            if posting is None:
+                posting = self._postings[word] = {}
+                bisect.insort(self._vocabulary, word)
+                self._word_trigrams[word] = _trigrams(word)
+                for gram in self._word_trigrams[word]:
+                    self._trigram_words.setdefault(gram, set()).add(word)
+            posting[entry_id] = weight
+
+        if isinstance(entry.data, dict):
+            for name in FACET_FIELDS:
+                value = entry.data.get(name)
+                if isinstance(value, str):
+                    self._facets.setdefault((entry.catalog, name), {}).setdefault(value, set()).add(entry_id)
+
+    def _remove(self, entry_id: int) -> None:
+        entry = self._entries.pop(entry_id)
+        del self._ids[(entry.catalog, entry.group, entry.key)]
+        for word in self._entry_words.pop(entry_id):
+            posting = self._postings[word]
+            posting.pop(entry_id, None)
+            if not posting:
+                del self._postings[word]
+                for gram in self._word_trigrams.pop(word):
+                    self._trigram_words[gram].discard(word)
+                    if not self._trigram_words[gram]:
+                        del self._trigram_words[gram]
+                del self._vocabulary[bisect.bisect_left(self._vocabulary, word)]
+        if isinstance(entry.data, dict):
+            for name in FACET_FIELDS:
+                values = self._facets.get((entry.catalog, name), {})
+                members = values.get(entry.data.get(name))
+                if members is not None:
+                    members.discard(entry_id)
+                    if not members:
+                        del values[entry.data.get(name)]
+
+    # ------------------------------------------------------------------
+    # Поиск
+    # ------------------------------------------------------------------
+
+    def _matches(self, word: str, fuzzy: bool) -> Dict[str, float]:
+        """Слова словаря, совпадающие со словом запроса -> оценка"""
+        matches: Dict[str, float] = {}
+        position = bisect.bisect_left(self._vocabulary, word)
+        while position < len(self._vocabulary) and self._vocabulary[position].startswith(word):
+            candidate = self._vocabulary[position]
+            position += 1
+            matches[candidate] = EXACT_SCORE if candidate == word else PREFIX_SCORE * (1 + len(word) / len(candidate)) / 2
+        if matches or not fuzzy or len(word) < 3:
+            return matches
+
+        grams = _trigrams(word)
+        common = Counter()
+        for gram in grams:
+            common.update(self._trigram_words.get(gram, ()))
+        for candidate, shared in common.items():
+            dice = 2.0 * shared / (len(grams) + len(self._word_trigrams[candidate]))
+            if dice >= settings.REFERENCE_FUZZY_MIN:
+                matches[candidate] = FUZZY_SCORE * dice
+        return matches
+
+    def search(self, query: str, catalogs: Optional[Iterable[str]] = None, limit: Optional[int] = 20,
+               fuzzy: bool = True) -> List[SearchHit]:
+        """
+        Ранжированный поиск
+
+        Args:
+            query: Текст запроса (слова ищутся по префиксу, с опечатками - по триграммам)
+            catalogs: Справочники (по умолчанию - все)
+            limit: Не более результатов (None - все)
+            fuzzy: Искать слова с опечатками, если нет точных и префиксных совпадений
+
+        Returns:
+            Записи по убыванию оценки
+        """
+        words = _words(query)
+        if not words:
+            return []
+        catalogs = set(catalogs) if catalogs is not None else None
+        with self._lock:
+            scores: Optional[Dict[int, float]] = None
+            for word in words:
+                best: Dict[int, float] = {}
+                for candidate, match in self._matches(word, fuzzy).items():
+                    for entry_id, weight in self._postings[candidate].items():
+                        score = match * weight
+                        if score > best.get(entry_id, 0.0):
+                            best[entry_id] = score
+                # Каждое слово запроса должно совпасть
+                scores = best if scores is None else {
+                    entry_id: score + best[entry_id] for entry_id, score in scores.items() if entry_id in best
+                }
+                if not scores:
+                    return []
+
+            hits = [
+                (score, self._entries[entry_id]) for entry_id, score in scores.items()
+                if catalogs is None or self._entries[entry_id].catalog in catalogs
+            ]
+        hits.sort(key=lambda hit: (-hit[0], len(hit[1].key), hit[1].key))
+        return [
+            SearchHit(entry.catalog, entry.key, entry.group, round(score, 3), entry.data)
+            for score, entry in hits[:limit]
+        ]
+
+    def facet_values(self, catalog: str, field: str, **where: str) -> List[str]:
+        """
+        Значения поля записей справочника (например, производители)
+
+        Args:
+            catalog: Справочник
+            field: Поле из FACET_FIELDS
+            **where: Отбор по другим полям FACET_FIELDS
+
+        Returns:
+            Отсортированные значения
+        """
+        with self._lock:
+            allowed = self._select(catalog, where)
+            values = self._facets.get((catalog, field), {})
+            return sorted(value for value, members in values.items() if allowed is None or members & allowed)
+
+    def entries(self, catalog: str, **where: str) -> Dict[str, Any]:
+        """
+        Записи справочника с отбором по полям FACET_FIELDS
+
+        Args:
+            catalog: Справочник
+            **where: {поле: значение}, например производитель="John Deere"
+
+        Returns:
+            {ключ: данные записи} в порядке справочника
+        """
+        with self._lock:
+            allowed = self._select(catalog, where)
+            ids = sorted(allowed) if allowed is not None else sorted(
+                entry_id for (name, _, _), entry_id in self._ids.items() if name == catalog
+            )
+            return {self._entries[entry_id].key: self._entries[entry_id].data for entry_id in ids}
+
+    def keys(self, catalog: str) -> List[str]:
+        """Названия записей справочника без повторов (для справочников с группами - внутри групп)"""
+        with self._lock:
+            return sorted({key for name, _, key in self._ids if name == catalog})
+
+    def _select(self, catalog: str, where: Dict[str, str]) -> Optional[Set[int]]:
+        allowed = None
+        for name, value in where.items():
+            if name not in FACET_FIELDS:
+                raise KeyError(f"Not a facet field: {name}")
+            members = self._facets.get((catalog, name), {}).get(value, set())
+            allowed = set(members) if allowed is None else allowed & members
+        return allowed
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+_index: Optional[ReferenceSearch] = None
+_index_lock = threading.Lock()
+_versions: Dict[str, Tuple[int, int, int]] = {}
+_checked_at = 0.0
+
+
+def _refresh(index: ReferenceSearch) -> List[str]:
+    """Переиндексация справочников, файлы которых изменились"""
+    changed = []
+    for catalog in CATALOG_FILES:
+        version = reference_version(catalog)
+        if _versions.get(catalog) != version:
+            index.update_catalog(catalog, load_reference(catalog, show_error=False))
+            _versions[catalog] = version
+            changed.append(catalog)
+    return changed
+
+
+def search_index() -> ReferenceSearch:
+    """
+    Общий для процесса индекс справочников
+
+    Строится при первом обращении; затем не чаще раза в REFERENCE_RELOAD_SEC
+    сверяются отпечатки файлов (reference_version), и справочники, сохранённые
+    другой сессией или процессом, переиндексируются.
+    """
+    global _index, _checked_at
+    if _index is None or time.monotonic() - _checked_at >= settings.REFERENCE_RELOAD_SEC:
+        with _index_lock:
+            if _index is None:
+                index = ReferenceSearch()
+                _refresh(index)
+                _index = index
+            elif time.monotonic() - _checked_at >= settings.REFERENCE_RELOAD_SEC:
+                _refresh(_index)
+            _checked_at = time.monotonic()
+    return _index
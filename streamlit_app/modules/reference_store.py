@@ -0,0 +1,251 @@
+"""
+Reference store - Сохранение справочников с версиями
+
+Запись JSON-справочника:
+
+- атомарная: данные пишутся во временный файл рядом со справочником,
+  fsync, затем os.replace - читатель видит либо старый, либо новый файл
+  целиком, но не наполовину записанный;
+- с версиями: каждое сохранение - снимок <data>/.history/<справочник>/NNNNNN.json
+  с монотонно растущим номером (хранится REFERENCE_HISTORY_KEEP последних),
+  любую версию можно восстановить;
+- с оптимистической блокировкой: редактор сохраняет относительно версии,
+  которую прочитал; если справочник успели изменить (другая сессия или
+  процесс), save() отклоняется с ReferenceConflict вместо тихой потери
+  чужих правок. Запись сериализуется блокировкой файла .lock.
+
+Читатели узнают об изменении по отпечатку файла (reference_version:
+mtime, размер, inode) - кеш load_reference_cached, индекс поиска и таблицы
+сопоставления перечитывают справочник только после реальной записи.
+"""
+import json
+import os
+import stat
+import tempfile
+import threading
+from contextlib import contextmanager
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, NamedTuple, Optional
+
+from modules.config import settings
+from utils.reference_loader import reference_path
+
+try:
+    import fcntl
+except ImportError:  # Windows: блокировка только внутри процесса
+    fcntl = None
+
+HISTORY_DIR = ".history"
+
+_thread_lock = threading.Lock()
+
+
+class ReferenceConflict(Exception):
+    """Справочник изменён после чтения - сохранение отклонено"""
+
+    def __init__(self, filename: str, expected: int, current: int):
+        self.filename = filename
+        self.expected = expected
+        self.current = current
+        super().__init__(f"{filename}: expected version {expected}, current version is {current}")
+
+
+class Snapshot(NamedTuple):
+    """Прочитанный справочник"""
+    data: Dict[str, Any]
+    version: int
+
+
+def catalog_path(filename: str) -> Path:
+    """
+    Файл справочника для записи
+
+    Тот же файл, который читает load_reference; новый справочник создаётся
+    в data/ текущей директории.
+    """
+    return reference_path(filename) or (Path.cwd() / "data" / filename).resolve()
+
+
+def _history_dir(path: Path) -> Path:
+    return path.parent / HISTORY_DIR / path.stem
+
+
+def _versions(path: Path) -> List[int]:
+    directory = _history_dir(path)
+    if not directory.exists():
+        return []
+    return sorted(int(item.stem) for item in directory.glob("*.json") if item.stem.isdigit())
+
+
+def current_version(filename: str) -> int:
+    """Номер последней сохранённой версии (0 - справочник ещё не редактировался)"""
+    versions = _versions(catalog_path(filename))
+    return versions[-1] if versions else 0
+
+
+def read(filename: str) -> Snapshot:
+    """
+    Чтение справочника вместе с версией для последующего save()
+
+    Args:
+        filename: Имя файла справочника
+
+    Returns:
+        Snapshot(data, version)
+    """
+    path = catalog_path(filename)
+    # Версия читается до данных: если между ними пройдёт запись, версия
+    # окажется старее данных и save() отклонит правку, а не потеряет чужую
+    version = current_version(filename)
+    if not path.exists():
+        return Snapshot({}, version)
+    with open(path, "r", encoding="utf-8") as f:
+        return Snapshot(json.load(f), version)
+
+
+def _write_atomic(path: Path, payload: Any) -> None:
+    path.parent.mkdir(parents=True, exist_ok=True)
+    try:
+        mode = stat.S_IMODE(os.stat(path).st_mode)
+    except FileNotFoundError:
+        mode = 0o644
+    fd, tmp_name = tempfile.mkstemp(dir=path.parent, prefix=f".{path.name}.", suffix=".tmp")
+    try:
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            json.dump(payload, f, ensure_ascii=False, indent=2)
+            f.flush()
+            os.fsync(f.fileno())
+        # mkstemp создаёт файл с правами 0600 - возвращаются права прежнего файла
+        os.chmod(tmp_name, mode)
+        os.replace(tmp_name, path)
+    except BaseException:
+        if os.path.exists(tmp_name):
+            os.unlink(tmp_name)
+        raise
+    _fsync_dir(path.parent)
+
+
+def _fsync_dir(directory: Path) -> None:
+    """Сброс на диск записи каталога после переименования (где поддерживается)"""
+    if not hasattr(os, "O_DIRECTORY"):
+        return
+    fd = os.open(directory, os.O_RDONLY | os.O_DIRECTORY)
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+
+@contextmanager
+def _locked(path: Path) -> Iterator[None]:
+    """Блокировка записи справочника (между потоками и процессами)"""
+    directory = _history_dir(path)
+    directory.mkdir(parents=True, exist_ok=True)
+    with _thread_lock:
+        if fcntl is None:
+            yield
+            return
+        with open(directory / ".lock", "w") as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+
+def save(filename: str, data: Dict[str, Any], expected_version: Optional[int] = None,
+         author: Optional[str] = None) -> int:
+    """
+    Атомарное сохранение справочника новой версией
+
+    Args:
+        filename: Имя файла справочника
+        data: Новое содержимое
+        expected_version: Версия, относительно которой сделаны правки
+            (Snapshot.version); None - без проверки
+        author: Кто сохранил (для истории)
+
+    Returns:
+        Номер новой версии
+
+    Raises:
+        ReferenceConflict: Справочник изменён после чтения
+    """
+    path = catalog_path(filename)
+    with _locked(path):
+        versions = _versions(path)
+        current = versions[-1] if versions else 0
+        if expected_version is not None and expected_version != current:
+            raise ReferenceConflict(filename, expected_version, current)
+
+        directory = _history_dir(path)
+        if not versions and path.exists():
+            # Исходный файл - версия 0, чтобы первую правку можно было откатить
+            with open(path, "r", encoding="utf-8") as f:
+                original = json.load(f)
+            _write_atomic(directory / f"{0:06d}.json", {"version": 0, "saved_at": None, "author": None,
+                                                        "data": original})
+
+        version = current + 1
+        # Сначала справочник, затем снимок: версия не опережает данные (см. read)
+        _write_atomic(path, data)
+        _write_atomic(directory / f"{version:06d}.json", {
+            "version": version,
+            "saved_at": datetime.now().isoformat(timespec="seconds"),
+            "author": author,
+            "data": data,
+        })
+
+        keep = max(settings.REFERENCE_HISTORY_KEEP, 1)
+        for old in _versions(path)[:-keep]:
+            (directory / f"{old:06d}.json").unlink(missing_ok=True)
+    return version
+
+
+def history(filename: str) -> List[Dict[str, Any]]:
+    """
+    Сохранённые версии справочника, новые первыми
+
+    Returns:
+        [{"version", "saved_at", "author", "records"}]
+    """
+    path = catalog_path(filename)
+    result = []
+    for version in reversed(_versions(path)):
+        try:
+            snapshot = load_version(filename, version)
+        except (OSError, ValueError):
+            continue
+        result.append({
+            "version": version,
+            "saved_at": snapshot.get("saved_at"),
+            "author": snapshot.get("author"),
+            "records": len(snapshot.get("data") or {}),
+        })
+    return result
+
+
+def load_version(filename: str, version: int) -> Dict[str, Any]:
+    """Снимок версии: {"version", "saved_at", "author", "data"}"""
+    with open(_history_dir(catalog_path(filename)) / f"{version:06d}.json", "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def restore(filename: str, version: int, expected_version: Optional[int] = None,
+            author: Optional[str] = None) -> int:
+    """
+    Восстановление версии справочника
+
+    История не переписывается: содержимое старой версии сохраняется новой.
+
+    Args:
+        filename: Имя файла справочника
+        version: Восстанавливаемая версия
+        expected_version: См. save()
+        author: Кто восстановил
+
+    Returns:
+        Номер новой версии
+    """
+    return save(filename, load_version(filename, version)["data"], expected_version, author)
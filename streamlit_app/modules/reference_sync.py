@@ -0,0 +1,286 @@
+"""
+Reference sync - Справочные таблицы БД из JSON-справочников
+
+Культуры, удобрения и СЗР (с десикантами) загружаются из JSON в ref_crops,
+ref_fertilizers и ref_pesticides, чтобы аналитика соединяла операции со
+свойствами справочника в SQL (нормы NPK, типичная урожайность), а не
+перебирала словари в Python.
+
+Запросы аналитики с этими таблицами - в modules.analytics и
+modules.nutrient_balance.
+
+- sync_references(): загрузка с разницей - записи пишутся пакетным upsert
+  по названию и переписываются, только если изменился их хеш
+  (source_hash); удалённые из JSON записи удаляются, ссылки на них
+  обнуляются. Вызывается при запуске (bootstrap) и после сохранения
+  справочника на странице справочников.
+- Ссылки: операции хранят id записи справочника (LINKS: operations.ref_crop_id,
+  fertilizer_applications.ref_fertilizer_id и т.д.). Название приводится к
+  справочнику через modules.reference_lookup (точно или по синониму).
+  ORM-запись проставляет ссылку сама (событие сессии before_flush, один
+  запрос на справочник за сброс), пакетная запись импорта Excel - через
+  link_references().
+"""
+import hashlib
+import json
+import re
+from typing import Any, Dict, Iterable, Optional
+
+import pandas as pd
+from sqlalchemy import bindparam, delete, event, inspect, select, update
+from sqlalchemy.orm import Session
+
+from modules.database import (
+    FertilizerApplication, HarvestData, Operation, PesticideApplication, RefCrop, RefFertilizer, RefPesticide,
+    SowingDetail,
+)
+from modules.nutrient_balance import invalidate_after_commit
+from modules.reference_lookup import CATALOGS, lookup
+from modules.upsert import upsert
+from utils.reference_loader import load_reference
+
+# Справочник modules.reference_lookup -> (таблица, колонка названия)
+TABLES = {
+    "crop": (RefCrop, "crop_name"),
+    "fertilizer": (RefFertilizer, "name"),
+    "pesticide": (RefPesticide, "trade_name"),
+}
+
+# Ссылки на справочник: (модель, колонка названия, колонка ссылки, справочник)
+LINKS = (
+    (Operation, "crop", "ref_crop_id", "crop"),
+    (HarvestData, "crop", "ref_crop_id", "crop"),
+    (SowingDetail, "combined_fertilizer_name", "ref_fertilizer_id", "fertilizer"),
+    (FertilizerApplication, "fertilizer_name", "ref_fertilizer_id", "fertilizer"),
+    (PesticideApplication, "pesticide_name", "ref_pesticide_id", "pesticide"),
+)
+
+# Файлы, от которых зависят справочные таблицы
+SYNCED_FILES = {filename for catalog in TABLES for filename, _ in CATALOGS[catalog]}
+
+# "2-3 л/га", "0,5 - 1,2 кг/га"
+_RATE = re.compile(r"^\s*([\d.,]+)\s*(?:-\s*([\d.,]+))?\s*(.*?)\s*$")
+
+
+def _number(value: Any) -> Optional[float]:
+    return float(value) if isinstance(value, (int, float)) and not isinstance(value, bool) else None
+
+
+def _crop_row(name: str, info: Dict[str, Any], group: Optional[str]) -> Dict[str, Any]:
+    yields = info.get("урожайность") or {}
+    seeding = info.get("норма_высева") or {}
+    need = info.get("потребность_NPK") or {}
+    return {
+        "crop_name": name,
+        "crop_type": info.get("тип"),
+        "typical_yield_min": _number(yields.get("мин")),
+        "typical_yield_max": _number(yields.get("макс")),
+        "typical_yield_avg": _number(yields.get("средняя")),
+        "seeding_rate_min": _number(seeding.get("мин")),
+        "seeding_rate_max": _number(seeding.get("макс")),
+        "seeding_depth_cm": _number((info.get("глубина_заделки") or {}).get("оптимум")),
+        "row_spacing_cm": _number((info.get("междурядье") or {}).get("стандарт")),
+        "n_need_kg_ha": _number(need.get("N")),
+        "p2o5_need_kg_ha": _number(need.get("P2O5")),
+        "k2o_need_kg_ha": _number(need.get("K2O")),
+    }
+
+
+def _fertilizer_row(name: str, info: Dict[str, Any], group: Optional[str]) -> Dict[str, Any]:
+    # P и K в справочнике - в оксидной форме (P2O5, K2O)
+    return {
+        "name": name,
+        "type": group,
+        "n_content": _number(info.get("N")),
+        "p2o5_content": _number(info.get("P")),
+        "k2o_content": _number(info.get("K")),
+        "s_content": _number(info.get("S")),
+    }
+
+
+def _pesticide_row(name: str, info: Dict[str, Any], group: Optional[str]) -> Dict[str, Any]:
+    dose = info.get("норма") or {}
+    dose_min, dose_max, unit = _number(dose.get("мин")), _number(dose.get("макс")), dose.get("единица")
+    if not dose and isinstance(info.get("норма_расхода"), str):
+        # Десиканты: норма строкой
+        match = _RATE.match(info["норма_расхода"])
+        if match:
+            dose_min = float(match.group(1).replace(",", "."))
+            dose_max = float((match.group(2) or match.group(1)).replace(",", "."))
+            unit = match.group(3) or None
+    return {
+        "trade_name": name,
+        "active_ingredient": info.get("действующее_вещество"),
+        "pesticide_class": info.get("класс") or (group if group is not None else "Десикант"),
+        "typical_dose_min": dose_min,
+        "typical_dose_max": dose_max,
+        "dose_unit": unit,
+    }
+
+
+_BUILDERS = {"crop": _crop_row, "fertilizer": _fertilizer_row, "pesticide": _pesticide_row}
+
+
+def catalog_rows(catalog: str) -> Dict[str, Dict[str, Any]]:
+    """
+    Строки справочной таблицы из JSON
+
+    Args:
+        catalog: "crop", "fertilizer" или "pesticide"
+
+    Returns:
+        {название: значения колонок с source_hash}
+    """
+    rows = {}
+    for filename, nested in CATALOGS[catalog]:
+        data = load_reference(filename, show_error=False)
+        items = [
+            (group, name, info) for group, entries in data.items() if isinstance(entries, dict)
+            for name, info in entries.items()
+        ] if nested else [(None, name, info) for name, info in data.items()]
+        for group, name, info in items:
+            if not isinstance(info, dict):
+                continue
+            row = _BUILDERS[catalog](name, info, group)
+            payload = json.dumps(row, sort_keys=True, ensure_ascii=False)
+            row["source_hash"] = hashlib.sha256(payload.encode("utf-8")).hexdigest()
+            rows[name] = row
+    return rows
+
+
+def sync_references(db: Session) -> Dict[str, Dict[str, int]]:
+    """
+    Загрузка JSON-справочников в справочные таблицы с разницей
+
+    Неизменённые записи не переписываются; записи, удалённые из JSON,
+    удаляются (ссылки операций на них обнуляются). Затем проставляются
+    ссылки операций без ссылки (link_references). Не коммитит; кеш баланса
+    N/P/K сбрасывается после коммита, если что-то изменилось.
+
+    Args:
+        db: Сессия
+
+    Returns:
+        {справочник: {"inserted", "updated", "unchanged", "removed"}, "links": {"linked": N}}
+    """
+    result = {}
+    for catalog, (model, key_column) in TABLES.items():
+        rows = catalog_rows(catalog)
+        if not rows:
+            # Справочник не прочитан - таблица не очищается
+            continue
+        inserted, updated, unchanged = upsert(db, model, key_column, list(rows.values()))
+
+        table = model.__table__
+        stale = db.scalars(select(table.c.id).where(table.c[key_column].not_in(list(rows)))).all()
+        if stale:
+            for link_model, _, ref_column, link_catalog in LINKS:
+                if link_catalog == catalog:
+                    link_table = link_model.__table__
+                    db.execute(update(link_table).where(link_table.c[ref_column].in_(stale)).values({ref_column: None}))
+            db.execute(delete(table).where(table.c.id.in_(stale)))
+
+        result[catalog] = {
+            "inserted": len(inserted), "updated": len(updated), "unchanged": unchanged, "removed": len(stale),
+        }
+    changed = any(counts["inserted"] or counts["updated"] or counts["removed"] for counts in result.values())
+    result["links"] = {"linked": link_references(db)}
+    if changed or result["links"]["linked"]:
+        # Нормы NPK и ссылки могли измениться у всех хозяйств
+        invalidate_after_commit(db)
+    return result
+
+
+def reference_ids(db, catalog: str, names: Iterable[str]) -> Dict[str, int]:
+    """
+    id записей справочной таблицы по введённым названиям
+
+    Args:
+        db: Сессия или соединение
+        catalog: "crop", "fertilizer" или "pesticide"
+        names: Названия как введены (синонимы и написание - как в reference_lookup)
+
+    Returns:
+        {название: id} для найденных
+    """
+    names = list(names)
+    if not names:
+        return {}
+    canonical = lookup(catalog).resolve(pd.Series(names, dtype=object), fuzzy=False)["canonical"]
+    pairs = {name: key for name, key in zip(names, canonical) if key is not None}
+    if not pairs:
+        return {}
+    model, key_column = TABLES[catalog]
+    key = model.__table__.c[key_column]
+    ids = dict(db.execute(select(key, model.__table__.c.id).where(key.in_(set(pairs.values())))).all())
+    return {name: ids[key] for name, key in pairs.items() if key in ids}
+
+
+def link_references(db: Session) -> int:
+    """
+    Ссылки на справочные таблицы для записей без ссылки
+
+    Одно обновление на различное название: UPDATE ... WHERE название = :name
+    AND ссылка IS NULL (executemany). Не коммитит.
+
+    Returns:
+        Число записей, получивших ссылку
+    """
+    linked = 0
+    for model, name_column, ref_column, catalog in LINKS:
+        table = model.__table__
+        name, ref = table.c[name_column], table.c[ref_column]
+        names = db.scalars(select(name).distinct().where(ref.is_(None), name.is_not(None))).all()
+        ids = reference_ids(db, catalog, names)
+        if not ids:
+            continue
+        stmt = (
+            update(table)
+            .where(name == bindparam("link_name"), ref.is_(None))
+            .values({ref_column: bindparam("link_id")})
+        )
+        result = db.execute(stmt, [{"link_name": value, "link_id": ref_id} for value, ref_id in ids.items()])
+        linked += max(result.rowcount, 0)
+    return linked
+
+
+# Модель -> (колонка названия, колонка ссылки, справочник)
+_LINKED_MODELS = {model: (name_column, ref_column, catalog) for model, name_column, ref_column, catalog in LINKS}
+
+
+def _link_before_flush(session: Session, flush_context, instances) -> None:
+    """
+    Ссылки новых записей и записей с изменённым названием
+
+    Названия собираются по всем записям сброса, затем один запрос
+    reference_ids на справочник, а не на каждую строку.
+    """
+    pending: Dict[str, Dict[str, list]] = {}
+    for obj in list(session.new) + list(session.dirty):
+        link = _LINKED_MODELS.get(type(obj))
+        if link is None:
+            continue
+        name_column, ref_column, catalog = link
+        state = inspect(obj)
+        if state.has_identity and not state.attrs[name_column].history.has_changes():
+            continue
+        value = getattr(obj, name_column)
+        if value:
+            pending.setdefault(catalog, {}).setdefault(value, []).append((obj, ref_column))
+        else:
+            setattr(obj, ref_column, None)
+
+    for catalog, objects in pending.items():
+        ids = reference_ids(session.connection(), catalog, objects)
+        for value, targets in objects.items():
+            for obj, ref_column in targets:
+                setattr(obj, ref_column, ids.get(value))
+
+
+def install() -> None:
+    """Ссылки на справочник при ORM-записи (повторный вызов ничего не делает)"""
+    if not event.contains(Session, "before_flush", _link_before_flush):
+        event.listen(Session, "before_flush", _link_before_flush)
+
+
+install()
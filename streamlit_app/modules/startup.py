@@ -0,0 +1,102 @@
+"""
+Startup - Холодный старт приложения: однократная инициализация БД
+
+bootstrap() выполняется один раз на процесс (st.cache_resource) и создаёт
+только отсутствующие таблицы и колонки. Её вызывает главная страница
+и require_auth(): страница, открытая первой после перезапуска, тоже
+получает готовую схему. Отложенные импорты и профиль времени запуска -
+в utils.lazy.
+"""
+from datetime import datetime
+from typing import Dict, List
+
+import streamlit as st
+from sqlalchemy import inspect, text
+
+from modules.config import settings
+from modules.database import Base, SessionLocal, engine
+from modules import audit_store, reference_sync
+from modules.reference_search import search_index
+from utils.lazy import startup_profile
+
+# Nullable-колонки, которые добавляются в существующие таблицы при старте
+# (для PostgreSQL те же изменения описаны в migrations/)
+ADDED_COLUMNS = {
+    "operations": ("client_uuid", "import_key", "source_hash", "ref_crop_id"),
+    "fields": ("source_hash",),
+    "economic_data": ("import_key", "source_hash"),
+    "import_manifest": ("quarantined",),
+    "sowing_details": ("ref_fertilizer_id",),
+    "fertilizer_applications": ("ref_fertilizer_id",),
+    "pesticide_applications": ("ref_pesticide_id",),
+    "harvest_data": ("ref_crop_id",),
+    "ref_crops": ("typical_yield_avg", "n_need_kg_ha", "p2o5_need_kg_ha", "k2o_need_kg_ha", "source_hash"),
+    "ref_fertilizers": ("source_hash",),
+    "ref_pesticides": ("source_hash",),
+}
+
+
+def _add_missing_columns(existing_tables) -> List[str]:
+    """ALTER TABLE ADD COLUMN для колонок ADDED_COLUMNS и их индексов, если их нет в БД"""
+    inspector = inspect(engine)
+    added = []
+    for table_name, column_names in ADDED_COLUMNS.items():
+        if table_name not in existing_tables:
+            continue
+        table = Base.metadata.tables[table_name]
+        present = {c["name"] for c in inspector.get_columns(table_name)}
+        indexes = {i["name"] for i in inspector.get_indexes(table_name)}
+        with engine.begin() as conn:
+            for name in column_names:
+                if name not in present:
+                    column_type = table.c[name].type.compile(dialect=engine.dialect)
+                    conn.execute(text(f"ALTER TABLE {table_name} ADD COLUMN {name} {column_type}"))
+                    added.append(f"{table_name}.{name}")
+            for index in table.indexes:
+                if index.name not in indexes:
+                    index.create(conn)
+    return added
+
+
+@st.cache_resource(show_spinner="Инициализация базы данных...")
+def bootstrap() -> Dict:
+    """
+    Однократная инициализация процесса
+
+    Вместо проверки файла farm_data.db (неверной для PostgreSQL) схема
+    сверяется одним запросом к каталогу БД; create_all вызывается только
+    для отсутствующих таблиц.
+
+    Returns:
+        {"created_tables": [...], "added_columns": [...], "started_at": ...}
+    """
+    with startup_profile.stage("schema_check"):
+        existing = set(inspect(engine).get_table_names())
+        missing = [t for t in Base.metadata.sorted_tables if t.name not in existing]
+
+    if missing:
+        with startup_profile.stage(f"create_schema ({len(missing)} tables)"):
+            Base.metadata.create_all(bind=engine, tables=missing)
+
+    with startup_profile.stage("added_columns"):
+        added = _add_missing_columns(existing)
+
+    with startup_profile.stage("audit_maintenance"):
+        audit_store.maintain_if_due()
+
+    with startup_profile.stage("reference_index"):
+        search_index()
+
+    with startup_profile.stage("reference_sync"):
+        with SessionLocal() as db:
+            reference_sync.sync_references(db)
+            db.commit()
+
+    if settings.STARTUP_PROFILE:
+        print(startup_profile.format(), flush=True)
+
+    return {
+        "created_tables": [t.name for t in missing],
+        "added_columns": added,
+        "started_at": datetime.now(),
+    }
@@ -0,0 +1,524 @@
+"""
+Synthetic - Генератор синтетических данных для нагрузочных тестов
+
+Создаёт хозяйства, поля, технику и многолетние операции со всеми типами
+деталей, а также метеоданные, GPS-треки, фитомониторинг, NDVI и экономику.
+Масштаб - от одного хозяйства до 5 000 хозяйств / 500 000 полей.
+
+Генерация детерминирована: у каждого хозяйства свой генератор
+random.Random(seed, номер хозяйства), поэтому результат не зависит от
+размера пачек. Идентификаторы назначаются заранее (от текущего max(id)),
+строки пишутся пачками multi-row INSERT через Core без ORM.
+
+Запуск:
+    python -m modules.synthetic --farms 10 --fields-per-farm 50 --seasons 3
+    python -m modules.synthetic --farms 5000 --fields-per-farm 100 --weather none \\
+        --database-url postgresql://localhost/farm_load
+"""
+import random
+import time
+from datetime import date, datetime, timedelta
+from typing import Any, Dict, List, Optional
+
+from sqlalchemy import create_engine, func, insert, select, text
+
+from modules.database import (
+    Base,
+    engine as app_engine,
+    Farm,
+    Field,
+    Machinery,
+    MachineryEquipment,
+    Implements,
+    Operation,
+    SowingDetail,
+    FertilizerApplication,
+    PesticideApplication,
+    HarvestData,
+    AgrochemicalAnalysis,
+    DesiccationDetails,
+    TillageDetails,
+    IrrigationDetails,
+    SnowRetentionDetails,
+    FallowDetails,
+    WeatherData,
+    GPSTrack,
+    PhytosanitaryMonitoring,
+    SatelliteData,
+    EconomicData,
+)
+
+# Порядок вставки с учётом внешних ключей
+TABLE_ORDER = [
+    Farm, Field, Machinery, MachineryEquipment, Implements, Operation,
+    SowingDetail, FertilizerApplication, PesticideApplication, HarvestData,
+    AgrochemicalAnalysis, DesiccationDetails, TillageDetails, IrrigationDetails,
+    SnowRetentionDetails, FallowDetails, WeatherData, GPSTrack,
+    PhytosanitaryMonitoring, SatelliteData, EconomicData,
+]
+
+REGIONS = [
+    ("Акмолинская", 51.2, 71.4),
+    ("Костанайская", 53.2, 63.6),
+    ("Северо-Казахстанская", 54.9, 69.1),
+    ("Павлодарская", 52.3, 76.9),
+    ("Карагандинская", 49.8, 73.1),
+]
+
+# Культура: (сорта, норма высева кг/га, урожайность т/га, цена тг/т, десикация)
+CROPS = {
+    "Пшеница яровая": (["Астана", "Шортандинская 95", "Акмола 2"], 120, 1.6, 95000, False),
+    "Ячмень": (["Астана 2000", "Карабалыкский 150"], 110, 1.8, 80000, False),
+    "Овес": (["Скакун", "Байшешек"], 100, 1.7, 70000, False),
+    "Рапс": (["Хантер", "Ратник"], 6, 1.2, 210000, True),
+    "Подсолнечник": (["Заря", "Бонд"], 6, 1.3, 190000, True),
+    "Лен масличный": (["Кустанайский янтарь", "Северный"], 45, 1.0, 230000, True),
+    "Горох": (["Аксайский усатый 55", "Ямальский"], 220, 1.5, 110000, False),
+}
+FALLOW = "Пар"
+
+FERTILIZERS = [("Аммофос", 12, 52, 0), ("Карбамид", 46, 0, 0), ("Аммиачная селитра", 34, 0, 0), ("Сульфоаммофос", 20, 20, 0)]
+PESTICIDES = [
+    ("Гербицид", "Ластик Экстра", "феноксапроп-П-этил"),
+    ("Гербицид", "Дерби", "флорасулам + флуметсулам"),
+    ("Фунгицид", "Альто Супер", "пропиконазол + ципроконазол"),
+    ("Инсектицид", "Каратэ Зеон", "лямбда-цигалотрин"),
+]
+PESTS = [("disease", "Септориоз"), ("disease", "Бурая ржавчина"), ("pest", "Хлебная блошка"), ("weed", "Овсюг")]
+TRACTORS = [("Кировец", "К-744"), ("John Deere", "8R 370"), ("Buhler Versatile", "2375")]
+COMBINES = [("Ростсельмаш", "Acros 595"), ("John Deere", "S760"), ("CLAAS", "Lexion 760")]
+IMPLEMENTS = [
+    ("seeder", "Amazone", "Condor 15001", 15.0),
+    ("cultivator", "Lemken", "Smaragd 9", 9.0),
+    ("harrow", "БДМ", "БДМ-6х4", 6.0),
+    ("sprayer_trailer", "Amazone", "UX 5201", 28.0),
+    ("header", "Ростсельмаш", "Power Stream 9", 9.0),
+]
+TILLAGE_TYPES = ["cultivation", "harrowing", "stubble_breaking", "discing"]
+
+
+class SyntheticConfig:
+    """
+    Параметры генерации
+
+    Args:
+        farms: Число хозяйств
+        fields_per_farm: Среднее число полей (фактическое - ±50%)
+        seasons: Число сезонов, заканчивая last_season
+        last_season: Последний сезон
+        seed: Зерно генератора
+        weather: "daily" - ежедневные метеоданные по хозяйству, "none" - без них
+        gps_points: Точек GPS-трека на посев и уборку (0 - без треков)
+        batch_rows: Строк в буфере до записи пачки
+    """
+
+    def __init__(
+        self,
+        farms: int = 1,
+        fields_per_farm: int = 20,
+        seasons: int = 3,
+        last_season: Optional[int] = None,
+        seed: int = 42,
+        weather: str = "daily",
+        gps_points: int = 10,
+        batch_rows: int = 20000,
+    ):
+        if weather not in ("daily", "none"):
+            raise ValueError(f"Unknown weather mode: {weather}")
+        self.farms = farms
+        self.fields_per_farm = fields_per_farm
+        self.seasons = seasons
+        self.last_season = last_season or datetime.now().year - 1
+        self.seed = seed
+        self.weather = weather
+        self.gps_points = gps_points
+        self.batch_rows = batch_rows
+
+    @property
+    def season_years(self) -> List[int]:
+        return list(range(self.last_season - self.seasons + 1, self.last_season + 1))
+
+
+class _Ids:
+    """Заранее назначаемые id (продолжают текущий max(id) таблицы)"""
+
+    def __init__(self, conn):
+        self._next = {
+            model.__tablename__: (conn.execute(select(func.max(model.__table__.c.id))).scalar() or 0) + 1
+            for model in TABLE_ORDER
+        }
+
+    def take(self, model) -> int:
+        name = model.__tablename__
+        value = self._next[name]
+        self._next[name] = value + 1
+        return value
+
+
+def _append_row(entity, rows: List[Dict[str, Any]], /, **values) -> Dict[str, Any]:
+    """
+    Добавление строки с полным набором колонок
+
+    executemany требует одинаковых ключей во всех строках пачки: пропущенные
+    колонки заполняются значением по умолчанию модели или None, колонки
+    с серверным значением по умолчанию (created_at) не передаются.
+    """
+    row = {
+        column.key: column.default.arg if column.default is not None and column.default.is_scalar else None
+        for column in entity.__table__.columns
+        if column.server_default is None
+    }
+    row.update(values)
+    rows.append(row)
+    return row
+
+
+class SyntheticGenerator:
+    """Генерация и пакетная запись синтетических данных"""
+
+    def __init__(self, config: SyntheticConfig, bind=None):
+        self.config = config
+        self.bind = bind if bind is not None else app_engine
+        self._buffers: Dict[Any, List[Dict[str, Any]]] = {model: [] for model in TABLE_ORDER}
+        self._buffered = 0
+        self.counts: Dict[str, int] = {model.__tablename__: 0 for model in TABLE_ORDER}
+
+    # ------------------------------------------------------------------
+    # Запись
+    # ------------------------------------------------------------------
+
+    def _flush(self) -> None:
+        if not self._buffered:
+            return
+        with self.bind.begin() as conn:
+            for model in TABLE_ORDER:
+                rows = self._buffers[model]
+                if rows:
+                    conn.execute(insert(model.__table__), rows)
+                    self.counts[model.__tablename__] += len(rows)
+                    self._buffers[model] = []
+        self._buffered = 0
+
+    def _reset_sequences(self) -> None:
+        """PostgreSQL: сдвиг последовательностей после вставки с явными id"""
+        if self.bind.dialect.name != "postgresql":
+            return
+        with self.bind.begin() as conn:
+            for model in TABLE_ORDER:
+                table = model.__tablename__
+                conn.execute(text(
+                    f"SELECT setval(pg_get_serial_sequence('{table}', 'id'), "
+                    f"COALESCE((SELECT MAX(id) FROM {table}), 1))"
+                ))
+
+    def run(self, progress=None) -> Dict[str, Any]:
+        """
+        Генерация всех хозяйств
+
+        Args:
+            progress: Необязательный callback(сгенерировано_хозяйств, всего)
+
+        Returns:
+            {"rows": {таблица: строк}, "seconds": ..., "rows_per_sec": ...}
+        """
+        Base.metadata.create_all(bind=self.bind)
+        started = time.perf_counter()
+
+        with self.bind.connect() as conn:
+            ids = _Ids(conn)
+
+        for farm_index in range(self.config.farms):
+            rng = random.Random(f"{self.config.seed}:{farm_index}")
+            self._generate_farm(rng, ids)
+            if self._buffered >= self.config.batch_rows:
+                self._flush()
+            if progress:
+                progress(farm_index + 1, self.config.farms)
+
+        self._flush()
+        self._reset_sequences()
+
+        seconds = time.perf_counter() - started
+        total = sum(self.counts.values())
+        return {
+            "rows": dict(self.counts),
+            "total_rows": total,
+            "seconds": round(seconds, 2),
+            "rows_per_sec": round(total / seconds) if seconds else 0,
+        }
+
+    # ------------------------------------------------------------------
+    # Генерация
+    # ------------------------------------------------------------------
+
+    def _add(self, entity, /, **values) -> Dict[str, Any]:
+        self._buffered += 1
+        return _append_row(entity, self._buffers[entity], **values)
+
+    def _generate_farm(self, rng: random.Random, ids: _Ids) -> None:
+        config = self.config
+        farm_id = ids.take(Farm)
+        region, lat, lon = rng.choice(REGIONS)
+        lat += rng.uniform(-1.0, 1.0)
+        lon += rng.uniform(-1.5, 1.5)
+
+        n_fields = max(1, round(config.fields_per_farm * rng.uniform(0.5, 1.5)))
+        fields = []
+        for _ in range(n_fields):
+            field_id = ids.take(Field)
+            fields.append(self._add(
+                Field, id=field_id, farm_id=farm_id, field_code=f"S{field_id:09d}",
+                name=f"Поле {len(fields) + 1}", area_ha=round(rng.uniform(40, 600), 1),
+                center_lat=lat + rng.uniform(-0.2, 0.2), center_lon=lon + rng.uniform(-0.3, 0.3),
+                soil_type=rng.choice(["Чернозем обыкновенный", "Чернозем южный", "Темно-каштановая"]),
+                ph_water=round(rng.uniform(6.2, 8.2), 1), humus_pct=round(rng.uniform(2.5, 6.0), 1),
+                p2o5_mg_kg=round(rng.uniform(8, 40), 1), k2o_mg_kg=round(rng.uniform(250, 600)),
+            ))
+
+        area = sum(f["area_ha"] for f in fields)
+        self._add(
+            Farm, id=farm_id, bin=f"99{farm_id:010d}", name=f"ТОО Синтетика-{farm_id}",
+            director_name="Тестовый руководитель", region=region, farm_type="ТОО",
+            founded_year=rng.randint(1995, 2015), total_area_ha=round(area, 1),
+            arable_area_ha=round(area, 1), center_lat=lat, center_lon=lon,
+        )
+
+        machines = {"tractor": [], "combine": [], "self_propelled_sprayer": []}
+        for kind, catalog, count in (("tractor", TRACTORS, 2), ("combine", COMBINES, 1), ("self_propelled_sprayer", [("Amazone", "Pantera 4504")], 1)):
+            for _ in range(count):
+                brand, model = rng.choice(catalog)
+                machine_id = ids.take(Machinery)
+                machines[kind].append(machine_id)
+                self._add(
+                    Machinery, id=machine_id, farm_id=farm_id, machinery_type=kind, brand=brand, model=model,
+                    year=rng.randint(2008, 2023), engine_power_hp=rng.choice([300, 370, 420, 500]),
+                    fuel_type="diesel", status="active",
+                )
+                has_gps = rng.random() < 0.6
+                self._add(
+                    MachineryEquipment, id=ids.take(MachineryEquipment), machine_id=machine_id,
+                    has_gps=has_gps, gps_type="RTK" if has_gps else None,
+                    accuracy_cm=2.5 if has_gps else None, has_autopilot=has_gps and rng.random() < 0.5,
+                )
+
+        implements = {}
+        for kind, brand, model, width in IMPLEMENTS:
+            implements[kind] = ids.take(Implements)
+            self._add(
+                Implements, id=implements[kind], farm_id=farm_id, implement_type=kind, brand=brand,
+                model=model, year=rng.randint(2010, 2023), working_width_m=width, status="active",
+            )
+
+        for year in config.season_years:
+            if config.weather == "daily":
+                self._weather(rng, ids, farm_id, year)
+            for field_index, field in enumerate(fields):
+                self._season(rng, ids, farm_id, field, field_index, year, machines, implements)
+
+    def _operation(self, ids: _Ids, farm_id: int, field: Dict, op_type: str, op_date: date, crop=None, **values) -> int:
+        op_id = ids.take(Operation)
+        self._add(
+            Operation, id=op_id, farm_id=farm_id, field_id=field["id"], operation_type=op_type,
+            operation_date=op_date, crop=crop, area_processed_ha=field["area_ha"], **values,
+        )
+        return op_id
+
+    def _gps(self, rng: random.Random, ids: _Ids, field: Dict, machine_id: int, op_type: str, day: date) -> None:
+        moment = datetime.combine(day, datetime.min.time()) + timedelta(hours=8)
+        lat, lon = field["center_lat"], field["center_lon"]
+        heading = rng.uniform(0, 360)
+        for point in range(self.config.gps_points):
+            self._add(
+                GPSTrack, id=ids.take(GPSTrack), datetime=moment + timedelta(seconds=30 * point),
+                latitude=lat + 0.0004 * point, longitude=lon + 0.0006 * point, altitude_m=rng.uniform(200, 300),
+                machine_id=machine_id, operation_type=op_type, speed_kmh=round(rng.uniform(6, 12), 1),
+                heading_deg=heading, field_id=field["id"],
+            )
+
+    def _season(self, rng, ids, farm_id, field, field_index, year, machines, implements) -> None:
+        crop = FALLOW if rng.random() < 0.12 else rng.choice(list(CROPS))
+        area = field["area_ha"]
+
+        if rng.random() < 0.3:
+            op = self._operation(ids, farm_id, field, "snow_retention", date(year, rng.randint(1, 2), rng.randint(1, 28)),
+                                 machine_id=machines["tractor"][0])
+            self._add(SnowRetentionDetails, id=ids.take(SnowRetentionDetails), operation_id=op, method="snow_plowing",
+                      snow_depth_cm=round(rng.uniform(15, 45)), snow_depth_after_cm=round(rng.uniform(30, 70)),
+                      number_of_passes=rng.randint(1, 3), coverage_percent=round(rng.uniform(60, 100)))
+
+        if (year + field_index) % 3 == 0:
+            op = self._operation(ids, farm_id, field, "soil_analysis", date(year, 4, rng.randint(5, 25)))
+            self._add(AgrochemicalAnalysis, id=ids.take(AgrochemicalAnalysis), operation_id=op, sample_depth_cm=20,
+                      ph_water=round(rng.uniform(6.2, 8.2), 1), humus_percent=round(rng.uniform(2.5, 6.0), 1),
+                      p2o5_mg_kg=round(rng.uniform(8, 40), 1), k2o_mg_kg=round(rng.uniform(250, 600)),
+                      no3_mg_kg=round(rng.uniform(3, 25), 1), lab_name="Синтетическая лаборатория")
+
+        op = self._operation(ids, farm_id, field, "tillage", date(year, 5, rng.randint(1, 10)),
+                             machine_id=machines["tractor"][-1], implement_id=implements["cultivator"])
+        self._add(TillageDetails, id=ids.take(TillageDetails), operation_id=op, tillage_type=rng.choice(TILLAGE_TYPES),
+                  depth_cm=rng.choice([6, 8, 10, 12]), soil_moisture="нормальная", tillage_purpose="pre_sowing")
+
+        if crop == FALLOW:
+            op = self._operation(ids, farm_id, field, "fallow", date(year, 6, rng.randint(1, 30)),
+                                 machine_id=machines["tractor"][0], implement_id=implements["cultivator"])
+            self._add(FallowDetails, id=ids.take(FallowDetails), operation_id=op, fallow_type=rng.choice(["black", "early", "cultivated"]),
+                      processing_depth_cm=rng.choice([8, 10, 12]), number_of_treatments=rng.randint(2, 4),
+                      weed_control_performed=True, purpose="Накопление влаги")
+            self._monitoring(rng, ids, field, year, crop)
+            return
+
+        varieties, seeding_rate, base_yield, price, desiccate = CROPS[crop]
+        variety = rng.choice(varieties)
+        sowing_date = date(year, 5, rng.randint(10, 31))
+        op = self._operation(ids, farm_id, field, "sowing", sowing_date, crop=crop, variety=variety,
+                             machine_id=machines["tractor"][0], implement_id=implements["seeder"],
+                             work_speed_kmh=round(rng.uniform(8, 12), 1))
+        self._add(SowingDetail, id=ids.take(SowingDetail), operation_id=op, crop=crop, variety=variety,
+                  seeding_rate_kg_ha=seeding_rate, seeding_depth_cm=rng.choice([4, 5, 6]), row_spacing_cm=rng.choice([15, 19, 23]),
+                  total_seeds_kg=round(seeding_rate * area), seed_reproduction=rng.choice(["элита", "1-я", "2-я"]),
+                  combined_with_fertilizer=False)
+        if self.config.gps_points:
+            self._gps(rng, ids, field, machines["tractor"][0], "sowing", sowing_date)
+
+        n_total = p_total = 0.0
+        for _ in range(rng.randint(1, 2)):
+            name, n, p, k = rng.choice(FERTILIZERS)
+            rate = rng.choice([40, 60, 80, 100])
+            op = self._operation(ids, farm_id, field, "fertilizing", sowing_date - timedelta(days=rng.randint(1, 10)), crop=crop,
+                                 implement_id=implements["seeder"])
+            n_total += rate * n / 100
+            p_total += rate * p / 100
+            self._add(FertilizerApplication, id=ids.take(FertilizerApplication), operation_id=op, fertilizer_name=name,
+                      fertilizer_type="Минеральное", rate_kg_ha=rate, total_fertilizer_kg=rate * area,
+                      n_content_percent=n, p_content_percent=p, k_content_percent=k,
+                      n_applied_kg=rate * n / 100 * area, p_applied_kg=rate * p / 100 * area, k_applied_kg=rate * k / 100 * area,
+                      application_method="Припосевное", application_purpose="Основное")
+
+        for _ in range(rng.randint(1, 3)):
+            op = self._operation(ids, farm_id, field, "spraying", date(year, rng.randint(6, 7), rng.randint(1, 28)), crop=crop,
+                                 machine_id=machines["self_propelled_sprayer"][0])
+            for pesticide_class, name, ingredient in rng.sample(PESTICIDES, rng.randint(1, 2)):
+                rate = round(rng.uniform(0.2, 1.2), 2)
+                self._add(PesticideApplication, id=ids.take(PesticideApplication), operation_id=op, pesticide_name=name,
+                          pesticide_class=pesticide_class, active_ingredient=ingredient, rate_per_ha=rate,
+                          total_product_used=round(rate * area, 1), water_rate_l_ha=rng.choice([100, 150, 200]),
+                          application_method="Наземное опрыскивание", growth_stage="Кущение",
+                          temperature_c=round(rng.uniform(14, 26), 1), wind_speed_ms=round(rng.uniform(0.5, 4), 1),
+                          humidity_percent=round(rng.uniform(40, 80)), waiting_period_days=rng.choice([20, 30, 40]))
+
+        if rng.random() < 0.05:
+            op = self._operation(ids, farm_id, field, "irrigation", date(year, 7, rng.randint(1, 28)), crop=crop)
+            rate = rng.choice([300, 400, 500])
+            self._add(IrrigationDetails, id=ids.take(IrrigationDetails), operation_id=op, irrigation_type="center_pivot",
+                      water_volume_m3=rate * area, water_rate_m3_ha=rate, water_source="Скважина",
+                      soil_moisture_before=round(rng.uniform(10, 20)), soil_moisture_after_percent=round(rng.uniform(25, 35)))
+
+        if desiccate and rng.random() < 0.7:
+            op = self._operation(ids, farm_id, field, "desiccation", date(year, 8, rng.randint(10, 31)), crop=crop,
+                                 machine_id=machines["self_propelled_sprayer"][0])
+            self._add(DesiccationDetails, id=ids.take(DesiccationDetails), operation_id=op, product_name="Раундап",
+                      active_ingredient="глифосат", rate_per_ha=2.0, water_rate_l_ha=150, growth_stage="Восковая спелость",
+                      target_moisture_percent=14)
+
+        # Урожайность: базовая по культуре, азот и случайный сезонный фактор
+        yield_t_ha = round(max(0.3, base_yield * rng.uniform(0.6, 1.4) + n_total * 0.004 + p_total * 0.002), 2)
+        harvest_date = date(year, rng.randint(8, 9), rng.randint(1, 28))
+        op = self._operation(ids, farm_id, field, "harvest", harvest_date, crop=crop, variety=variety,
+                             machine_id=machines["combine"][0], implement_id=implements["header"])
+        self._add(HarvestData, id=ids.take(HarvestData), operation_id=op, crop=crop, variety=variety,
+                  yield_t_ha=yield_t_ha, total_yield_t=round(yield_t_ha * area, 1),
+                  moisture_percent=round(rng.uniform(11, 18), 1), protein_percent=round(rng.uniform(11, 15), 1),
+                  quality_class=rng.randint(1, 4))
+        if self.config.gps_points:
+            self._gps(rng, ids, field, machines["combine"][0], "harvest", harvest_date)
+
+        if rng.random() < 0.5:
+            op = self._operation(ids, farm_id, field, "tillage", harvest_date + timedelta(days=rng.randint(3, 20)),
+                                 machine_id=machines["tractor"][-1], implement_id=implements["harrow"])
+            self._add(TillageDetails, id=ids.take(TillageDetails), operation_id=op, tillage_type="stubble_breaking",
+                      depth_cm=8, soil_moisture="сухая", tillage_purpose="post_harvest")
+
+        costs = rng.uniform(45000, 90000)
+        revenue = yield_t_ha * price
+        self._add(EconomicData, id=ids.take(EconomicData), field_id=field["id"], year=year, crop=crop, area_ha=area,
+                  total_costs_kzt_ha=round(costs), yield_t_ha=yield_t_ha, selling_price_kzt_t=price,
+                  revenue_kzt_ha=round(revenue), profit_kzt_ha=round(revenue - costs),
+                  profitability_pct=round((revenue - costs) / costs * 100, 1))
+        self._monitoring(rng, ids, field, year, crop)
+
+    def _monitoring(self, rng, ids, field, year, crop) -> None:
+        for _ in range(2):
+            pest_type, pest_name = rng.choice(PESTS)
+            severity = round(rng.uniform(0, 40), 1)
+            self._add(PhytosanitaryMonitoring, id=ids.take(PhytosanitaryMonitoring), field_id=field["id"],
+                      inspection_date=date(year, rng.randint(6, 8), rng.randint(1, 28)), pest_type=pest_type,
+                      pest_name=pest_name, severity_pct=severity, prevalence_pct=round(rng.uniform(0, 60), 1),
+                      intensity_score=rng.randint(1, 5), threshold_exceeded=severity > 20, crop_stage="Кущение",
+                      gps_lat=field["center_lat"], gps_lon=field["center_lon"])
+
+        for step in range(12):
+            ndvi = 0.15 + 0.6 * (1 - abs(step - 6) / 6) + rng.uniform(-0.05, 0.05)
+            self._add(SatelliteData, id=ids.take(SatelliteData), field_id=field["id"],
+                      acquisition_date=date(year, 5, 1) + timedelta(days=10 * step), satellite_source="Sentinel-2",
+                      ndvi_mean=round(ndvi, 3), ndvi_min=round(ndvi - 0.1, 3), ndvi_max=round(ndvi + 0.1, 3),
+                      ndvi_std=0.05, cloud_cover_pct=round(rng.uniform(0, 60)), resolution_m=10,
+                      crop_stage=None if crop == FALLOW else "Вегетация")
+
+    def _weather(self, rng, ids, farm_id, year) -> None:
+        day = date(year, 1, 1)
+        while day.year == year:
+            seasonal = -15 + 35 * max(0.0, 1 - abs(day.timetuple().tm_yday - 196) / 182) + rng.uniform(-4, 4)
+            self._add(WeatherData, id=ids.take(WeatherData), farm_id=farm_id, datetime=datetime.combine(day, datetime.min.time()),
+                      temp_air_c=round(seasonal, 1), temp_min_c=round(seasonal - rng.uniform(3, 8), 1),
+                      temp_max_c=round(seasonal + rng.uniform(3, 8), 1),
+                      precipitation_mm=round(rng.expovariate(1.2), 1) if rng.random() < 0.3 else 0.0,
+                      humidity_pct=round(rng.uniform(35, 90)), wind_speed_ms=round(rng.uniform(1, 8), 1))
+            day += timedelta(days=1)
+
+
+def generate(config: SyntheticConfig, database_url: Optional[str] = None, progress=None) -> Dict[str, Any]:
+    """
+    Генерация данных в БД приложения или в указанную БД
+
+    Args:
+        config: Параметры генерации
+        database_url: URL SQLite/PostgreSQL (по умолчанию - БД приложения)
+        progress: callback(готово, всего)
+
+    Returns:
+        Отчёт SyntheticGenerator.run()
+    """
+    bind = create_engine(database_url) if database_url else app_engine
+    return SyntheticGenerator(config, bind).run(progress)
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Генерация синтетических данных")
+    parser.add_argument("--farms", type=int, default=1)
+    parser.add_argument("--fields-per-farm", type=int, default=20)
+    parser.add_argument("--seasons", type=int, default=3)
+    parser.add_argument("--last-season", type=int, default=None)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--weather", choices=["daily", "none"], default="daily")
+    parser.add_argument("--gps-points", type=int, default=10)
+    parser.add_argument("--batch-rows", type=int, default=20000)
+    parser.add_argument("--database-url", default=None, help="Целевая БД (по умолчанию DATABASE_URL приложения)")
+    args = parser.parse_args()
+
+    config = SyntheticConfig(
+        farms=args.farms, fields_per_farm=args.fields_per_farm, seasons=args.seasons,
+        last_season=args.last_season, seed=args.seed, weather=args.weather,
+        gps_points=args.gps_points, batch_rows=args.batch_rows,
+    )
+
+    def _progress(done: int, total: int) -> None:
+        if done == total or done % max(1, total // 20) == 0:
+            print(f"  {done}/{total} farms", flush=True)
+
+    report = generate(config, args.database_url, _progress)
+    print(f"Inserted {report['total_rows']} rows in {report['seconds']} s ({report['rows_per_sec']} rows/s)")
+    for table, count in report["rows"].items():
+        if count:
+            print(f"  {table:<28} {count}")
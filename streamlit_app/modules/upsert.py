@@ -0,0 +1,60 @@
+"""
+Upsert - Пакетная запись INSERT ... ON CONFLICT DO UPDATE
+
+Общая для импорта Excel (modules.excel_import) и синхронизации
+справочников (modules.reference_sync): записи с уникальным ключом и хешем
+содержимого source_hash; строки с тем же хешем не переписываются.
+"""
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from sqlalchemy import select, true
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.orm import Session
+
+# INSERT ... ON CONFLICT поддерживают диалекты PostgreSQL и SQLite
+_INSERTS = {"postgresql": postgresql.insert, "sqlite": sqlite.insert}
+
+
+def upsert(db: Session, model, key_column: str, records: List[Dict[str, Any]],
+           guard: Optional[Callable] = None) -> Tuple[Dict[str, int], Dict[str, int], int]:
+    """
+    Пакетный INSERT ... ON CONFLICT (key_column) DO UPDATE
+
+    Строка обновляется, только если изменился source_hash. Повторы ключа
+    внутри пакета схлопываются (побеждает последняя запись).
+
+    Args:
+        db: Сессия
+        model: Модель с колонками key_column и source_hash
+        key_column: Колонка с уникальным индексом
+        records: Значения колонок (одинаковый набор ключей у всех записей)
+        guard: excluded -> дополнительное условие обновления
+
+    Returns:
+        ({ключ: id} добавленных, {ключ: id} обновлённых, число без изменений)
+    """
+    table = model.__table__
+    key = table.c[key_column]
+    by_key = {record[key_column]: record for record in records}
+    existing = dict(db.execute(select(key, table.c.source_hash).where(key.in_(list(by_key)))).all())
+    changed = [
+        record for row_key, record in by_key.items()
+        if row_key not in existing or existing[row_key] != record["source_hash"]
+    ]
+    if not changed:
+        return {}, {}, len(by_key)
+
+    dialect = db.get_bind().dialect.name
+    if dialect not in _INSERTS:
+        raise NotImplementedError(f"Upsert is not supported for {dialect}")
+    stmt = _INSERTS[dialect](table).values(changed)
+    condition = table.c.source_hash.is_distinct_from(stmt.excluded.source_hash)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[key_column],
+        set_={name: stmt.excluded[name] for name in changed[0] if name != key_column},
+        where=condition & (guard(stmt.excluded) if guard else true()),
+    ).returning(table.c.id, key)
+    written = {row_key: row_id for row_id, row_key in db.execute(stmt)}
+    inserted = {row_key: row_id for row_key, row_id in written.items() if row_key not in existing}
+    updated = {row_key: row_id for row_key, row_id in written.items() if row_key in existing}
+    return inserted, updated, len(by_key) - len(written)
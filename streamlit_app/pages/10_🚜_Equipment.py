@@ -4,8 +4,6 @@ Equipment - Управление техникой и агрегатами
 """
 import streamlit as st
 import pandas as pd
-import json
-from pathlib import Path
 from sqlalchemy.orm import Session
 from modules.database import SessionLocal, Farm, Machinery, Implements
 from modules.auth import (
@@ -18,7 +16,9 @@ from modules.auth import (
 )
 from modules.validators import validator
 from modules.config import settings
+from modules.reference_search import search_index
 from datetime import datetime
+from typing import Optional, Tuple
 
 # Настройка страницы
 st.set_page_config(page_title="Техника", page_icon="🚜", layout="wide")
@@ -34,34 +34,48 @@ st.caption(f"Пользователь: **{get_user_display_name()}**")
 # Получение сессии БД
 db = SessionLocal()
 
-# Загрузка справочников техники
-tractors_ref = {}
-combines_ref = {}
-implements_ref = {}
+# Справочники техники - общий индекс справочников (modules.reference_search):
+# производители и модели выбираются по фасетам, без перебора справочника
+references = search_index()
 
-try:
-    tractors_path = Path('data/tractors.json')
-    if tractors_path.exists():
-        with open(tractors_path, 'r', encoding='utf-8') as f:
-            tractors_ref = json.load(f)
-except Exception as e:
-    st.warning(f"⚠️ Не удалось загрузить справочник тракторов: {e}")
 
-try:
-    combines_path = Path('data/combines.json')
-    if combines_path.exists():
-        with open(combines_path, 'r', encoding='utf-8') as f:
-            combines_ref = json.load(f)
-except Exception as e:
-    st.warning(f"⚠️ Не удалось загрузить справочник комбайнов: {e}")
+def pick_reference_model(catalog: str, key: str, **where: str) -> Tuple[Optional[str], Optional[dict]]:
+    """
+    Выбор модели из справочника: поиск по названию или производитель -> модель
+
+    Args:
+        catalog: Файл справочника ("tractors.json")
+        key: Префикс ключей виджетов
+        **where: Отбор записей (например, тип_оборудования="seeder")
+
+    Returns:
+        (модель, данные записи) или (None, None)
+    """
+    query = st.text_input("🔍 Поиск модели", key=f"{key}_search", placeholder="Например: 8R 230, Ростсельмаш")
+
+    col_ref1, col_ref2 = st.columns(2)
+
+    if query:
+        models = {
+            hit.key: hit.data for hit in references.search(query, catalogs=[catalog], limit=50)
+            if all(hit.data.get(name) == value for name, value in where.items())
+        }
+        if not models:
+            st.warning(f"Ничего не найдено по запросу: {query}")
+    else:
+        with col_ref1:
+            # Выбор производителя
+            brands = references.facet_values(catalog, "производитель", **where)
+            selected_brand = st.selectbox("Производитель", brands, key=f"{key}_brand")
+        # Модели производителя
+        models = references.entries(catalog, производитель=selected_brand, **where) if selected_brand else {}
+
+    with col_ref2:
+        if models:
+            selected_model = st.selectbox("Модель из справочника", list(models.keys()), key=f"{key}_model")
+            return selected_model, models[selected_model]
+    return None, None
 
-try:
-    implements_path = Path('data/implements.json')
-    if implements_path.exists():
-        with open(implements_path, 'r', encoding='utf-8') as f:
-            implements_ref = json.load(f)
-except Exception as e:
-    st.warning(f"⚠️ Не удалось загрузить справочник агрегатов: {e}")
 
 try:
     # Проверка наличия хозяйства
@@ -203,23 +217,10 @@ try:
         ref_data = None
 
         if add_mode == "Из справочника":
-            if machinery_type == 'tractor' and tractors_ref:
+            if machinery_type == 'tractor' and references.facet_values("tractors.json", "производитель"):
                 st.markdown("**📚 Выбор из справочника тракторов**")
 
-                col_ref1, col_ref2 = st.columns(2)
-
-                with col_ref1:
-                    # Выбор производителя
-                    brands = sorted(set(v['производитель'] for v in tractors_ref.values()))
-                    selected_brand = st.selectbox("Производитель", brands, key="tractor_brand")
-
-                with col_ref2:
-                    # Фильтрация моделей по производителю
-                    filtered_models = {k: v for k, v in tractors_ref.items() if v['производитель'] == selected_brand}
-
-                    if filtered_models:
-                        selected_ref_model = st.selectbox("Модель из справочника", list(filtered_models.keys()), key="tractor_model")
-                        ref_data = filtered_models[selected_ref_model]
+                selected_ref_model, ref_data = pick_reference_model("tractors.json", "tractor")
 
                 # Показать характеристики
                 if ref_data:
@@ -227,23 +228,10 @@ try:
                                f"🏷️ Класс: {ref_data['класс']} | "
                                f"🚜 Тип: {ref_data['тип']}")
 
-            elif machinery_type == 'combine' and combines_ref:
+            elif machinery_type == 'combine' and references.facet_values("combines.json", "производитель"):
                 st.markdown("**📚 Выбор из справочника комбайнов**")
 
-                col_ref1, col_ref2 = st.columns(2)
-
-                with col_ref1:
-                    # Выбор производителя
-                    brands = sorted(set(v['производитель'] for v in combines_ref.values()))
-                    selected_brand = st.selectbox("Производитель", brands, key="combine_brand")
-
-                with col_ref2:
-                    # Фильтрация моделей по производителю
-                    filtered_models = {k: v for k, v in combines_ref.items() if v['производитель'] == selected_brand}
-
-                    if filtered_models:
-                        selected_ref_model = st.selectbox("Модель из справочника", list(filtered_models.keys()), key="combine_model")
-                        ref_data = filtered_models[selected_ref_model]
+                selected_ref_model, ref_data = pick_reference_model("combines.json", "combine")
 
                 # Показать характеристики
                 if ref_data:
@@ -514,27 +502,16 @@ try:
         selected_impl_ref_model = None
         impl_ref_data = None
 
-        if add_impl_mode == "Из справочника" and implements_ref:
-            # Фильтрация по типу оборудования
-            filtered_by_type = {k: v for k, v in implements_ref.items() if v.get('тип_оборудования') == implement_type}
+        if add_impl_mode == "Из справочника" and references.keys("implements.json"):
+            # Производители агрегатов выбранного типа
+            impl_brands = references.facet_values("implements.json", "производитель", тип_оборудования=implement_type)
 
-            if filtered_by_type:
+            if impl_brands:
                 st.markdown("**📚 Выбор из справочника агрегатов**")
 
-                col_ref1, col_ref2 = st.columns(2)
-
-                with col_ref1:
-                    # Выбор производителя
-                    brands = sorted(set(v['производитель'] for v in filtered_by_type.values()))
-                    selected_impl_brand = st.selectbox("Производитель", brands, key="impl_brand_ref")
-
-                with col_ref2:
-                    # Фильтрация моделей по производителю
-                    filtered_models = {k: v for k, v in filtered_by_type.items() if v['производитель'] == selected_impl_brand}
-
-                    if filtered_models:
-                        selected_impl_ref_model = st.selectbox("Модель из справочника", list(filtered_models.keys()), key="impl_model_ref")
-                        impl_ref_data = filtered_models[selected_impl_ref_model]
+                selected_impl_ref_model, impl_ref_data = pick_reference_model(
+                    "implements.json", "impl", тип_оборудования=implement_type
+                )
 
                 # Показать характеристики
                 if impl_ref_data:
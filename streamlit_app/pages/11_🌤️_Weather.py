@@ -5,26 +5,28 @@ import streamlit as st
 import pandas as pd
 from datetime import datetime, date, timedelta
 from pathlib import Path
-import plotly.express as px
-import plotly.graph_objects as go
 
 # Добавляем путь к модулям
 import sys
 sys.path.append(str(Path(__file__).parent.parent))
 
-from modules.database import get_db, Farm, Field, WeatherData
+from modules.database import get_db, WeatherData
+from modules.farm_cache import user_scope, get_farm, get_fields
 from modules.auth import (
     require_auth,
     require_farm_binding,
-    filter_query_by_farm,
     get_user_display_name,
     get_current_user,
-    is_admin,
     can_edit_data,
     can_delete_data
 )
 from modules.validators import DataValidator
 from utils.formatters import format_date, format_number
+from utils.downsampling import downsample, scatter_trace_class
+from utils.lazy import lazy_import
+
+# Библиотеки графиков загружаются при первом построении графика
+go = lazy_import("plotly.graph_objects")
 
 # Настройка страницы
 st.set_page_config(page_title="Метеоданные", page_icon="🌤️", layout="wide")
@@ -45,18 +47,14 @@ db = next(get_db())
 # Проверка наличия хозяйства
 user = get_current_user()
 
-if is_admin():
-    farm = db.query(Farm).first()
-else:
-    user_farm_id = user.get("farm_id") if user else None
-    farm = db.query(Farm).filter(Farm.id == user_farm_id).first() if user_farm_id else None
+farm = get_farm(user_scope())
 
 if not farm:
     st.warning("⚠️ Сначала создайте хозяйство на странице Farm Setup!")
     st.stop()
 
 # Получение списка полей
-fields = filter_query_by_farm(db.query(Field), Field).all()
+fields = get_fields(user_scope())
 
 # Табы
 tab1, tab2, tab3, tab4 = st.tabs(["📝 Регистрация данных", "📊 История погоды", "📈 Анализ", "🌡️ Агроклиматические показатели"])
@@ -380,10 +378,17 @@ with tab3:
         temp_min = [w.temp_min_c for w in all_weather]
         temp_avg = [(w.temp_max_c + w.temp_min_c) / 2 if w.temp_max_c and w.temp_min_c else w.temp_air_c for w in all_weather]
 
+        # Многолетние ряды прореживаются (LTTB) и рисуются через WebGL
+        trace_class = scatter_trace_class(len(dates))
+
         fig_temp = go.Figure()
-        fig_temp.add_trace(go.Scatter(x=dates, y=temp_max, mode='lines', name='T макс', line=dict(color='red')))
-        fig_temp.add_trace(go.Scatter(x=dates, y=temp_avg, mode='lines', name='T средн', line=dict(color='orange')))
-        fig_temp.add_trace(go.Scatter(x=dates, y=temp_min, mode='lines', name='T мин', line=dict(color='blue')))
+        for series, series_name, series_color in [
+            (temp_max, 'T макс', 'red'),
+            (temp_avg, 'T средн', 'orange'),
+            (temp_min, 'T мин', 'blue'),
+        ]:
+            series_x, series_y = downsample(dates, series)
+            fig_temp.add_trace(trace_class(x=series_x, y=series_y, mode='lines', name=series_name, line=dict(color=series_color)))
 
         fig_temp.update_layout(
             title="Температура воздуха",
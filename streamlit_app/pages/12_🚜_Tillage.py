@@ -12,14 +12,14 @@ from pathlib import Path
 import sys
 sys.path.append(str(Path(__file__).parent.parent))
 
-from modules.database import get_db, Farm, Field, Operation, TillageDetails, Machinery, Implements
+from modules.database import get_db, Field, Operation, TillageDetails
+from modules.farm_cache import user_scope, get_farm, get_fields, get_machinery, get_implements
+from modules.offline_queue import save_operation, render_sync_status
 from modules.auth import (
     require_auth,
     require_farm_binding,
-    filter_query_by_farm,
     get_user_display_name,
     get_current_user,
-    is_admin,
     can_edit_data,
     can_delete_data
 )
@@ -33,6 +33,7 @@ require_farm_binding()
 
 st.title("🚜 Учет обработки почвы")
 st.caption(f"Пользователь: **{get_user_display_name()}**")
+render_sync_status(user_scope())
 
 # Подключение к БД
 db = next(get_db())
@@ -50,18 +51,14 @@ except Exception as e:
 # Проверка наличия хозяйства
 user = get_current_user()
 
-if is_admin():
-    farm = db.query(Farm).first()
-else:
-    user_farm_id = user.get("farm_id") if user else None
-    farm = db.query(Farm).filter(Farm.id == user_farm_id).first() if user_farm_id else None
+farm = get_farm(user_scope())
 
 if not farm:
     st.warning("⚠️ Сначала создайте хозяйство!")
     st.stop()
 
 # Получение списка полей
-fields = filter_query_by_farm(db.query(Field), Field).all()
+fields = get_fields(user_scope())
 if not fields:
     st.warning("⚠️ Сначала добавьте поля на странице 'Поля'!")
     st.stop()
@@ -177,8 +174,8 @@ with tab1:
         st.markdown("### 🚜 Техника и агрегаты")
 
         # Получение списка техники и агрегатов
-        machinery_list = filter_query_by_farm(db.query(Machinery).filter(Machinery.status == 'active'), Machinery).all()
-        implements_list = filter_query_by_farm(db.query(Implements).filter(Implements.status == 'active'), Implements).all()
+        machinery_list = get_machinery(user_scope())
+        implements_list = get_implements(user_scope())
 
         col_tech1, col_tech2, col_tech3 = st.columns(3)
 
@@ -322,7 +319,7 @@ with tab1:
             else:
                 try:
                     # Создаем операцию
-                    operation = Operation(
+                    operation_values = dict(
                         farm_id=farm.id,
                         field_id=selected_field.id,
                         operation_type="tillage",
@@ -337,22 +334,19 @@ with tab1:
                         weather_conditions=weather_conditions if weather_conditions else None,
                         notes=notes if notes else None
                     )
-                    db.add(operation)
-                    db.flush()
-
-                    # Создаем детали обработки почвы
-                    tillage_details = TillageDetails(
-                        operation_id=operation.id,
+                    # Детали обработки почвы
+                    tillage_values = dict(
                         tillage_type=tillage_type,
                         depth_cm=depth_cm if depth_cm else None,
                         tillage_purpose=tillage_purpose if tillage_purpose else None,
                         soil_moisture=soil_moisture if soil_moisture else None
                     )
-                    db.add(tillage_details)
-
-                    db.commit()
+                    _, operation_id = save_operation(db, operation_values, {"tillage_details": tillage_values})
 
-                    st.success(f"✅ Обработка почвы зарегистрирована! Обработано {area_processed} га")
+                    if operation_id is None:
+                        st.success(f"✅ Обработка сохранена на устройстве ({area_processed} га) и будет отправлена при появлении связи")
+                    else:
+                        st.success(f"✅ Обработка почвы зарегистрирована! Обработано {area_processed} га")
                     st.balloons()
 
                 except Exception as e:
@@ -6,8 +6,9 @@ import streamlit as st
 import pandas as pd
 import io
 from datetime import datetime
+from typing import Optional
 from sqlalchemy.orm import Session
-from modules.database import SessionLocal, Farm, Field, Operation, AgrochemicalAnalysis, EconomicData, HarvestData, SowingDetail, FertilizerApplication
+from modules.database import SessionLocal, Farm
 from modules.auth import (
     require_auth,
     require_farm_binding,
@@ -20,6 +21,11 @@ from modules.auth import (
 )
 from modules.validators import validator
 from modules.config import settings
+from modules.jobs import render_job, render_jobs, save_upload, submit
+from modules.excel_reader import read_sheet, sheet_names
+from modules.excel_import import discard_quarantine, quarantine_rows, replay_quarantine
+from modules.reference_lookup import unknown_names
+from modules.farm_cache import farm_cache
 
 # Настройка страницы
 st.set_page_config(page_title="Импорт данных", page_icon="📥", layout="wide")
@@ -37,6 +43,133 @@ st.markdown("""
 Поддерживаются стандартные шаблоны из папки `examples/`.
 """)
 
+
+
+@st.cache_data(max_entries=4, show_spinner=False)
+def _read_upload(file_id: str, sheet: Optional[str], _data: bytes) -> pd.DataFrame:
+    return read_sheet(_data, sheet)
+
+
+def read_upload(uploaded_file, sheet: Optional[str] = None) -> pd.DataFrame:
+    """
+    Лист загруженного файла
+
+    Файл разбирается один раз: результат кешируется по file_id загрузки,
+    поэтому нажатие кнопки импорта (перезапуск скрипта) не читает Excel заново.
+
+    Args:
+        uploaded_file: Файл из st.file_uploader
+        sheet: Имя листа (по умолчанию - первый)
+
+    Returns:
+        DataFrame листа
+    """
+    return _read_upload(uploaded_file.file_id, sheet, uploaded_file.getvalue())
+
+
+def start_import_job(uploaded_file, sheet: str, farm_id: int, force: bool = False) -> None:
+    """
+    Постановка импорта в фоновую очередь
+
+    Запись выполняет процесс-исполнитель (modules.excel_import), поэтому
+    импорт не прерывается обновлением страницы и не занимает поток скрипта.
+    Повторная загрузка того же или исправленного файла не создаёт дублей:
+    строки сопоставляются по естественному ключу и хешу содержимого.
+
+    Args:
+        uploaded_file: Файл из st.file_uploader
+        sheet: Тип файла ("02".."06")
+        farm_id: Хозяйство
+        force: Применить заново строки, уже импортированные ранее
+    """
+    user = get_current_user() or {}
+    job_id = submit(
+        "import_excel",
+        {"path": save_upload(uploaded_file), "sheet": sheet, "farm_id": farm_id,
+         "file_name": uploaded_file.name, "force": force},
+        user_id=user.get("id"),
+        farm_id=farm_id,
+    )
+    st.session_state["import_job_id"] = job_id
+    st.success(f"✅ Импорт поставлен в очередь (задача #{job_id}). Можно продолжать работу - ход импорта ниже.")
+
+
+def render_reference_check(df: pd.DataFrame, column: str, catalog: str) -> None:
+    """
+    Предупреждение о названиях, которых нет в справочнике
+
+    Найденные точно или по синониму названия при импорте заменяются
+    названиями справочника; остальные импортируются как есть.
+
+    Args:
+        df: Лист Excel
+        column: Колонка с названиями
+        catalog: Справочник modules.reference_lookup
+    """
+    if column not in df.columns:
+        return
+    unknown = unknown_names(df[column], catalog)
+    if unknown.empty:
+        return
+    st.warning(f"⚠️ Нет в справочнике ({column}): {len(unknown)} названий - будут импортированы как есть")
+    for item in unknown.head(10).itertuples():
+        hint = f" - возможно: {', '.join(item.suggestions)}" if item.suggestions else ""
+        st.caption(f"  • {item.name} (строк: {item.rows}){hint}")
+
+
+def render_quarantine(db: Session, farm_id: int) -> None:
+    """
+    Строки импорта, отправленные в карантин
+
+    Ошибочные строки не прерывают импорт: здесь их можно исправить прямо
+    в таблице и импортировать повторно или отбросить.
+
+    Args:
+        db: Сессия БД
+        farm_id: Хозяйство
+    """
+    rows = quarantine_rows(db, farm_id)
+    if not rows:
+        return
+
+    with st.expander(f"🧪 Карантин импорта: {len(rows)} строк", expanded=False):
+        for sheet in sorted({row["sheet"] for row in rows}):
+            group = [row for row in rows if row["sheet"] == sheet]
+            st.markdown(f"**Тип {sheet}** - строк: {len(group)}")
+            frame = pd.DataFrame([
+                {"id": row["id"], "Строка": row["row_number"], "Файл": row["file_name"], "Причина": row["reason"],
+                 **row["data"]}
+                for row in group
+            ])
+            edited = st.data_editor(
+                frame,
+                disabled=["id", "Строка", "Файл", "Причина"],
+                hide_index=True,
+                use_container_width=True,
+                key=f"quarantine_editor_{sheet}",
+            )
+            data_columns = [column for column in edited.columns if column not in ("id", "Строка", "Файл", "Причина")]
+            col1, col2 = st.columns(2)
+            with col1:
+                if st.button("🔁 Импортировать исправленные строки", key=f"quarantine_replay_{sheet}"):
+                    result = replay_quarantine(db, {
+                        int(record["id"]): {column: record[column] for column in data_columns}
+                        for record in edited.to_dict("records")
+                    })
+                    farm_cache.bump("field", farm_id)
+                    st.session_state["quarantine_result"] = (
+                        f"Импортировано строк: {result['replayed']}, осталось с ошибками: {result['failed']}"
+                    )
+                    st.rerun()
+            with col2:
+                if st.button("🗑️ Отбросить строки", key=f"quarantine_discard_{sheet}"):
+                    discard_quarantine(db, [row["id"] for row in group])
+                    st.rerun()
+
+        if st.session_state.get("quarantine_result"):
+            st.info(st.session_state.pop("quarantine_result"))
+
+
 # Получение сессии БД
 db = SessionLocal()
 
@@ -142,6 +275,12 @@ try:
         help=f"Загрузите файл в формате {data_types[selected_type]['template']}"
     )
 
+    reapply = st.checkbox(
+        "Применить заново строки, уже импортированные ранее",
+        help="По умолчанию диапазоны строк, уже загруженные из этого или предыдущего файла без изменений, "
+             "пропускаются; изменённые строки обновляют ранее созданные записи, новые - добавляются"
+    )
+
     if uploaded_file:
         try:
             # Чтение файла
@@ -149,8 +288,8 @@ try:
                 # Определение типа импорта
                 if "01 - Общая информация" in selected_type:
                     # Файл с несколькими листами
-                    excel_file = pd.ExcelFile(uploaded_file)
-                    sheets = excel_file.sheet_names
+                    # Только список листов: содержимое читается для нужного листа
+                    sheets = sheet_names(uploaded_file)
 
                     st.success(f"✅ Файл прочитан успешно! Найдено листов: {len(sheets)}")
 
@@ -161,7 +300,7 @@ try:
 
                     # Чтение листа "Идентификация"
                     if "Идентификация" in sheets:
-                        df = pd.read_excel(uploaded_file, sheet_name="Идентификация")
+                        df = read_upload(uploaded_file, "Идентификация")
                         st.markdown("#### Превью данных (Идентификация):")
                         st.dataframe(df.head(10), use_container_width=True)
 
@@ -234,7 +373,7 @@ try:
 
                 elif "02 - Паспорт" in selected_type:
                     # Импорт полей
-                    df = pd.read_excel(uploaded_file)
+                    df = read_upload(uploaded_file)
 
                     st.success(f"✅ Файл прочитан! Найдено строк: {len(df)}")
 
@@ -290,54 +429,14 @@ try:
                     # Кнопка импорта
                     if not errors and valid_rows > 0:
                         if st.button("📥 Импортировать поля", type="primary"):
-                            with st.spinner(f"Импорт {valid_rows} полей..."):
-                                try:
-                                    if not farm:
-                                        st.error("❌ Сначала импортируйте данные хозяйства (тип 01)")
-                                        st.stop()
-
-                                    imported_count = 0
-
-                                    for idx, row in df.iterrows():
-                                        if pd.isna(row.get('ID поля')) or pd.isna(row.get('Площадь (га)')):
-                                            continue
-
-                                        field_code = str(row['ID поля'])
-                                        area = float(row['Площадь (га)'])
-
-                                        # Проверка существования
-                                        existing = db.query(Field).filter(Field.field_code == field_code).first()
-
-                                        if not existing:
-                                            new_field = Field(
-                                                farm_id=farm.id,
-                                                field_code=field_code,
-                                                name=row.get('Название поля') if not pd.isna(row.get('Название поля')) else None,
-                                                area_ha=area,
-                                                cadastral_number=row.get('Кадастровый номер') if not pd.isna(row.get('Кадастровый номер')) else None,
-                                                center_lat=row.get('Центроид широта') if not pd.isna(row.get('Центроид широта')) else None,
-                                                center_lon=row.get('Центроид долгота') if not pd.isna(row.get('Центроид долгота')) else None,
-                                                soil_type=row.get('Тип почвы') if not pd.isna(row.get('Тип почвы')) else None,
-                                                ph_water=row.get('pH водн') if not pd.isna(row.get('pH водн')) else None,
-                                                humus_pct=row.get('Гумус (%)') if not pd.isna(row.get('Гумус (%)')) else None,
-                                                p2o5_mg_kg=row.get('P2O5 (мг/кг)') if not pd.isna(row.get('P2O5 (мг/кг)')) else None,
-                                                k2o_mg_kg=row.get('K2O (мг/кг)') if not pd.isna(row.get('K2O (мг/кг)')) else None,
-                                            )
-                                            db.add(new_field)
-                                            imported_count += 1
-
-                                    db.commit()
-                                    st.success(f"✅ Успешно импортировано {imported_count} полей!")
-                                    st.balloons()
-                                    st.info("💡 Перейдите к разделу 'Поля' через боковое меню для просмотра импортированных данных.")
-
-                                except Exception as e:
-                                    db.rollback()
-                                    st.error(f"❌ Ошибка при импорте: {str(e)}")
+                            if not farm:
+                                st.error("❌ Сначала импортируйте данные хозяйства (тип 01)")
+                                st.stop()
+                            start_import_job(uploaded_file, "02", farm.id, force=reapply)
 
                 elif "03 - Агрохимические" in selected_type:
                     # Импорт агрохимических анализов
-                    df = pd.read_excel(uploaded_file)
+                    df = read_upload(uploaded_file)
 
                     st.success(f"✅ Файл прочитан! Найдено строк: {len(df)}")
 
@@ -390,65 +489,14 @@ try:
                     # Кнопка импорта
                     if not errors and valid_rows > 0:
                         if st.button("📥 Импортировать анализы", type="primary"):
-                            with st.spinner(f"Импорт {valid_rows} анализов..."):
-                                try:
-                                    if not farm:
-                                        st.error("❌ Сначала импортируйте данные хозяйства (тип 01)")
-                                        st.stop()
-
-                                    imported_count = 0
-
-                                    for idx, row in df.iterrows():
-                                        if pd.isna(row.get('ID поля')) or pd.isna(row.get('Дата анализа')):
-                                            continue
-
-                                        field_code = str(row['ID поля'])
-                                        field = db.query(Field).filter(Field.field_code == field_code).first()
-
-                                        if not field:
-                                            st.warning(f"⚠️ Поле {field_code} не найдено, пропуск...")
-                                            continue
-
-                                        # Парсинг даты
-                                        analysis_date = pd.to_datetime(row['Дата анализа']).date()
-
-                                        # Создание операции
-                                        operation = Operation(
-                                            farm_id=farm.id,
-                                            field_id=field.id,
-                                            operation_type="soil_analysis",
-                                            operation_date=analysis_date,
-                                            area_processed_ha=field.area_ha
-                                        )
-                                        db.add(operation)
-                                        db.flush()
-
-                                        # Создание анализа
-                                        analysis = AgrochemicalAnalysis(
-                                            operation_id=operation.id,
-                                            sample_depth_cm=row.get('Глубина отбора (см)') if not pd.isna(row.get('Глубина отбора (см)')) else None,
-                                            ph_water=row.get('pH водн') if not pd.isna(row.get('pH водн')) else None,
-                                            ph_salt=row.get('pH сол') if not pd.isna(row.get('pH сол')) else None,
-                                            humus_percent=row.get('Гумус (%)') if not pd.isna(row.get('Гумус (%)')) else None,
-                                            nitrogen_total_percent=row.get('N общий (%)') if not pd.isna(row.get('N общий (%)')) else None,
-                                            p2o5_mg_kg=row.get('P2O5 (мг/кг)') if not pd.isna(row.get('P2O5 (мг/кг)')) else None,
-                                            k2o_mg_kg=row.get('K2O (мг/кг)') if not pd.isna(row.get('K2O (мг/кг)')) else None,
-                                            mobile_s_mg_kg=row.get('S подв. (мг/кг)') if not pd.isna(row.get('S подв. (мг/кг)')) else None
-                                        )
-                                        db.add(analysis)
-                                        imported_count += 1
-
-                                    db.commit()
-                                    st.success(f"✅ Успешно импортировано {imported_count} анализов!")
-                                    st.balloons()
-
-                                except Exception as e:
-                                    db.rollback()
-                                    st.error(f"❌ Ошибка при импорте: {str(e)}")
+                            if not farm:
+                                st.error("❌ Сначала импортируйте данные хозяйства (тип 01)")
+                                st.stop()
+                            start_import_job(uploaded_file, "03", farm.id, force=reapply)
 
                 elif "04 - Журнал" in selected_type:
                     # Импорт журнала работ
-                    df = pd.read_excel(uploaded_file)
+                    df = read_upload(uploaded_file)
 
                     st.success(f"✅ Файл прочитан! Найдено строк: {len(df)}")
 
@@ -475,6 +523,7 @@ try:
                             valid_rows += 1
 
                         st.info(f"ℹ️ Найдено валидных строк: {valid_rows}")
+                        render_reference_check(df, "Культура", "crop")
 
                     # Показать результаты
                     if errors:
@@ -487,58 +536,14 @@ try:
                     # Кнопка импорта
                     if not errors and valid_rows > 0:
                         if st.button("📥 Импортировать операции", type="primary"):
-                            with st.spinner(f"Импорт {valid_rows} операций..."):
-                                try:
-                                    if not farm:
-                                        st.error("❌ Сначала импортируйте данные хозяйства (тип 01)")
-                                        st.stop()
-
-                                    imported_count = 0
-                                    operation_type_map = {
-                                        "Посев": "sowing",
-                                        "Внесение удобрений": "fertilizing",
-                                        "Опрыскивание": "spraying",
-                                        "Уборка": "harvest"
-                                    }
-
-                                    for idx, row in df.iterrows():
-                                        if pd.isna(row.get('ID поля')) or pd.isna(row.get('Дата')) or pd.isna(row.get('Тип операции')):
-                                            continue
-
-                                        field_code = str(row['ID поля'])
-                                        field = db.query(Field).filter(Field.field_code == field_code).first()
-
-                                        if not field:
-                                            continue
-
-                                        # Парсинг даты
-                                        op_date = pd.to_datetime(row['Дата']).date()
-                                        op_type_ru = str(row['Тип операции'])
-                                        op_type = operation_type_map.get(op_type_ru, "other")
-
-                                        # Создание операции
-                                        operation = Operation(
-                                            farm_id=farm.id,
-                                            field_id=field.id,
-                                            operation_type=op_type,
-                                            operation_date=op_date,
-                                            area_processed_ha=row.get('Площадь (га)') if not pd.isna(row.get('Площадь (га)')) else field.area_ha,
-                                            notes=row.get('Примечание') if not pd.isna(row.get('Примечание')) else None
-                                        )
-                                        db.add(operation)
-                                        imported_count += 1
-
-                                    db.commit()
-                                    st.success(f"✅ Успешно импортировано {imported_count} операций!")
-                                    st.balloons()
-
-                                except Exception as e:
-                                    db.rollback()
-                                    st.error(f"❌ Ошибка при импорте: {str(e)}")
+                            if not farm:
+                                st.error("❌ Сначала импортируйте данные хозяйства (тип 01)")
+                                st.stop()
+                            start_import_job(uploaded_file, "04", farm.id, force=reapply)
 
                 elif "05 - Урожайность" in selected_type:
                     # Импорт урожайности
-                    df = pd.read_excel(uploaded_file)
+                    df = read_upload(uploaded_file)
 
                     st.success(f"✅ Файл прочитан! Найдено строк: {len(df)}")
 
@@ -573,6 +578,7 @@ try:
                                     errors.append(f"Строка {idx + 2}: {msg}")
 
                         st.info(f"ℹ️ Найдено валидных строк: {valid_rows}")
+                        render_reference_check(df, "Культура", "crop")
 
                     # Показать результаты
                     if errors:
@@ -585,69 +591,14 @@ try:
                     # Кнопка импорта
                     if not errors and valid_rows > 0:
                         if st.button("📥 Импортировать урожайность", type="primary"):
-                            with st.spinner(f"Импорт {valid_rows} записей..."):
-                                try:
-                                    if not farm:
-                                        st.error("❌ Сначала импортируйте данные хозяйства (тип 01)")
-                                        st.stop()
-
-                                    imported_count = 0
-
-                                    for idx, row in df.iterrows():
-                                        if pd.isna(row.get('ID поля')) or pd.isna(row.get('Год')) or pd.isna(row.get('Урожайность (т/га)')):
-                                            continue
-
-                                        field_code = str(row['ID поля'])
-                                        field = db.query(Field).filter(Field.field_code == field_code).first()
-
-                                        if not field:
-                                            continue
-
-                                        # Парсинг данных
-                                        year = int(row['Год'])
-                                        # Предполагаем дату уборки - 15 августа указанного года
-                                        harvest_date = datetime(year, 8, 15).date()
-
-                                        yield_t_ha = float(row['Урожайность (т/га)'])
-                                        area = row.get('Площадь (га)') if not pd.isna(row.get('Площадь (га)')) else field.area_ha
-                                        total_yield = yield_t_ha * area
-
-                                        # Создание операции
-                                        operation = Operation(
-                                            farm_id=farm.id,
-                                            field_id=field.id,
-                                            operation_type="harvest",
-                                            operation_date=harvest_date,
-                                            area_processed_ha=area
-                                        )
-                                        db.add(operation)
-                                        db.flush()
-
-                                        # Создание данных уборки
-                                        harvest = HarvestData(
-                                            operation_id=operation.id,
-                                            crop=row.get('Культура') if not pd.isna(row.get('Культура')) else "Не указано",
-                                            variety=row.get('Сорт') if not pd.isna(row.get('Сорт')) else None,
-                                            yield_t_ha=yield_t_ha,
-                                            total_yield_t=total_yield,
-                                            moisture_percent=row.get('Влажность (%)') if not pd.isna(row.get('Влажность (%)')) else None,
-                                            protein_percent=row.get('Белок (%)') if not pd.isna(row.get('Белок (%)')) else None,
-                                            gluten_percent=row.get('Клейковина (%)') if not pd.isna(row.get('Клейковина (%)')) else None
-                                        )
-                                        db.add(harvest)
-                                        imported_count += 1
-
-                                    db.commit()
-                                    st.success(f"✅ Успешно импортировано {imported_count} записей урожайности!")
-                                    st.balloons()
-
-                                except Exception as e:
-                                    db.rollback()
-                                    st.error(f"❌ Ошибка при импорте: {str(e)}")
+                            if not farm:
+                                st.error("❌ Сначала импортируйте данные хозяйства (тип 01)")
+                                st.stop()
+                            start_import_job(uploaded_file, "05", farm.id, force=reapply)
 
                 elif "06 - Экономические" in selected_type:
                     # Импорт экономических данных
-                    df = pd.read_excel(uploaded_file)
+                    df = read_upload(uploaded_file)
 
                     st.success(f"✅ Файл прочитан! Найдено строк: {len(df)}")
 
@@ -674,6 +625,7 @@ try:
                             valid_rows += 1
 
                         st.info(f"ℹ️ Найдено валидных строк: {valid_rows}")
+                        render_reference_check(df, "Культура", "crop")
 
                     # Показать результаты
                     if errors:
@@ -686,59 +638,14 @@ try:
                     # Кнопка импорта
                     if not errors and valid_rows > 0:
                         if st.button("📥 Импортировать экономические данные", type="primary"):
-                            with st.spinner(f"Импорт {valid_rows} записей..."):
-                                try:
-                                    if not farm:
-                                        st.error("❌ Сначала импортируйте данные хозяйства (тип 01)")
-                                        st.stop()
-
-                                    imported_count = 0
-
-                                    for idx, row in df.iterrows():
-                                        if pd.isna(row.get('ID поля')) or pd.isna(row.get('Год')):
-                                            continue
-
-                                        field_code = str(row['ID поля'])
-                                        field = db.query(Field).filter(Field.field_code == field_code).first()
-
-                                        if not field:
-                                            continue
-
-                                        year = int(row['Год'])
-                                        crop = str(row.get('Культура')) if not pd.isna(row.get('Культура')) else None
-
-                                        # Создание экономических данных
-                                        economic_data = EconomicData(
-                                            farm_id=farm.id,
-                                            field_id=field.id,
-                                            year=year,
-                                            crop=crop,
-                                            revenue_per_ha=row.get('Выручка (тг/га)') if not pd.isna(row.get('Выручка (тг/га)')) else None,
-                                            costs_per_ha=row.get('Затраты (тг/га)') if not pd.isna(row.get('Затраты (тг/га)')) else None,
-                                            profit_per_ha=row.get('Прибыль (тг/га)') if not pd.isna(row.get('Прибыль (тг/га)')) else None,
-                                            profitability_percent=row.get('Рентабельность (%)') if not pd.isna(row.get('Рентабельность (%)')) else None,
-                                            subsidy_per_ha=row.get('Субсидии (тг/га)') if not pd.isna(row.get('Субсидии (тг/га)')) else None,
-                                            # Rental fields
-                                            field_rental_cost=row.get('Аренда поля (тг/га)') if not pd.isna(row.get('Аренда поля (тг/га)')) else None,
-                                            field_rental_period=str(row.get('Период аренды поля')) if not pd.isna(row.get('Период аренды поля')) else None,
-                                            machinery_rental_cost=row.get('Аренда техники (тг)') if not pd.isna(row.get('Аренда техники (тг)')) else None,
-                                            machinery_rental_type=str(row.get('Тип аренды техники')) if not pd.isna(row.get('Тип аренды техники')) else None,
-                                            rented_machinery_description=str(row.get('Описание арендованной техники')) if not pd.isna(row.get('Описание арендованной техники')) else None
-                                        )
-                                        db.add(economic_data)
-                                        imported_count += 1
-
-                                    db.commit()
-                                    st.success(f"✅ Успешно импортировано {imported_count} записей экономических данных!")
-                                    st.balloons()
-
-                                except Exception as e:
-                                    db.rollback()
-                                    st.error(f"❌ Ошибка при импорте: {str(e)}")
+                            if not farm:
+                                st.error("❌ Сначала импортируйте данные хозяйства (тип 01)")
+                                st.stop()
+                            start_import_job(uploaded_file, "06", farm.id, force=reapply)
 
                 else:
                     # Общий импорт для других типов
-                    df = pd.read_excel(uploaded_file)
+                    df = read_upload(uploaded_file)
 
                     st.success(f"✅ Файл прочитан! Найдено строк: {len(df)}, колонок: {len(df.columns)}")
 
@@ -764,6 +671,19 @@ try:
             st.error(f"❌ Ошибка при чтении файла: {str(e)}")
             st.exception(e)
 
+    # ============================================================================
+    # ФОНОВЫЕ ЗАДАЧИ ИМПОРТА
+    # ============================================================================
+
+    if st.session_state.get("import_job_id"):
+        st.markdown("#### ⏳ Ход импорта")
+        render_job(st.session_state["import_job_id"], key_prefix="import_current")
+
+    render_jobs(farm.id if farm else None, kinds=["import_excel"])
+
+    if farm:
+        render_quarantine(db, farm.id)
+
     st.markdown("---")
 
     # ============================================================================
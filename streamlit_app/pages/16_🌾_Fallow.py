@@ -9,8 +9,9 @@ from pathlib import Path
 import sys
 sys.path.append(str(Path(__file__).parent.parent))
 
-from modules.database import get_db, Farm, Field, Operation, FallowDetails, Machinery, Implements
-from modules.auth import require_auth, require_farm_binding, filter_query_by_farm, get_user_display_name, get_current_user, is_admin
+from modules.database import get_db, Field, Operation, FallowDetails
+from modules.farm_cache import user_scope, get_farm, get_fields, get_machinery, get_implements
+from modules.auth import require_auth, require_farm_binding, get_user_display_name, get_current_user
 
 st.set_page_config(page_title="Обработка паров", page_icon="🌾", layout="wide")
 require_auth()
@@ -32,13 +33,13 @@ except Exception as e:
     pass  # Справочник опционален
 
 user = get_current_user()
-farm = db.query(Farm).first() if is_admin() else db.query(Farm).filter(Farm.id == user.get("farm_id")).first()
+farm = get_farm(user_scope())
 
 if not farm:
     st.warning("⚠️ Сначала создайте хозяйство!")
     st.stop()
 
-fields = filter_query_by_farm(db.query(Field), Field).all()
+fields = get_fields(user_scope())
 if not fields:
     st.warning("⚠️ Сначала добавьте поля!")
     st.stop()
@@ -79,8 +80,8 @@ with tab1:
         st.markdown("---")
         st.markdown("### 🚜 Техника")
 
-        machinery_list = filter_query_by_farm(db.query(Machinery).filter(Machinery.status == 'active'), Machinery).all()
-        implements_list = filter_query_by_farm(db.query(Implements).filter(Implements.status == 'active'), Implements).all()
+        machinery_list = get_machinery(user_scope())
+        implements_list = get_implements(user_scope())
 
         # Pre-load machinery attributes
         tractors = [m for m in machinery_list if m.machinery_type == 'tractor']
@@ -8,8 +8,11 @@ from sqlalchemy.orm import Session
 from modules.database import SessionLocal, Farm, Field, Operation, AgrochemicalAnalysis
 from modules.config import settings
 from modules.auth import require_auth, filter_query_by_farm, get_current_user, get_user_display_name, is_admin
-import plotly.express as px
-import plotly.graph_objects as go
+from utils.charts import create_pie_chart
+from utils.lazy import lazy_import
+
+# Библиотеки графиков загружаются при первом построении графика
+go = lazy_import("plotly.graph_objects")
 
 # Настройка страницы
 st.set_page_config(page_title="Dashboard", page_icon="🏠", layout="wide")
@@ -193,13 +196,12 @@ try:
             if fields_data:
                 df_fields = pd.DataFrame(fields_data, columns=['Поле', 'Площадь (га)'])
 
-                fig_fields = px.pie(
-                    df_fields,
-                    values='Площадь (га)',
-                    names='Поле',
-                    title='Распределение площадей по полям',
-                    height=400
+                fig_fields = create_pie_chart(
+                    values=df_fields['Площадь (га)'].tolist(),
+                    names=df_fields['Поле'].tolist(),
+                    title='Распределение площадей по полям'
                 )
+                fig_fields.update_layout(height=400)
                 st.plotly_chart(fig_fields, use_container_width=True)
             else:
                 st.info("Добавьте поля для отображения графика")
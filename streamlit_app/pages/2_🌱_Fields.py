@@ -5,11 +5,11 @@ Fields - Управление полями
 import streamlit as st
 import pandas as pd
 from sqlalchemy.orm import Session
-from modules.database import SessionLocal, Farm, Field, Operation
+from modules.database import SessionLocal, Field, Operation
+from modules.farm_cache import user_scope, get_farm, get_fields
 from modules.auth import (
     require_auth,
     require_farm_binding,
-    filter_query_by_farm,
     get_user_display_name,
     can_edit_data,
     can_delete_data
@@ -34,19 +34,11 @@ db = SessionLocal()
 
 try:
     # Проверка наличия хозяйства
-    from modules.auth import get_current_user, is_admin
+    from modules.auth import get_current_user
     user = get_current_user()
 
-    if is_admin():
-        # Админ может выбрать хозяйство (если нужно, добавьте селектор)
-        farm = db.query(Farm).first()
-    else:
-        # Фермер работает со своим хозяйством
-        user_farm_id = user.get("farm_id") if user else None
-        if user_farm_id:
-            farm = db.query(Farm).filter(Farm.id == user_farm_id).first()
-        else:
-            farm = None
+    # Админ - первое хозяйство (если нужно, добавьте селектор), фермер - своё
+    farm = get_farm(user_scope())
 
     if not farm:
         st.error("❌ Хозяйство не найдено. Обратитесь к администратору для привязки к хозяйству.")
@@ -59,7 +51,7 @@ try:
     st.markdown("### 📋 Список полей")
 
     # Получение полей для текущего хозяйства
-    fields = filter_query_by_farm(db.query(Field), Field).all()
+    fields = get_fields(user_scope())
 
     if fields:
         # Создание DataFrame для отображения
@@ -344,12 +336,14 @@ try:
                         delete_btn = st.form_submit_button("🗑️ Удалить", use_container_width=True, type="secondary")
 
                     if update_btn:
-                        selected_field.name = edit_name
-                        selected_field.area_ha = edit_area
-                        selected_field.cadastral_number = edit_cadastral if edit_cadastral else None
-                        selected_field.soil_type = edit_soil_type if edit_soil_type != "Не указан" else None
-                        selected_field.ph_water = edit_ph if edit_ph > 0 else None
-                        selected_field.humus_pct = edit_humus if edit_humus > 0 else None
+                        # В списке - снимки из кеша, изменяем объект текущей сессии
+                        field_to_update = db.get(Field, selected_field.id)
+                        field_to_update.name = edit_name
+                        field_to_update.area_ha = edit_area
+                        field_to_update.cadastral_number = edit_cadastral if edit_cadastral else None
+                        field_to_update.soil_type = edit_soil_type if edit_soil_type != "Не указан" else None
+                        field_to_update.ph_water = edit_ph if edit_ph > 0 else None
+                        field_to_update.humus_pct = edit_humus if edit_humus > 0 else None
 
                         db.commit()
                         st.success("✅ Поле обновлено!")
@@ -18,6 +18,9 @@ from modules.auth import (
     can_delete_data
 )
 from modules.config import settings
+from modules.loading import operations_query, operation_details
+from modules.jobs import render_job, submit
+from modules.exports import journal_filters
 
 # Настройка страницы
 st.set_page_config(page_title="Журнал операций", page_icon="📝", layout="wide")
@@ -109,6 +112,16 @@ try:
     # ПОЛУЧЕНИЕ ДАННЫХ С ФИЛЬТРАЦИЕЙ
     # ============================================================================
 
+    # КРИТИЧЕСКИЙ ФИЛЬТР: только операции из полей текущего хозяйства
+    # (те же условия использует фоновый полный экспорт)
+    filters = journal_filters(
+        farm.id,
+        operation_type=operation_types[selected_type],
+        field_id=field_options[selected_field],
+        date_from=date_from,
+        date_to=date_to,
+    )
+
     # Базовый запрос
     query = db.query(
         Operation.id,
@@ -121,23 +134,7 @@ try:
         Operation.area_processed_ha,
         Operation.operator,
         Operation.notes
-    ).join(Field)
-
-    # КРИТИЧЕСКИЙ ФИЛЬТР: только операции из полей текущего хозяйства
-    query = query.filter(Field.farm_id == farm.id)
-
-    # Применение фильтров
-    if operation_types[selected_type]:
-        query = query.filter(Operation.operation_type == operation_types[selected_type])
-
-    if field_options[selected_field]:
-        query = query.filter(Operation.field_id == field_options[selected_field])
-
-    if date_from:
-        query = query.filter(Operation.operation_date >= date_from)
-
-    if date_to:
-        query = query.filter(Operation.operation_date <= date_to)
+    ).join(Field).filter(*filters)
 
     # Сортировка по дате (новые сверху)
     query = query.order_by(Operation.operation_date.desc())
@@ -295,6 +292,25 @@ try:
                 use_container_width=True
             )
 
+        with col3:
+            # Полный экспорт с деталями: профиль export_full, фоновая задача (modules.exports)
+            if st.button("🗂️ Подготовить полный экспорт (с деталями)", use_container_width=True):
+                st.session_state["journal_export_job_id"] = submit(
+                    "export_journal",
+                    {
+                        "farm_id": farm.id,
+                        "operation_type": operation_types[selected_type],
+                        "field_id": field_options[selected_field],
+                        "date_from": date_from,
+                        "date_to": date_to,
+                    },
+                    user_id=(user or {}).get("id"),
+                    farm_id=farm.id,
+                )
+
+            if st.session_state.get("journal_export_job_id"):
+                render_job(st.session_state["journal_export_job_id"], key_prefix="journal_export")
+
     else:
         st.info("📭 Операции не найдены. Измените фильтры или добавьте новые операции.")
 
@@ -336,7 +352,8 @@ try:
 
             if selected_op_name:
                 selected_op_id = operation_options[selected_op_name]
-                selected_op = db.query(Operation).filter(Operation.id == selected_op_id).first()
+                # Профиль journal: поле, техника и все детали одним запросом
+                selected_op = operations_query(db, "journal").filter(Operation.id == selected_op_id).first()
 
                 if selected_op:
                     with st.expander("📝 Детальная информация", expanded=False):
@@ -350,11 +367,13 @@ try:
                             st.markdown(f"**Сорт:** {selected_op.variety or '-'}")
 
                         with col2:
-                            field = db.query(Field).filter(Field.id == selected_op.field_id).first()
+                            field = selected_op.field
                             st.markdown(f"**Поле:** {field.name or field.field_code if field else '-'}")
                             st.markdown(f"**Площадь обработанная:** {selected_op.area_processed_ha or '-'} га")
                             st.markdown(f"**Оператор:** {selected_op.operator or '-'}")
-                            st.markdown(f"**Техника ID:** {selected_op.machine_id or '-'}")
+                            machine = selected_op.machinery
+                            machine_label = f"{machine.brand or ''} {machine.model}".strip() if machine else '-'
+                            st.markdown(f"**Техника:** {machine_label}")
 
                         if selected_op.notes:
                             st.markdown("**Примечания:**")
@@ -364,6 +383,14 @@ try:
                             st.markdown("**Погодные условия:**")
                             st.info(selected_op.weather_conditions)
 
+                        # Детали операции (уже загружены профилем)
+                        for relation, values in operation_details(selected_op).items():
+                            st.markdown(f"**{relation}:**")
+                            if isinstance(values, list):
+                                st.dataframe(pd.DataFrame(values), use_container_width=True, hide_index=True)
+                            else:
+                                st.json({k: str(v) if v is not None else None for k, v in values.items()})
+
 finally:
     db.close()
 
@@ -8,14 +8,15 @@ import json
 from datetime import datetime, date
 from pathlib import Path
 from sqlalchemy.orm import Session
-from modules.database import SessionLocal, Farm, Field, Operation, SowingDetail, Machinery, Implements
+from modules.database import SessionLocal, Field, Operation, SowingDetail
+from modules.farm_cache import user_scope, get_farm, get_fields, get_machinery, get_implements
+from modules.offline_queue import save_operation, render_sync_status
+from modules.reference_lookup import canonicalize
 from modules.auth import (
     require_auth,
     require_farm_binding,
-    filter_query_by_farm,
     get_user_display_name,
     get_current_user,
-    is_admin,
     can_edit_data,
     can_delete_data
 )
@@ -33,6 +34,7 @@ require_farm_binding()
 # Заголовок
 st.title("🌾 Учет посевных работ")
 st.caption(f"Пользователь: **{get_user_display_name()}**")
+render_sync_status(user_scope())
 
 # Получение сессии БД
 db = SessionLocal()
@@ -45,18 +47,14 @@ try:
     # Проверка наличия хозяйства
     user = get_current_user()
 
-    if is_admin():
-        farm = db.query(Farm).first()
-    else:
-        user_farm_id = user.get("farm_id") if user else None
-        farm = db.query(Farm).filter(Farm.id == user_farm_id).first() if user_farm_id else None
+    farm = get_farm(user_scope())
 
     if not farm:
         st.error("❌ Сначала необходимо зарегистрировать хозяйство!")
         st.stop()
 
     # Получение полей
-    fields = filter_query_by_farm(db.query(Field), Field).all()
+    fields = get_fields(user_scope())
 
     if not fields:
         st.warning("⚠️ Сначала добавьте поля в разделе 'Fields'")
@@ -282,8 +280,8 @@ try:
         st.markdown("#### 🚜 Техника и агрегаты")
 
         # Получение списка техники и агрегатов
-        machinery_list = filter_query_by_farm(db.query(Machinery).filter(Machinery.status == 'active'), Machinery).all()
-        implements_list = filter_query_by_farm(db.query(Implements).filter(Implements.status == 'active'), Implements).all()
+        machinery_list = get_machinery(user_scope())
+        implements_list = get_implements(user_scope())
 
         col1, col2 = st.columns(2)
 
@@ -475,7 +473,7 @@ try:
             else:
                 try:
                     # Создание операции
-                    new_operation = Operation(
+                    operation_values = dict(
                         farm_id=farm.id,
                         field_id=selected_field.id,
                         operation_type="sowing",
@@ -494,12 +492,12 @@ try:
                         notes=notes if notes else None
                     )
 
-                    db.add(new_operation)
-                    db.flush()  # Получить ID операции
+                    # Название удобрения - как в справочнике, если найдено точно или по синониму
+                    if combined_with_fertilizer and combined_fertilizer_name:
+                        combined_fertilizer_name = canonicalize(pd.Series([combined_fertilizer_name]), "fertilizer").iat[0]
 
-                    # Создание деталей посева
-                    sowing_detail = SowingDetail(
-                        operation_id=new_operation.id,
+                    # Детали посева
+                    sowing_values = dict(
                         crop=selected_crop,
                         variety=selected_variety if selected_variety != "Не указан" else None,
                         seeding_rate_kg_ha=seeding_rate,
@@ -516,10 +514,12 @@ try:
                         combined_fertilizer_rate_kg_ha=combined_fertilizer_rate if combined_with_fertilizer else None
                     )
 
-                    db.add(sowing_detail)
-                    db.commit()
+                    _, operation_id = save_operation(db, operation_values, {"sowing_details": sowing_values})
 
-                    st.success(f"✅ Посев успешно зарегистрирован!")
+                    if operation_id is None:
+                        st.success("✅ Посев сохранён на устройстве и будет отправлен при появлении связи")
+                    else:
+                        st.success(f"✅ Посев успешно зарегистрирован!")
                     st.balloons()
 
                     # Показать сводку
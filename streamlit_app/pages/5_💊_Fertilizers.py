@@ -6,27 +6,31 @@ import pandas as pd
 import json
 from datetime import datetime, date
 from pathlib import Path
-import plotly.express as px
-import plotly.graph_objects as go
 
 # Добавляем путь к модулям
 import sys
 sys.path.append(str(Path(__file__).parent.parent))
 
-from modules.database import get_db, Farm, Field, Operation, FertilizerApplication, Machinery, Implements
+from modules.database import get_db, Operation, FertilizerApplication
+from modules.farm_cache import user_scope, get_farm, get_fields, get_machinery, get_implements
 from modules.auth import (
     require_auth,
     require_farm_binding,
-    filter_query_by_farm,
     get_user_display_name,
     get_current_user,
-    is_admin,
     can_edit_data,
     can_delete_data
 )
 from modules.validators import DataValidator
+from modules.analytics import fertilizer_frame, fertilizer_summary
+from modules.nutrient_balance import get_season_balance
 from utils.formatters import format_date, format_area, format_number, format_npk
 from utils.reference_loader import load_fertilizers, load_tractors
+from utils.lazy import lazy_import
+
+# Библиотеки графиков загружаются при первом построении графика
+px = lazy_import("plotly.express")
+go = lazy_import("plotly.graph_objects")
 
 # Настройка страницы
 st.set_page_config(page_title="Удобрения", page_icon="💊", layout="wide")
@@ -51,24 +55,20 @@ db = next(get_db())
 # Проверка наличия хозяйства
 user = get_current_user()
 
-if is_admin():
-    farm = db.query(Farm).first()
-else:
-    user_farm_id = user.get("farm_id") if user else None
-    farm = db.query(Farm).filter(Farm.id == user_farm_id).first() if user_farm_id else None
+farm = get_farm(user_scope())
 
 if not farm:
     st.warning("⚠️ Сначала создайте хозяйство на странице импорта!")
     st.stop()
 
 # Получение списка полей
-fields = filter_query_by_farm(db.query(Field), Field).all()
+fields = get_fields(user_scope())
 if not fields:
     st.warning("⚠️ Сначала добавьте поля на странице 'Поля'!")
     st.stop()
 
 # Табы
-tab1, tab2, tab3 = st.tabs(["📝 Регистрация внесения", "📊 История внесений", "📚 Справочник удобрений"])
+tab1, tab2, tab3, tab4 = st.tabs(["📝 Регистрация внесения", "📊 История внесений", "📚 Справочник удобрений", "⚖️ Баланс NPK"])
 
 # ========================================
 # TAB 1: Регистрация внесения удобрений
@@ -163,8 +163,8 @@ with tab1:
         st.markdown("### 🚜 Техника и агрегаты")
 
         # Получение списка техники и агрегатов
-        machinery_list = filter_query_by_farm(db.query(Machinery).filter(Machinery.status == 'active'), Machinery).all()
-        implements_list = filter_query_by_farm(db.query(Implements).filter(Implements.status == 'active'), Implements).all()
+        machinery_list = get_machinery(user_scope())
+        implements_list = get_implements(user_scope())
 
         # Pre-load machinery attributes
         machinery_options = {}
@@ -411,47 +411,31 @@ with tab2:
             key="filter_year_history"
         )
 
-    # Получение данных
-    query = db.query(Operation, FertilizerApplication, Field).join(
-        FertilizerApplication, Operation.id == FertilizerApplication.operation_id
-    ).join(
-        Field, Operation.field_id == Field.id
-    ).filter(
-        Operation.operation_type == "fertilizing"
-    ).filter(
-        Field.farm_id == farm.id  # КРИТИЧЕСКИЙ ФИЛЬТР: только операции текущего хозяйства
+    # Получение данных (только нужные колонки; КРИТИЧЕСКИЙ ФИЛЬТР: только текущее хозяйство)
+    applications_df = fertilizer_frame(
+        db,
+        farm.id,
+        year=filter_year if filter_year != "Все годы" else None,
+        field_code=filter_field.split(" - ")[0] if filter_field != "Все поля" else None,
+        fertilizer_type=filter_category if filter_category != "Все категории" else None
     )
 
-    # Применение фильтров
-    if filter_field != "Все поля":
-        field_code = filter_field.split(" - ")[0]
-        query = query.filter(Field.field_code == field_code)
-
-    if filter_category != "Все категории":
-        query = query.filter(FertilizerApplication.fertilizer_type == filter_category)
-
-    if filter_year != "Все годы":
-        from sqlalchemy import extract
-        query = query.filter(extract('year', Operation.operation_date) == filter_year)
-
-    applications = query.order_by(Operation.operation_date.desc()).all()
-
-    if applications:
-        st.metric("Всего внесений", len(applications))
+    if not applications_df.empty:
+        st.metric("Всего внесений", len(applications_df))
 
         # Таблица
         data = []
-        for op, fert_app, field in applications:
+        for row in applications_df.itertuples(index=False):
             data.append({
-                "Дата": format_date(op.operation_date),
-                "Поле": f"{field.field_code} - {field.name}",
-                "Категория": fert_app.fertilizer_type,
-                "Удобрение": fert_app.fertilizer_name,
-                "Норма (кг/га)": format_number(fert_app.rate_kg_ha, 1),
-                "Площадь (га)": format_area(op.area_processed_ha),
-                "Всего (кг)": format_number(fert_app.total_fertilizer_kg, 0),
-                "NPK д.в. (кг)": f"N:{format_number(fert_app.n_applied_kg, 1)} P:{format_number(fert_app.p_applied_kg, 1)} K:{format_number(fert_app.k_applied_kg, 1)}",
-                "Способ": fert_app.application_method
+                "Дата": format_date(row.operation_date.date()),
+                "Поле": row.field,
+                "Категория": row.fertilizer_type,
+                "Удобрение": row.fertilizer_name,
+                "Норма (кг/га)": format_number(row.rate_kg_ha, 1),
+                "Площадь (га)": format_area(row.area_ha),
+                "Всего (кг)": format_number(row.total_fertilizer_kg, 0),
+                "NPK д.в. (кг)": f"N:{format_number(row.n_applied_kg, 1)} P:{format_number(row.p_applied_kg, 1)} K:{format_number(row.k_applied_kg, 1)}",
+                "Способ": row.application_method
             })
 
         df = pd.DataFrame(data)
@@ -463,10 +447,11 @@ with tab2:
 
         col1, col2, col3, col4 = st.columns(4)
 
-        total_fertilizer = sum(fert_app.total_fertilizer_kg for _, fert_app, _ in applications)
-        total_n = sum(fert_app.n_applied_kg for _, fert_app, _ in applications)
-        total_p = sum(fert_app.p_applied_kg for _, fert_app, _ in applications)
-        total_k = sum(fert_app.k_applied_kg for _, fert_app, _ in applications)
+        summary = fertilizer_summary(applications_df)
+        total_fertilizer = summary["totals"]["total_fertilizer"]
+        total_n = summary["totals"]["total_n"]
+        total_p = summary["totals"]["total_p"]
+        total_k = summary["totals"]["total_k"]
 
         with col1:
             st.metric("Всего внесено удобрений", f"{format_number(total_fertilizer, 0)} кг")
@@ -482,14 +467,10 @@ with tab2:
 
         with col1:
             # График по категориям
-            category_data = {}
-            for _, fert_app, _ in applications:
-                category = fert_app.fertilizer_type
-                category_data[category] = category_data.get(category, 0) + fert_app.total_fertilizer_kg
-
+            by_category = summary["by_category"]
             fig_category = px.pie(
-                values=list(category_data.values()),
-                names=list(category_data.keys()),
+                values=by_category["total_fertilizer"].tolist(),
+                names=by_category["fertilizer_type"].tolist(),
                 title="Распределение по категориям удобрений (кг)"
             )
             st.plotly_chart(fig_category, use_container_width=True)
@@ -515,20 +496,13 @@ with tab2:
             st.plotly_chart(fig_npk, use_container_width=True)
 
         # График по полям
-        field_data = {}
-        for op, fert_app, field in applications:
-            field_name = f"{field.field_code} - {field.name}"
-            if field_name not in field_data:
-                field_data[field_name] = {"N": 0, "P": 0, "K": 0}
-            field_data[field_name]["N"] += fert_app.n_applied_kg
-            field_data[field_name]["P"] += fert_app.p_applied_kg
-            field_data[field_name]["K"] += fert_app.k_applied_kg
-
-        if field_data:
-            fields_list = list(field_data.keys())
-            n_values = [field_data[f]["N"] for f in fields_list]
-            p_values = [field_data[f]["P"] for f in fields_list]
-            k_values = [field_data[f]["K"] for f in fields_list]
+        by_field = summary["by_field"]
+
+        if not by_field.empty:
+            fields_list = by_field["field"].tolist()
+            n_values = by_field["n"].tolist()
+            p_values = by_field["p"].tolist()
+            k_values = by_field["k"].tolist()
 
             fig_fields = go.Figure(data=[
                 go.Bar(name='Азот (N)', x=fields_list, y=n_values),
@@ -598,6 +572,68 @@ with tab3:
     else:
         st.warning("Справочник удобрений не загружен")
 
+# ========================================
+# TAB 4: Баланс NPK
+# ========================================
+with tab4:
+    st.subheader("Баланс элементов питания по полям")
+
+    st.info("""
+    **Баланс** = внесено (удобрения + совмещённый посев) − вынос с урожаем.
+    Вынос рассчитывается по урожайности и потребности культуры из справочника.
+    Фосфор и калий - в пересчёте на P₂O₅ и K₂O, кг д.в./га.
+    """)
+
+    balance_season = st.selectbox(
+        "Сезон",
+        options=list(range(datetime.now().year, datetime.now().year - 10, -1)),
+        key="balance_season"
+    )
+
+    balance_df = get_season_balance(db, farm.id, balance_season)
+
+    if not balance_df.empty:
+        col1, col2, col3 = st.columns(3)
+        with col1:
+            st.metric("Средний баланс N", f"{format_number(balance_df['n_balance_kg_ha'].mean(), 1)} кг/га")
+        with col2:
+            st.metric("Средний баланс P₂O₅", f"{format_number(balance_df['p_balance_kg_ha'].mean(), 1)} кг/га")
+        with col3:
+            st.metric("Средний баланс K₂O", f"{format_number(balance_df['k_balance_kg_ha'].mean(), 1)} кг/га")
+
+        display_df = balance_df.rename(columns={
+            "field_code": "Поле",
+            "field_name": "Название",
+            "area_ha": "Площадь (га)",
+            "crop": "Культура",
+            "yield_t_ha": "Урожайность (т/га)",
+            "n_applied_kg_ha": "N внесено",
+            "p_applied_kg_ha": "P₂O₅ внесено",
+            "k_applied_kg_ha": "K₂O внесено",
+            "n_removed_kg_ha": "N вынос",
+            "p_removed_kg_ha": "P₂O₅ вынос",
+            "k_removed_kg_ha": "K₂O вынос",
+            "n_balance_kg_ha": "Баланс N",
+            "p_balance_kg_ha": "Баланс P₂O₅",
+            "k_balance_kg_ha": "Баланс K₂O",
+            "soil_p2o5_mg_kg": "P₂O₅ почвы (мг/кг)",
+            "soil_k2o_mg_kg": "K₂O почвы (мг/кг)",
+            "soil_no3_mg_kg": "NO₃ почвы (мг/кг)",
+            "soil_analysis_date": "Дата анализа",
+        }).drop(columns=["field_id", "season"])
+
+        st.dataframe(display_df.round(1), use_container_width=True, hide_index=True)
+
+        csv = display_df.to_csv(index=False).encode('utf-8-sig')
+        st.download_button(
+            "📥 Скачать CSV",
+            csv,
+            f"npk_balance_{balance_season}.csv",
+            "text/csv"
+        )
+    else:
+        st.info("📭 Нет данных о внесении, посеве или уборке за выбранный сезон")
+
 # Футер
 st.markdown("---")
 st.markdown("💊 **Учет внесения удобрений** | Версия 1.0")
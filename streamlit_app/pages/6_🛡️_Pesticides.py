@@ -6,27 +6,30 @@ import pandas as pd
 import json
 from datetime import datetime, date, timedelta
 from pathlib import Path
-import plotly.express as px
-import plotly.graph_objects as go
 
 # Добавляем путь к модулям
 import sys
 sys.path.append(str(Path(__file__).parent.parent))
 
-from modules.database import get_db, Farm, Field, Operation, PesticideApplication, Machinery, Implements
+from modules.database import get_db, Field, Operation, PesticideApplication
+from modules.farm_cache import user_scope, get_farm, get_fields, get_machinery, get_implements
 from modules.auth import (
     require_auth,
     require_farm_binding,
-    filter_query_by_farm,
     get_user_display_name,
     get_current_user,
-    is_admin,
     can_edit_data,
     can_delete_data
 )
 from modules.validators import DataValidator
+from modules.analytics import pesticide_frame, pesticide_summary
 from utils.formatters import format_date, format_area, format_number
 from utils.reference_loader import load_pesticides, load_tractors
+from modules.reference_search import search_index
+from utils.lazy import lazy_import
+
+# Библиотеки графиков загружаются при первом построении графика
+px = lazy_import("plotly.express")
 
 # Настройка страницы
 st.set_page_config(page_title="СЗР", page_icon="🛡️", layout="wide")
@@ -51,18 +54,14 @@ db = next(get_db())
 # Проверка наличия хозяйства
 user = get_current_user()
 
-if is_admin():
-    farm = db.query(Farm).first()
-else:
-    user_farm_id = user.get("farm_id") if user else None
-    farm = db.query(Farm).filter(Farm.id == user_farm_id).first() if user_farm_id else None
+farm = get_farm(user_scope())
 
 if not farm:
     st.warning("⚠️ Сначала создайте хозяйство на странице импорта!")
     st.stop()
 
 # Получение списка полей
-fields = filter_query_by_farm(db.query(Field), Field).all()
+fields = get_fields(user_scope())
 if not fields:
     st.warning("⚠️ Сначала добавьте поля на странице 'Поля'!")
     st.stop()
@@ -230,8 +229,8 @@ with tab1:
         st.markdown("### 🚜 Техника для опрыскивания")
 
         # Получение списка техники и агрегатов
-        machinery_list = filter_query_by_farm(db.query(Machinery).filter(Machinery.status == 'active'), Machinery).all()
-        implements_list = filter_query_by_farm(db.query(Implements).filter(Implements.status == 'active'), Implements).all()
+        machinery_list = get_machinery(user_scope())
+        implements_list = get_implements(user_scope())
 
         # Pre-load machinery attributes
         spray_machinery = [m for m in machinery_list if m.machinery_type in ['tractor', 'self_propelled_sprayer', 'drone']]
@@ -497,47 +496,31 @@ with tab2:
             key="filter_year_history"
         )
 
-    # Получение данных
-    query = db.query(Operation, PesticideApplication, Field).join(
-        PesticideApplication, Operation.id == PesticideApplication.operation_id
-    ).join(
-        Field, Operation.field_id == Field.id
-    ).filter(
-        Operation.operation_type == "spraying"
-    ).filter(
-        Field.farm_id == farm.id  # КРИТИЧЕСКИЙ ФИЛЬТР: только операции текущего хозяйства
+    # Получение данных (только нужные колонки; КРИТИЧЕСКИЙ ФИЛЬТР: только текущее хозяйство)
+    applications_df = pesticide_frame(
+        db,
+        farm.id,
+        year=filter_year if filter_year != "Все годы" else None,
+        field_code=filter_field.split(" - ")[0] if filter_field != "Все поля" else None,
+        pesticide_class=filter_class if filter_class != "Все классы" else None
     )
 
-    # Применение фильтров
-    if filter_field != "Все поля":
-        field_code = filter_field.split(" - ")[0]
-        query = query.filter(Field.field_code == field_code)
-
-    if filter_class != "Все классы":
-        query = query.filter(PesticideApplication.pesticide_class == filter_class)
-
-    if filter_year != "Все годы":
-        from sqlalchemy import extract
-        query = query.filter(extract('year', Operation.operation_date) == filter_year)
-
-    applications = query.order_by(Operation.operation_date.desc()).all()
-
-    if applications:
-        st.metric("Всего обработок", len(applications))
+    if not applications_df.empty:
+        st.metric("Всего обработок", len(applications_df))
 
         # Таблица
         data = []
-        for op, pest_app, field in applications:
+        for row in applications_df.itertuples(index=False):
             data.append({
-                "Дата": format_date(op.operation_date),
-                "Поле": f"{field.field_code} - {field.name}",
-                "Класс": pest_app.pesticide_class,
-                "Препарат": pest_app.pesticide_name,
-                "Норма": f"{format_number(pest_app.rate_per_ha, 2)} л/га",
-                "Площадь (га)": format_area(op.area_processed_ha),
-                "Всего": f"{format_number(pest_app.total_product_used, 2)} л/кг",
-                "Цель": pest_app.treatment_target,
-                "Способ": pest_app.application_method
+                "Дата": format_date(row.operation_date.date()),
+                "Поле": row.field,
+                "Класс": row.pesticide_class,
+                "Препарат": row.pesticide_name,
+                "Норма": f"{format_number(row.rate_per_ha, 2)} л/га",
+                "Площадь (га)": format_area(row.area_ha),
+                "Всего": f"{format_number(row.total_product_used, 2)} л/кг",
+                "Цель": row.treatment_target,
+                "Способ": row.application_method
             })
 
         df = pd.DataFrame(data)
@@ -549,12 +532,13 @@ with tab2:
 
         col1, col2, col3, col4 = st.columns(4)
 
-        total_product = sum(pest_app.total_product_used for _, pest_app, _ in applications)
-        total_area = sum(op.area_processed_ha for op, _, _ in applications)
-        avg_rate = total_product / total_area if total_area > 0 else 0
+        summary = pesticide_summary(applications_df)
+        total_product = summary["totals"]["total_product"]
+        total_area = summary["totals"]["total_area"]
+        avg_rate = summary["totals"]["avg_rate"]
 
         with col1:
-            st.metric("Всего обработок", len(applications))
+            st.metric("Всего обработок", summary["totals"]["count"])
         with col2:
             st.metric("Обработано площади", format_area(total_area))
         with col3:
@@ -567,42 +551,31 @@ with tab2:
 
         with col1:
             # График по классам
-            class_data = {}
-            for _, pest_app, _ in applications:
-                pest_class = pest_app.pesticide_class
-                class_data[pest_class] = class_data.get(pest_class, 0) + 1
-
+            by_class = summary["by_class"]
             fig_class = px.pie(
-                values=list(class_data.values()),
-                names=list(class_data.keys()),
+                values=by_class["count"].tolist(),
+                names=by_class["pesticide_class"].tolist(),
                 title="Распределение по классам СЗР"
             )
             st.plotly_chart(fig_class, use_container_width=True)
 
         with col2:
             # График по целям
-            target_data = {}
-            for _, pest_app, _ in applications:
-                target = pest_app.treatment_target
-                target_data[target] = target_data.get(target, 0) + 1
-
+            by_target = summary["by_target"]
             fig_target = px.pie(
-                values=list(target_data.values()),
-                names=list(target_data.keys()),
+                values=by_target["count"].tolist(),
+                names=by_target["treatment_target"].tolist(),
                 title="Распределение по целям обработки"
             )
             st.plotly_chart(fig_target, use_container_width=True)
 
         # График расхода по полям
-        field_data = {}
-        for op, pest_app, field in applications:
-            field_name = f"{field.field_code}"
-            field_data[field_name] = field_data.get(field_name, 0) + pest_app.total_product_used
+        by_field = summary["by_field"]
 
-        if field_data:
+        if not by_field.empty:
             fig_fields = px.bar(
-                x=list(field_data.keys()),
-                y=list(field_data.values()),
+                x=by_field["field_code"].tolist(),
+                y=by_field["total_product"].tolist(),
                 title="Расход препаратов по полям (л/кг)",
                 labels={"x": "Поля", "y": "Расход (л/кг)"}
             )
@@ -617,6 +590,21 @@ with tab2:
 with tab3:
     st.subheader("Справочник средств защиты растений")
 
+    # Поиск по названию препарата и действующему веществу (включая десиканты)
+    pesticide_query = st.text_input("🔍 Поиск препарата", placeholder="Название или действующее вещество, например: тебуконазол")
+    if pesticide_query:
+        pesticide_hits = search_index().search(
+            pesticide_query, catalogs=["pesticides.json", "desiccation_products.json"], limit=50
+        )
+        if pesticide_hits:
+            st.dataframe(pd.DataFrame([{
+                "Название": hit.key,
+                "Класс": hit.group or "Десиканты",
+                "Действующее вещество": hit.data.get("действующее_вещество", "-"),
+            } for hit in pesticide_hits]), use_container_width=True, hide_index=True)
+        else:
+            st.warning(f"Ничего не найдено по запросу: {pesticide_query}")
+
     if pesticides_ref:
         # Выбор класса
         selected_cat = st.selectbox(
@@ -6,8 +6,6 @@ import pandas as pd
 import json
 from datetime import datetime, date
 from pathlib import Path
-import plotly.express as px
-import plotly.graph_objects as go
 
 # Добавляем путь к модулям
 import sys
@@ -27,6 +25,11 @@ from modules.auth import (
 from modules.validators import DataValidator
 from utils.formatters import format_date, format_area
 from utils.reference_loader import load_diseases, load_pests, load_weeds
+from modules.reference_search import search_index
+from utils.lazy import lazy_import
+
+# Библиотеки графиков загружаются при первом построении графика
+px = lazy_import("plotly.express")
 
 # Настройка страницы
 st.set_page_config(page_title="Фитосанитария", page_icon="🐛", layout="wide")
@@ -45,6 +48,7 @@ validator = DataValidator()
 diseases_ref = load_diseases()
 pests_ref = load_pests()
 weeds_ref = load_weeds()
+references = search_index()
 
 # Подключение к БД
 db = next(get_db())
@@ -143,38 +147,28 @@ with tab1:
 
         with col3:
             if problem_type == "Болезнь":
-                # Выбор болезни из справочника
-                all_diseases = []
-                for crop_diseases in diseases_ref.values():
-                    all_diseases.extend(list(crop_diseases.keys()))
-
+                # Выбор болезни из справочника (названия без повторов по культурам)
                 disease_name = st.selectbox(
                     "Название болезни *",
-                    options=sorted(set(all_diseases)),
+                    options=references.keys("diseases.json"),
                     help="Выберите болезнь из справочника"
                 )
                 problem_name = disease_name
 
             elif problem_type == "Вредитель":
-                # Выбор вредителя из справочника
-                all_pests = list(pests_ref.keys())
-
+                # Выбор вредителя из справочника (вредители сгруппированы по культурам)
                 pest_name = st.selectbox(
                     "Название вредителя *",
-                    options=sorted(all_pests),
+                    options=references.keys("pests.json"),
                     help="Выберите вредителя из справочника"
                 )
                 problem_name = pest_name
 
             else:  # Сорняк
                 # Выбор сорняка из справочника
-                all_weeds = []
-                for weed_category in weeds_ref.values():
-                    all_weeds.extend(list(weed_category.keys()))
-
                 weed_name = st.selectbox(
                     "Название сорняка *",
-                    options=sorted(set(all_weeds)),
+                    options=references.keys("weeds.json"),
                     help="Выберите сорняк из справочника"
                 )
                 problem_name = weed_name
@@ -487,6 +481,22 @@ with tab2:
 with tab3:
     st.subheader("Справочники по фитосанитарии")
 
+    # Поиск по названию и латинскому названию во всех трёх справочниках
+    phyto_query = st.text_input("🔍 Поиск по болезням, вредителям и сорнякам",
+                                placeholder="Название или латынь, например: ржавчина, Blumeria")
+    if phyto_query:
+        phyto_labels = {"diseases.json": "🦠 Болезнь", "pests.json": "🐛 Вредитель", "weeds.json": "🌿 Сорняк"}
+        phyto_hits = references.search(phyto_query, catalogs=list(phyto_labels), limit=50)
+        if phyto_hits:
+            st.dataframe(pd.DataFrame([{
+                "Справочник": phyto_labels[hit.catalog],
+                "Название": hit.key,
+                "Группа": hit.group or "-",
+                "Латынь": hit.data.get("латынь", "-") if isinstance(hit.data, dict) else "-",
+            } for hit in phyto_hits]), use_container_width=True, hide_index=True)
+        else:
+            st.warning(f"Ничего не найдено по запросу: {phyto_query}")
+
     ref_tab1, ref_tab2, ref_tab3 = st.tabs(["🦠 Болезни", "🐛 Вредители", "🌿 Сорняки"])
 
     with ref_tab1:
@@ -6,27 +6,30 @@ import pandas as pd
 import json
 from datetime import datetime, date
 from pathlib import Path
-import plotly.express as px
-import plotly.graph_objects as go
 
 # Добавляем путь к модулям
 import sys
 sys.path.append(str(Path(__file__).parent.parent))
 
-from modules.database import get_db, Farm, Field, Operation, HarvestData, SowingDetail, Machinery, Implements
+from modules.database import get_db, Operation, SowingDetail, Implements
+from modules.farm_cache import user_scope, get_farm, get_fields, get_machinery
+from modules.offline_queue import save_operation, render_sync_status
 from modules.auth import (
     require_auth,
     require_farm_binding,
-    filter_query_by_farm,
     get_user_display_name,
     get_current_user,
-    is_admin,
     can_edit_data,
     can_delete_data
 )
 from modules.validators import DataValidator
+from modules.analytics import crop_targets, harvest_frame, harvest_summary
 from utils.formatters import format_date, format_area, format_number
-from utils.charts import create_bar_chart, create_grouped_bar_chart, create_scatter_chart
+from utils.charts import create_bar_chart, create_grouped_bar_chart, create_scatter_chart, create_pie_chart, create_line_chart
+from utils.lazy import lazy_import
+
+# Библиотеки графиков загружаются при первом построении графика
+px = lazy_import("plotly.express")
 
 # Настройка страницы
 st.set_page_config(page_title="Уборка урожая", page_icon="🚜", layout="wide")
@@ -37,6 +40,7 @@ require_farm_binding()
 
 st.title("🚜 Учет уборки урожая")
 st.caption(f"Пользователь: **{get_user_display_name()}**")
+render_sync_status(user_scope())
 
 # Инициализация валидатора
 validator = DataValidator()
@@ -67,21 +71,20 @@ except Exception as e:
 # Подключение к БД
 db = next(get_db())
 
+# Типичная урожайность культур (справочная таблица ref_crops)
+targets = crop_targets(db).set_index("crop")
+
 # Проверка наличия хозяйства
 user = get_current_user()
 
-if is_admin():
-    farm = db.query(Farm).first()
-else:
-    user_farm_id = user.get("farm_id") if user else None
-    farm = db.query(Farm).filter(Farm.id == user_farm_id).first() if user_farm_id else None
+farm = get_farm(user_scope())
 
 if not farm:
     st.warning("⚠️ Сначала создайте хозяйство на странице импорта!")
     st.stop()
 
 # Получение списка полей
-fields = filter_query_by_farm(db.query(Field), Field).all()
+fields = get_fields(user_scope())
 if not fields:
     st.warning("⚠️ Сначала добавьте поля на странице 'Поля'!")
     st.stop()
@@ -219,7 +222,7 @@ with tab1:
         st.markdown("### 🚜 Техника для уборки")
 
         # Получение списка комбайнов
-        machinery_list = filter_query_by_farm(db.query(Machinery).filter(Machinery.status == 'active'), Machinery).all()
+        machinery_list = get_machinery(user_scope())
         combines = [m for m in machinery_list if m.machinery_type == 'combine']
 
         # Pre-load machinery attributes
@@ -320,14 +323,13 @@ with tab1:
         st.markdown("---")
         st.markdown("### 📊 Сравнение с целевыми показателями")
 
-        if crop_name in crops_ref:
-            crop_data = crops_ref[crop_name]
-            typical_yields = crop_data.get("урожайность_типичная", {})
+        if crop_name in targets.index:
+            crop_target = targets.loc[crop_name]
 
-            if typical_yields:
-                min_yield = typical_yields.get("мин", 0)
-                max_yield = typical_yields.get("макс", 0)
-                avg_yield = typical_yields.get("средняя", 0)
+            if pd.notna(crop_target["yield_avg"]) and crop_target["yield_avg"] > 0:
+                min_yield = crop_target["yield_min"]
+                max_yield = crop_target["yield_max"]
+                avg_yield = crop_target["yield_avg"]
 
                 col6, col7, col8 = st.columns(3)
 
@@ -405,7 +407,7 @@ with tab1:
             else:
                 try:
                     # Создаем операцию
-                    operation = Operation(
+                    operation_values = dict(
                         farm_id=farm.id,
                         field_id=selected_field.id,
                         operation_type="harvest",
@@ -417,12 +419,8 @@ with tab1:
                         work_speed_kmh=work_speed_kmh if work_speed_kmh else None,
                         notes=notes
                     )
-                    db.add(operation)
-                    db.flush()
-
-                    # Создаем данные уборки
-                    harvest_data = HarvestData(
-                        operation_id=operation.id,
+                    # Данные уборки
+                    harvest_values = dict(
                         crop=crop_name,
                         variety=variety_name if variety_name != "Не указан" else None,
                         yield_t_ha=yield_t_ha,
@@ -434,11 +432,12 @@ with tab1:
                         falling_number=falling_number if falling_number > 0 else None,
                         weed_content_percent=weed_content_percent if weed_content_percent > 0 else None
                     )
-                    db.add(harvest_data)
+                    _, operation_id = save_operation(db, operation_values, {"harvest_data": harvest_values})
 
-                    db.commit()
-
-                    st.success(f"✅ Уборка зарегистрирована! Валовой сбор: {format_number(total_yield_t, 2)} т")
+                    if operation_id is None:
+                        st.success(f"✅ Уборка сохранена на устройстве (валовой сбор {format_number(total_yield_t, 2)} т) и будет отправлена при появлении связи")
+                    else:
+                        st.success(f"✅ Уборка зарегистрирована! Валовой сбор: {format_number(total_yield_t, 2)} т")
                     st.balloons()
 
                 except Exception as e:
@@ -476,46 +475,31 @@ with tab2:
             key="filter_year_history"
         )
 
-    # Получение данных
-    query = db.query(Operation, HarvestData, Field).join(
-        HarvestData, Operation.id == HarvestData.operation_id
-    ).join(
-        Field, Operation.field_id == Field.id
-    ).filter(
-        Operation.operation_type == "harvest",
-        Field.farm_id == farm.id  # КРИТИЧЕСКИЙ ФИЛЬТР: только операции текущего хозяйства
+    # Получение данных (только нужные колонки; КРИТИЧЕСКИЙ ФИЛЬТР: только текущее хозяйство)
+    harvests_df = harvest_frame(
+        db,
+        farm.id,
+        year=filter_year if filter_year != "Все годы" else None,
+        crop=filter_crop if filter_crop != "Все культуры" else None,
+        field_code=filter_field.split(" - ")[0] if filter_field != "Все поля" else None
     )
 
-    # Применение фильтров
-    if filter_field != "Все поля":
-        field_code = filter_field.split(" - ")[0]
-        query = query.filter(Field.field_code == field_code)
-
-    if filter_crop != "Все культуры":
-        query = query.filter(HarvestData.crop == filter_crop)
-
-    if filter_year != "Все годы":
-        from sqlalchemy import extract
-        query = query.filter(extract('year', Operation.operation_date) == filter_year)
-
-    harvests = query.order_by(Operation.operation_date.desc()).all()
-
-    if harvests:
-        st.metric("Всего уборок", len(harvests))
+    if not harvests_df.empty:
+        st.metric("Всего уборок", len(harvests_df))
 
         # Таблица
         data = []
-        for op, harvest, field in harvests:
+        for row in harvests_df.itertuples(index=False):
             data.append({
-                "Дата": format_date(op.operation_date),
-                "Поле": f"{field.field_code} - {field.name}",
-                "Культура": harvest.crop,
-                "Сорт": harvest.variety or "-",
-                "Площадь (га)": format_area(op.area_processed_ha),
-                "Урожайность (т/га)": format_number(harvest.yield_t_ha, 2),
-                "Валовой сбор (т)": format_number(harvest.total_yield_t, 2),
-                "Влажность (%)": format_number(harvest.moisture_percent, 1) if harvest.moisture_percent else "-",
-                "Белок (%)": format_number(harvest.protein_percent, 1) if harvest.protein_percent else "-"
+                "Дата": format_date(row.operation_date.date()),
+                "Поле": row.field,
+                "Культура": row.crop,
+                "Сорт": row.variety or "-",
+                "Площадь (га)": format_area(row.area_ha),
+                "Урожайность (т/га)": format_number(row.yield_t_ha, 2),
+                "Валовой сбор (т)": format_number(row.total_yield_t, 2),
+                "Влажность (%)": format_number(row.moisture_percent, 1) if pd.notna(row.moisture_percent) else "-",
+                "Белок (%)": format_number(row.protein_percent, 1) if pd.notna(row.protein_percent) else "-"
             })
 
         df = pd.DataFrame(data)
@@ -539,10 +523,11 @@ with tab2:
 
         col1, col2, col3, col4 = st.columns(4)
 
-        total_area = sum(op.area_processed_ha for op, _, _ in harvests)
-        total_yield = sum(harvest.total_yield_t for _, harvest, _ in harvests)
-        avg_yield = total_yield / total_area if total_area > 0 else 0
-        max_yield = max(harvest.yield_t_ha for _, harvest, _ in harvests)
+        summary = harvest_summary(harvests_df)
+        total_area = summary["totals"]["total_area"]
+        total_yield = summary["totals"]["total_yield"]
+        avg_yield = summary["totals"]["avg_yield"]
+        max_yield = summary["totals"]["max_yield"]
 
         with col1:
             st.metric("Убрано площади", format_area(total_area))
@@ -558,38 +543,23 @@ with tab2:
 
         with col1:
             # График по культурам
-            crop_data = {}
-            for _, harvest, _ in harvests:
-                crop = harvest.crop
-                crop_data[crop] = crop_data.get(crop, 0) + harvest.total_yield_t
-
-            fig_crop = px.pie(
-                values=list(crop_data.values()),
-                names=list(crop_data.keys()),
+            by_crop = summary["by_crop"]
+            fig_crop = create_pie_chart(
+                values=by_crop["total_yield"].tolist(),
+                names=by_crop["crop"].tolist(),
                 title="Валовой сбор по культурам (т)"
             )
             st.plotly_chart(fig_crop, use_container_width=True)
 
         with col2:
-            # График урожайности по полям
-            field_yields = {}
-            field_areas = {}
-            for op, harvest, field in harvests:
-                field_name = f"{field.field_code}"
-                if field_name not in field_yields:
-                    field_yields[field_name] = 0
-                    field_areas[field_name] = 0
-                field_yields[field_name] += harvest.total_yield_t
-                field_areas[field_name] += op.area_processed_ha
-
             # Средняя урожайность по полям
-            avg_yields_by_field = {k: field_yields[k] / field_areas[k] for k in field_yields.keys()}
-
-            fig_fields = px.bar(
-                x=list(avg_yields_by_field.keys()),
-                y=list(avg_yields_by_field.values()),
+            by_field = summary["by_field"]
+            fig_fields = create_bar_chart(
+                x=by_field["field_code"].tolist(),
+                y=by_field["avg_yield"].tolist(),
                 title="Средняя урожайность по полям (т/га)",
-                labels={"x": "Поля", "y": "Урожайность (т/га)"}
+                x_label="Поля",
+                y_label="Урожайность (т/га)"
             )
             st.plotly_chart(fig_fields, use_container_width=True)
 
@@ -602,63 +572,42 @@ with tab2:
 with tab3:
     st.subheader("Анализ урожайности")
 
-    # Получение всех уборок
-    all_harvests = db.query(Operation, HarvestData, Field).join(
-        HarvestData, Operation.id == HarvestData.operation_id
-    ).join(
-        Field, Operation.field_id == Field.id
-    ).filter(
-        Operation.operation_type == "harvest",
-        Field.farm_id == farm.id  # КРИТИЧЕСКИЙ ФИЛЬТР: только операции текущего хозяйства
-    ).all()
-
-    if all_harvests:
+    # Получение всех уборок (КРИТИЧЕСКИЙ ФИЛЬТР: только операции текущего хозяйства)
+    all_harvests_df = harvest_frame(db, farm.id)
+
+    if not all_harvests_df.empty:
+        all_summary = harvest_summary(all_harvests_df)
+
         # Анализ по годам
         st.markdown("### 📅 Динамика по годам")
 
-        yearly_data = {}
-        for op, harvest, field in all_harvests:
-            year = op.operation_date.year
-            if year not in yearly_data:
-                yearly_data[year] = {"total_yield": 0, "total_area": 0}
-            yearly_data[year]["total_yield"] += harvest.total_yield_t
-            yearly_data[year]["total_area"] += op.area_processed_ha
-
-        years = sorted(yearly_data.keys())
-        avg_yields_by_year = [yearly_data[y]["total_yield"] / yearly_data[y]["total_area"] for y in years]
-        total_yields_by_year = [yearly_data[y]["total_yield"] for y in years]
+        by_year = all_summary["by_year"]
+        years = [int(y) for y in by_year["year"]]
+        avg_yields_by_year = by_year["avg_yield"].tolist()
+        total_yields_by_year = by_year["total_yield"].tolist()
 
         col1, col2 = st.columns(2)
 
         with col1:
-            fig_year_avg = go.Figure()
-            fig_year_avg.add_trace(go.Scatter(
+            fig_year_avg = create_line_chart(
                 x=years,
                 y=avg_yields_by_year,
-                mode='lines+markers',
-                name='Средняя урожайность',
-                line=dict(color='green', width=3),
-                marker=dict(size=10)
-            ))
-            fig_year_avg.update_layout(
                 title="Средняя урожайность по годам",
-                xaxis_title="Год",
-                yaxis_title="Урожайность (т/га)"
+                x_label="Год",
+                y_label="Урожайность (т/га)",
+                line_name='Средняя урожайность',
+                color='green'
             )
             st.plotly_chart(fig_year_avg, use_container_width=True)
 
         with col2:
-            fig_year_total = go.Figure()
-            fig_year_total.add_trace(go.Bar(
+            fig_year_total = create_bar_chart(
                 x=years,
                 y=total_yields_by_year,
-                name='Валовой сбор',
-                marker_color='orange'
-            ))
-            fig_year_total.update_layout(
                 title="Валовой сбор по годам",
-                xaxis_title="Год",
-                yaxis_title="Валовой сбор (т)"
+                x_label="Год",
+                y_label="Валовой сбор (т)",
+                color='orange'
             )
             st.plotly_chart(fig_year_total, use_container_width=True)
 
@@ -666,17 +615,10 @@ with tab3:
         st.markdown("---")
         st.markdown("### 🌾 Анализ по культурам")
 
-        crop_analysis = {}
-        for op, harvest, field in all_harvests:
-            crop = harvest.crop
-            if crop not in crop_analysis:
-                crop_analysis[crop] = {"yields": [], "areas": []}
-            crop_analysis[crop]["yields"].append(harvest.yield_t_ha)
-            crop_analysis[crop]["areas"].append(op.area_processed_ha)
-
-        # Средняя урожайность по культурам
-        crop_avg_yields = {crop: sum(data["yields"]) / len(data["yields"]) for crop, data in crop_analysis.items()}
-        crop_total_areas = {crop: sum(data["areas"]) for crop, data in crop_analysis.items()}
+        # Средняя урожайность и площади по культурам
+        by_crop_all = all_summary["by_crop"]
+        crop_avg_yields = dict(zip(by_crop_all["crop"], by_crop_all["avg_yield"]))
+        crop_total_areas = dict(zip(by_crop_all["crop"], by_crop_all["total_area"]))
 
         col1, col2 = st.columns(2)
 
@@ -692,7 +634,7 @@ with tab3:
             st.plotly_chart(fig_crop_yield, use_container_width=True)
 
         with col2:
-            fig_crop_area = px.pie(
+            fig_crop_area = create_pie_chart(
                 values=list(crop_total_areas.values()),
                 names=list(crop_total_areas.keys()),
                 title="Распределение площадей по культурам"
@@ -704,15 +646,10 @@ with tab3:
         st.markdown("### 🔬 Качество зерна vs Урожайность")
 
         # Данные для scatter plot
-        yields_for_scatter = []
-        proteins_for_scatter = []
-        crops_for_scatter = []
-
-        for op, harvest, field in all_harvests:
-            if harvest.protein_percent:
-                yields_for_scatter.append(harvest.yield_t_ha)
-                proteins_for_scatter.append(harvest.protein_percent)
-                crops_for_scatter.append(harvest.crop)
+        with_protein = all_harvests_df[all_harvests_df["protein_percent"].fillna(0) > 0]
+        yields_for_scatter = with_protein["yield_t_ha"].tolist()
+        proteins_for_scatter = with_protein["protein_percent"].tolist()
+        crops_for_scatter = with_protein["crop"].tolist()
 
         if yields_for_scatter:
             fig_scatter = px.scatter(
@@ -742,22 +679,31 @@ with tab4:
     """)
 
     # Таблица целевых показателей
-    target_data = []
-    for crop_name, crop_info in crops_ref.items():
-        typical_yields = crop_info.get("урожайность_типичная", {})
-        if typical_yields:
-            target_data.append({
-                "Культура": crop_name,
-                "Минимум (т/га)": typical_yields.get("мин", "-"),
-                "Средняя (т/га)": typical_yields.get("средняя", "-"),
-                "Максимум (т/га)": typical_yields.get("макс", "-"),
-                "Условие": typical_yields.get("условие", "-")
-            })
-
-    if target_data:
-        df_targets = pd.DataFrame(target_data)
+    if not targets.empty:
+        df_targets = targets.reset_index().rename(columns={
+            "crop": "Культура",
+            "yield_min": "Минимум (т/га)",
+            "yield_avg": "Средняя (т/га)",
+            "yield_max": "Максимум (т/га)",
+        })
         st.dataframe(df_targets, use_container_width=True, hide_index=True)
 
+    # Фактическая урожайность хозяйства против типичной (соединение в SQL)
+    farm_by_crop = harvest_summary(all_harvests_df)["by_crop"]
+    farm_by_crop = farm_by_crop[farm_by_crop["typical_yield_avg"].notna()]
+    if not farm_by_crop.empty:
+        st.markdown("### 📏 Урожайность хозяйства относительно типичной")
+        st.dataframe(
+            farm_by_crop[["crop", "avg_yield", "typical_yield_avg", "vs_typical_pct"]].rename(columns={
+                "crop": "Культура",
+                "avg_yield": "Средняя хозяйства (т/га)",
+                "typical_yield_avg": "Типичная (т/га)",
+                "vs_typical_pct": "Отклонение (%)",
+            }).round(2),
+            use_container_width=True,
+            hide_index=True
+        )
+
     # Факторы влияния
     st.markdown("---")
     st.markdown("### 🌟 Факторы, влияющие на урожайность")
@@ -4,7 +4,11 @@ Admin Panel - User Management
 import streamlit as st
 import pandas as pd
 from datetime import datetime
-from modules.database import SessionLocal, User, Farm, AuditLog, UserFarm
+from modules.database import SessionLocal, User, Farm, UserFarm
+from modules.config import settings
+from modules import audit_store
+from utils.lazy import startup_profile
+from modules.query_log import query_log
 from modules.auth import (
     require_admin, get_current_user, create_user, hash_password,
     get_user_display_name, log_action
@@ -44,7 +48,7 @@ try:
     st.markdown("---")
 
     # Вкладки админки
-    tabs = st.tabs(["👥 Пользователи", "➕ Создать пользователя", "🏢 Назначение на хозяйства", "📜 Журнал действий", "⚙️ Настройки"])
+    tabs = st.tabs(["👥 Пользователи", "➕ Создать пользователя", "🏢 Назначение на хозяйства", "📜 Журнал действий", "⚙️ Настройки", "🐢 Запросы SQL"])
 
     # ============================================================================
     # ВКЛАДКА: УПРАВЛЕНИЕ ПОЛЬЗОВАТЕЛЯМИ
@@ -462,27 +466,76 @@ try:
     with tabs[3]:
         st.markdown("### 📜 Журнал действий пользователей")
 
-        logs = db.query(AuditLog, User).join(User).order_by(AuditLog.created_at.desc()).limit(100).all()
+        maintenance = audit_store.maintain_if_due()
+        if maintenance and maintenance["dropped"]:
+            st.caption(f"🗑️ Удалены архивы старше срока хранения: {', '.join(maintenance['dropped'])}")
 
-        if logs:
-            data = []
-            for log, user in logs:
-                data.append({
-                    "Дата": log.created_at.strftime("%Y-%m-%d %H:%M:%S"),
-                    "Пользователь": user.username,
-                    "Действие": log.action,
-                    "Тип": log.entity_type or "-",
-                    "ID": log.entity_id or "-",
-                    "Детали": log.details or "-"
-                })
+        # Фильтры
+        all_users = db.query(User.id, User.username).order_by(User.username).all()
+        user_options = {"Все": None}
+        user_options.update({username: user_id for user_id, username in all_users})
 
-            df = pd.DataFrame(data)
+        col1, col2, col3 = st.columns(3)
+        with col1:
+            filter_user = st.selectbox("Пользователь", list(user_options.keys()), key="audit_user")
+            filter_action = st.selectbox(
+                "Действие", ["Все", "login", "logout", "create", "update", "delete"], key="audit_action"
+            )
+        with col2:
+            filter_entity = st.text_input("Тип объекта", placeholder="user, field, operation...", key="audit_entity")
+            filter_entity_id = st.number_input("ID объекта", min_value=0, value=0, step=1, key="audit_entity_id")
+        with col3:
+            filter_period = st.date_input("Период", value=(), key="audit_period")
+            page_size = st.selectbox("Строк на странице", [50, 100, 200, 500], index=1, key="audit_page_size")
+
+        date_from = filter_period[0] if len(filter_period) > 0 else None
+        date_to = filter_period[1] if len(filter_period) > 1 else date_from
+
+        filters = dict(
+            user_id=user_options[filter_user],
+            action=None if filter_action == "Все" else filter_action,
+            entity_type=filter_entity.strip() or None,
+            entity_id=int(filter_entity_id) or None,
+            date_from=date_from,
+            date_to=date_to,
+        )
+
+        # Стек курсоров страниц; при смене фильтров - снова первая страница
+        filters_key = (tuple(filters.items()), page_size)
+        if st.session_state.get("audit_filters_key") != filters_key:
+            st.session_state["audit_filters_key"] = filters_key
+            st.session_state["audit_cursors"] = [None]
+        cursors = st.session_state["audit_cursors"]
+
+        logs, next_cursor = audit_store.query_audit_page(db, limit=page_size, cursor=cursors[-1], **filters)
+
+        if logs:
+            df = pd.DataFrame([{
+                "Дата": log["created_at"].strftime("%Y-%m-%d %H:%M:%S") if log["created_at"] else "-",
+                "Пользователь": log["username"] or f"#{log['user_id']}",
+                "Действие": log["action"],
+                "Тип": log["entity_type"] or "-",
+                "ID": log["entity_id"] or "-",
+                "Детали": log["details"] or "-"
+            } for log in logs])
             st.dataframe(df, use_container_width=True, hide_index=True)
 
+            col1, col2, col3 = st.columns([1, 2, 1])
+            with col1:
+                if st.button("⬅️ Назад", disabled=len(cursors) == 1, key="audit_prev"):
+                    cursors.pop()
+                    st.rerun()
+            with col2:
+                st.caption(f"Страница {len(cursors)}")
+            with col3:
+                if st.button("Далее ➡️", disabled=next_cursor is None, key="audit_next"):
+                    cursors.append(next_cursor)
+                    st.rerun()
+
             # Экспорт
             csv = df.to_csv(index=False).encode('utf-8-sig')
             st.download_button(
-                "📥 Скачать журнал (CSV)",
+                "📥 Скачать страницу журнала (CSV)",
                 csv,
                 "audit_log.csv",
                 "text/csv"
@@ -490,12 +543,40 @@ try:
         else:
             st.info("📭 Журнал пуст")
 
+        with st.expander("🗄️ Хранение журнала"):
+            st.caption(f"Срок хранения: {settings.AUDIT_RETENTION_MONTHS} мес. (0 - без ограничения)")
+            st.dataframe(
+                pd.DataFrame(audit_store.list_partitions()).rename(columns={"table": "Таблица", "rows": "Записей"}),
+                use_container_width=True,
+                hide_index=True
+            )
+            if st.button("🔄 Выполнить обслуживание", key="audit_maintain"):
+                report = audit_store.maintain()
+                st.success(
+                    f"Создано: {len(report['created'])}, перенесено: {len(report['rotated'])}, "
+                    f"удалено: {len(report['dropped'])}"
+                )
+
     # ============================================================================
     # ВКЛАДКА: НАСТРОЙКИ
     # ============================================================================
     with tabs[4]:
         st.markdown("### ⚙️ Системные настройки")
 
+        with st.expander("⏱️ Профиль запуска процесса"):
+            profile = startup_profile.report()
+            if profile:
+                st.dataframe(
+                    pd.DataFrame(profile).rename(columns={
+                        "stage": "Этап", "ms": "Длительность, мс",
+                        "since_start_ms": "От старта, мс", "at": "Время"
+                    }),
+                    use_container_width=True,
+                    hide_index=True
+                )
+            else:
+                st.info("Профиль пуст: процесс ещё не проходил инициализацию")
+
         st.info("🚧 Раздел в разработке")
 
         st.markdown("**Планируется:**")
@@ -504,6 +585,72 @@ try:
         st.markdown("- Настройки безопасности")
         st.markdown("- Системные логи")
 
+    # ============================================================================
+    # ВКЛАДКА: ЗАПРОСЫ SQL
+    # ============================================================================
+    with tabs[5]:
+        st.markdown("### 🐢 Запросы SQL")
+
+        summary = query_log.summary()
+        st.caption(f"Статистика процесса с {summary['since'].strftime('%d.%m.%Y %H:%M:%S')}")
+
+        col1, col2, col3, col4 = st.columns(4)
+        with col1:
+            st.metric("Запросов", summary["queries"])
+        with col2:
+            st.metric("Время в БД", f"{summary['total_ms'] / 1000:.1f} с")
+        with col3:
+            st.metric(f"Медленных (≥ {summary['slow_ms']:.0f} мс)", summary["slow"])
+        with col4:
+            st.metric("Подозрений на N+1", summary["n_plus_one"])
+
+        order_labels = {"Суммарное время": "total_ms", "Количество": "count", "Максимальное время": "max_ms"}
+        order = st.radio("Сортировка", list(order_labels), horizontal=True, key="sql_order")
+        top = query_log.top_statements(limit=30, order_by=order_labels[order])
+        if top:
+            df_top = pd.DataFrame(top)
+            df_top["sources"] = df_top["sources"].map(", ".join)
+            st.dataframe(
+                df_top[["count", "total_ms", "avg_ms", "max_ms", "rows", "sources", "statement"]].rename(columns={
+                    "count": "Кол-во", "total_ms": "Всего, мс", "avg_ms": "Среднее, мс",
+                    "max_ms": "Макс, мс", "rows": "Строк", "sources": "Страницы", "statement": "Запрос"
+                }),
+                use_container_width=True,
+                hide_index=True
+            )
+        else:
+            st.info("Запросов пока не было")
+
+        st.markdown("#### 🐌 Журнал медленных запросов")
+        slow = query_log.slow_queries()
+        if slow:
+            st.dataframe(
+                pd.DataFrame(slow).rename(columns={
+                    "at": "Время", "ms": "мс", "rows": "Строк", "source": "Страница", "statement": "Запрос"
+                }),
+                use_container_width=True,
+                hide_index=True
+            )
+        else:
+            st.success("Медленных запросов нет")
+
+        st.markdown("#### 🔁 Повторяющиеся запросы (N+1)")
+        repeats = query_log.n_plus_one()
+        if repeats:
+            st.dataframe(
+                pd.DataFrame(repeats).rename(columns={
+                    "at": "Время", "source": "Страница", "repeats": "Повторов", "statement": "Запрос"
+                }),
+                use_container_width=True,
+                hide_index=True
+            )
+        else:
+            st.success("Повторов не обнаружено")
+
+        if st.button("🧹 Сбросить статистику", key="sql_reset"):
+            query_log.reset()
+            st.rerun()
+
 finally:
     db.close()
 
@@ -5,9 +5,10 @@ Reference Data Management - Управление справочниками
 import streamlit as st
 import pandas as pd
 import json
-from pathlib import Path
 from modules.database import SessionLocal
 from modules.auth import require_admin, get_user_display_name
+from modules import reference_store, reference_sync
+from modules.reference_search import search_index
 from datetime import datetime
 
 st.set_page_config(page_title="Справочники", page_icon="📚", layout="wide")
@@ -18,9 +19,6 @@ require_admin()
 st.title("📚 Управление справочниками")
 st.markdown("Редактирование справочных данных системы")
 
-# Путь к справочникам
-DATA_DIR = Path("data")
-
 # Определение справочников
 REFERENCES = {
     "crops": {
@@ -121,6 +119,49 @@ REFERENCES = {
     }
 }
 
+
+def save_reference(ref_key: str, data: dict, restore_version: int = None) -> bool:
+    """
+    Сохранение справочника новой версией, обновление индекса поиска и справочных таблиц БД
+
+    Сохраняется относительно версии, открытой в этой сессии: если справочник
+    успели изменить в другой сессии, показывается ошибка и ничего не пишется.
+
+    Args:
+        ref_key: Ключ справочника в REFERENCES
+        data: Содержимое справочника
+        restore_version: Восстановить эту версию вместо записи data
+
+    Returns:
+        True, если сохранено
+    """
+    filename = REFERENCES[ref_key]['file']
+    base_key = f"ref_base_{ref_key}"
+    try:
+        if restore_version is not None:
+            version = reference_store.restore(filename, restore_version, st.session_state.get(base_key),
+                                              author=get_user_display_name())
+            data = reference_store.load_version(filename, version)["data"]
+        else:
+            version = reference_store.save(filename, data, st.session_state.get(base_key),
+                                           author=get_user_display_name())
+    except reference_store.ReferenceConflict as e:
+        st.error(
+            f"❌ Справочник изменён в другой сессии (версия {e.current}, у вас открыта {e.expected}). "
+            "Загрузите актуальную версию и повторите изменения."
+        )
+        return False
+    st.session_state[base_key] = version
+    # Переиндексируются только изменённые записи
+    search_index().update_catalog(filename, data)
+    if filename in reference_sync.SYNCED_FILES:
+        # Справочные таблицы БД (культуры, удобрения, СЗР) - только изменённые записи
+        with SessionLocal() as db:
+            reference_sync.sync_references(db)
+            db.commit()
+    return True
+
+
 # Sidebar - выбор справочника
 with st.sidebar:
     st.markdown(f"### 👤 {get_user_display_name()}")
@@ -138,7 +179,7 @@ with st.sidebar:
 
     # Подсчет записей в каждом справочнике
     for ref_key, ref_info in REFERENCES.items():
-        file_path = DATA_DIR / ref_info['file']
+        file_path = reference_store.catalog_path(ref_info['file'])
         if file_path.exists():
             try:
                 with open(file_path, 'r', encoding='utf-8') as f:
@@ -151,7 +192,8 @@ with st.sidebar:
 # Основная область
 if selected_ref:
     ref_info = REFERENCES[selected_ref]
-    file_path = DATA_DIR / ref_info['file']
+    file_path = reference_store.catalog_path(ref_info['file'])
+    base_key = f"ref_base_{selected_ref}"
 
     st.markdown(f"## {ref_info['name']}")
     st.markdown(f"*{ref_info['description']}*")
@@ -162,15 +204,24 @@ if selected_ref:
         st.error(f"❌ Файл справочника не найден: {file_path}")
 
         if st.button("➕ Создать новый справочник"):
-            with open(file_path, 'w', encoding='utf-8') as f:
-                json.dump({}, f, ensure_ascii=False, indent=2)
-            st.success("✅ Справочник создан!")
-            st.rerun()
+            if save_reference(selected_ref, {}):
+                st.success("✅ Справочник создан!")
+                st.rerun()
     else:
-        # Загрузка данных
+        # Загрузка данных вместе с версией
         try:
-            with open(file_path, 'r', encoding='utf-8') as f:
-                reference_data = json.load(f)
+            snapshot = reference_store.read(ref_info['file'])
+            reference_data = snapshot.data
+            # Версия, относительно которой сохраняются правки этой сессии
+            st.session_state.setdefault(base_key, snapshot.version)
+            if snapshot.version != st.session_state[base_key]:
+                st.warning(
+                    f"⚠️ Справочник изменён в другой сессии: версия {snapshot.version}, "
+                    f"у вас открыта {st.session_state[base_key]}. Сохранение будет отклонено."
+                )
+                if st.button("🔄 Загрузить актуальную версию"):
+                    st.session_state[base_key] = snapshot.version
+                    st.rerun()
         except Exception as e:
             st.error(f"❌ Ошибка загрузки: {str(e)}")
             reference_data = {}
@@ -192,11 +243,13 @@ if selected_ref:
                 # Поиск
                 search_query = st.text_input("🔍 Поиск", placeholder="Введите название для поиска...")
 
-                # Фильтрация
+                # Ранжированный поиск по индексу (название, производитель, модель, латынь, д.в.)
                 filtered_data = reference_data
                 if search_query:
-                    filtered_data = {k: v for k, v in reference_data.items()
-                                   if search_query.lower() in k.lower()}
+                    hits = search_index().search(search_query, catalogs=[ref_info['file']], limit=None)
+                    # В справочниках с группами показывается группа найденной записи
+                    found = dict.fromkeys(hit.group or hit.key for hit in hits)
+                    filtered_data = {k: reference_data[k] for k in found if k in reference_data}
 
                 if not filtered_data:
                     st.warning(f"Ничего не найдено по запросу: {search_query}")
@@ -216,10 +269,9 @@ if selected_ref:
                                 if st.button("🗑️ Удалить", key=f"delete_{idx}"):
                                     if st.session_state.get(f"confirm_delete_{idx}"):
                                         del reference_data[key]
-                                        with open(file_path, 'w', encoding='utf-8') as f:
-                                            json.dump(reference_data, f, ensure_ascii=False, indent=2)
-                                        st.success(f"✅ Удалено: {key}")
-                                        st.rerun()
+                                        if save_reference(selected_ref, reference_data):
+                                            st.success(f"✅ Удалено: {key}")
+                                            st.rerun()
                                     else:
                                         st.session_state[f"confirm_delete_{idx}"] = True
                                         st.warning("⚠️ Нажмите еще раз для подтверждения")
@@ -295,11 +347,10 @@ if selected_ref:
                     else:
                         try:
                             reference_data[new_key] = new_data
-                            with open(file_path, 'w', encoding='utf-8') as f:
-                                json.dump(reference_data, f, ensure_ascii=False, indent=2)
-                            st.success(f"✅ Добавлено: {new_key}")
-                            st.balloons()
-                            st.rerun()
+                            if save_reference(selected_ref, reference_data):
+                                st.success(f"✅ Добавлено: {new_key}")
+                                st.balloons()
+                                st.rerun()
                         except Exception as e:
                             st.error(f"❌ Ошибка сохранения: {str(e)}")
 
@@ -340,11 +391,9 @@ if selected_ref:
                                 new_data = json.loads(edited_json)
                                 reference_data[edit_key] = new_data
 
-                                with open(file_path, 'w', encoding='utf-8') as f:
-                                    json.dump(reference_data, f, ensure_ascii=False, indent=2)
-
-                                st.success(f"✅ Обновлено: {edit_key}")
-                                st.rerun()
+                                if save_reference(selected_ref, reference_data):
+                                    st.success(f"✅ Обновлено: {edit_key}")
+                                    st.rerun()
                             except json.JSONDecodeError as e:
                                 st.error(f"❌ Ошибка в JSON: {str(e)}")
                             except Exception as e:
@@ -353,10 +402,9 @@ if selected_ref:
                         if delete_submitted:
                             try:
                                 del reference_data[edit_key]
-                                with open(file_path, 'w', encoding='utf-8') as f:
-                                    json.dump(reference_data, f, ensure_ascii=False, indent=2)
-                                st.success(f"✅ Удалено: {edit_key}")
-                                st.rerun()
+                                if save_reference(selected_ref, reference_data):
+                                    st.success(f"✅ Удалено: {edit_key}")
+                                    st.rerun()
                             except Exception as e:
                                 st.error(f"❌ Ошибка удаления: {str(e)}")
 
@@ -393,11 +441,9 @@ if selected_ref:
                             else:
                                 reference_data.update(imported_data)
 
-                            with open(file_path, 'w', encoding='utf-8') as f:
-                                json.dump(reference_data, f, ensure_ascii=False, indent=2)
-
-                            st.success(f"✅ Импортировано {len(imported_data)} записей!")
-                            st.rerun()
+                            if save_reference(selected_ref, reference_data):
+                                st.success(f"✅ Импортировано {len(imported_data)} записей!")
+                                st.rerun()
 
                     except Exception as e:
                         st.error(f"❌ Ошибка импорта: {str(e)}")
@@ -426,6 +472,30 @@ if selected_ref:
                 else:
                     st.warning("📭 Нет данных для экспорта")
 
+            st.markdown("---")
+            st.markdown("#### 🕓 История версий")
+
+            versions = reference_store.history(ref_info['file'])
+            if not versions:
+                st.info("Справочник ещё не изменялся через эту страницу")
+            else:
+                st.dataframe(
+                    pd.DataFrame(versions).rename(columns={
+                        "version": "Версия", "saved_at": "Сохранено", "author": "Автор", "records": "Записей"
+                    }),
+                    use_container_width=True,
+                    hide_index=True
+                )
+                restore_version = st.selectbox(
+                    "Версия для восстановления",
+                    options=[v["version"] for v in versions[1:]],
+                    format_func=lambda v: f"Версия {v}"
+                )
+                if restore_version is not None and st.button("↩️ Восстановить версию"):
+                    if save_reference(selected_ref, None, restore_version=restore_version):
+                        st.success(f"✅ Восстановлена версия {restore_version}")
+                        st.rerun()
+
 # Footer
 st.markdown("---")
 st.markdown("💡 **Совет:** Используйте вкладку 'Импорт/Экспорт' для резервного копирования перед массовыми изменениями")
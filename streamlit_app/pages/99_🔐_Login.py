@@ -4,10 +4,15 @@ Login & Registration Page
 import streamlit as st
 from modules.database import SessionLocal, User
 from modules.auth import authenticate_user, login_user, logout_user, get_current_user, create_user
+from modules.credentials import LoginThrottled, CredentialServiceBusy
+from modules.startup import bootstrap
 import re
 
 st.set_page_config(page_title="Вход в систему", page_icon="🔐", layout="centered")
 
+# Вход может быть первой страницей после перезапуска
+bootstrap()
+
 # Инициализация session state
 if "user" not in st.session_state:
     st.session_state["user"] = None
@@ -86,15 +91,23 @@ try:
                         st.error("❌ Заполните все поля")
                     else:
                         with st.spinner("Проверка учетных данных..."):
-                            user = authenticate_user(db, username, password)
+                            try:
+                                user = authenticate_user(db, username, password)
+                            except LoginThrottled as e:
+                                user = None
+                                st.error(f"⏳ Слишком много неудачных попыток. Повторите через {int(e.retry_after) + 1} с.")
+                            except CredentialServiceBusy:
+                                user = None
+                                st.warning("⏳ Сервер перегружен входами, повторите попытку через несколько секунд.")
+                            else:
+                                if not user:
+                                    st.error("❌ Неверное имя пользователя или пароль")
 
                             if user:
                                 login_user(user)
                                 st.success(f"✅ Добро пожаловать, {user.full_name or user.username}!")
                                 st.balloons()
                                 st.rerun()
-                            else:
-                                st.error("❌ Неверное имя пользователя или пароль")
 
             st.markdown("---")
             st.info("💡 **Первый раз здесь?** Зарегистрируйтесь на вкладке 'Регистрация'")
@@ -5,8 +5,6 @@ import streamlit as st
 import pandas as pd
 from datetime import datetime, date
 from pathlib import Path
-import plotly.express as px
-import plotly.graph_objects as go
 
 # Добавляем путь к модулям
 import sys
@@ -27,6 +25,11 @@ from modules.validators import DataValidator
 from modules.config import Settings
 from utils.formatters import format_date, format_area, format_number
 from utils.charts import create_heatmap, create_grouped_bar_chart
+from utils.lazy import lazy_import
+
+# Библиотеки графиков загружаются при первом построении графика
+px = lazy_import("plotly.express")
+go = lazy_import("plotly.graph_objects")
 
 # Настройка страницы
 st.set_page_config(page_title="Агрохимия", page_icon="🧪", layout="wide")
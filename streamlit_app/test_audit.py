@@ -0,0 +1,105 @@
+"""
+Тест фонового писателя журнала (modules.audit.AuditWriter)
+Проверяет пакетную запись, политики переполнения очереди
+и сброс очереди при остановке
+"""
+import threading
+import time
+from contextlib import contextmanager
+
+import pytest
+from sqlalchemy import func, select
+
+from modules.audit import AuditWriter
+from modules.database import AuditLog
+
+
+class GatedBind:
+    """Движок, на котором фоновый поток ждёт release() перед записью"""
+
+    def __init__(self, engine):
+        self.engine = engine
+        self.entered = threading.Event()
+        self.released = threading.Event()
+
+    @contextmanager
+    def begin(self):
+        if threading.current_thread().name == "audit-writer":
+            self.entered.set()
+            assert self.released.wait(10)
+        with self.engine.begin() as conn:
+            yield conn
+
+
+def _event(n):
+    return {"user_id": 1, "action": "update", "entity_type": "field", "entity_id": n}
+
+
+def _rows(engine):
+    with engine.connect() as conn:
+        return conn.execute(select(AuditLog.entity_id).order_by(AuditLog.id)).scalars().all()
+
+
+def test_batches_and_flush(engine):
+    writer = AuditWriter(bind=engine, batch_size=3, flush_interval_ms=10_000)
+    try:
+        for n in range(3):
+            writer.submit(_event(n))
+        # Полная пачка пишется сразу, не дожидаясь интервала
+        deadline = time.monotonic() + 5
+        while writer.stats()["written"] < 3 and time.monotonic() < deadline:
+            time.sleep(0.01)
+        assert writer.stats()["batches"] == 1
+
+        before = time.monotonic()
+        writer.submit(_event(3))
+        writer.submit(_event(4))
+        assert writer.flush()
+        assert time.monotonic() - before < 5
+        assert (writer.stats()["written"], writer.stats()["batches"]) == (5, 2)
+        assert _rows(engine) == [0, 1, 2, 3, 4]
+        with engine.connect() as conn:
+            assert conn.execute(select(func.count()).where(AuditLog.created_at.is_(None))).scalar() == 0
+    finally:
+        writer.stop()
+
+
+@pytest.mark.parametrize("policy", ["block", "drop", "sync"])
+def test_overflow_policies(engine, policy):
+    bind = GatedBind(engine)
+    writer = AuditWriter(bind=bind, max_queue=2, batch_size=1, flush_interval_ms=10_000,
+                         overflow_policy=policy, block_timeout_ms=100)
+    try:
+        # Первое событие занимает поток, следующие два заполняют очередь
+        writer.submit(_event(0))
+        assert bind.entered.wait(5)
+        assert writer.submit(_event(1)) and writer.submit(_event(2))
+
+        started = time.monotonic()
+        accepted = writer.submit(_event(3))
+        waited = time.monotonic() - started
+        stats = writer.stats()
+        if policy == "sync":
+            # Записано в вызывающем потоке, мимо очереди
+            assert accepted and stats["written"] == 1 and stats["dropped"] == 0
+            assert _rows(engine) == [3]
+        else:
+            assert not accepted and stats["dropped"] == 1
+            assert waited >= 0.09 if policy == "block" else waited < 0.09
+    finally:
+        bind.released.set()
+        writer.stop()
+
+    expected = [3, 0, 1, 2] if policy == "sync" else [0, 1, 2]
+    assert _rows(engine) == expected
+
+
+def test_stop_drains_queue(engine):
+    writer = AuditWriter(bind=engine, batch_size=1000, flush_interval_ms=10_000)
+    for n in range(50):
+        writer.submit(_event(n))
+    assert writer.stats()["written"] == 0
+
+    writer.stop()
+    assert writer.stats()["written"] == 50
+    assert _rows(engine) == list(range(50))
@@ -0,0 +1,90 @@
+"""
+Тест помесячного журнала действий (modules.audit_store) на SQLite
+Проверяет ротацию прошлых месяцев, срок хранения и keyset-пагинацию
+по текущей и месячным таблицам
+"""
+from datetime import date, datetime, timedelta
+
+import pytest
+from sqlalchemy import inspect
+
+from modules import audit_store
+from modules.config import settings
+from modules.database import AuditLog, User
+
+TODAY = date(2024, 3, 15)
+
+
+@pytest.fixture()
+def db(session_factory, monkeypatch):
+    monkeypatch.setattr(settings, "AUDIT_RETENTION_MONTHS", 0)
+    with session_factory() as session:
+        users = [User(username=name, email=f"{name}@example.com", hashed_password="-", role="farmer")
+                 for name in ("agronom", "admin")]
+        session.add_all(users)
+        session.flush()
+        # По 3 записи с одинаковым временем: порядок страниц держится на id
+        start = datetime(2024, 1, 1, 8)
+        for step in range(30):
+            created_at = start + timedelta(days=step * 3)
+            for user in users + users[:1]:
+                session.add(AuditLog(user_id=user.id, action="update", entity_type="field",
+                                     entity_id=step, created_at=created_at))
+        session.commit()
+        yield session
+
+
+def _months(engine):
+    return sorted(name for name in inspect(engine).get_table_names() if audit_store._partition_month(name))
+
+
+def _ordered_ids(db):
+    rows = db.query(AuditLog.id, AuditLog.created_at).all()
+    return [row_id for row_id, _ in sorted(rows, key=lambda row: (row[1], row[0]), reverse=True)]
+
+
+def test_rotation_and_retention(db, engine, monkeypatch):
+    assert audit_store.maintain(engine, TODAY)["rotated"] == ["audit_logs_202401", "audit_logs_202402"]
+    assert _months(engine) == ["audit_logs_202401", "audit_logs_202402"]
+    counts = {row["table"]: row["rows"] for row in audit_store.list_partitions(engine)}
+    assert counts == {"audit_logs": 3 * 10, "audit_logs_202402": 3 * 9, "audit_logs_202401": 3 * 11}
+    db.expire_all()
+    assert min(created_at for (created_at,) in db.query(AuditLog.created_at)) >= datetime(2024, 3, 1)
+
+    # Повторный запуск в том же месяце ничего не переносит
+    assert audit_store.maintain(engine, TODAY)["rotated"] == []
+
+    # Месяц спустя март уходит в архив, январь - за пределами двух месяцев хранения
+    monkeypatch.setattr(settings, "AUDIT_RETENTION_MONTHS", 2)
+    report = audit_store.maintain(engine, date(2024, 4, 2))
+    assert (report["rotated"], report["dropped"]) == (["audit_logs_202403"], ["audit_logs_202401"])
+    assert _months(engine) == ["audit_logs_202402", "audit_logs_202403"]
+
+
+def test_keyset_pages_across_month_tables(db, engine):
+    expected = _ordered_ids(db)
+    audit_store.maintain(engine, TODAY)
+
+    seen, cursor, pages = [], None, 0
+    while True:
+        rows, cursor = audit_store.query_audit_page(db, limit=7, cursor=cursor)
+        seen += [row["id"] for row in rows]
+        pages += 1
+        if cursor is None:
+            break
+    assert seen == expected
+    assert pages == -(-len(expected) // 7)
+    assert {row["username"] for row in rows} <= {"agronom", "admin"}
+
+    # Фильтры и период сужают выборку, пагинация по ним та же
+    admin_id = db.query(User.id).filter(User.username == "admin").scalar()
+    first, cursor = audit_store.query_audit_page(
+        db, limit=4, user_id=admin_id, date_from=date(2024, 1, 20), date_to=date(2024, 2, 10),
+    )
+    rest, last_cursor = audit_store.query_audit_page(
+        db, limit=4, cursor=cursor, user_id=admin_id, date_from=date(2024, 1, 20), date_to=date(2024, 2, 10),
+    )
+    period = [row["created_at"] for row in first + rest]
+    assert last_cursor is None and len(period) == 7
+    assert period == sorted(period, reverse=True)
+    assert datetime(2024, 1, 20) <= min(period) and max(period) < datetime(2024, 2, 11)
@@ -0,0 +1,45 @@
+"""
+Тест поиска регрессий в истории бенчмарков
+Проверяет U-критерий, пороги compare() и выбор базового прогона
+"""
+import random
+
+from benchmarks.history import History, compare, mann_whitney_greater
+
+
+def _run(commit, samples, dirty=False, machine="m"):
+    return {"commit": commit, "dirty": dirty, "machine": machine, "started_at": "",
+            "cases": {name: {"samples": values} for name, values in samples.items()}}
+
+
+def test_mann_whitney_separates_shifted_samples():
+    rng = random.Random(1)
+    base = [1 + rng.gauss(0, 0.02) for _ in range(10)]
+    slower = [1.3 + rng.gauss(0, 0.02) for _ in range(10)]
+    assert mann_whitney_greater(base, slower) < 0.001
+    assert mann_whitney_greater(slower, base) > 0.99
+    assert mann_whitney_greater([1.0] * 5, [1.0] * 5) == 1.0
+
+
+def test_compare_requires_significance_and_threshold():
+    rng = random.Random(2)
+    noise = lambda center: [center + rng.gauss(0, center * 0.02) for _ in range(10)]
+    base = _run("a", {"slow": noise(1.0), "tiny": noise(1.0), "fast": noise(1.0), "noisy": [1, 2] * 5})
+    current = _run("b", {"slow": noise(1.5), "tiny": noise(1.03), "fast": noise(0.5), "noisy": [1.2, 2.2] * 5})
+
+    status = {row["case"]: row["status"] for row in compare(base, current, threshold=0.10, alpha=0.01)}
+    assert status == {"slow": "regression", "tiny": "unchanged", "fast": "improvement", "noisy": "unchanged"}
+
+
+def test_history_baseline_and_replacement(tmp_path):
+    history = History(tmp_path / "history.json")
+    history.add(_run("a", {"x": [1.0]}))
+    history.add(_run("b", {"x": [2.0]}, machine="other"))
+    history.add(_run("a", {"x": [3.0]}))
+    history.save()
+
+    history = History(tmp_path / "history.json")
+    assert len(history.runs) == 2
+    assert history.baseline("m", "c")["cases"]["x"]["samples"] == [3.0]
+    assert history.baseline("m", "a", revision="a")["commit"] == "a"
+    assert history.baseline("m", "c", revision="zzz") is None
@@ -0,0 +1,105 @@
+"""
+Тест журнала изменений
+Проверяет записи insert/update/delete и отнесение деталей к операции
+"""
+from datetime import date
+
+from sqlalchemy import event, select
+
+from modules import change_log
+from modules.database import ChangeLog, Farm, Field, Operation, SowingDetail
+
+
+def test_change_log_entries(session_factory):
+    change_log.install(session_factory)
+
+    with session_factory() as db:
+        farm = Farm(bin="123456789012", name="Тест")
+        db.add(farm)
+        db.flush()
+        field = Field(farm_id=farm.id, field_code="F1", name="Поле 1", area_ha=100)
+        db.add(field)
+        db.flush()
+        operation = Operation(farm_id=farm.id, field_id=field.id, operation_type="sowing",
+                              operation_date=date(2025, 5, 1))
+        db.add(operation)
+        db.commit()
+        farm_id, field_id, operation_id = farm.id, field.id, operation.id
+
+        detail = SowingDetail(operation_id=operation.id, crop="Пшеница")
+        db.add(detail)
+        db.commit()
+        field.name = "Поле 1а"
+        db.commit()
+        db.delete(detail)
+        db.delete(operation)
+        db.commit()
+
+        # Откат не оставляет записей
+        field.area_ha = 1
+        db.flush()
+        db.rollback()
+
+        entries = [(e.table_name, e.row_id, e.farm_id, e.op)
+                   for e in db.scalars(select(ChangeLog).order_by(ChangeLog.id))]
+
+    assert entries == [
+        ("farms", farm_id, farm_id, "insert"),
+        ("fields", field_id, farm_id, "insert"),
+        ("operations", operation_id, farm_id, "insert"),
+        ("operations", operation_id, farm_id, "update"),
+        ("fields", field_id, farm_id, "update"),
+        ("operations", operation_id, farm_id, "delete"),
+    ]
+
+
+def test_detail_farms_resolved_per_flush(session_factory, engine, farm_id, field_id):
+    change_log.install(session_factory)
+    with session_factory() as db:
+        for day in range(1, 11):
+            operation = Operation(farm_id=farm_id, field_id=field_id, operation_type="sowing",
+                                  operation_date=date(2025, 5, day))
+            operation.sowing_details = SowingDetail(crop="Пшеница")
+            db.add(operation)
+        db.commit()
+
+    with session_factory() as db:
+        details = db.scalars(select(SowingDetail)).all()
+        # Половина операций уже в сессии, остальные не загружались
+        db.scalars(select(Operation).where(Operation.operation_date <= date(2025, 5, 5))).all()
+        lookups = []
+
+        def count(conn, cursor, statement, parameters, context, executemany):
+            if statement.lstrip().upper().startswith("SELECT") and "FROM operations" in statement:
+                lookups.append(statement)
+
+        event.listen(engine, "before_cursor_execute", count)
+        try:
+            for detail in details:
+                detail.crop = "Ячмень"
+            db.commit()
+        finally:
+            event.remove(engine, "before_cursor_execute", count)
+
+        assert len(lookups) == 1
+        updates = db.execute(select(ChangeLog.farm_id).where(ChangeLog.op == "update")).scalars().all()
+        assert updates == [farm_id] * 10
+
+
+def test_delete_with_details_stays_delete(session_factory, farm_id, field_id):
+    change_log.install(session_factory)
+    with session_factory() as db:
+        operation = Operation(farm_id=farm_id, field_id=field_id, operation_type="sowing",
+                              operation_date=date(2025, 5, 1))
+        operation.sowing_details = SowingDetail(crop="Пшеница")
+        db.add(operation)
+        db.commit()
+        operation_id, detail = operation.id, operation.sowing_details
+
+        # Операция обрабатывается раньше своих деталей
+        db.delete(operation)
+        db.delete(detail)
+        db.commit()
+
+        last = db.scalars(select(ChangeLog).order_by(ChangeLog.id.desc())).first()
+        assert (last.table_name, last.row_id, last.farm_id, last.op) == ("operations", operation_id, farm_id, "delete")
@@ -0,0 +1,61 @@
+"""
+Тест кеша графиков (utils.chart_cache)
+Проверяет стабильность ключей и вытеснение по числу записей и объёму
+"""
+from datetime import date
+
+import numpy as np
+import pandas as pd
+
+from utils.chart_cache import FigureCache
+
+key = FigureCache.make_key
+
+
+def test_key_stability():
+    frame = pd.DataFrame({"x": [1, 2, 3], "y": [0.5, 1.5, 2.5]})
+    # Одинаковое содержимое - один ключ, независимо от объекта
+    assert key("f", (frame,), {"title": "A"}) == key("f", (frame.copy(),), {"title": "A"})
+    assert key("f", ([1, 2],), {}) == key("f", ([1, 2],), {})
+    assert key("f", (), {"a": 1, "b": 2}) == key("f", (), {"b": 2, "a": 1})
+
+    distinct = [
+        key("f", ([1, 2],), {}),
+        key("f", ([1.0, 2.0],), {}),
+        key("f", ([1, 2.0],), {}),
+        key("f", (["1", "2"],), {}),
+        key("f", ([True, False],), {}),
+        key("f", (np.array([1, 2], dtype=np.int32),), {}),
+        key("f", (pd.Series([1.0, 2.0]),), {}),
+        key("f", ({"a": [1], "b": [2]},), {}),
+        key("f", ({"b": [2], "a": [1]},), {}),
+        key("f", ([date(2024, 1, 1)],), {}),
+        key("g", ([1, 2],), {}),
+        key("f", (), {"values": [1, 2]}),
+    ]
+    assert len(set(distinct)) == len(distinct)
+
+
+def test_lru_limits():
+    cache = FigureCache(max_entries=2, max_bytes=10)
+    cache.put("a", "1234")
+    cache.put("b", "1234")
+    assert cache.get("a") == "1234"
+    # Лимит записей: вытесняется давно не использованная "b"
+    cache.put("c", "12")
+    assert cache.get("b") is None
+    assert (cache.get("a"), cache.get("c")) == ("1234", "12")
+
+    # Лимит объёма: 4 + 8 > 10 - вытесняется "a"
+    cache.put("d", "12345678")
+    assert cache.get("a") is None
+    assert cache.stats()["size_bytes"] == 10
+    # Запись больше лимита не сохраняется и ничего не вытесняет
+    cache.put("e", "x" * 11)
+    assert cache.get("e") is None
+    assert cache.stats()["entries"] == 2
+
+    # Перезапись ключа не удваивает объём
+    cache.put("d", "123")
+    assert cache.stats()["size_bytes"] == 5
+    assert FigureCache(max_entries=0).enabled is False
@@ -0,0 +1,96 @@
+"""
+Тест сервиса паролей (modules.credentials)
+Проверяет окна ограничителя входов, пересчёт хеша при входе
+и отказ вместо исключения пула при долгом ожидании
+"""
+import threading
+
+import pytest
+
+from modules import auth, credentials
+from modules.credentials import CredentialService, CredentialServiceBusy, LoginThrottle, LoginThrottled
+from modules.database import User
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture()
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(credentials.time, "monotonic", clock)
+    return clock
+
+
+def test_throttle_windows(clock):
+    throttle = LoginThrottle(max_failures=3, window=60, base_lockout=10, max_lockout=25)
+    throttle.register_failure("Admin")
+    throttle.register_failure("admin ")
+    throttle.check("admin")
+
+    # Неудачи вне окна не накапливаются
+    clock.now += 61
+    throttle.register_failure("admin")
+    throttle.register_failure("admin")
+    throttle.check("admin")
+
+    throttle.register_failure("admin")
+    with pytest.raises(LoginThrottled) as throttled:
+        throttle.check("ADMIN")
+    assert throttled.value.retry_after == pytest.approx(10)
+    throttle.check("other")
+
+    # Каждая следующая неудача удваивает блокировку, но не больше max_lockout
+    clock.now += 10
+    throttle.check("admin")
+    throttle.register_failure("admin")
+    with pytest.raises(LoginThrottled) as throttled:
+        throttle.check("admin")
+    assert throttled.value.retry_after == pytest.approx(20)
+    throttle.register_failure("admin")
+    with pytest.raises(LoginThrottled) as throttled:
+        throttle.check("admin")
+    assert throttled.value.retry_after == pytest.approx(25)
+
+    throttle.reset("admin")
+    throttle.check("admin")
+
+
+def test_login_rehashes_outdated_cost(session_factory, monkeypatch):
+    service = CredentialService(rounds=5, workers=1)
+    monkeypatch.setattr(auth, "credential_service", service)
+    monkeypatch.setattr(auth, "login_throttle", LoginThrottle(max_failures=2))
+    with session_factory() as db:
+        old_hash = CredentialService(rounds=4)._hash_sync("secret", 4)
+        db.add(User(username="agronom", email="a@example.com", hashed_password=old_hash, role="farmer"))
+        db.commit()
+
+        assert auth.authenticate_user(db, "agronom", "wrong") is None
+        assert db.query(User).one().hashed_password == old_hash
+
+        user = auth.authenticate_user(db, "agronom", "secret")
+        assert user is not None and user.last_login is not None
+        assert user.hashed_password.startswith("$2b$05$")
+        assert service.verify("secret", user.hashed_password)
+
+        # Хеш уже с текущей стоимостью - повторный пересчёт не нужен
+        assert service.verify_and_update("secret", user.hashed_password) == (True, None)
+
+
+def test_slow_pool_reports_busy():
+    service = CredentialService(rounds=4, workers=1, max_pending=1, timeout=0.05)
+    release = threading.Event()
+    blocker = service._executor.submit(release.wait)
+    try:
+        with pytest.raises(CredentialServiceBusy):
+            service.verify("secret", "$2b$04$invalid")
+    finally:
+        release.set()
+        blocker.result()
+    # Снятая из очереди задача освободила слот
+    assert service._slots.acquire(blocking=False) and service._slots.acquire(blocking=False)
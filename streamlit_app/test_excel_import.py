@@ -0,0 +1,142 @@
+"""
+Тест импорта Excel
+Проверяет upsert по естественному ключу, манифест диапазонов,
+продолжение после сбоя и карантин ошибочных строк
+"""
+from datetime import date
+
+import pandas as pd
+import pytest
+from sqlalchemy import func, select
+from sqlalchemy.exc import IntegrityError
+
+from modules import excel_import
+from modules.config import settings
+from modules.database import (
+    ChangeLog, Farm, Field, HarvestData, ImportManifest, ImportQuarantine, Operation,
+)
+
+
+@pytest.fixture()
+def setup(session_factory, farm_id, monkeypatch):
+    monkeypatch.setattr(settings, "IMPORT_CHUNK_ROWS", 2)
+    return session_factory, farm_id
+
+
+def _import(factory, df, sheet, farm_id, **kwargs):
+    with factory() as db:
+        result = excel_import.import_sheet(db, df, sheet, farm_id, **kwargs)
+        db.commit()
+    return result
+
+
+def test_reimport_upserts_by_natural_key(setup):
+    factory, farm_id = setup
+    fields = pd.DataFrame({"ID поля": ["F1", "F2", "F3"], "Площадь (га)": [100.0, 200.0, 300.0]})
+    assert _import(factory, fields, "02", farm_id)["inserted"] == 3
+
+    yields = pd.DataFrame({
+        "ID поля": ["F1", "F2", "F3"],
+        "Год": [2024, 2024, 2024],
+        "Культура": ["Пшеница", "Ячмень", "Пшеница"],
+        "Урожайность (т/га)": [2.1, 1.8, 2.5],
+    })
+    first = _import(factory, yields, "05", farm_id)
+    assert (first["inserted"], first["updated"]) == (3, 0)
+
+    # Тот же файл: все диапазоны уже применены
+    again = _import(factory, yields, "05", farm_id)
+    assert (again["imported"], again["already_applied"]) == (0, 3)
+
+    # Исправленная строка F3 (второй диапазон): обновление без дубля, первый диапазон пропущен
+    corrected = yields.assign(**{"Урожайность (т/га)": [2.1, 1.8, 2.7]})
+    result = _import(factory, corrected, "05", farm_id)
+    assert (result["inserted"], result["updated"], result["already_applied"]) == (0, 1, 2)
+
+    # force разбирает все строки, но без изменений ничего не пишет
+    forced = _import(factory, corrected, "05", farm_id, force=True)
+    assert (forced["imported"], forced["unchanged"]) == (0, 3)
+
+    with factory() as db:
+        assert db.scalar(select(func.count(Operation.id))) == 3
+        assert db.scalar(select(func.count(HarvestData.id))) == 3
+        f3 = db.scalar(select(Field.id).where(Field.field_code == "F3"))
+        harvest = db.scalars(select(HarvestData).join(Operation).where(Operation.field_id == f3)).one()
+        assert harvest.yield_t_ha == 2.7
+        assert db.scalar(select(func.count(ImportManifest.id)).where(ImportManifest.sheet == "05")) == 5
+        ops = db.scalars(select(ChangeLog.op).where(ChangeLog.table_name == "operations")).all()
+        assert sorted(ops) == ["insert", "insert", "insert", "update"]
+
+
+def test_manual_operations_and_foreign_fields_untouched(setup):
+    factory, farm_id = setup
+    with factory() as db:
+        other = Farm(bin="999999999999", name="Соседи")
+        db.add(other)
+        db.flush()
+        db.add(Field(farm_id=other.id, field_code="X1", area_ha=50.0))
+        field = Field(farm_id=farm_id, field_code="F1", area_ha=100.0)
+        db.add(field)
+        db.flush()
+        db.add(Operation(farm_id=farm_id, field_id=field.id, operation_type="sowing",
+                         operation_date=date(2024, 5, 1), crop="Пшеница"))
+        db.commit()
+
+    fields = pd.DataFrame({"ID поля": ["F1", "X1"], "Площадь (га)": [120.0, 70.0]})
+    result = _import(factory, fields, "02", farm_id)
+    assert (result["updated"], result["quarantined"]) == (1, 1)
+
+    operations = pd.DataFrame({
+        "ID поля": ["F1", "F1"],
+        "Дата": ["2024-05-01", "2024-05-01"],
+        "Тип операции": ["Посев", "Посев"],
+        "Культура": ["Пшеница", "Пшеница"],
+    })
+    # Две строки с одним ключом - одна операция; ручная операция не затрагивается
+    assert _import(factory, operations, "04", farm_id)["inserted"] == 1
+    with factory() as db:
+        assert db.scalar(select(func.count(Operation.id))) == 2
+        assert db.scalar(select(Field.area_ha).where(Field.field_code == "X1")) == 50.0
+
+
+def test_resume_after_crash_and_quarantine_replay(setup, monkeypatch):
+    factory, farm_id = setup
+    fields = pd.DataFrame({
+        "ID поля": ["F1", "F2", "BAD", "F4", "F5", "F6"],
+        "Площадь (га)": [100.0, "сто", 300.0, 400.0, 500.0, 600.0],
+    })
+    write_fields = excel_import.SHEETS["02"]
+
+    def failing_write(db, farm_id, records):
+        if any(record["values"]["field_code"] == "BAD" for record in records):
+            raise IntegrityError("INSERT", {}, Exception("bad row"))
+        return write_fields[1](db, farm_id, records)
+
+    monkeypatch.setitem(excel_import.SHEETS, "02", (write_fields[0], failing_write, *write_fields[2:]))
+
+    calls = []
+
+    def crash_on_third_chunk(fraction, message=None, force=False):
+        calls.append(fraction)
+        if len(calls) == 3:
+            raise RuntimeError("worker died")
+
+    with pytest.raises(RuntimeError):
+        _import(factory, fields, "02", farm_id, progress=crash_on_third_chunk, job_id=None)
+    with factory() as db:
+        # Два пакета зафиксированы; "сто" и BAD (отказ БД в пакете) - в карантине, F4 записано построчно
+        assert sorted(db.scalars(select(Field.field_code))) == ["F1", "F4"]
+
+    resumed = _import(factory, fields, "02", farm_id)
+    assert (resumed["already_applied"], resumed["inserted"]) == (4, 2)
+
+    with factory() as db:
+        pending = excel_import.quarantine_rows(db, farm_id)
+        assert [(row["row_number"], row["reason"][:12]) for row in pending] == [(3, "Некорректное"), (4, "bad row")]
+        fixed = dict(pending[0]["data"], **{"Площадь (га)": 100})
+        assert excel_import.replay_quarantine(db, {pending[0]["id"]: fixed, pending[1]["id"]: None}) == \
+            {"replayed": 1, "failed": 1}
+        assert excel_import.discard_quarantine(db, [pending[1]["id"]]) == 1
+        assert excel_import.quarantine_rows(db, farm_id) == []
+        assert db.scalar(select(Field.area_ha).where(Field.field_code == "F2")) == 100.0
+        assert db.scalar(select(func.count(ImportQuarantine.id))) == 2
@@ -0,0 +1,53 @@
+"""
+Тест чтения Excel (modules.excel_reader)
+Результат совпадает с pd.read_excel, в одном процессе и в пуле
+"""
+import numpy as np
+import pandas as pd
+import pytest
+
+from modules.excel_reader import read_sheet, read_workbook, sheet_names
+
+
+@pytest.fixture()
+def workbook(tmp_path):
+    path = tmp_path / "passport.xlsx"
+    fields = pd.DataFrame({
+        "ID поля": ["F1", "F2", None, "F4"],
+        "Дата анализа": pd.to_datetime(["2024-04-01", None, "2024-04-03", "2024-04-04"]),
+        "Площадь (га)": [120.5, 80, np.nan, 45.2],
+        "Год": [2023, 2024, 2024, 2025],
+    })
+    with pd.ExcelWriter(path) as writer:
+        pd.DataFrame([["БИН", "123456789012"], ["Телефон", "+77011234567"]]).to_excel(
+            writer, index=False, header=False, sheet_name="Идентификация")
+        fields.to_excel(writer, index=False, sheet_name="Поля")
+        # Пустая строка посреди данных и повтор заголовка
+        pd.DataFrame([["a", 1], [None, None], ["b", 2]], columns=["Код", "Код"]).to_excel(
+            writer, index=False, sheet_name="Прочее")
+    return path
+
+
+def test_matches_pandas(workbook):
+    assert sheet_names(workbook) == ["Идентификация", "Поля", "Прочее"]
+    expected = pd.read_excel(workbook, sheet_name=None)
+    frames = read_workbook(workbook, workers=1)
+    assert list(frames) == list(expected)
+    for sheet in ("Поля", "Прочее"):
+        pd.testing.assert_frame_equal(frames[sheet], expected[sheet], check_dtype=False)
+
+    # Текстовые ячейки остаются текстом (pd.read_excel превращает "+7701..." в число)
+    identification = read_sheet(workbook.read_bytes())
+    assert dict(zip(identification.iloc[:, 0], identification.iloc[:, 1])) == {"Телефон": "+77011234567"}
+    assert len(read_sheet(workbook, "Поля", nrows=2)) == 2
+    assert str(read_sheet(workbook, "Поля", dtype_backend="pyarrow")["Год"].dtype) == "int64[pyarrow]"
+    with pytest.raises(KeyError):
+        read_workbook(workbook, ["Нет такого листа"])
+
+
+def test_parallel_matches_sequential(workbook):
+    sequential = read_workbook(workbook, workers=1)
+    parallel = read_workbook(workbook.read_bytes(), workers=2, parallel_min_bytes=0)
+    assert list(parallel) == list(sequential)
+    for sheet in sequential:
+        pd.testing.assert_frame_equal(parallel[sheet], sequential[sheet])
@@ -0,0 +1,91 @@
+"""
+Тест общего кеша данных хозяйства (modules.farm_cache)
+Проверяет, что после коммита, переноса в другое хозяйство и массового
+изменения устаревшие снимки не отдаются, а откат не сбрасывает кеш
+"""
+import pytest
+
+from modules import farm_cache
+from modules.database import Farm, Field, Machinery
+from modules.farm_cache import ALL_FARMS, FarmReadCache, get_fields, get_machinery
+
+
+@pytest.fixture()
+def cache(session_factory, monkeypatch):
+    cache = FarmReadCache(ttl=300)
+    monkeypatch.setattr(farm_cache, "farm_cache", cache)
+    monkeypatch.setattr(farm_cache, "_session_factory", session_factory)
+    farm_cache.install(session_factory)
+    return cache
+
+
+@pytest.fixture()
+def other_farm_id(session_factory):
+    with session_factory() as db:
+        farm = Farm(bin="210987654321", name="Соседи")
+        db.add(farm)
+        db.commit()
+        return farm.id
+
+
+def _codes(scope):
+    return [field.field_code for field in get_fields(scope)]
+
+
+def test_commit_and_rollback(cache, session_factory, farm_id, field_id):
+    assert _codes(farm_id) == ["F1"]
+    assert _codes(farm_id) == ["F1"]
+    assert (cache.hits, cache.misses) == (1, 1)
+
+    with session_factory() as db:
+        db.add(Field(farm_id=farm_id, field_code="F2", name="Поле 2", area_ha=50))
+        db.flush()
+        # До коммита изменение не видно другим сессиям - кеш прежний
+        assert _codes(farm_id) == ["F1"]
+        db.commit()
+    assert _codes(farm_id) == ["F1", "F2"]
+
+    misses = cache.misses
+    with session_factory() as db:
+        db.get(Field, field_id).name = "Черновик"
+        db.flush()
+        db.rollback()
+    assert [field.name for field in get_fields(farm_id)] == ["Поле 1", "Поле 2"]
+    assert cache.misses == misses
+
+
+def test_move_to_other_farm_and_admin_scope(cache, session_factory, farm_id, field_id, other_farm_id):
+    assert _codes(farm_id) == ["F1"]
+    assert _codes(other_farm_id) == []
+    assert [(f.field_code, f.farm_id) for f in get_fields(ALL_FARMS)] == [("F1", farm_id)]
+
+    with session_factory() as db:
+        db.get(Field, field_id).farm_id = other_farm_id
+        db.commit()
+
+    # Устаревают и старое хозяйство, и новое, и область администратора
+    assert _codes(farm_id) == []
+    assert _codes(other_farm_id) == ["F1"]
+    assert [(f.field_code, f.farm_id) for f in get_fields(ALL_FARMS)] == [("F1", other_farm_id)]
+
+
+def test_bulk_update(cache, session_factory, farm_id, other_farm_id):
+    with session_factory() as db:
+        db.add_all([
+            Machinery(farm_id=farm_id, machinery_type="tractor", model="К-744"),
+            Machinery(farm_id=other_farm_id, machinery_type="combine", model="Акрос"),
+        ])
+        db.commit()
+    assert [m.model for m in get_machinery(farm_id)] == ["К-744"]
+    assert [m.model for m in get_machinery(other_farm_id)] == ["Акрос"]
+    assert len(get_machinery(ALL_FARMS)) == 2
+
+    # query.update() не проходит через after_flush: хозяйство неизвестно,
+    # устаревают все области техники
+    with session_factory() as db:
+        db.query(Machinery).update({Machinery.status: "repair"})
+        db.commit()
+    assert get_machinery(farm_id) == []
+    assert get_machinery(other_farm_id) == []
+    assert get_machinery(ALL_FARMS) == []
+    assert [m.status for m in get_machinery(farm_id, active_only=False)] == ["repair"]
@@ -0,0 +1,88 @@
+"""
+Тест фоновых задач
+Проверяет импорт в пуле процессов, отмену и повтор после ошибки
+"""
+import json
+import time
+
+import pandas as pd
+import pytest
+from sqlalchemy import func, select
+
+from modules import jobs
+from modules.config import settings
+from modules.database import Field, Job
+
+
+@pytest.fixture()
+def setup(tmp_path, engine, session_factory, farm_id, monkeypatch):
+    monkeypatch.setattr(settings, "JOBS_DIR", str(tmp_path / "jobs"))
+    monkeypatch.setattr(settings, "JOBS_RETRY_DELAY_SEC", 0)
+    return session_factory, engine.url.render_as_string(hide_password=False), farm_id, tmp_path
+
+
+def _fields_file(tmp_path, prefix, count):
+    path = tmp_path / f"{prefix}.xlsx"
+    pd.DataFrame({
+        "ID поля": [f"{prefix}{i:03d}" for i in range(count)],
+        "Площадь (га)": [100.0 + i for i in range(count)],
+    }).to_excel(path, index=False)
+    return str(path)
+
+
+def test_import_jobs_run_in_worker_processes(setup):
+    factory, database_url, farm_id, tmp_path = setup
+    runner = jobs.JobRunner(database_url, workers=2, poll_interval=0.2)
+    try:
+        job_ids = [
+            jobs.submit("import_excel", {"path": _fields_file(tmp_path, prefix, 30), "sheet": "02", "farm_id": farm_id},
+                        farm_id=farm_id, session_factory=factory, runner=runner)
+            for prefix in ("A", "B")
+        ]
+        deadline = time.monotonic() + 120
+        while time.monotonic() < deadline:
+            if all(jobs.get_job(job_id, factory)["status"] not in jobs.ACTIVE for job_id in job_ids):
+                break
+            time.sleep(0.2)
+    finally:
+        runner.stop()
+
+    for job_id in job_ids:
+        job = jobs.get_job(job_id, factory)
+        assert job["status"] == jobs.SUCCEEDED, job["error"]
+        assert job["result"]["imported"] == 30
+        assert job["progress"] == 1.0
+    with factory() as db:
+        assert db.scalar(select(func.count(Field.id))) == 60
+
+
+def test_cancel_and_retry(setup, monkeypatch):
+    factory, _, farm_id, tmp_path = setup
+    monkeypatch.setattr(settings, "JOBS_WORKERS", 0)
+
+    # Неизвестный тип файла: ошибка в каждой из двух попыток
+    failed = jobs.submit("import_excel", {"path": "missing.xlsx", "sheet": "99", "farm_id": farm_id},
+                         farm_id=farm_id, max_attempts=2, session_factory=factory)
+    job = jobs.get_job(failed, factory)
+    assert job["status"] == jobs.FAILED
+    assert job["attempts"] == 2
+    assert "ValueError" in job["message"]
+
+    jobs.retry(failed, factory)
+    assert jobs.get_job(failed, factory)["status"] == jobs.QUEUED
+    jobs.cancel(failed, factory)
+    assert jobs.get_job(failed, factory)["status"] == jobs.CANCELLED
+
+    # Выполняемая задача прерывается на ctx.progress() и ничего не записывает
+    params = {"path": _fields_file(tmp_path, "C", 5), "sheet": "02", "farm_id": farm_id}
+    with factory() as db:
+        job = Job(kind="import_excel", status=jobs.QUEUED, params=json.dumps(params), farm_id=farm_id,
+                  attempts=0, max_attempts=1, cancel_requested=False)
+        db.add(job)
+        db.commit()
+        job_id = job.id
+    assert jobs._claim(factory, "test", 1) == [job_id]
+    jobs.cancel(job_id, factory)
+    assert jobs.run_job(job_id, factory) == jobs.CANCELLED
+    with factory() as db:
+        assert db.scalar(select(func.count(Field.id))) == 0
@@ -0,0 +1,60 @@
+"""
+Тест профилей загрузки операций
+Проверяет, что экспорт и журнал не делают ленивых запросов к деталям
+"""
+from datetime import date
+
+import pytest
+from sqlalchemy import event
+
+from modules.database import Operation, SowingDetail, HarvestData, FertilizerApplication
+from modules.loading import (
+    LazyLoadError, forbid_lazy_loads, operations_query, export_operations_frame, operation_details,
+)
+
+
+@pytest.fixture()
+def db(engine, session_factory, farm_id, field_id):
+    session = session_factory()
+    for i in range(300):
+        op = Operation(farm_id=farm_id, field_id=field_id, operation_type="sowing", operation_date=date(2024, 5, 1))
+        op.sowing_details = SowingDetail(crop="Пшеница", seeding_rate_kg_ha=120)
+        op.harvest_data = HarvestData(crop="Пшеница", yield_t_ha=2.0)
+        op.fertilizer_applications = [FertilizerApplication(fertilizer_name="Аммофос", rate_kg_ha=80)]
+        session.add(op)
+    session.commit()
+    session.expunge_all()
+
+    statements = []
+    event.listen(engine, "before_cursor_execute", lambda *args: statements.append(args[2]))
+    session.info["statements"] = statements
+    yield session
+    session.close()
+
+
+def test_export_full_uses_constant_number_of_queries(db):
+    """Полный экспорт: несколько запросов без ленивых загрузок"""
+    with forbid_lazy_loads(db):
+        operations = operations_query(db, "export_full").all()
+        frame = export_operations_frame(operations)
+
+    assert len(frame) == 300
+    assert "harvest_data.yield_t_ha" in frame.columns
+    assert len(db.info["statements"]) <= 3
+
+
+def test_journal_profile_loads_all_details(db):
+    """Детальный просмотр журнала не догружает связи"""
+    with forbid_lazy_loads(db):
+        op = operations_query(db, "journal").first()
+        details = operation_details(op)
+
+    assert {"sowing_details", "harvest_data", "fertilizer_applications"} <= set(details)
+
+
+def test_lazy_load_is_reported(db):
+    """Связь вне профиля в режиме проверки вызывает ошибку"""
+    with forbid_lazy_loads(db):
+        op = operations_query(db, "harvest_summary").first()
+        with pytest.raises(LazyLoadError):
+            op.sowing_details
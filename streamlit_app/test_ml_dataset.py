@@ -0,0 +1,76 @@
+"""
+Тест инкрементальной сборки ML-датасета (modules.ml_dataset)
+Проверяет пропуск без изменений и пересборку только затронутых партиций,
+в том числе после правки строк на месте
+"""
+from datetime import date
+
+import pytest
+from sqlalchemy import update
+
+from modules import change_log
+from modules.database import Field, HarvestData, Operation, RefCrop
+from modules.ml_dataset import DatasetBuilder, load_dataset
+
+
+@pytest.fixture()
+def db(session_factory, farm_id, field_id):
+    change_log.install(session_factory)
+    with session_factory() as session:
+        session.add(RefCrop(crop_name="Пшеница яровая", typical_yield_avg=2.0, n_need_kg_ha=80.0))
+        for season, yield_t_ha in ((2023, 1.5), (2024, 2.0)):
+            harvest = Operation(farm_id=farm_id, field_id=field_id, operation_type="harvest",
+                                operation_date=date(season, 9, 1), crop="Пшеница яровая")
+            harvest.harvest_data = HarvestData(crop="Пшеница яровая", yield_t_ha=yield_t_ha)
+            session.add(harvest)
+        session.commit()
+        yield session
+
+
+def _yields(output):
+    df = load_dataset(str(output))
+    return dict(zip(df["season"], df["yield_t_ha"]))
+
+
+def test_incremental_build(db, farm_id, tmp_path):
+    output = tmp_path / "dataset"
+    builder = DatasetBuilder(db, str(output))
+    assert sorted(builder.build()["rebuilt"]) == [(farm_id, 2023), (farm_id, 2024)]
+    assert builder.build()["skipped"] is True
+
+    # Правка на месте: количество и id строк прежние, журнал изменений - новый
+    harvest = db.query(HarvestData).join(Operation).filter(Operation.operation_date == date(2024, 9, 1)).one()
+    harvest.yield_t_ha = 3.0
+    db.commit()
+    report = builder.build()
+    assert (report["skipped"], report["rebuilt"], report["unchanged"]) == (False, [(farm_id, 2024)], 1)
+    assert _yields(output) == {2023: 1.5, 2024: 3.0}
+
+    # Площадь поля входит в строки всех сезонов
+    db.get(Field, harvest.operation.field_id).area_ha = 120
+    db.commit()
+    assert sorted(builder.build()["rebuilt"]) == [(farm_id, 2023), (farm_id, 2024)]
+
+    # Нормы справочника переписываются в обход журнала - пересборка всего
+    db.execute(update(RefCrop).values(n_need_kg_ha=40.0, source_hash="changed"))
+    db.commit()
+    assert len(builder.build()["rebuilt"]) == 2
+    assert builder.build()["skipped"] is True
+
+
+def test_empty_partition_is_not_rebuilt(db, farm_id, field_id, tmp_path):
+    # Сезон только с обработкой почвы: отпечаток есть, строк поле-сезон нет
+    db.add(Operation(farm_id=farm_id, field_id=field_id, operation_type="tillage",
+                     operation_date=date(2022, 10, 1)))
+    db.commit()
+    output = tmp_path / "dataset"
+    builder = DatasetBuilder(db, str(output))
+    assert sorted(builder.build()["rebuilt"]) == [(farm_id, 2023), (farm_id, 2024)]
+    assert builder.load_manifest()["empty_partitions"] == [f"{farm_id}/2022"]
+
+    harvest = db.query(HarvestData).join(Operation).filter(Operation.operation_date == date(2024, 9, 1)).one()
+    harvest.yield_t_ha = 3.0
+    db.commit()
+    report = builder.build()
+    assert (report["rebuilt"], report["unchanged"]) == ([(farm_id, 2024)], 2)
+    assert builder.load_manifest()["empty_partitions"] == [f"{farm_id}/2022"]
@@ -0,0 +1,48 @@
+"""
+Тест кеша баланса N/P/K (modules.nutrient_balance)
+Проверяет, что правка на месте и изменение справочника не отдают старый баланс
+"""
+from datetime import date
+
+import pytest
+from sqlalchemy import update
+
+from modules import change_log, nutrient_balance
+from modules.database import HarvestData, Operation, RefCrop
+
+
+@pytest.fixture()
+def db(session_factory, farm_id, field_id, monkeypatch):
+    monkeypatch.setattr(nutrient_balance, "_cache", {})
+    change_log.install(session_factory)
+    with session_factory() as session:
+        session.add(RefCrop(crop_name="Пшеница яровая", typical_yield_avg=2.0, n_need_kg_ha=80.0))
+        session.commit()
+        harvest = Operation(farm_id=farm_id, field_id=field_id, operation_type="harvest",
+                            operation_date=date(2024, 9, 1), crop="Пшеница яровая")
+        harvest.harvest_data = HarvestData(crop="Пшеница яровая", yield_t_ha=2.0)
+        session.add(harvest)
+        session.commit()
+        yield session
+
+
+def _n_removed(db, farm_id):
+    return nutrient_balance.get_season_balance(db, farm_id, 2024).iloc[0]["n_removed_kg_ha"]
+
+
+def test_cache_sees_edits_after_caching(db, farm_id):
+    assert _n_removed(db, farm_id) == pytest.approx(80.0)
+    assert _n_removed(db, farm_id) == pytest.approx(80.0)
+    assert len(nutrient_balance._cache) == 1
+
+    # Правка урожайности на месте: число операций то же, журнал изменений - новый
+    db.query(HarvestData).one().yield_t_ha = 3.0
+    db.commit()
+    assert _n_removed(db, farm_id) == pytest.approx(120.0)
+
+    # Нормы справочника меняются в обход журнала - сброс после коммита
+    db.execute(update(RefCrop).values(n_need_kg_ha=40.0))
+    nutrient_balance.invalidate_after_commit(db)
+    assert _n_removed(db, farm_id) == pytest.approx(120.0)
+    db.commit()
+    assert _n_removed(db, farm_id) == pytest.approx(60.0)
@@ -0,0 +1,193 @@
+"""
+Тест офлайн-очереди операций
+Проверяет идемпотентную синхронизацию, обнаружение конфликтов,
+область хозяйства и отправку на сервер с обновлением токена
+"""
+import gzip
+import json
+import threading
+from datetime import date
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs
+
+import pytest
+
+from modules.database import Operation, SowingDetail
+from modules.offline_queue import (
+    CONFLICT, DISCARDED, FAILED, PENDING, SYNCED, KEEP_BOTH, DirectTransport, HttpTransport, OfflineQueue,
+    SyncAuthError, SyncWorker,
+)
+
+
+@pytest.fixture()
+def setup(tmp_path, session_factory, farm_id, field_id):
+    queue = OfflineQueue(str(tmp_path / "queue.db"))
+    worker = SyncWorker(queue, DirectTransport(session_factory), batch_size=2)
+    yield queue, worker, session_factory, {"farm_id": farm_id, "field_id": field_id}
+    queue.close()
+
+
+def _sowing(ids, day):
+    operation = dict(ids, operation_type="sowing", operation_date=date(2025, 5, day), area_processed_ha=50.0)
+    return operation, {"sowing_details": {"crop": "Пшеница", "seeding_rate_kg_ha": 120.0}}
+
+
+def test_sync_is_batched_and_idempotent(setup):
+    queue, worker, factory, ids = setup
+    uuids = [queue.enqueue(*_sowing(ids, day)) for day in (10, 11, 12)]
+
+    assert worker.sync_once() == {"created": 3}
+    assert queue.counts() == {SYNCED: 3}
+
+    # Повторная отправка той же операции (например, ответ сервера потерялся)
+    queue.resolve(uuids[0], "retry")
+    assert worker.sync_once() == {"duplicate": 1}
+
+    with factory() as db:
+        assert db.query(Operation).count() == 3
+        assert db.query(SowingDetail).count() == 3
+        assert {op.client_uuid for op in db.query(Operation)} == set(uuids)
+
+
+def test_conflict_waits_for_user_decision(setup):
+    queue, worker, factory, ids = setup
+    queue.enqueue(*_sowing(ids, 10))
+    worker.sync_once()
+
+    duplicate = queue.enqueue(*_sowing(ids, 10))
+    assert worker.sync_once() == {"conflict": 1}
+    assert queue.items([CONFLICT])[0]["client_uuid"] == duplicate
+
+    queue.resolve(duplicate, KEEP_BOTH)
+    assert queue.counts()[PENDING] == 1
+    assert worker.sync_once() == {"created": 1}
+    with factory() as db:
+        assert db.query(Operation).count() == 2
+
+
+def test_payload_cannot_claim_import_key(setup):
+    queue, worker, factory, ids = setup
+    operation, details = _sowing(ids, 10)
+    operation.update(import_key="F1|sowing|2025-05-10|Пшеница", source_hash="forged")
+    queue.enqueue(operation, details)
+    assert worker.sync_once() == {"created": 1}
+    with factory() as db:
+        op = db.query(Operation).one()
+        assert (op.import_key, op.source_hash) == (None, None)
+
+
+def test_status_is_scoped_to_farm(setup):
+    queue, worker, factory, ids = setup
+    own = queue.enqueue(*_sowing(ids, 10))
+    other = queue.enqueue(*_sowing(dict(ids, farm_id=ids["farm_id"] + 1), 10))
+    queue.resolve(own, "discard", farm_id=ids["farm_id"])
+    queue.resolve(other, "discard", farm_id=ids["farm_id"])
+
+    assert queue.counts(ids["farm_id"]) == {DISCARDED: 1}
+    assert queue.counts() == {DISCARDED: 1, PENDING: 1}
+    assert [item["client_uuid"] for item in queue.items([PENDING], farm_id=ids["farm_id"])] == []
+    assert [item["client_uuid"] for item in queue.items([PENDING])] == [other]
+
+
+class FakeBackend(ThreadingHTTPServer):
+    """Минимальный backend: вход, обновление токена и /operations/bulk"""
+
+    def __init__(self):
+        super().__init__(("127.0.0.1", 0), FakeBackendHandler)
+        self.issued = 0
+        self.valid = set()
+        self.calls = []
+        self.rejected_uuid = None
+
+    @property
+    def url(self):
+        return f"http://127.0.0.1:{self.server_port}"
+
+    def issue(self):
+        self.issued += 1
+        access = f"access-{self.issued}"
+        self.valid = {access}
+        return {"access_token": access, "refresh_token": f"refresh-{self.issued}", "token_type": "bearer"}
+
+
+class FakeBackendHandler(BaseHTTPRequestHandler):
+    def log_message(self, *args):
+        pass
+
+    def _reply(self, code, payload):
+        body = json.dumps(payload).encode()
+        self.send_response(code)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_POST(self):
+        server = self.server
+        data = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        server.calls.append(self.path.split("?")[0])
+        if self.path == "/api/v1/auth/login":
+            if parse_qs(data.decode())["password"] != ["secret"]:
+                return self._reply(401, {"detail": "Incorrect username or password"})
+            return self._reply(200, server.issue())
+        if self.path.startswith("/api/v1/auth/refresh"):
+            return self._reply(200, server.issue())
+        if self.headers.get("Authorization", "")[len("Bearer "):] not in server.valid:
+            return self._reply(401, {"detail": "Could not validate credentials"})
+        items = json.loads(gzip.decompress(data))["items"]
+        if any(item["client_uuid"] == server.rejected_uuid for item in items):
+            return self._reply(422, {"detail": [{"loc": ["body", "items", 0, "client_uuid"], "msg": "too long"}]})
+        return self._reply(200, {"results": [
+            {"client_uuid": item["client_uuid"], "status": "created", "operation_id": n, "conflict_with": None,
+             "error": None} for n, item in enumerate(items, start=1)
+        ]})
+
+
+@pytest.fixture()
+def backend():
+    server = FakeBackend()
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+def test_http_sync_refreshes_token_and_isolates_rejected_item(tmp_path, backend):
+    queue = OfflineQueue(str(tmp_path / "queue.db"))
+    transport = HttpTransport(backend.url, username="device", password="secret", timeout=5)
+    worker = SyncWorker(queue, transport, batch_size=10)
+    ids = {"farm_id": 1, "field_id": 1}
+    try:
+        uuids = [queue.enqueue(*_sowing(ids, day)) for day in (10, 11, 12, 13)]
+        backend.rejected_uuid = uuids[2]
+        assert worker.sync_once() == {"created": 3, "error": 1}
+        failed = queue.items([FAILED])
+        assert [item["client_uuid"] for item in failed] == [uuids[2]]
+        assert failed[0]["last_error"] == "HTTP 422: body.items.0.client_uuid: too long"
+
+        # Токен истёк: обновление по refresh token и повтор той же пачки
+        backend.valid = set()
+        queue.resolve(uuids[2], "retry")
+        backend.rejected_uuid = None
+        assert worker.sync_once() == {"created": 1}
+        assert backend.calls.count("/api/v1/auth/refresh") == 1
+        assert backend.calls.count("/api/v1/auth/login") == 1
+        assert worker.last_error is None and worker.auth_error is None
+    finally:
+        queue.close()
+
+
+def test_http_sync_reports_rejected_credentials(tmp_path, backend):
+    queue = OfflineQueue(str(tmp_path / "queue.db"))
+    worker = SyncWorker(queue, HttpTransport(backend.url, username="device", password="wrong", timeout=5))
+    try:
+        queue.enqueue(*_sowing({"farm_id": 1, "field_id": 1}, 10))
+        with pytest.raises(SyncAuthError):
+            worker.sync_once()
+        # Не ошибка связи: операции ждут в очереди без счётчика попыток
+        assert worker.auth_error == "HTTP 401: Incorrect username or password"
+        assert worker.last_error is None
+        assert queue.items([PENDING])[0]["attempts"] == 0
+    finally:
+        queue.close()
@@ -0,0 +1,36 @@
+"""
+Тест сопоставления названий со справочниками (modules.reference_lookup)
+Проверяет точные совпадения, синонимы, подсказки и разбор колонки целиком
+"""
+import numpy as np
+import pandas as pd
+
+from modules.reference_lookup import ReferenceLookup, canonicalize, lookup, unknown_names
+
+
+def test_resolve_column():
+    values = pd.Series(["пшеница  ЯРОВАЯ", "Подсолнух", "Ячмнь", "Пшеница", None, np.nan, "Горох"] * 3,
+                       index=range(100, 121))
+    resolved = lookup("crop").resolve(values)
+    assert list(resolved.index) == list(values.index)
+    first = resolved.iloc[:7]
+    assert first["canonical"].tolist()[:3] == ["Пшеница яровая", "Подсолнечник", "Ячмень"]
+    assert first["match"].tolist() == ["exact", "alias", "fuzzy", None, None, None, None]
+    # "Пшеница" одинаково близка к яровой и озимой - не выбирается, но предлагается
+    assert [name for name, _ in lookup("crop").suggest("Пшеница")] == ["Пшеница яровая", "Пшеница озимая"]
+
+    # Нечёткие совпадения не подставляются
+    assert canonicalize(values, "crop").iloc[:4].tolist() == ["Пшеница яровая", "Подсолнечник", "Ячмнь", "Пшеница"]
+    unknown = unknown_names(values, "crop")
+    assert unknown.set_index("name")["rows"].to_dict() == {"Ячмнь": 3, "Пшеница": 3, "Горох": 3}
+
+
+def test_derived_aliases():
+    fertilizers = lookup("fertilizer").resolve(["мочевина", "npk 16-16-16", "кас 32"])
+    assert fertilizers["canonical"].tolist() == ["Карбамид (Мочевина)", "Нитроаммофоска NPK 16:16:16", "КАС-32"]
+    assert lookup("pesticide").resolve(["Фастак"])["canonical"].iat[0] == "Фастак (100 г/л)"
+    assert lookup("active_ingredient").resolve(["Дикват дибромид"])["canonical"].iat[0] == "Дикват"
+
+    # Синоним, ведущий к двум названиям, отбрасывается
+    reference = ReferenceLookup("test", ["Торнадо (500 г/л)", "Торнадо (360 г/л)"])
+    assert reference.resolve(["Торнадо"], fuzzy=False)["match"].iat[0] is None
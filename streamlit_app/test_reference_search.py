@@ -0,0 +1,38 @@
+"""
+Тест поиска по справочникам (modules.reference_search)
+Проверяет ранжирование, опечатки, фасеты и обновление индекса по записям
+"""
+from modules.reference_search import ReferenceSearch, search_index
+
+
+def test_search_all_catalogs():
+    index = search_index()
+    assert index.search("john deere 8r 230")[0].key == "John Deere 8R 230"
+    # Латинское название и действующее вещество индексируются вместе с названием
+    assert {hit.catalog for hit in index.search("Blumeria")} == {"diseases.json"}
+    assert [hit.key for hit in index.search("тебуконазол", catalogs=["pesticides.json"])] == ["Фалькон (460 г/л)"]
+    # Префикс и опечатка
+    assert index.search("фаст")[0].key == "Фастак (100 г/л)"
+    assert index.search("фалкон")[0].key == "Фалькон (460 г/л)"
+    assert index.search("нет такого") == []
+
+
+def test_incremental_update_and_facets():
+    index = ReferenceSearch()
+    tractors = {
+        "МТЗ 82.1": {"производитель": "МТЗ Беларус", "модель": "82.1"},
+        "Кировец К-744": {"производитель": "Петербургский тракторный завод", "модель": "К-744"},
+    }
+    assert index.update_catalog("tractors.json", tractors) == {"added": 2, "updated": 0, "removed": 0}
+    assert index.facet_values("tractors.json", "производитель") == ["МТЗ Беларус", "Петербургский тракторный завод"]
+
+    edited = dict(tractors, **{"МТЗ 1221": {"производитель": "МТЗ Беларус", "модель": "1221"}})
+    edited["Кировец К-744"] = {"производитель": "ПТЗ", "модель": "К-744Р"}
+    del edited["МТЗ 82.1"]
+    assert index.update_catalog("tractors.json", edited) == {"added": 1, "updated": 1, "removed": 1}
+    assert list(index.entries("tractors.json")) == ["Кировец К-744", "МТЗ 1221"]
+    assert list(index.entries("tractors.json", производитель="МТЗ Беларус")) == ["МТЗ 1221"]
+    assert index.facet_values("tractors.json", "производитель") == ["МТЗ Беларус", "ПТЗ"]
+    assert index.search("82") == []
+    assert [hit.key for hit in index.search("к 744р")] == ["Кировец К-744"]
+    assert len(index._vocabulary) == len(index._postings)
@@ -0,0 +1,84 @@
+"""
+Тест сохранения справочников (modules.reference_store)
+Проверяет версии, отказ при устаревшей версии, восстановление
+и перечитывание справочника читателями после записи
+"""
+import json
+import os
+import stat
+
+import pytest
+
+from modules import reference_lookup, reference_search, reference_store
+from modules.config import settings
+from utils.reference_loader import reference_version
+
+
+@pytest.fixture()
+def data_dir(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(settings, "REFERENCE_RELOAD_SEC", 0)
+    directory = tmp_path / "data"
+    directory.mkdir()
+    (directory / "test_crops.json").write_text(json.dumps({"Пшеница": {"тип": "Зерновая"}}), encoding="utf-8")
+    return directory
+
+
+def test_versions_conflict_and_restore(data_dir, monkeypatch):
+    monkeypatch.setattr(settings, "REFERENCE_HISTORY_KEEP", 3)
+    snapshot = reference_store.read("test_crops.json")
+    assert snapshot.version == 0
+
+    data = dict(snapshot.data, Ячмень={"тип": "Зерновая"})
+    assert reference_store.save("test_crops.json", data, snapshot.version, author="admin") == 1
+    assert json.loads((data_dir / "test_crops.json").read_text(encoding="utf-8")) == data
+    # Временные файлы не остаются рядом со справочником
+    assert sorted(path.name for path in data_dir.iterdir()) == [".history", "test_crops.json"]
+
+    # Вторая сессия правила версию 0 - сохранение отклоняется, файл не меняется
+    with pytest.raises(reference_store.ReferenceConflict) as conflict:
+        reference_store.save("test_crops.json", {"Овёс": {}}, snapshot.version)
+    assert (conflict.value.expected, conflict.value.current) == (0, 1)
+    assert reference_store.read("test_crops.json") == (data, 1)
+
+    for version in (2, 3, 4):
+        assert reference_store.save("test_crops.json", {"v": version}, version - 1) == version
+    # Хранятся REFERENCE_HISTORY_KEEP последних версий; номера не переиспользуются
+    assert [item["version"] for item in reference_store.history("test_crops.json")] == [4, 3, 2]
+    assert reference_store.restore("test_crops.json", 2, expected_version=4) == 5
+    assert reference_store.read("test_crops.json") == ({"v": 2}, 5)
+
+
+def test_readers_reload_after_save(data_dir, monkeypatch):
+    monkeypatch.setitem(reference_lookup.CATALOGS, "crop", (("test_crops.json", False),))
+    monkeypatch.setattr(reference_lookup, "_compiled", {})
+    monkeypatch.setattr(reference_search, "CATALOG_FILES", ("test_crops.json",))
+    monkeypatch.setattr(reference_search, "_index", None)
+    monkeypatch.setattr(reference_search, "_versions", {})
+
+    assert reference_lookup.lookup("crop").resolve(["Овёс"])["canonical"].iat[0] is None
+    index = reference_search.search_index()
+    assert reference_search.search_index().search("овёс") == []
+    compiled = reference_lookup.lookup("crop")
+    assert reference_lookup.lookup("crop") is compiled
+
+    before = reference_version("test_crops.json")
+    reference_store.save("test_crops.json", {"Овёс": {"тип": "Зерновая"}}, 0)
+    assert reference_version("test_crops.json") != before
+
+    assert reference_lookup.lookup("crop").resolve(["Овёс"])["canonical"].iat[0] == "Овёс"
+    assert reference_search.search_index() is index
+    assert [hit.key for hit in index.search("овёс")] == ["Овёс"]
+    assert index.search("пшеница") == []
+
+
+@pytest.mark.skipif(os.name != "posix", reason="права доступа POSIX")
+def test_save_keeps_file_mode(data_dir):
+    path = data_dir / "test_crops.json"
+    path.chmod(0o664)
+    snapshot = reference_store.read("test_crops.json")
+    reference_store.save("test_crops.json", dict(snapshot.data, Овёс={}), snapshot.version)
+    assert stat.S_IMODE(path.stat().st_mode) == 0o664
+
+    reference_store.save("new_catalog.json", {"Рожь": {}}, 0)
+    assert stat.S_IMODE((data_dir / "new_catalog.json").stat().st_mode) == 0o644
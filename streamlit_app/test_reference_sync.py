@@ -0,0 +1,153 @@
+"""
+Тест справочных таблиц БД (modules.reference_sync)
+Проверяет загрузку JSON с разницей, ссылки операций на справочник
+и расчёт баланса NPK соединением в SQL
+"""
+import shutil
+from datetime import date
+from pathlib import Path
+
+import pytest
+from sqlalchemy import event, func, select
+
+from modules import reference_lookup, reference_store, reference_sync
+from modules.config import settings
+from modules.database import (
+    FertilizerApplication, HarvestData, Operation, RefCrop, RefFertilizer, RefPesticide, SowingDetail,
+)
+from modules.nutrient_balance import compute_balance
+
+DATA_DIR = Path(__file__).parent / "data"
+
+
+@pytest.fixture()
+def setup(tmp_path, session_factory, farm_id, field_id, monkeypatch):
+    # Копии справочников: тест правит их через reference_store
+    (tmp_path / "data").mkdir()
+    for filename in reference_sync.SYNCED_FILES | {"active_ingredients.json"}:
+        shutil.copy(DATA_DIR / filename, tmp_path / "data" / filename)
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(settings, "REFERENCE_RELOAD_SEC", 0)
+    monkeypatch.setattr(reference_lookup, "_compiled", {})
+    return session_factory, (farm_id, field_id)
+
+
+def test_diff_load(setup):
+    factory, _ = setup
+    with factory() as db:
+        first = reference_sync.sync_references(db)
+        db.commit()
+        assert first["crop"]["inserted"] == db.scalar(select(func.count(RefCrop.id))) == 9
+        urea = db.scalars(select(RefFertilizer).where(RefFertilizer.name == "Карбамид (Мочевина)")).one()
+        assert (urea.type, urea.n_content, urea.p2o5_content) == ("Минеральные азотные", 46.0, 0.0)
+        reglone = db.scalars(select(RefPesticide).where(RefPesticide.trade_name == "Реглон Супер")).one()
+        assert (reglone.pesticide_class, reglone.typical_dose_min, reglone.typical_dose_max, reglone.dose_unit) == \
+            ("Десикант", 2.0, 3.0, "л/га")
+
+        # Без изменений в JSON ничего не переписывается
+        again = reference_sync.sync_references(db)
+        assert all(again[catalog]["unchanged"] == first[catalog]["inserted"] for catalog in reference_sync.TABLES)
+
+        snapshot = reference_store.read("crops.json")
+        crops = dict(snapshot.data)
+        crops["Ячмень"] = dict(crops["Ячмень"], урожайность={"мин": 1.0, "макс": 6.0, "средняя": 2.2})
+        del crops["Овес"]
+        reference_store.save("crops.json", crops, snapshot.version)
+        barley_id = db.scalar(select(RefCrop.id).where(RefCrop.crop_name == "Ячмень"))
+
+        changed = reference_sync.sync_references(db)["crop"]
+        assert (changed["updated"], changed["removed"], changed["unchanged"]) == (1, 1, 7)
+        barley = db.scalars(select(RefCrop).where(RefCrop.crop_name == "Ячмень")).one()
+        # Запись обновлена на месте: ссылки операций остаются верными
+        assert (barley.id, barley.typical_yield_avg) == (barley_id, 2.2)
+
+
+def test_links_and_balance(setup):
+    factory, (farm_id, field_id) = setup
+    with factory() as db:
+        reference_sync.sync_references(db)
+        db.commit()
+
+        # ORM-запись: ссылка по синониму проставляется при вставке
+        sowing = Operation(farm_id=farm_id, field_id=field_id, operation_type="sowing",
+                           operation_date=date(2024, 5, 10), crop="Подсолнух", area_processed_ha=100.0)
+        sowing.sowing_details = SowingDetail(crop="Подсолнечник", combined_fertilizer_name="Аммофос",
+                                             combined_fertilizer_rate_kg_ha=50.0)
+        fertilizing = Operation(farm_id=farm_id, field_id=field_id, operation_type="fertilizing",
+                                operation_date=date(2024, 5, 1))
+        fertilizing.fertilizer_applications = [FertilizerApplication(fertilizer_name="мочевина", n_applied_kg=4600.0)]
+        db.add_all([sowing, fertilizing])
+        db.commit()
+        assert sowing.ref_crop_id == db.scalar(select(RefCrop.id).where(RefCrop.crop_name == "Подсолнечник"))
+        assert fertilizing.fertilizer_applications[0].ref_fertilizer_id == \
+            db.scalar(select(RefFertilizer.id).where(RefFertilizer.name == "Карбамид (Мочевина)"))
+
+        # Пакетная запись (как импорт Excel) связывается link_references
+        db.execute(Operation.__table__.insert(), [{
+            "farm_id": farm_id, "field_id": field_id, "operation_type": "harvest",
+            "operation_date": date(2024, 9, 20), "crop": "подсолнечник", "area_processed_ha": 100.0,
+        }])
+        harvest_id = db.scalar(select(Operation.id).where(Operation.operation_type == "harvest"))
+        db.execute(HarvestData.__table__.insert(), [
+            {"operation_id": harvest_id, "crop": "Подсолнечник", "yield_t_ha": 2.4, "total_yield_t": 240.0},
+        ])
+        assert reference_sync.link_references(db) == 2
+        assert reference_sync.link_references(db) == 0
+        db.commit()
+
+        balance = compute_balance(db, farm_id, 2024).iloc[0]
+        # Подсолнечник: 60 кг N на среднюю урожайность 1.2 т/га
+        assert balance["n_removed_kg_ha"] == pytest.approx(2.4 * 60 / 1.2)
+        # Мочевина 4600 кг N на 100 га + Аммофос 12% N x 50 кг/га
+        assert balance["n_applied_kg_ha"] == pytest.approx(46.0 + 6.0)
+
+        # Культура удалена из справочника: ссылки обнуляются
+        snapshot = reference_store.read("crops.json")
+        crops = {name: info for name, info in snapshot.data.items() if name != "Подсолнечник"}
+        reference_store.save("crops.json", crops, snapshot.version)
+        reference_sync.sync_references(db)
+        assert db.scalar(select(func.count(Operation.id)).where(Operation.ref_crop_id.is_not(None))) == 0
+        assert compute_balance(db, farm_id, 2024).iloc[0]["n_removed_kg_ha"] == 0
+
+
+def test_orm_links_one_query_per_catalog(setup, engine):
+    factory, (farm_id, field_id) = setup
+    with factory() as db:
+        reference_sync.sync_references(db)
+        db.commit()
+
+        lookups = []
+
+        def count(conn, cursor, statement, parameters, context, executemany):
+            if statement.lstrip().upper().startswith("SELECT") and " ref_" in statement:
+                lookups.append(statement)
+
+        operations = []
+        for day, crop in enumerate(("Пшеница яровая", "Ячмень", "Подсолнух", "Неизвестная") * 5, start=1):
+            op = Operation(farm_id=farm_id, field_id=field_id, operation_type="fertilizing",
+                           operation_date=date(2024, 5, day), crop=crop)
+            op.fertilizer_applications = [FertilizerApplication(fertilizer_name="мочевина")]
+            operations.append(op)
+        event.listen(engine, "before_cursor_execute", count)
+        try:
+            db.add_all(operations)
+            db.flush()
+            assert len(lookups) == 2  # культуры и удобрения
+
+            # Правка названия пересчитывает ссылку; запись без правки не трогается
+            lookups.clear()
+            operations[0].crop = "Ячмень"
+            operations[1].area_processed_ha = 10.0
+            db.flush()
+            assert len(lookups) == 1
+        finally:
+            event.remove(engine, "before_cursor_execute", count)
+
+        crop_ids = dict(db.execute(select(RefCrop.crop_name, RefCrop.id)).all())
+        assert [op.ref_crop_id for op in operations[:4]] == [
+            crop_ids["Ячмень"], crop_ids["Ячмень"], crop_ids["Подсолнечник"], None,
+        ]
+        assert operations[4].ref_crop_id == crop_ids["Пшеница яровая"]
+        assert {app.ref_fertilizer_id for op in operations for app in op.fertilizer_applications} == {
+            db.scalar(select(RefFertilizer.id).where(RefFertilizer.name == "Карбамид (Мочевина)"))
+        }
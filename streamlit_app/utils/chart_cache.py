@@ -0,0 +1,205 @@
+"""
+Chart cache - Кеш готовых Plotly-графиков между перезапусками Streamlit
+"""
+from __future__ import annotations
+
+import functools
+import hashlib
+import json
+import threading
+from collections import OrderedDict
+from datetime import date, datetime
+from typing import Any, Callable, Dict, Optional
+
+import numpy as np
+import pandas as pd
+
+from modules.config import settings
+from utils.lazy import lazy_import
+
+go = lazy_import("plotly.graph_objects")
+
+_SCALAR_TYPES = (bool, int, float, str, date, datetime)
+
+
+class FigureCache:
+    """
+    LRU-кеш графиков, хранящихся в виде сериализованного JSON
+
+    Ключ - хеш содержимого входных массивов и параметров графика,
+    поэтому одинаковые данные дают попадание в кеш независимо от сессии.
+    Вытеснение идёт по давности использования с ограничением
+    на количество записей и суммарный объём JSON в памяти.
+    """
+
+    def __init__(self, max_entries: int = 256, max_bytes: int = 64 * 1024 * 1024):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.enabled = max_entries > 0 and max_bytes > 0
+        self._entries: "OrderedDict[str, str]" = OrderedDict()
+        self._size_bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    # ------------------------------------------------------------------
+    # Ключи
+    # ------------------------------------------------------------------
+
+    @classmethod
+    def make_key(cls, name: str, args: tuple, kwargs: Dict[str, Any]) -> str:
+        """
+        Построение ключа кеша по имени функции и её аргументам
+
+        Args:
+            name: Имя функции построения графика
+            args: Позиционные аргументы
+            kwargs: Именованные аргументы
+
+        Returns:
+            Hex-дайджест содержимого
+        """
+        h = hashlib.blake2b(digest_size=20)
+        h.update(name.encode("utf-8"))
+        cls._feed(h, args)
+        for key in sorted(kwargs):
+            h.update(b"\x00k" + key.encode("utf-8"))
+            cls._feed(h, kwargs[key])
+        return h.hexdigest()
+
+    @classmethod
+    def _feed(cls, h, value: Any) -> None:
+        """Рекурсивная подача значения в хеш"""
+        if value is None or isinstance(value, _SCALAR_TYPES):
+            h.update(b"\x00s" + type(value).__name__.encode() + repr(value).encode("utf-8"))
+        elif isinstance(value, (pd.Series, pd.Index)):
+            cls._feed_array(h, value.to_numpy())
+        elif isinstance(value, pd.DataFrame):
+            h.update(b"\x00f")
+            cls._feed(h, list(value.columns))
+            for col in value.columns:
+                cls._feed_array(h, value[col].to_numpy())
+        elif isinstance(value, np.ndarray):
+            cls._feed_array(h, value)
+        elif isinstance(value, (list, tuple)):
+            h.update(b"\x00l" + str(len(value)).encode())
+            # Однородные числовые списки хешируем одним буфером; тип элементов
+            # входит в ключ через dtype ([1, 2] и [1.0, 2.0] - разные ключи)
+            kinds = {type(v) for v in value}
+            if len(kinds) == 1 and issubclass(next(iter(kinds)), (int, float, np.number)) and kinds != {bool}:
+                cls._feed_array(h, np.asarray(value))
+            elif all(isinstance(v, _SCALAR_TYPES) for v in value):
+                # Плоские списки дат/строк - одной склейкой repr
+                h.update("\x1f".join(map(repr, value)).encode("utf-8"))
+            else:
+                for item in value:
+                    cls._feed(h, item)
+        elif isinstance(value, dict):
+            # Порядок ключей важен: он задаёт порядок серий на графике
+            h.update(b"\x00d" + str(len(value)).encode())
+            for k, v in value.items():
+                cls._feed(h, k)
+                cls._feed(h, v)
+        else:
+            h.update(b"\x00r" + type(value).__name__.encode() + repr(value).encode("utf-8"))
+
+    @classmethod
+    def _feed_array(cls, h, array: np.ndarray) -> None:
+        """Подача numpy-массива в хеш"""
+        h.update(b"\x00a" + str(array.dtype).encode() + str(array.shape).encode())
+        if array.dtype == object:
+            for item in array.ravel():
+                cls._feed(h, item)
+        else:
+            h.update(np.ascontiguousarray(array).tobytes())
+
+    # ------------------------------------------------------------------
+    # Хранение
+    # ------------------------------------------------------------------
+
+    def get(self, key: str) -> Optional[str]:
+        """Получение JSON графика по ключу (None при промахе)"""
+        with self._lock:
+            payload = self._entries.get(key)
+            if payload is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return payload
+
+    def put(self, key: str, payload: str) -> None:
+        """Сохранение JSON графика с вытеснением старых записей"""
+        size = len(payload)
+        if size > self.max_bytes:
+            return
+
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self._size_bytes -= len(old)
+
+            self._entries[key] = payload
+            self._size_bytes += size
+
+            while self._entries and (
+                len(self._entries) > self.max_entries or self._size_bytes > self.max_bytes
+            ):
+                _, evicted = self._entries.popitem(last=False)
+                self._size_bytes -= len(evicted)
+
+    def clear(self) -> None:
+        """Очистка кеша"""
+        with self._lock:
+            self._entries.clear()
+            self._size_bytes = 0
+            self.hits = 0
+            self.misses = 0
+
+    def stats(self) -> Dict[str, Any]:
+        """Статистика кеша"""
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "size_bytes": self._size_bytes,
+                "max_entries": self.max_entries,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / total if total else 0.0,
+            }
+
+
+# Общий кеш процесса: один на все сессии Streamlit
+figure_cache = FigureCache(
+    max_entries=settings.CHART_CACHE_MAX_ENTRIES,
+    max_bytes=settings.CHART_CACHE_MAX_MB * 1024 * 1024,
+)
+
+
+def cached_figure(func: Callable[..., go.Figure]) -> Callable[..., go.Figure]:
+    """
+    Декоратор кеширования функций построения графиков
+
+    При попадании график восстанавливается из JSON без повторного
+    построения и без повторной валидации (JSON уже получен из Plotly).
+    Каждый вызов возвращает новый объект Figure, поэтому последующие
+    изменения графика на странице не портят кеш.
+    """
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs) -> go.Figure:
+        if not figure_cache.enabled:
+            return func(*args, **kwargs)
+
+        key = figure_cache.make_key(func.__qualname__, args, kwargs)
+        payload = figure_cache.get(key)
+        if payload is not None:
+            return go.Figure(json.loads(payload), _validate=False)
+
+        fig = func(*args, **kwargs)
+        figure_cache.put(key, fig.to_json())
+        return fig
+
+    wrapper.uncached = func
+    return wrapper
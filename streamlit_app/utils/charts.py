@@ -1,12 +1,21 @@
 """
 Charts - Утилиты для создания графиков
 """
-import plotly.express as px
-import plotly.graph_objects as go
+from __future__ import annotations
+
 from typing import List, Dict, Optional, Tuple
 import pandas as pd
 
+from utils.lazy import lazy_import
+from utils.chart_cache import cached_figure
+from utils.downsampling import downsample, downsample_shared, scatter_trace_class
+
+# plotly загружается при первом построении графика
+px = lazy_import("plotly.express")
+go = lazy_import("plotly.graph_objects")
+
 
+@cached_figure
 def create_pie_chart(
     values: List[float],
     names: List[str],
@@ -55,6 +64,7 @@ def create_pie_chart(
     return fig
 
 
+@cached_figure
 def create_bar_chart(
     x: List,
     y: List[float],
@@ -100,6 +110,7 @@ def create_bar_chart(
     return fig
 
 
+@cached_figure
 def create_grouped_bar_chart(
     categories: List[str],
     data: Dict[str, List[float]],
@@ -140,6 +151,7 @@ def create_grouped_bar_chart(
     return fig
 
 
+@cached_figure
 def create_line_chart(
     x: List,
     y: List[float],
@@ -152,6 +164,9 @@ def create_line_chart(
     """
     Создание линейного графика
 
+    Длинные ряды прореживаются LTTB до CHART_MAX_POINTS точек,
+    очень длинные рисуются через WebGL (Scattergl).
+
     Args:
         x: Значения по оси X
         y: Значения по оси Y
@@ -164,12 +179,16 @@ def create_line_chart(
     Returns:
         Plotly Figure
     """
+    n_points = len(y)
+    x, y = downsample(x, y)
+    trace_class = scatter_trace_class(n_points)
+
     fig = go.Figure()
 
-    fig.add_trace(go.Scatter(
+    fig.add_trace(trace_class(
         x=x,
         y=y,
-        mode='lines+markers',
+        mode='lines+markers' if len(y) == n_points else 'lines',
         name=line_name,
         line=dict(color=color, width=2),
         marker=dict(size=6)
@@ -185,6 +204,7 @@ def create_line_chart(
     return fig
 
 
+@cached_figure
 def create_multiline_chart(
     x: List,
     data: Dict[str, List[float]],
@@ -195,6 +215,8 @@ def create_multiline_chart(
     """
     Создание графика с несколькими линиями
 
+    Каждая линия прореживается LTTB независимо.
+
     Args:
         x: Значения по оси X
         data: Словарь {название_линии: [значения]}
@@ -208,10 +230,14 @@ def create_multiline_chart(
     fig = go.Figure()
 
     for line_name, y_values in data.items():
-        fig.add_trace(go.Scatter(
-            x=x,
-            y=y_values,
-            mode='lines+markers',
+        n_points = len(y_values)
+        line_x, line_y = downsample(x, y_values)
+        trace_class = scatter_trace_class(n_points)
+
+        fig.add_trace(trace_class(
+            x=line_x,
+            y=line_y,
+            mode='lines+markers' if len(line_y) == n_points else 'lines',
             name=line_name,
             line=dict(width=2),
             marker=dict(size=6)
@@ -227,6 +253,7 @@ def create_multiline_chart(
     return fig
 
 
+@cached_figure
 def create_scatter_chart(
     x: List[float],
     y: List[float],
@@ -287,6 +314,7 @@ def create_scatter_chart(
     return fig
 
 
+@cached_figure
 def create_heatmap(
     z_values: List[List[float]],
     x_labels: List[str],
@@ -324,6 +352,7 @@ def create_heatmap(
     return fig
 
 
+@cached_figure
 def create_progress_bar_chart(
     categories: List[str],
     values: List[float],
@@ -382,6 +411,7 @@ def create_progress_bar_chart(
     return fig
 
 
+@cached_figure
 def create_gauge_chart(
     value: float,
     title: str,
@@ -437,6 +467,7 @@ def create_gauge_chart(
     return fig
 
 
+@cached_figure
 def create_stacked_bar_chart(
     categories: List[str],
     data: Dict[str, List[float]],
@@ -477,6 +508,7 @@ def create_stacked_bar_chart(
     return fig
 
 
+@cached_figure
 def create_box_plot(
     data: Dict[str, List[float]],
     title: str,
@@ -510,6 +542,7 @@ def create_box_plot(
     return fig
 
 
+@cached_figure
 def create_area_chart(
     x: List,
     data: Dict[str, List[float]],
@@ -521,6 +554,10 @@ def create_area_chart(
     """
     Создание графика с областями
 
+    Серии прореживаются LTTB по общим точкам оси X, чтобы стек
+    оставался согласованным. WebGL используется только без стека
+    (Scattergl не поддерживает stackgroup).
+
     Args:
         x: Значения по оси X
         data: Словарь {название_серии: [значения]}
@@ -532,10 +569,14 @@ def create_area_chart(
     Returns:
         Plotly Figure
     """
+    n_points = len(x)
+    x, data = downsample_shared(x, data)
+    trace_class = go.Scatter if stacked else scatter_trace_class(n_points)
+
     fig = go.Figure()
 
     for series_name, y_values in data.items():
-        fig.add_trace(go.Scatter(
+        fig.add_trace(trace_class(
             x=x,
             y=y_values,
             mode='lines',
@@ -554,6 +595,7 @@ def create_area_chart(
     return fig
 
 
+@cached_figure
 def create_histogram(
     values: List[float],
     title: str,
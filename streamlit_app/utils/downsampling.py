@@ -0,0 +1,170 @@
+"""
+Downsampling - Прореживание длинных временных рядов для графиков
+Алгоритм Largest-Triangle-Three-Buckets (LTTB)
+"""
+from __future__ import annotations
+
+from typing import List, Optional, Sequence, Tuple
+
+import numpy as np
+import pandas as pd
+
+from modules.config import settings
+from utils.lazy import lazy_import
+
+go = lazy_import("plotly.graph_objects")
+
+
+def _to_numeric(values: Sequence) -> np.ndarray:
+    """
+    Приведение значений оси X к числам для расчёта площадей
+
+    Даты и datetime переводятся в наносекунды, прочие нечисловые
+    значения заменяются порядковым номером точки.
+    """
+    array = np.asarray(values)
+
+    if np.issubdtype(array.dtype, np.number):
+        return array.astype(float)
+
+    if np.issubdtype(array.dtype, np.datetime64):
+        return array.astype("datetime64[ns]").astype(np.int64).astype(float)
+
+    try:
+        dt = pd.to_datetime(pd.Series(values))
+        return dt.to_numpy(dtype="datetime64[ns]").astype(np.int64).astype(float)
+    except (TypeError, ValueError):
+        return np.arange(len(array), dtype=float)
+
+
+def lttb_indices(x: Sequence, y: Sequence[float], threshold: int) -> np.ndarray:
+    """
+    Индексы точек, отобранных алгоритмом LTTB
+
+    Первая и последняя точки сохраняются всегда. Остальные точки делятся
+    на (threshold - 2) корзины; в каждой выбирается точка, образующая
+    треугольник наибольшей площади с уже выбранной точкой предыдущей
+    корзины и средней точкой следующей. Внутри корзины расчёт векторный.
+
+    Args:
+        x: Значения по оси X (числа, даты)
+        y: Значения по оси Y
+        threshold: Количество точек на выходе
+
+    Returns:
+        Отсортированный массив индексов исходного ряда
+    """
+    n = len(y)
+    if threshold >= n or threshold < 3:
+        return np.arange(n)
+
+    xs = _to_numeric(x)
+    ys = np.nan_to_num(np.asarray(y, dtype=float))
+
+    # Границы корзин для внутренних точек [1, n - 1)
+    edges = np.linspace(1, n - 1, threshold - 1).astype(np.int64)
+
+    # Средние точки всех корзин считаются заранее одним проходом
+    counts = np.diff(edges)
+    x_sums = np.add.reduceat(xs[1:n - 1], edges[:-1] - 1)
+    y_sums = np.add.reduceat(ys[1:n - 1], edges[:-1] - 1)
+    x_means = np.append(x_sums / counts, xs[n - 1])
+    y_means = np.append(y_sums / counts, ys[n - 1])
+
+    selected = np.empty(threshold, dtype=np.int64)
+    selected[0] = 0
+    selected[-1] = n - 1
+
+    prev = 0
+    for i in range(threshold - 2):
+        start, stop = edges[i], edges[i + 1]
+        ax, ay = xs[prev], ys[prev]
+        cx, cy = x_means[i + 1], y_means[i + 1]
+
+        bx = xs[start:stop]
+        by = ys[start:stop]
+        # Удвоенная площадь треугольника (множитель 1/2 на argmax не влияет)
+        areas = np.abs((ax - cx) * (by - ay) - (ax - bx) * (cy - ay))
+
+        prev = start + int(np.argmax(areas))
+        selected[i + 1] = prev
+
+    return selected
+
+
+def downsample(
+    x: Sequence,
+    y: Sequence[float],
+    threshold: Optional[int] = None
+) -> Tuple[List, List[float]]:
+    """
+    Прореживание ряда, если он длиннее порога
+
+    Args:
+        x: Значения по оси X
+        y: Значения по оси Y
+        threshold: Максимальное число точек (по умолчанию CHART_MAX_POINTS)
+
+    Returns:
+        (x, y) - исходные значения отобранных точек
+    """
+    if threshold is None:
+        threshold = settings.CHART_MAX_POINTS
+
+    if not threshold or len(y) <= threshold:
+        return x, y
+
+    idx = lttb_indices(x, y, threshold)
+    x_list = list(x)
+    y_list = list(y)
+    return [x_list[i] for i in idx], [y_list[i] for i in idx]
+
+
+def downsample_shared(
+    x: Sequence,
+    data: dict,
+    threshold: Optional[int] = None
+) -> Tuple[List, dict]:
+    """
+    Прореживание нескольких рядов с общей осью X
+
+    Точки отбираются по сумме рядов, чтобы все серии сохранили
+    одинаковые значения X (нужно для стековых графиков).
+
+    Args:
+        x: Общие значения по оси X
+        data: Словарь {название_серии: [значения]}
+        threshold: Максимальное число точек (по умолчанию CHART_MAX_POINTS)
+
+    Returns:
+        (x, data) с прореженными рядами
+    """
+    if threshold is None:
+        threshold = settings.CHART_MAX_POINTS
+
+    if not data or not threshold or len(x) <= threshold:
+        return x, data
+
+    total = np.nansum([np.asarray(v, dtype=float) for v in data.values()], axis=0)
+    idx = lttb_indices(x, total, threshold)
+    x_list = list(x)
+    sampled = {}
+    for name, values in data.items():
+        values_list = list(values)
+        sampled[name] = [values_list[i] for i in idx]
+    return [x_list[i] for i in idx], sampled
+
+
+def scatter_trace_class(n_points: int):
+    """
+    Класс трассы для линии: WebGL (Scattergl) для больших рядов
+
+    Args:
+        n_points: Количество точек в исходном ряду
+
+    Returns:
+        go.Scattergl или go.Scatter
+    """
+    if settings.CHART_WEBGL_THRESHOLD and n_points > settings.CHART_WEBGL_THRESHOLD:
+        return go.Scattergl
+    return go.Scatter
@@ -0,0 +1,111 @@
+"""
+Lazy - Отложенные импорты и профиль времени запуска
+
+Тяжёлые библиотеки визуализации (plotly, folium) подключаются через
+lazy_import и загружаются при первом обращении к атрибуту, а не при
+открытии страницы. Модуль зависит только от стандартной библиотеки:
+его импортируют utils.charts, utils.maps и другие модули графиков,
+которым не нужны БД и инициализация процесса (modules.startup).
+"""
+import importlib
+import sys
+import threading
+import time
+import types
+from contextlib import contextmanager
+from datetime import datetime
+from typing import Dict, List
+
+# Момент импорта модуля - условная точка старта процесса
+_PROCESS_STARTED = time.perf_counter()
+
+
+class StartupProfile:
+    """Журнал длительности этапов запуска (общий на процесс)"""
+
+    def __init__(self):
+        self._stages: List[Dict] = []
+        self._lock = threading.Lock()
+
+    def record(self, stage: str, seconds: float) -> None:
+        with self._lock:
+            self._stages.append({
+                "stage": stage,
+                "ms": round(seconds * 1000, 1),
+                "since_start_ms": round((time.perf_counter() - _PROCESS_STARTED) * 1000, 1),
+                "at": datetime.now().strftime("%H:%M:%S"),
+            })
+
+    @contextmanager
+    def stage(self, name: str):
+        """Замер этапа: with startup_profile.stage("schema_check"): ..."""
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(name, time.perf_counter() - started)
+
+    def report(self) -> List[Dict]:
+        """Этапы в порядке выполнения"""
+        with self._lock:
+            return list(self._stages)
+
+    def format(self) -> str:
+        """Текстовый отчёт для лога"""
+        lines = [f"{s['stage']:<40} {s['ms']:>9.1f} ms  (t+{s['since_start_ms']:.0f} ms)" for s in self.report()]
+        return "\n".join(["Startup profile:"] + lines)
+
+
+startup_profile = StartupProfile()
+
+
+class LazyModule(types.ModuleType):
+    """
+    Модуль, загружаемый при первом обращении к атрибуту
+
+    После загрузки атрибуты копируются в словарь прокси,
+    поэтому последующие обращения идут без __getattr__.
+    """
+
+    def __init__(self, name: str):
+        super().__init__(name)
+        self._lazy_lock = threading.Lock()
+        self._lazy_module = None
+
+    def _load(self):
+        if self._lazy_module is None:
+            with self._lazy_lock:
+                if self._lazy_module is None:
+                    with startup_profile.stage(f"import {self.__name__}"):
+                        module = importlib.import_module(self.__name__)
+                    self.__dict__.update(module.__dict__)
+                    self._lazy_module = module
+        return self._lazy_module
+
+    def __getattr__(self, attr):
+        if attr.startswith("_lazy"):
+            raise AttributeError(attr)
+        return getattr(self._load(), attr)
+
+    def __dir__(self):
+        return dir(self._load())
+
+
+_lazy_modules: Dict[str, LazyModule] = {}
+
+
+def lazy_import(name: str):
+    """
+    Отложенный импорт модуля
+
+    Args:
+        name: Полное имя модуля ("plotly.express")
+
+    Returns:
+        Уже загруженный модуль или прокси LazyModule
+    """
+    if name in sys.modules:
+        return sys.modules[name]
+    if name not in _lazy_modules:
+        _lazy_modules[name] = LazyModule(name)
+    return _lazy_modules[name]
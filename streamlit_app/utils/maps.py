@@ -1,11 +1,17 @@
 """
 Maps - Утилиты для работы с картами
 """
-import folium
-from folium import plugins
+from __future__ import annotations
+
 from typing import List, Dict, Optional, Tuple
 import json
 
+from utils.lazy import lazy_import
+
+# folium загружается при первом построении карты
+folium = lazy_import("folium")
+plugins = lazy_import("folium.plugins")
+
 
 def create_base_map(
     center_lat: float = 51.1694,
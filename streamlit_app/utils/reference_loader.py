@@ -4,21 +4,12 @@ Handles multiple possible file locations for robustness
 """
 import json
 from pathlib import Path
-from typing import Dict, Any, Optional
+from typing import Dict, Any, List, Optional, Tuple
 import streamlit as st
 
 
-def load_reference(filename: str, show_error: bool = True) -> Dict[str, Any]:
-    """
-    Загрузка справочника из JSON из нескольких возможных путей
-
-    Args:
-        filename: имя JSON файла (например, "fertilizers.json")
-        show_error: показывать ли ошибку в Streamlit при неудаче
-
-    Returns:
-        Словарь с данными или пустой словарь при ошибке
-    """
+def _candidate_paths(filename: str) -> List[Path]:
+    """Возможные пути справочника в порядке приоритета"""
     # Определяем возможные пути поиска справочника
     # ПРИОРИТЕТ: Streamlit Cloud запускает app.py из streamlit_app/, поэтому cwd == streamlit_app/
     candidate_paths = [
@@ -44,8 +35,64 @@ def load_reference(filename: str, show_error: bool = True) -> Dict[str, Any]:
         Path.cwd().parent / "shared" / "data" / filename,
     ]
 
-    # Удаляем дубликаты и нормализуем пути
-    candidate_paths = list(set(p.resolve() for p in candidate_paths))
+    # Удаляем дубликаты и нормализуем пути (с сохранением приоритета: читатели
+    # и редактор справочников должны видеть один и тот же файл)
+    return list(dict.fromkeys(p.resolve() for p in candidate_paths))
+
+
+def reference_path(filename: str) -> Optional[Path]:
+    """
+    Файл справочника, который читает load_reference
+
+    Args:
+        filename: имя JSON файла
+
+    Returns:
+        Первый существующий путь по приоритету или None
+    """
+    for path in _candidate_paths(filename):
+        if path.exists():
+            return path
+    return None
+
+
+def reference_version(filename: str) -> Tuple[int, int, int]:
+    """
+    Отпечаток файла справочника (mtime в наносекундах, размер, inode)
+
+    Меняется при каждой записи справочника (в том числе из другого процесса),
+    поэтому служит ключом кеша: данные перечитываются только после изменения.
+    Атомарная запись (reference_store) заменяет файл новым, поэтому inode
+    различает и две записи одного размера в пределах точности mtime.
+
+    Args:
+        filename: имя JSON файла
+
+    Returns:
+        (mtime_ns, size, inode) или (0, 0, 0), если файла нет
+    """
+    path = reference_path(filename)
+    if path is None:
+        return (0, 0, 0)
+    try:
+        stat = path.stat()
+    except OSError:
+        return (0, 0, 0)
+    return (stat.st_mtime_ns, stat.st_size, stat.st_ino)
+
+
+def load_reference(filename: str, show_error: bool = True) -> Dict[str, Any]:
+    """
+    Загрузка справочника из JSON из нескольких возможных путей
+
+    Args:
+        filename: имя JSON файла (например, "fertilizers.json")
+        show_error: показывать ли ошибку в Streamlit при неудаче
+
+    Returns:
+        Словарь с данными или пустой словарь при ошибке
+    """
+    candidate_paths = _candidate_paths(filename)
 
     # Пытаемся загрузить из каждого возможного пути
     for path in candidate_paths:
@@ -183,7 +230,11 @@ def load_implements() -> Dict[str, Any]:
 
 
 # Кешированные версии для оптимизации производительности
-@st.cache_data(ttl=3600)  # Кеш на 1 час
-def load_reference_cached(filename: str) -> Dict[str, Any]:
-    """Кешированная загрузка справочника"""
+@st.cache_data(ttl=3600, max_entries=64)  # Кеш на 1 час
+def _load_reference_versioned(filename: str, version: Tuple[int, int, int]) -> Dict[str, Any]:
     return load_reference(filename, show_error=True)
+
+
+def load_reference_cached(filename: str) -> Dict[str, Any]:
+    """Кешированная загрузка справочника (перечитывается сразу после изменения файла)"""
+    return _load_reference_versioned(filename, reference_version(filename))